@@ -2,11 +2,35 @@
 """
 Mini Assembler para 6502
 Gera arquivo .mif de 16KB com instruções começando no endereço 0x1000
+
+Com um mapa de memória (memorymap.py) o espaço de endereços passa a ser o
+do mapa (64KB por padrão), a imagem fica em memória esparsa e as saídas
+trazem apenas os segmentos usados.
+
+Constantes (.EQU) e tabelas calculadas na montagem (.BYTE/.WORD com FOR)
+usam as expressões de expressions.py; .INCLUDE, macros e .REPT ficam em
+preprocessor.py:
+
+    TAM     .EQU 64
+    SENO:   .BYTE round(127 * sin(2 * PI * I / TAM)) & $FF FOR I = 0 TO TAM - 1
+            LDX #TAM
+
+Fontes grandes podem ser montados em streaming (assemble_stream, --stream):
+o fonte é lido uma única vez e só as referências para frente ficam
+pendentes até o fim, então a memória acompanha o código gerado.
 """
 
+import argparse
+import gc
+import os
 import re
 import sys
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, List, Tuple, Optional
+
+import memimage
+import timing
+from expressions import RE_NAME, evaluate, split_arguments
+from memorymap import RAM, MemoryMap, Region, SparseMemory, find_project_map
 
 # Tamanho da memória em bytes (16KB)
 MEMORY_SIZE = 16 * 1024  # 16384 bytes
@@ -14,6 +38,9 @@ MEMORY_SIZE = 16 * 1024  # 16384 bytes
 # Endereço inicial das instruções
 START_ADDRESS = 0x1000
 
+# Mapa usado sem mapa de projeto: uma única RAM de MEMORY_SIZE bytes
+DEFAULT_MEMORY_MAP = MemoryMap([Region('RAM', RAM, 0, MEMORY_SIZE)], MEMORY_SIZE)
+
 # Modos de endereçamento
 class AddressMode:
     IMPLIED = 'IMP'       # Implícito (sem operando)
@@ -289,13 +316,153 @@ OPCODES: Dict[str, Dict[str, Tuple[int, int]]] = {
 # Instruções de branch (usam endereçamento relativo)
 BRANCH_INSTRUCTIONS = {'BCC', 'BCS', 'BEQ', 'BMI', 'BNE', 'BPL', 'BVC', 'BVS'}
 
+# Branch com condição invertida (usado para expandir branches longos)
+INVERTED_BRANCHES = {
+    'BCC': 'BCS', 'BCS': 'BCC', 'BEQ': 'BNE', 'BNE': 'BEQ',
+    'BMI': 'BPL', 'BPL': 'BMI', 'BVC': 'BVS', 'BVS': 'BVC',
+}
+
+# Branch longo: branch invertido sobre um JMP absoluto (2 + 3 bytes)
+LONG_BRANCH_SIZE = 5
+JMP_ABSOLUTE = OPCODES['JMP'][AddressMode.ABSOLUTE][0]
+
+# Modo de página zero equivalente a cada modo absoluto
+ZERO_PAGE_MODES = {
+    AddressMode.ABSOLUTE: AddressMode.ZERO_PAGE,
+    AddressMode.ABSOLUTE_X: AddressMode.ZERO_PAGE_X,
+    AddressMode.ABSOLUTE_Y: AddressMode.ZERO_PAGE_Y,
+}
+ABSOLUTE_MODES = {zp: absolute for absolute, zp in ZERO_PAGE_MODES.items()}
+
+# Limite de iterações da relaxação do layout
+MAX_RELAX_PASSES = 32
+
+# Montagem em streaming: statements codificados por lote e limite do cache
+# de decodificação (operandos distintos crescem com o fonte)
+STREAM_BATCH = 4096
+STREAM_DECODE_CACHE = 65536
+
+# Expressões regulares dos modos de endereçamento (compiladas uma única vez)
+RE_IMMEDIATE = re.compile(r'^#(.+)$')
+RE_INDIRECT_X = re.compile(r'^\((.+),\s*X\)$', re.IGNORECASE)
+RE_INDIRECT_Y = re.compile(r'^\((.+)\),\s*Y$', re.IGNORECASE)
+RE_INDIRECT = re.compile(r'^\((.+)\)$')
+RE_INDEXED_X = re.compile(r'^(.+),\s*X$', re.IGNORECASE)
+RE_INDEXED_Y = re.compile(r'^(.+),\s*Y$', re.IGNORECASE)
+
+# Tabela gerada: EXPRESSÃO FOR VAR = INÍCIO TO FIM [STEP PASSO]
+RE_TABLE = re.compile(r'^(.+?)\s+FOR\s+([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(.+?)\s+TO\s+(.+?)'
+                      r'(?:\s+STEP\s+(.+))?$', re.IGNORECASE)
+
+# Diretivas do pré-processador (o fonte sem elas é analisado linha a linha)
+RE_PREPROCESSOR = re.compile(r'\.(?:INCLUDE|MACRO|REPT)\b', re.IGNORECASE)
+# Linha com .INCLUDE (opcionalmente com label), usada para posicionar o incluído na listagem
+RE_INCLUDE_LINE = re.compile(r'^\s*(?:[^;:]*:)?\s*\.INCLUDE\b', re.IGNORECASE)
+
+
+def is_label_ref(value_str: str) -> bool:
+    """Indica se o operando é uma referência a label (e não um número)"""
+    try:
+        first = value_str[0]
+    except IndexError:
+        first = ''
+    if not first or first.isspace():
+        # Ex.: item vazio em ".WORD $1234,"
+        raise ValueError("Operando vazio")
+    return first != '$' and not first.isdigit()
+
+
+# Tipos de statement produzidos pelo parser
+class StatementKind:
+    LABEL = 'LABEL'       # Linha contendo apenas um label
+    ORG = 'ORG'           # Diretiva .ORG
+    BYTE = 'BYTE'         # Diretiva .BYTE
+    WORD = 'WORD'         # Diretiva .WORD
+    EQU = 'EQU'           # Constante (.EQU): o label vale `value`, sem gerar bytes
+    INSTRUCTION = 'INS'   # Instrução do processador
+
+
+class Statement:
+    """
+    Statement já analisado pelo parser.
+
+    Guarda tudo que as duas passagens precisam (modo, tamanho, opcode e
+    operando), de forma que o texto fonte é processado uma única vez.
+    """
+    __slots__ = ('line_num', 'label', 'kind', 'instruction', 'mode', 'value',
+                 'ref', 'opcode', 'size', 'data', 'address', 'file')
+
+    def __init__(self, line_num: int, label: Optional[str], kind: str,
+                 instruction: Optional[str] = None, mode: Optional[str] = None,
+                 value: Optional[int] = None, ref: Optional[str] = None,
+                 opcode: int = 0, size: int = 0, data: Optional[list] = None):
+        self.line_num = line_num
+        self.label = label
+        self.kind = kind
+        self.instruction = instruction
+        self.mode = mode
+        self.value = value        # Valor numérico do operando (ou endereço do .ORG)
+        self.ref = ref            # Label referenciado pelo operando
+        self.opcode = opcode
+        self.size = size          # Tamanho em bytes gerado na memória
+        self.data = data          # Itens de .BYTE/.WORD (int ou nome de label)
+        self.address = 0          # Preenchido na primeira passagem
+        self.file = 0             # Índice em Assembler6502.files (.INCLUDE)
+
+    def copy(self) -> 'Statement':
+        statement = Statement.__new__(Statement)
+        for name in Statement.__slots__:
+            setattr(statement, name, getattr(self, name))
+        return statement
+
+    def __repr__(self) -> str:
+        return (f"Statement(linha={self.line_num}, label={self.label!r}, "
+                f"{self.kind} {self.instruction or ''} {self.mode or ''})")
+
+
+def statement_cycles(statement: Statement) -> int:
+    """Ciclos de clock da FSM gastos por um statement (0 para diretivas)"""
+    if statement.kind != StatementKind.INSTRUCTION:
+        return 0
+    if statement.size == LONG_BRANCH_SIZE:
+        inverted = OPCODES[INVERTED_BRANCHES[statement.instruction]][AddressMode.RELATIVE][0]
+        return timing.CYCLES[inverted] + timing.CYCLES[JMP_ABSOLUTE]
+    return timing.CYCLES[statement.opcode]
+
 
 class Assembler6502:
-    def __init__(self):
-        self.memory = bytearray(MEMORY_SIZE)
+    # Endereço inicial quando o fonte não usa .ORG
+    origin = START_ADDRESS
+    # Em módulos relocáveis o endereço final dos labels só é conhecido no link,
+    # então referências a labels nunca são reduzidas para página zero
+    relocatable = False
+
+    def __init__(self, optimize: bool = False, memory_map: Optional[MemoryMap] = None,
+                 profile: Optional[Dict[str, int]] = None):
+        # Com mapa de memória a imagem é esparsa (só as páginas usadas)
+        self.memory_map = memory_map
+        self.memory = SparseMemory(memory_map.size) if memory_map is not None else bytearray(MEMORY_SIZE)
+        self.memory_size = len(self.memory)
         self.labels: Dict[str, int] = {}
         self.current_address = START_ADDRESS
         self.pending_labels: List[Tuple[int, str, int]] = []  # (address, label, instruction_size)
+        # Statements da última montagem (usados pela listagem e pelo mapa de fonte)
+        self.statements: List[Statement] = []
+        self.source_name = '<fonte>'
+        # Arquivos da última montagem: o fonte e os incluídos (Statement.file)
+        self.files: List[str] = [self.source_name]
+        # Constantes .EQU, na ordem de definição
+        self.constants: Dict[str, int] = {}
+        # Regiões ocupadas pelo programa: (início, fim exclusivo)
+        self.segments: List[Tuple[int, int]] = []
+        # Texto da instrução -> (instrução, modo, valor, label, opcode, tamanho)
+        self.decode_cache: Dict[str, Tuple[str, str, Optional[int], Optional[str], int, int]] = {}
+        # Otimizador peephole (opcional) e relatório da última montagem
+        self.optimize = optimize
+        self.optimization_report = None
+        # Perfil de execução por label (layout.py) e relatório do layout
+        self.profile = profile
+        self.layout_report = None
 
     def parse_value(self, value_str: str) -> int:
         """Parse um valor numérico (hex ou decimal)"""
@@ -326,55 +493,66 @@ class Assembler6502:
         if operand.upper() == 'A':
             return AddressMode.ACCUMULATOR, None, None
 
+        first = operand[0]
+
         # Imediato: #$XX ou #XX
-        match = re.match(r'^#(.+)$', operand)
-        if match:
-            value = self.parse_value(match.group(1))
-            return AddressMode.IMMEDIATE, value, None
-
-        # Indireto,X: ($XX,X)
-        match = re.match(r'^\((.+),\s*X\)$', operand, re.IGNORECASE)
-        if match:
-            value = self.parse_value(match.group(1))
-            return AddressMode.INDIRECT_X, value, None
-
-        # Indireto,Y: ($XX),Y
-        match = re.match(r'^\((.+)\),\s*Y$', operand, re.IGNORECASE)
-        if match:
-            value = self.parse_value(match.group(1))
-            return AddressMode.INDIRECT_Y, value, None
-
-        # Indireto: ($XXXX) - apenas para JMP
-        match = re.match(r'^\((.+)\)$', operand)
-        if match:
-            value = self.parse_value(match.group(1))
-            return AddressMode.INDIRECT, value, None
-
-        # Absoluto,X ou Página Zero,X: $XXXX,X ou $XX,X
-        match = re.match(r'^(.+),\s*X$', operand, re.IGNORECASE)
-        if match:
-            val_str = match.group(1).strip()
-            # Check if it's a label
-            if not val_str.startswith('$') and not val_str.startswith('0x') and not val_str[0].isdigit():
-                return AddressMode.ABSOLUTE_X, None, val_str
-            value = self.parse_value(val_str)
-            if value <= 0xFF:
-                return AddressMode.ZERO_PAGE_X, value, None
-            return AddressMode.ABSOLUTE_X, value, None
-
-        # Absoluto,Y ou Página Zero,Y: $XXXX,Y ou $XX,Y
-        match = re.match(r'^(.+),\s*Y$', operand, re.IGNORECASE)
-        if match:
-            val_str = match.group(1).strip()
-            if not val_str.startswith('$') and not val_str.startswith('0x') and not val_str[0].isdigit():
-                return AddressMode.ABSOLUTE_Y, None, val_str
-            value = self.parse_value(val_str)
-            if value <= 0xFF:
-                return AddressMode.ZERO_PAGE_Y, value, None
-            return AddressMode.ABSOLUTE_Y, value, None
+        if first == '#':
+            match = RE_IMMEDIATE.match(operand)
+            if match:
+                val_str = match.group(1).strip()
+                # Byte baixo/alto de um label: #<LABEL ou #>LABEL
+                if val_str[0] in '<>':
+                    return AddressMode.IMMEDIATE, None, val_str[0] + val_str[1:].strip()
+                if val_str in self.constants:
+                    return AddressMode.IMMEDIATE, self.constants[val_str], None
+                value = self.parse_value(val_str)
+                return AddressMode.IMMEDIATE, value, None
+
+        if first == '(':
+            # Indireto,X: ($XX,X)
+            match = RE_INDIRECT_X.match(operand)
+            if match:
+                value = self.parse_value(match.group(1))
+                return AddressMode.INDIRECT_X, value, None
+
+            # Indireto,Y: ($XX),Y
+            match = RE_INDIRECT_Y.match(operand)
+            if match:
+                value = self.parse_value(match.group(1))
+                return AddressMode.INDIRECT_Y, value, None
+
+            # Indireto: ($XXXX) - apenas para JMP
+            match = RE_INDIRECT.match(operand)
+            if match:
+                value = self.parse_value(match.group(1))
+                return AddressMode.INDIRECT, value, None
+
+        if ',' in operand:
+            # Absoluto,X ou Página Zero,X: $XXXX,X ou $XX,X
+            match = RE_INDEXED_X.match(operand)
+            if match:
+                val_str = match.group(1).strip()
+                # Check if it's a label
+                if is_label_ref(val_str):
+                    return AddressMode.ABSOLUTE_X, None, val_str
+                value = self.parse_value(val_str)
+                if value <= 0xFF:
+                    return AddressMode.ZERO_PAGE_X, value, None
+                return AddressMode.ABSOLUTE_X, value, None
+
+            # Absoluto,Y ou Página Zero,Y: $XXXX,Y ou $XX,Y
+            match = RE_INDEXED_Y.match(operand)
+            if match:
+                val_str = match.group(1).strip()
+                if is_label_ref(val_str):
+                    return AddressMode.ABSOLUTE_Y, None, val_str
+                value = self.parse_value(val_str)
+                if value <= 0xFF:
+                    return AddressMode.ZERO_PAGE_Y, value, None
+                return AddressMode.ABSOLUTE_Y, value, None
 
         # Verificar se é um label
-        if not operand.startswith('$') and not operand.startswith('0x') and not operand[0].isdigit():
+        if is_label_ref(operand):
             # É um label
             if instruction in BRANCH_INSTRUCTIONS:
                 return AddressMode.RELATIVE, None, operand
@@ -391,235 +569,683 @@ class Assembler6502:
             return AddressMode.ZERO_PAGE, value, None
         return AddressMode.ABSOLUTE, value, None
 
-    def first_pass(self, lines: List[str]) -> None:
-        """Primeira passagem: coleta labels e calcula endereços"""
-        self.current_address = START_ADDRESS
-        self.labels = {}
-
-        for line_num, line in enumerate(lines, 1):
-            # Remove comentários
-            if ';' in line:
-                line = line[:line.index(';')]
+    def parse_line(self, line: str, line_num: int) -> Optional[Statement]:
+        """Analisa uma linha do fonte; retorna None para linhas vazias"""
+        # Remove comentários
+        comment = line.find(';')
+        if comment >= 0:
+            line = line[:comment]
+        line = line.strip()
+
+        if not line:
+            return None
+
+        # Verifica se é um label
+        label = None
+        if ':' in line:
+            label, _, line = line.partition(':')
+            label = label.strip()
             line = line.strip()
-
             if not line:
-                continue
+                return Statement(line_num, label, StatementKind.LABEL)
 
-            # Verifica se é um label
-            if ':' in line:
-                parts = line.split(':', 1)
-                label = parts[0].strip()
-                self.labels[label] = self.current_address
-                line = parts[1].strip() if len(parts) > 1 else ''
-                if not line:
-                    continue
+        # Fontes gerados repetem muito as mesmas instruções: o texto sem label
+        # e comentário indexa a decodificação já feita (só instruções entram)
+        decoded = self.decode_cache.get(line)
+        if decoded is not None:
+            return Statement(line_num, label, StatementKind.INSTRUCTION, *decoded)
 
-            # Parse da instrução
-            parts = line.split(None, 1)
-            instruction = parts[0].upper()
-            operand = parts[1] if len(parts) > 1 else ''
+        # Parse da instrução
+        parts = line.split(None, 1)
+        instruction = parts[0].upper()
+        operand = parts[1] if len(parts) > 1 else ''
 
+        # Diretivas (todas começam com '.')
+        if instruction[0] == '.':
             # Diretiva .ORG
             if instruction == '.ORG':
-                self.current_address = self.parse_value(operand)
-                continue
+                return Statement(line_num, label, StatementKind.ORG, instruction,
+                                 value=self.parse_value(operand))
 
             # Diretiva .BYTE
             if instruction == '.BYTE':
-                bytes_data = [self.parse_value(b.strip()) for b in operand.split(',')]
-                self.current_address += len(bytes_data)
-                continue
+                try:
+                    bytes_data = [self.parse_value(b.strip()) for b in operand.split(',')]
+                except ValueError:
+                    bytes_data = self.parse_data(operand, line_num)
+                return Statement(line_num, label, StatementKind.BYTE, instruction,
+                                 size=len(bytes_data), data=bytes_data)
 
             # Diretiva .WORD
             if instruction == '.WORD':
-                words_data = operand.split(',')
-                self.current_address += len(words_data) * 2
-                continue
-
-            if instruction not in OPCODES:
-                raise ValueError(f"Linha {line_num}: Instrução desconhecida '{instruction}'")
-
-            # Detecta modo de endereçamento para calcular tamanho
-            mode, _, _ = self.detect_address_mode(operand, instruction)
-
-            if mode not in OPCODES[instruction]:
-                raise ValueError(f"Linha {line_num}: Modo de endereçamento '{mode}' inválido para '{instruction}'")
-
-            _, size = OPCODES[instruction][mode]
-            self.current_address += size
-
-    def write_byte(self, address: int, value: int) -> None:
-        """Escreve um byte na memória se estiver dentro do range"""
-        if 0 <= address < MEMORY_SIZE:
-            self.memory[address] = value & 0xFF
-
-    def second_pass(self, lines: List[str]) -> None:
-        """Segunda passagem: gera código de máquina"""
-        self.current_address = START_ADDRESS
-
-        for line_num, line in enumerate(lines, 1):
-            # Remove comentários
-            if ';' in line:
-                line = line[:line.index(';')]
-            line = line.strip()
-
-            if not line:
-                continue
-
-            # Remove label se presente
-            if ':' in line:
-                parts = line.split(':', 1)
-                line = parts[1].strip() if len(parts) > 1 else ''
-                if not line:
+                words_data = self.parse_data(operand, line_num, words=True)
+                return Statement(line_num, label, StatementKind.WORD, instruction,
+                                 size=len(words_data) * 2, data=words_data)
+
+            # Constante: NOME: .EQU expressão
+            if instruction == '.EQU':
+                if not label:
+                    raise ValueError(f"Linha {line_num}: .EQU sem nome (use NOME: .EQU valor)")
+                if label in self.constants:
+                    raise ValueError(f"Linha {line_num}: Constante '{label}' já definida")
+                try:
+                    value = evaluate(operand, self.constants)
+                except ValueError as e:
+                    raise ValueError(f"Linha {line_num}: {e}") from None
+                self.constants[label] = value
+                return Statement(line_num, label, StatementKind.EQU, instruction, value=value)
+
+        if instruction not in OPCODES:
+            raise ValueError(f"Linha {line_num}: Instrução desconhecida '{instruction}'")
+
+        # Detecta modo de endereçamento (fixa tamanho e opcode)
+        try:
+            mode, value, ref = self.detect_address_mode(operand, instruction)
+        except ValueError as e:
+            raise ValueError(f"Linha {line_num}: {e}") from None
+
+        if mode not in OPCODES[instruction]:
+            raise ValueError(f"Linha {line_num}: Modo de endereçamento '{mode}' inválido para '{instruction}'")
+
+        opcode, size = OPCODES[instruction][mode]
+        # Imediato com constante (#NOME) depende do .EQU: não vai para o cache
+        if not (mode == AddressMode.IMMEDIATE and operand[1:].strip() in self.constants):
+            self.decode_cache[line] = (instruction, mode, value, ref, opcode, size)
+        return Statement(line_num, label, StatementKind.INSTRUCTION, instruction,
+                         mode, value, ref, opcode, size)
+
+    def parse_data(self, operand: str, line_num: int, words: bool = False) -> list:
+        """
+        Itens de .BYTE/.WORD: números, expressões com constantes ou uma
+        tabela "EXPRESSÃO FOR VAR = INÍCIO TO FIM [STEP PASSO]". Em .WORD,
+        nomes simples (e <NOME, >NOME) ficam como labels para a segunda passagem.
+        """
+        try:
+            match = RE_TABLE.match(operand.strip())
+            if match:
+                expression, variable, first, last, step = match.groups()
+                first, last = evaluate(first, self.constants), evaluate(last, self.constants)
+                step = evaluate(step, self.constants) if step else 1
+                if step == 0:
+                    raise ValueError("STEP 0 em tabela")
+                names = dict(self.constants)
+                data = []
+                for index in range(first, last + (1 if step > 0 else -1), step):
+                    names[variable] = index
+                    data.append(evaluate(expression, names))
+                return data
+
+            data = []
+            items = split_arguments(operand) if '(' in operand else operand.split(',')
+            for item in items:
+                item = item.strip()
+                if words and is_label_ref(item) and RE_NAME.match(item.lstrip('<>')):
+                    # Labels são resolvidos na segunda passagem
+                    data.append(item)
                     continue
+                try:
+                    data.append(self.parse_value(item))
+                except ValueError:
+                    data.append(evaluate(item, self.constants))
+            return data
+        except ValueError as e:
+            raise ValueError(f"Linha {line_num}: {e}") from None
+
+    def parse(self, lines: List[str]) -> List[Statement]:
+        """Converte o fonte em uma lista compacta de statements (uma única vez)"""
+        self.constants = {}
+        self.files = [self.source_name]
+        if RE_PREPROCESSOR.search('\n'.join(lines)):
+            # Import local: o pré-processador depende das classes deste módulo
+            import preprocessor
+            return preprocessor.Preprocessor(self).expand(lines)
+        parse_line = self.parse_line
+        # Statements não formam ciclos: o coletor cíclico só gastaria tempo
+        # percorrendo os objetos novos a cada poucas centenas de linhas
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            statements = [parse_line(line, line_num) for line_num, line in enumerate(lines, 1)]
+        finally:
+            if collecting:
+                gc.enable()
+        return [statement for statement in statements if statement is not None]
+
+    def relax(self, statements: List[Statement]) -> None:
+        """
+        Repete a primeira passagem até o layout convergir
 
-            # Parse da instrução
-            parts = line.split(None, 1)
-            instruction = parts[0].upper()
-            operand = parts[1] if len(parts) > 1 else ''
-
-            # Diretiva .ORG
-            if instruction == '.ORG':
-                self.current_address = self.parse_value(operand)
-                continue
+        Referências a labels que caem na página zero passam a usar o modo
+        ZERO_PAGE/ZERO_PAGE_X/ZERO_PAGE_Y (quando o opcode suporta), e
+        branches fora do alcance viram branch invertido + JMP.
+        """
+        for _ in range(MAX_RELAX_PASSES):
+            self.first_pass(statements)
+            labels = self.labels
+            changed = False
 
-            # Diretiva .BYTE
-            if instruction == '.BYTE':
-                bytes_data = [self.parse_value(b.strip()) for b in operand.split(',')]
-                for byte in bytes_data:
-                    self.write_byte(self.current_address, byte)
-                    self.current_address += 1
-                continue
+            for statement in statements:
+                if statement.kind != StatementKind.INSTRUCTION:
+                    continue
+                mode = statement.mode
 
-            # Diretiva .WORD
-            if instruction == '.WORD':
-                words_data = operand.split(',')
-                for word_str in words_data:
-                    word_str = word_str.strip()
-                    # Check if it's a label
-                    if not word_str.startswith('$') and not word_str.startswith('0x') and not word_str[0].isdigit():
-                        if word_str in self.labels:
-                            word = self.labels[word_str]
-                        else:
-                            raise ValueError(f"Linha {line_num}: Label desconhecido '{word_str}'")
+                if mode == AddressMode.RELATIVE:
+                    if statement.size == LONG_BRANCH_SIZE:
+                        continue
+                    target = statement.value if statement.ref is None else labels.get(statement.ref)
+                    if target is None:
+                        continue
+                    offset = target - (statement.address + 2)
+                    if offset < -128 or offset > 127:
+                        # Branch longo é definitivo (garante a convergência)
+                        statement.size = LONG_BRANCH_SIZE
+                        changed = True
+
+                elif statement.ref is not None:
+                    target = labels.get(statement.ref)
+                    if target is None:
+                        continue
+                    modes = OPCODES[statement.instruction]
+                    if (mode in ZERO_PAGE_MODES and target <= 0xFF and not self.relocatable
+                            and ZERO_PAGE_MODES[mode] in modes):
+                        mode = ZERO_PAGE_MODES[mode]
+                    elif mode in ABSOLUTE_MODES and target > 0xFF:
+                        mode = ABSOLUTE_MODES[mode]
                     else:
-                        word = self.parse_value(word_str)
-                    self.write_byte(self.current_address, word & 0xFF)  # Low byte
-                    self.write_byte(self.current_address + 1, (word >> 8) & 0xFF)  # High byte
-                    self.current_address += 2
-                continue
+                        continue
+                    statement.mode = mode
+                    statement.opcode, statement.size = modes[mode]
+                    changed = True
 
-            # Detecta modo de endereçamento
-            mode, value, label = self.detect_address_mode(operand, instruction)
+            if not changed:
+                self.check_segments(statements)
+                return
 
-            # Resolve label se necessário
-            if label:
-                if label not in self.labels:
-                    raise ValueError(f"Linha {line_num}: Label desconhecido '{label}'")
-                value = self.labels[label]
+        raise ValueError(f"Layout não convergiu após {MAX_RELAX_PASSES} passagens")
 
-            # Obtém opcode e tamanho
-            opcode, size = OPCODES[instruction][mode]
+    def first_pass(self, statements: List[Statement]) -> None:
+        """Primeira passagem: coleta labels e calcula endereços"""
+        # Endereço, labels e segmento atual em variáveis locais (laço quente)
+        address = self.origin
+        labels: Dict[str, int] = {}
+        segments: List[Tuple[int, int]] = []
+        segment_start = segment_end = None
+
+        for statement in statements:
+            if statement.label is not None:
+                labels[statement.label] = (statement.value if statement.kind == StatementKind.EQU
+                                           else address)
+
+            if statement.kind == StatementKind.ORG:
+                address = statement.value
+
+            statement.address = address
+            size = statement.size
+            if size:
+                if segment_end != address:
+                    if segment_end is not None:
+                        segments.append((segment_start, segment_end))
+                    segment_start = address
+                address += size
+                segment_end = address
+
+        if segment_end is not None:
+            segments.append((segment_start, segment_end))
+        self.current_address = address
+        self.labels = labels
+        self.segments = segments
+
+    def check_segments(self, statements: List[Statement]) -> None:
+        """Gera erro se algum segmento cai fora das regiões RAM/ROM do mapa de memória"""
+        memory_map = self.memory_map or DEFAULT_MEMORY_MAP
+        errors = []
+        for start, end in self.segments:
+            for gap_start, gap_end in memory_map.uncovered(start, end):
+                statement = next((st for st in statements
+                                  if st.size and st.address < gap_end and st.address + st.size > gap_start), None)
+                where = f"Linha {statement.line_num}: " if statement is not None else ''
+                errors.append(f"{where}${gap_start:04X}-${gap_end - 1:04X} "
+                              f"em {memory_map.describe(gap_start)}")
+        if errors:
+            raise ValueError("Código ou dados fora das regiões RAM/ROM: " + '; '.join(errors))
 
-            # Escreve opcode
-            self.write_byte(self.current_address, opcode)
+    def write_byte(self, address: int, value: int) -> None:
+        """Escreve um byte na memória se estiver dentro do range"""
+        if 0 <= address < self.memory_size:
+            self.memory[address] = value & 0xFF
 
-            # Escreve operando
-            if size >= 2:
-                if mode == AddressMode.RELATIVE:
+    def resolve_label(self, label: str, line_num: int) -> int:
+        """Retorna o endereço de um label ou gera erro se desconhecido"""
+        if label[0] in '<>':
+            # Seletor de byte: <LABEL (baixo) ou >LABEL (alto)
+            value = self.resolve_label(label[1:], line_num)
+            return value & 0xFF if label[0] == '<' else (value >> 8) & 0xFF
+        if label not in self.labels:
+            raise ValueError(f"Linha {line_num}: Label desconhecido '{label}'")
+        return self.labels[label]
+
+    def second_pass(self, statements: List[Statement]) -> None:
+        """Segunda passagem: gera código de máquina"""
+        memory = self.memory
+        memory_size = self.memory_size
+        write_byte = self.write_byte
+
+        for statement in statements:
+            kind = statement.kind
+            address = statement.address
+
+            if kind == StatementKind.INSTRUCTION:
+                value = statement.value
+
+                # Resolve label se necessário
+                if statement.ref is not None:
+                    value = self.resolve_label(statement.ref, statement.line_num)
+
+                size = statement.size
+
+                # Monta os bytes da instrução (opcode + operando)
+                if size == 1:
+                    encoded = (statement.opcode,)
+                elif size == LONG_BRANCH_SIZE:
+                    # Branch invertido pula o JMP para o destino
+                    inverted = OPCODES[INVERTED_BRANCHES[statement.instruction]][AddressMode.RELATIVE][0]
+                    encoded = (inverted, 3, JMP_ABSOLUTE, value & 0xFF, (value >> 8) & 0xFF)
+                elif statement.mode == AddressMode.RELATIVE:
                     # Calcula offset relativo para branches
-                    offset = value - (self.current_address + 2)
+                    offset = value - (address + 2)
                     if offset < -128 or offset > 127:
-                        raise ValueError(f"Linha {line_num}: Branch fora do alcance ({offset})")
-                    self.write_byte(self.current_address + 1, offset & 0xFF)
+                        raise ValueError(f"Linha {statement.line_num}: Branch fora do alcance ({offset})")
+                    encoded = (statement.opcode, offset & 0xFF)
+                elif size == 2:
+                    encoded = (statement.opcode, value & 0xFF)
                 else:
-                    self.write_byte(self.current_address + 1, value & 0xFF)
-
-            if size == 3:
-                self.write_byte(self.current_address + 2, (value >> 8) & 0xFF)
-
-            self.current_address += size
+                    encoded = (statement.opcode, value & 0xFF, (value >> 8) & 0xFF)
+
+                if 0 <= address and address + size <= memory_size:
+                    memory[address:address + size] = bytes(encoded)
+                elif address < memory_size:
+                    for i, byte in enumerate(encoded):
+                        write_byte(address + i, byte)
+
+            elif kind == StatementKind.BYTE:
+                for byte in statement.data:
+                    write_byte(address, byte)
+                    address += 1
+
+            elif kind == StatementKind.WORD:
+                for word in statement.data:
+                    if isinstance(word, str):
+                        word = self.resolve_label(word, statement.line_num)
+                    write_byte(address, word & 0xFF)  # Low byte
+                    write_byte(address + 1, (word >> 8) & 0xFF)  # High byte
+                    address += 2
+
+        self.current_address = statements[-1].address + statements[-1].size if statements else self.origin
+
+    def prepare(self, source: str) -> List[Statement]:
+        """Analisa, otimiza (se habilitado) e calcula o layout do código fonte"""
+        statements = self.parse(source.split('\n'))
+        if self.optimize:
+            # Import local: o otimizador depende das classes deste módulo
+            import optimizer
+            self.optimization_report = optimizer.OptimizationReport()
+            statements = optimizer.optimize(statements, self.optimization_report,
+                                            self.memory_map, self.constants)
+        if self.profile is not None:
+            # Import local: o layout depende das classes deste módulo
+            import layout
+            self.layout_report = layout.LayoutReport()
+            statements = layout.layout(statements, self.profile, self.layout_report)
+        self.relax(statements)
+        return statements
 
     def assemble(self, source: str) -> None:
         """Assembla o código fonte"""
-        lines = source.split('\n')
-        self.first_pass(lines)
-        self.second_pass(lines)
+        statements = self.prepare(source)
+        self.second_pass(statements)
+        self.statements = statements
+
+    def assemble_stream(self, lines: Iterable[str]) -> None:
+        """
+        Assembla o fonte lido de um iterável de linhas (arquivo aberto, gerador...)
+
+        Uma única leitura: cada statement recebe o endereço ao ser lido e é
+        codificado em lotes de STREAM_BATCH; só os statements que usam label
+        ainda não definido ficam guardados, até o fim do fonte. A memória
+        usada é a da imagem mais essas pendências, e não a do texto.
+
+        Sem o fonte inteiro não há .INCLUDE/.MACRO/.REPT, otimizador nem
+        layout por perfil, e o tamanho de cada instrução é fixado na leitura:
+        referência para frente a label de página zero fica no modo absoluto e
+        branch para frente precisa caber no alcance curto. A listagem e o
+        mapa de fonte precisam de assemble() (self.statements fica vazio).
+        """
+        if self.optimize or self.profile is not None:
+            raise ValueError("Otimizador e layout por perfil precisam do fonte inteiro (use assemble)")
+        self.constants = {}
+        self.files = [self.source_name]
+        self.statements = []
+        self.labels = labels = {}
+        segments: List[Tuple[int, int]] = []
+        batch: List[Statement] = []
+        pending: List[Statement] = []   # Referências a labels ainda não definidos
+        address = self.origin
+        parse_line = self.parse_line
+
+        for line_num, line in enumerate(lines, 1):
+            try:
+                statement = parse_line(line, line_num)
+            except ValueError:
+                if RE_PREPROCESSOR.search(line):
+                    raise ValueError(f"Linha {line_num}: .INCLUDE, .MACRO e .REPT precisam do fonte "
+                                     f"inteiro (use assemble)") from None
+                raise
+            if statement is None:
+                continue
+            kind = statement.kind
+            if statement.label is not None:
+                labels[statement.label] = statement.value if kind == StatementKind.EQU else address
+            if kind == StatementKind.ORG:
+                address = statement.value
+
+            forward = False
+            if kind == StatementKind.INSTRUCTION and statement.ref is not None:
+                ref = statement.ref
+                target = labels.get(ref[1:] if ref[0] in '<>' else ref)
+                if target is None:
+                    forward = True
+                elif statement.mode == AddressMode.RELATIVE:
+                    offset = target - (address + 2)
+                    if offset < -128 or offset > 127:
+                        statement.size = LONG_BRANCH_SIZE
+                elif statement.mode in ZERO_PAGE_MODES and target <= 0xFF and not self.relocatable:
+                    modes = OPCODES[statement.instruction]
+                    if ZERO_PAGE_MODES[statement.mode] in modes:
+                        statement.mode = ZERO_PAGE_MODES[statement.mode]
+                        statement.opcode, statement.size = modes[statement.mode]
+            elif kind == StatementKind.WORD:
+                forward = any(isinstance(word, str) and (word[1:] if word[0] in '<>' else word) not in labels
+                              for word in statement.data)
+
+            statement.address = address
+            size = statement.size
+            if size:
+                if segments and segments[-1][1] == address:
+                    segments[-1] = (segments[-1][0], address + size)
+                else:
+                    segments.append((address, address + size))
+                address += size
+
+            if forward:
+                pending.append(statement)
+            else:
+                batch.append(statement)
+                if len(batch) >= STREAM_BATCH:
+                    self.second_pass(batch)
+                    batch.clear()
+                    if len(self.decode_cache) > STREAM_DECODE_CACHE:
+                        self.decode_cache.clear()
+
+        self.segments = segments
+        self.check_segments(batch + pending)
+        self.second_pass(batch)
+        # Labels conhecidos: as pendências são resolvidas e gravadas na imagem
+        for statement in pending:
+            if statement.mode == AddressMode.RELATIVE and statement.ref in labels:
+                offset = labels[statement.ref] - (statement.address + 2)
+                if offset < -128 or offset > 127:
+                    raise ValueError(f"Linha {statement.line_num}: Branch para frente fora do alcance "
+                                     f"({offset}); na montagem em streaming use JMP ou assemble()")
+        self.second_pass(pending)
+        self.current_address = address
 
     def assemble_file(self, filename: str) -> None:
         """Assembla um arquivo"""
         with open(filename, 'r') as f:
             source = f.read()
+        self.source_name = filename
         self.assemble(source)
 
-    def generate_mif(self, output_filename: str) -> None:
-        """Gera arquivo MIF de 16KB"""
-        with open(output_filename, 'w') as f:
-            f.write("-- Memory Initialization File (.mif)\n")
-            f.write("-- Generated by Mini Assembler 6502\n")
-            f.write("-- Instructions start at address 0x1000\n\n")
-            f.write(f"DEPTH = {MEMORY_SIZE};\n")
-            f.write("WIDTH = 8;\n")
-            f.write("ADDRESS_RADIX = HEX;\n")
-            f.write("DATA_RADIX = HEX;\n\n")
-            f.write("CONTENT BEGIN\n")
-
-            # Agrupa bytes consecutivos iguais para compactação
-            i = 0
-            while i < MEMORY_SIZE:
-                value = self.memory[i]
-
-                # Encontra sequência de bytes iguais
-                j = i + 1
-                while j < MEMORY_SIZE and self.memory[j] == value:
-                    j += 1
-
-                if j - i > 1:
-                    # Range de valores iguais
-                    f.write(f"    [{i:04X}..{j-1:04X}] : {value:02X};\n")
-                else:
-                    # Valor único
-                    f.write(f"    {i:04X} : {value:02X};\n")
-
-                i = j
+    def source_map(self):
+        """Mapa endereço -> linha/símbolo da última montagem (sourcemap.SourceMap)"""
+        # Import local: sourcemap depende das classes deste módulo
+        import sourcemap
+        return sourcemap.SourceMap.from_assembler(self)
 
-            f.write("END;\n")
+    @property
+    def sparse(self) -> bool:
+        """Imagem esparsa (montagem com mapa de memória)"""
+        return self.memory_map is not None
 
+    def generate_mif(self, output_filename: str, sparse: bool = False) -> None:
+        """
+        Gera arquivo MIF de 16KB (com sparse=True, apenas as regiões usadas)
+        Com mapa de memória a profundidade é a do mapa e a saída é sempre esparsa.
+        """
+        sparse = sparse or self.sparse
+        memimage.write_mif(self.memory, output_filename, self.segments if sparse else None)
         print(f"Arquivo MIF gerado: {output_filename}")
 
+    def generate_hex(self, output_filename: str) -> None:
+        """Gera arquivo Intel HEX com as regiões usadas"""
+        memimage.write_hex(self.memory, output_filename, self.segments)
+        print(f"Arquivo HEX gerado: {output_filename}")
+
+    def generate_bin(self, output_filename: str) -> None:
+        """
+        Gera arquivo binário bruto com a imagem completa da memória
+        Com mapa de memória o arquivo termina no último byte usado.
+        """
+        end = max((end for _, end in self.segments), default=0) if self.sparse else None
+        memimage.write_bin(self.memory, output_filename, 0, end)
+        print(f"Arquivo BIN gerado: {output_filename}")
+
+    def write_output(self, output_filename: str) -> str:
+        """
+        Grava a imagem no formato da extensão (.mif, .hex ou .bin), sem mensagens
+        Retorna o formato gravado ('MIF', 'HEX' ou 'BIN').
+        """
+        return memimage.write_image(self.memory, output_filename, self.segments, self.sparse)
+
+    def generate_output(self, output_filename: str) -> None:
+        """Escolhe o formato de saída pela extensão (.mif, .hex ou .bin)"""
+        output_format = self.write_output(output_filename)
+        print(f"Arquivo {output_format} gerado: {output_filename}")
+
+    def find_loops(self) -> List[Tuple[str, int, int, int, int, int]]:
+        """
+        Encontra laços a partir de branches e JMPs para trás
+        Retorna: (label, início, fim, linha do salto, instruções, ciclos por iteração)
+        ordenados do laço mais caro para o mais barato
+        """
+        instructions = [st for st in self.statements if st.kind == StatementKind.INSTRUCTION]
+        loops = []
+        for jump in instructions:
+            if jump.ref is None or (jump.mode != AddressMode.RELATIVE and jump.instruction != 'JMP'):
+                continue
+            target = self.labels.get(jump.ref)
+            if target is None or target > jump.address:
+                continue
+            body = [st for st in instructions if target <= st.address <= jump.address]
+            cycles = sum(statement_cycles(st) for st in body)
+            loops.append((jump.ref, target, jump.address, jump.line_num, len(body), cycles))
+        loops.sort(key=lambda loop: loop[5], reverse=True)
+        return loops
+
+    def listing_columns(self, statement: Statement) -> Tuple[str, str, object]:
+        """(endereço, bytes, ciclos) de um statement nas colunas da listagem"""
+        data = self.memory[statement.address:statement.address + statement.size]
+        encoded = ' '.join(f"{byte:02X}" for byte in data[:3]) + ('+' if len(data) > 3 else '')
+        cycles = statement_cycles(statement) if statement.kind == StatementKind.INSTRUCTION else ''
+        return f"{statement.address:04X}", encoded, cycles
+
+    @staticmethod
+    def listing_text(statement: Statement) -> str:
+        """Texto resumido de um statement sem linha própria no fonte (label e instrução)"""
+        label = f"{statement.label}:" if statement.label else ''
+        return f"{label} {statement.instruction or ''}".strip()
+
+    def generate_listing(self, lines: List[str], output_filename: str,
+                         clock_hz: float = timing.DEFAULT_CLOCK_HZ) -> None:
+        """
+        Gera listagem com endereço, bytes e custo em ciclos da FSM por linha
+
+        Linhas que geram vários statements (chamada de macro, corpo de .REPT)
+        mostram o primeiro na própria linha e os demais logo abaixo, sem
+        número de linha. O código de arquivos incluídos aparece sob a linha
+        do .INCLUDE, com 'arquivo:linha' no lugar do fonte.
+        """
+        # Statements do fonte principal por linha; os dos incluídos ficam sob
+        # a linha do .INCLUDE (entre o statement anterior e o próximo do fonte)
+        by_line: Dict[int, List[Statement]] = {}
+        included: Dict[int, List[Statement]] = {}
+        pending: List[Statement] = []
+        last_line = 1
+
+        def place_included(next_line: int) -> None:
+            anchor = next((line_num for line_num in range(last_line, next_line)
+                           if line_num <= len(lines) and RE_INCLUDE_LINE.match(lines[line_num - 1])),
+                          max(last_line, next_line - 1))
+            included.setdefault(anchor, []).extend(pending)
+            pending.clear()
+
+        for statement in self.statements:
+            if statement.file:
+                pending.append(statement)
+                continue
+            if pending:
+                place_included(statement.line_num)
+            by_line.setdefault(statement.line_num, []).append(statement)
+            last_line = statement.line_num
+        if pending:
+            place_included(len(lines) + 1)
+
+        out = [f"{'END.':<6}{'BYTES':<11}{'CICL':>5}  {'LINHA':>5}  FONTE\n"]
+        total_cycles = sum(statement_cycles(statement) for statement in self.statements
+                           if statement.kind == StatementKind.INSTRUCTION)
+
+        for line_num, text in enumerate(lines, 1):
+            statements = by_line.get(line_num, [])
+            address = encoded = cycles = ''
+            if statements:
+                address, encoded, cycles = self.listing_columns(statements[0])
+            out.append(f"{address:<6}{encoded:<11}{cycles:>5}  {line_num:>5}  {text.rstrip()}\n")
+            for statement in statements[1:]:
+                address, encoded, cycles = self.listing_columns(statement)
+                out.append(f"{address:<6}{encoded:<11}{cycles:>5}  {'':>5}    {self.listing_text(statement)}\n")
+            for statement in included.get(line_num, ()):
+                address, encoded, cycles = self.listing_columns(statement)
+                where = f"{os.path.basename(self.files[statement.file])}:{statement.line_num}"
+                out.append(f"{address:<6}{encoded:<11}{cycles:>5}  {'':>5}    {where}  {self.listing_text(statement)}\n")
+
+        code_size = sum(end - start for start, end in self.segments)
+        out.append(f"\nTotal: {code_size} bytes, {total_cycles} ciclos (uma passagem por instrução)\n")
+
+        loops = self.find_loops()
+        out.append(f"\nLaços encontrados (custo por iteração a {clock_hz / 1e6:g} MHz):\n")
+        if not loops:
+            out.append("  nenhum\n")
+        for label, start, end, line_num, count, cycles in loops:
+            out.append(f"  {label:<16} ${start:04X}-${end:04X}  {count:>4} instruções  "
+                       f"{cycles:>6} ciclos  {timing.cycles_to_seconds(cycles, clock_hz) * 1e6:9.3f} us"
+                       f"  (salto na linha {line_num})\n")
+
+        with open(output_filename, 'w') as f:
+            f.write(''.join(out))
+        print(f"Listagem gerada: {output_filename}")
+
     def print_memory(self, start: int = START_ADDRESS, length: int = 64) -> None:
         """Imprime uma seção da memória para debug"""
         print(f"\nMemória a partir de ${start:04X}:")
-        for i in range(start, min(start + length, MEMORY_SIZE), 16):
-            hex_values = ' '.join(f'{self.memory[j]:02X}' for j in range(i, min(i + 16, MEMORY_SIZE)))
+        for i in range(start, min(start + length, self.memory_size), 16):
+            hex_values = ' '.join(f'{self.memory[j]:02X}' for j in range(i, min(i + 16, self.memory_size)))
             print(f"${i:04X}: {hex_values}")
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Uso: python assembler.py <arquivo.asm> [arquivo_saida.mif]")
-        print("\nExemplo:")
-        print("  python assembler.py programa.asm")
-        print("  python assembler.py programa.asm saida.mif")
-        sys.exit(1)
-
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else input_file.rsplit('.', 1)[0] + '.mif'
+    parser = argparse.ArgumentParser(
+        description="Mini Assembler 6502",
+        epilog="Exemplo:\n  python assembler.py programa.asm\n  python assembler.py programa.asm saida.mif\n"
+               "  python assembler.py programa.asm saida.hex --listing -O",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="arquivo .asm")
+    parser.add_argument('output', nargs='?', help="arquivo de saída .mif, .hex ou .bin")
+    parser.add_argument('--listing', nargs='?', const='', metavar='ARQUIVO',
+                        help="gera listagem com ciclos por linha e relatório de laços (padrão: <entrada>.lst)")
+    parser.add_argument('--map', nargs='?', const='', metavar='ARQUIVO',
+                        help="grava o mapa de fonte e o índice de símbolos (padrão: <entrada>.map)")
+    parser.add_argument('-O', '--optimize', action='store_true',
+                        help="aplica o otimizador peephole e mostra o que foi economizado")
+    parser.add_argument('--profile', metavar='ARQUIVO',
+                        help="reordena os blocos de código pelo perfil de execução por label (JSON "
+                             "do profiler.py --save-profile ou {\"LABEL\": execuções})")
+    parser.add_argument('--profile-run', type=int, metavar='N',
+                        help="obtém o perfil executando até N instruções no simulador e reordena os blocos")
+    parser.add_argument('--stream', action='store_true',
+                        help="monta lendo o fonte linha a linha, com memória proporcional ao código gerado "
+                             "(sem .INCLUDE/.MACRO/.REPT, -O e --profile)")
+    parser.add_argument('--cache', nargs='?', const='.asm6502_cache', metavar='DIR',
+                        help="reaproveita montagens anteriores guardadas em DIR (padrão: .asm6502_cache)")
+    parser.add_argument('--memory-map', metavar='ARQUIVO',
+                        help="mapa de memória RAM/ROM/E/S do projeto (padrão: memoria.cfg ao lado "
+                             "do fonte, se existir; sem mapa, RAM única de 16KB)")
+    args = parser.parse_args()
+    if args.stream and (args.cache is not None or args.listing is not None or args.map is not None):
+        parser.error("--stream não gera listagem nem mapa de fonte e não usa o cache")
+
+    input_file = args.input
+    output_file = args.output or input_file.rsplit('.', 1)[0] + '.mif'
 
     try:
-        assembler = Assembler6502()
-        assembler.assemble_file(input_file)
-        assembler.generate_mif(output_file)
+        map_file = args.memory_map or find_project_map(input_file)
+        memory_map = MemoryMap.load(map_file) if map_file else None
+        profile = None
+        if args.profile:
+            from layout import load_profile
+            profile = load_profile(args.profile)
+        elif args.profile_run:
+            from layout import profile_from_run
+            profiled = Assembler6502(optimize=args.optimize, memory_map=memory_map)
+            profiled.assemble_file(input_file)
+            profile = profile_from_run(profiled, args.profile_run)
+        assembler = Assembler6502(optimize=args.optimize, memory_map=memory_map, profile=profile)
+        if args.cache is not None:
+            from cache import AssemblyCache
+            AssemblyCache(args.cache).assemble_file(assembler, input_file)
+        elif args.stream:
+            assembler.source_name = input_file
+            with open(input_file, 'r') as f:
+                assembler.assemble_stream(f)
+        else:
+            assembler.assemble_file(input_file)
+        assembler.generate_output(output_file)
+
+        if assembler.optimization_report is not None:
+            assembler.optimization_report.print()
+        if assembler.layout_report is not None:
+            assembler.layout_report.print()
+
+        if args.map is not None:
+            map_file = args.map or input_file.rsplit('.', 1)[0] + '.map'
+            assembler.source_name = input_file
+            assembler.source_map().save(map_file)
+            print(f"Mapa de fonte gerado: {map_file}")
+
+        if args.listing is not None:
+            listing_file = args.listing or input_file.rsplit('.', 1)[0] + '.lst'
+            with open(input_file, 'r') as f:
+                assembler.generate_listing(f.read().split('\n'), listing_file)
 
         # Mostra os primeiros bytes para verificação
-        assembler.print_memory(START_ADDRESS, 64)
+        first = assembler.segments[0][0] if assembler.sparse and assembler.segments else START_ADDRESS
+        assembler.print_memory(first, 64)
 
         print(f"\nLabels encontrados:")
         for label, addr in assembler.labels.items():
             print(f"  {label}: ${addr:04X}")
 
-    except FileNotFoundError:
-        print(f"Erro: Arquivo '{input_file}' não encontrado.")
+    except FileNotFoundError as e:
+        print(f"Erro: Arquivo '{e.filename or input_file}' não encontrado.")
         sys.exit(1)
     except ValueError as e:
         print(f"Erro de montagem: {e}")
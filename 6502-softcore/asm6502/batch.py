@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Montagem em lote do Mini Assembler 6502
+
+Monta muitos fontes (lista na linha de comando ou manifesto) em um pool de
+processos. Cada worker importa o assembler uma única vez (tabela OPCODES
+pronta) e mantém um cache de decodificação compartilhado entre os jobs,
+então o custo de inicialização do interpretador é pago por worker e não
+por arquivo. Erros de um fonte são coletados no resultado sem interromper
+o lote. Como no assembler.py, um memoria.cfg ao lado do fonte define o
+mapa de memória daquele job.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from assembler import STREAM_DECODE_CACHE, Assembler6502
+from memorymap import MemoryMap, find_project_map
+
+# Cache texto da instrução -> decodificação, compartilhado pelos jobs do worker
+# (esvaziado antes do job que o encontrar acima de STREAM_DECODE_CACHE)
+_decode_cache: Dict[str, tuple] = {}
+
+
+def _init_worker() -> None:
+    """Começa cada worker com o cache vazio (no fork ele herdaria o do processo pai)"""
+    _decode_cache.clear()
+
+
+class BatchResult:
+    """Resultado da montagem de um fonte do lote"""
+    __slots__ = ('source', 'output', 'image', 'labels', 'error', 'seconds')
+
+    def __init__(self, source: str, output: Optional[str] = None, image: Optional[bytes] = None,
+                 labels: Optional[Dict[str, int]] = None, error: Optional[str] = None,
+                 seconds: float = 0.0):
+        self.source = source
+        self.output = output      # Arquivo gerado (None no modo em memória)
+        self.image = image        # Imagem da memória (apenas no modo em memória)
+        self.labels = labels or {}
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        status = 'ok' if self.ok else f'erro: {self.error}'
+        return f"BatchResult({self.source!r}, {status})"
+
+
+def default_output(source: str) -> str:
+    return source.rsplit('.', 1)[0] + '.mif'
+
+
+def read_manifest(filename: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    Lê um manifesto com uma linha por job: 'fonte.asm [saida.mif]'
+    Linhas vazias e comentários (#) são ignorados; caminhos relativos
+    são relativos ao diretório do manifesto.
+    """
+    base = os.path.dirname(filename)
+    jobs = []
+    with open(filename, 'r') as f:
+        for line in f:
+            parts = line.split('#', 1)[0].split()
+            if not parts:
+                continue
+            source = os.path.join(base, parts[0])
+            output = os.path.join(base, parts[1]) if len(parts) > 1 else None
+            jobs.append((source, output))
+    return jobs
+
+
+def assemble_job(job: Tuple[str, Optional[str], bool, bool]) -> BatchResult:
+    """Monta um fonte (executado dentro do worker)"""
+    source, output, in_memory, optimize = job
+    started = time.perf_counter()
+    try:
+        map_file = find_project_map(source)
+        memory_map = MemoryMap.load(map_file) if map_file else None
+        assembler = Assembler6502(optimize, memory_map=memory_map)
+        assembler.decode_cache = _decode_cache
+        if len(_decode_cache) > STREAM_DECODE_CACHE:
+            # Mesmo limite da montagem em streaming: lotes longos não crescem sem fim
+            _decode_cache.clear()
+        assembler.assemble_file(source)
+        if in_memory:
+            image = bytes(assembler.memory[0:assembler.memory_size])
+            result = BatchResult(source, image=image, labels=assembler.labels)
+        else:
+            output = output or default_output(source)
+            assembler.write_output(output)
+            result = BatchResult(source, output, labels=assembler.labels)
+    except FileNotFoundError as e:
+        result = BatchResult(source, error=f"Arquivo '{e.filename or source}' não encontrado")
+    except (ValueError, OSError) as e:
+        result = BatchResult(source, error=str(e))
+    except Exception as e:
+        # Falha inesperada em um fonte não pode derrubar os outros jobs do lote
+        result = BatchResult(source, error=f"erro interno ({type(e).__name__}: {e})")
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def assemble_batch(jobs: Sequence, workers: Optional[int] = None, in_memory: bool = False,
+                   optimize: bool = False) -> List[BatchResult]:
+    """
+    Monta os fontes em paralelo e retorna os resultados na ordem dos jobs
+    `jobs`: caminhos dos fontes ou pares (fonte, saída)
+    """
+    tasks = []
+    for job in jobs:
+        source, output = (job, None) if isinstance(job, str) else job
+        tasks.append((source, output, in_memory, optimize))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        _init_worker()
+        return [assemble_job(task) for task in tasks]
+
+    # Vários jobs por envio reduzem a comunicação entre processos
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        return list(executor.map(assemble_job, tasks, chunksize=chunksize))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Montagem em lote do Mini Assembler 6502",
+        epilog="Exemplo:\n  python batch.py firmware/*.asm -j 8\n  python batch.py -m variantes.txt",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='*', help="arquivos .asm (saída <fonte>.mif)")
+    parser.add_argument('-m', '--manifest', help="arquivo com uma linha 'fonte.asm [saida]' por job")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="número de processos (padrão: CPUs)")
+    parser.add_argument('-O', '--optimize', action='store_true', help="aplica o otimizador peephole")
+    args = parser.parse_args()
+
+    try:
+        jobs = list(args.sources)
+        if args.manifest:
+            jobs.extend(read_manifest(args.manifest))
+    except FileNotFoundError:
+        print(f"Erro: Arquivo '{args.manifest}' não encontrado.")
+        sys.exit(1)
+    if not jobs:
+        parser.error("nenhum fonte informado")
+
+    started = time.perf_counter()
+    results = assemble_batch(jobs, args.jobs, optimize=args.optimize)
+    elapsed = time.perf_counter() - started
+
+    failures = [result for result in results if not result.ok]
+    for result in failures:
+        print(f"Erro de montagem em {result.source}: {result.error}")
+    print(f"{len(results) - len(failures)} fontes montados, {len(failures)} com erro em {elapsed:.2f} s")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+"""
+Benchmarks do Mini Assembler 6502 e do simulador
+
+Gera fontes sintéticos (de 1 mil a 1 milhão de linhas, cobrindo todos os
+modos de OPCODES), mede cada passagem do assembler, a escrita do .mif, o
+pico de memória e a velocidade do simulador, grava os resultados em JSON e
+compara com uma execução de referência.
+
+Uso (a partir do diretório asm6502):
+    python -m benchmarks -o resultados.json
+    python -m benchmarks --baseline resultados.json --tolerance 0.15
+"""
@@ -0,0 +1,219 @@
+"""
+Executa os benchmarks, grava os resultados e compara com a referência
+
+Cada métrica guarda o valor, a unidade e se valores maiores ou menores são
+melhores. Uma métrica regrediu quando piora mais que `tolerance` (fração)
+em relação à referência; nesse caso o processo termina com código 1.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+
+import memimage
+from assembler import Assembler6502
+from simulator import Simulator6502
+
+from benchmarks.sources import generate_source, runnable_source
+
+RESULTS_FORMAT = 'asm6502-bench'
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+FULL_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_TOLERANCE = 0.10
+
+HIGHER = 'higher'
+LOWER = 'lower'
+
+
+class Results:
+    """Métricas de uma execução: nome -> {value, unit, better}"""
+
+    def __init__(self, metrics: Optional[Dict[str, dict]] = None):
+        self.metrics: Dict[str, dict] = metrics or {}
+
+    def add(self, name: str, value: float, unit: str, better: str) -> None:
+        self.metrics[name] = {'value': value, 'unit': unit, 'better': better}
+        print(f"  {name:<44} {value:>16,.1f} {unit}")
+
+    def to_dict(self) -> dict:
+        return {
+            'format': RESULTS_FORMAT,
+            'version': RESULTS_VERSION,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'metrics': self.metrics,
+        }
+
+    def save(self, filename: str) -> None:
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1, sort_keys=True)
+
+    @classmethod
+    def load(cls, filename: str) -> 'Results':
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        if data.get('format') != RESULTS_FORMAT or data.get('version') != RESULTS_VERSION:
+            raise ValueError(f"Arquivo de resultados inválido: {filename}")
+        return cls(data['metrics'])
+
+
+def best_time(function: Callable[..., object], repeat: int,
+              setup: Optional[Callable[[], tuple]] = None) -> float:
+    """
+    Menor tempo de `repeat` execuções (descarta ruído de agendamento)
+    Com `setup`, cada execução recebe argumentos novos, preparados fora do tempo medido.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        arguments = setup() if setup is not None else ()
+        started = time.perf_counter()
+        function(*arguments)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def bench_assembler(results: Results, sizes: Sequence[int], repeat: int) -> None:
+    """Tempo de cada passagem, escrita do .mif e pico de memória por tamanho de fonte"""
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'saida.mif')
+        # Aquece as tabelas de formatação do .mif (montadas na primeira escrita)
+        memimage.write_mif(bytes(range(256)) * 64, output)
+        for size in sizes:
+            lines = generate_source(size).split('\n')
+            count = len(lines)
+            runs = max(1, repeat if size < 1_000_000 else 1)
+            prefix = f'assembler.{size}'
+
+            # Cada execução usa um assembler novo: com o cache de decodificação
+            # quente ou statements já relaxados, a medida não passaria pelo
+            # detect_address_mode nem pelas passagens do layout
+            def parsed() -> tuple:
+                assembler = Assembler6502()
+                return assembler, assembler.parse(lines)
+
+            def relaxed() -> tuple:
+                assembler, statements = parsed()
+                assembler.relax(statements)
+                return assembler, statements
+
+            seconds = best_time(lambda assembler: assembler.parse(lines), runs,
+                                lambda: (Assembler6502(),))
+            results.add(f'{prefix}.parse', count / seconds, 'linhas/s', HIGHER)
+
+            seconds = best_time(lambda assembler, statements: assembler.relax(statements), runs, parsed)
+            results.add(f'{prefix}.layout', count / seconds, 'linhas/s', HIGHER)
+
+            seconds = best_time(lambda assembler, statements: assembler.second_pass(statements), runs, relaxed)
+            results.add(f'{prefix}.second_pass', count / seconds, 'linhas/s', HIGHER)
+
+            source = '\n'.join(lines)
+            seconds = best_time(lambda: Assembler6502().assemble(source), runs)
+            results.add(f'{prefix}.total', count / seconds, 'linhas/s', HIGHER)
+
+            assembler = Assembler6502()
+            assembler.assemble(source)
+
+            seconds = best_time(lambda: memimage.write_mif(assembler.memory, output), runs)
+            results.add(f'{prefix}.write_mif', seconds * 1000, 'ms', LOWER)
+
+            tracemalloc.start()
+            Assembler6502().assemble(source)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.add(f'{prefix}.peak_memory', peak / 1024, 'KiB', LOWER)
+
+
+def bench_simulator(results: Results, steps: int, repeat: int) -> None:
+    """Instruções simuladas por segundo em cada modo de execução"""
+    assembler = Assembler6502()
+    assembler.assemble(runnable_source())
+    modes = {
+        'interpreted': {},
+        'timed': {'timing_mode': True},
+        'translated': {'translate': True},
+        'translated_timed': {'translate': True, 'timing_mode': True},
+    }
+    for name, options in modes.items():
+        def run() -> None:
+            simulator = Simulator6502.from_assembler(assembler, **options)
+            simulator.run(steps)
+        seconds = best_time(run, repeat)
+        results.add(f'simulator.{name}', steps / seconds, 'instruções/s', HIGHER)
+
+
+def compare(current: Results, baseline: Results, tolerance: float) -> List[str]:
+    """Imprime a comparação e retorna as métricas que regrediram"""
+    regressions = []
+    print(f"\n{'Métrica':<44} {'Referência':>14} {'Atual':>14} {'Variação':>9}")
+    print("-" * 84)
+    for name, entry in sorted(current.metrics.items()):
+        reference = baseline.metrics.get(name)
+        if reference is None or not reference['value']:
+            continue
+        change = entry['value'] / reference['value'] - 1
+        worse = -change if entry['better'] == HIGHER else change
+        mark = ''
+        if worse > tolerance:
+            regressions.append(name)
+            mark = '  REGRESSÃO'
+        print(f"{name:<44} {reference['value']:>14,.1f} {entry['value']:>14,.1f} {change:>+8.1%}{mark}")
+    return regressions
+
+
+def parse_sizes(text: str) -> List[int]:
+    return [int(size.replace('_', '')) for size in text.split(',') if size]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="Benchmarks do Mini Assembler 6502 e do simulador")
+    parser.add_argument('--sizes', type=parse_sizes, default=list(DEFAULT_SIZES),
+                        help="tamanhos dos fontes sintéticos em linhas, separados por vírgula "
+                             "(padrão: 1000,10000,100000)")
+    parser.add_argument('--full', action='store_true', help="inclui o fonte de 1 milhão de linhas")
+    parser.add_argument('--steps', type=int, default=500_000, help="instruções por medição do simulador")
+    parser.add_argument('--repeat', type=int, default=3, help="repetições por medição (vale a melhor)")
+    parser.add_argument('-o', '--output', metavar='ARQUIVO', help="grava os resultados em JSON")
+    parser.add_argument('--baseline', metavar='ARQUIVO', help="resultados de referência para comparação")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="piora máxima aceita em fração da referência (padrão: 0.10)")
+    args = parser.parse_args()
+
+    try:
+        baseline = Results.load(args.baseline) if args.baseline else None
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+
+    sizes = list(FULL_SIZES) if args.full else args.sizes
+    results = Results()
+    print("Assembler:")
+    bench_assembler(results, sizes, args.repeat)
+    print("Simulador:")
+    bench_simulator(results, args.steps, args.repeat)
+
+    if args.output:
+        results.save(args.output)
+        print(f"\nResultados gravados em: {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} métrica(s) pioraram mais de {args.tolerance:.0%}: "
+                  + ', '.join(regressions))
+            sys.exit(1)
+        print(f"\nNenhuma regressão acima de {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Fontes sintéticos para os benchmarks
+
+generate_source() percorre todos os pares (instrução, modo) de OPCODES com
+operandos variados (números, labels, seletores #</#>), labels a cada
+poucas linhas, branches para trás dentro do alcance e diretivas
+.BYTE/.WORD. O gerador soma os bytes emitidos (contando cada branch como
+branch longo, o pior caso do relax) e volta para START_ADDRESS com um
+.ORG antes que o código passe de MEMORY_SIZE, então fontes de qualquer
+tamanho continuam cabendo na imagem de 16KB.
+
+runnable_source() é um laço que roda indefinidamente sem BRK nem opcodes
+inválidos, usado para medir o simulador.
+"""
+
+import random
+from typing import List, Tuple
+
+from assembler import AddressMode, LONG_BRANCH_SIZE, MEMORY_SIZE, OPCODES, START_ADDRESS
+
+# Linhas entre dois labels
+LABEL_INTERVAL = 8
+
+# (instrução, modo) em ordem fixa, para a geração ser reprodutível
+INSTRUCTION_MODES: List[Tuple[str, str]] = sorted(
+    (mnemonic, mode) for mnemonic, modes in OPCODES.items() for mode in modes)
+
+
+def operand_text(mnemonic: str, mode: str, rng: random.Random, label: str) -> str:
+    """Operando em texto para o modo dado (`label`: label já definido mais acima)"""
+    zp = rng.randrange(0x100)
+    absolute = rng.randrange(0x200, 0x4000)
+    use_label = rng.random() < 0.3
+    if mode == AddressMode.IMPLIED:
+        return ''
+    if mode == AddressMode.ACCUMULATOR:
+        return 'A'
+    if mode == AddressMode.IMMEDIATE:
+        if use_label:
+            return f'#{rng.choice("<>")}{label}'
+        return f'#${zp:02X}' if rng.random() < 0.7 else f'#{zp}'
+    if mode == AddressMode.ZERO_PAGE:
+        return f'${zp:02X}'
+    if mode == AddressMode.ZERO_PAGE_X:
+        return f'${zp:02X},X'
+    if mode == AddressMode.ZERO_PAGE_Y:
+        return f'${zp:02X},Y'
+    if mode == AddressMode.ABSOLUTE:
+        return label if use_label or mnemonic in ('JMP', 'JSR') else f'${absolute:04X}'
+    if mode == AddressMode.ABSOLUTE_X:
+        return f'{label},X' if use_label else f'${absolute:04X},X'
+    if mode == AddressMode.ABSOLUTE_Y:
+        return f'{label},Y' if use_label else f'${absolute:04X},Y'
+    if mode == AddressMode.INDIRECT:
+        return f'(${absolute:04X})'
+    if mode == AddressMode.INDIRECT_X:
+        return f'(${zp:02X},X)'
+    if mode == AddressMode.INDIRECT_Y:
+        return f'(${zp:02X}),Y'
+    if mode == AddressMode.RELATIVE:
+        return label
+    raise ValueError(f"Modo desconhecido: {mode}")
+
+
+def generate_source(lines: int, seed: int = 6502) -> str:
+    """Fonte sintético com aproximadamente `lines` linhas"""
+    rng = random.Random(seed)
+    out: List[str] = [f'.ORG ${START_ADDRESS:04X}', 'L0:']
+    label_count = 1
+    index = 0
+    address = START_ADDRESS
+    while len(out) < lines:
+        if len(out) % LABEL_INTERVAL == 0:
+            out.append(f'L{label_count}:')
+            label_count += 1
+            continue
+        label = f'L{label_count - 1}'
+        choice = rng.random()
+        if choice < 0.02:
+            count = rng.randrange(1, 8)
+            values = ', '.join(f'${rng.randrange(0x100):02X}' for _ in range(count))
+            text, size = f'    .BYTE {values}   ; dados', count
+        elif choice < 0.03:
+            text, size = f'    .WORD {label}, ${rng.randrange(0x10000):04X}', 4
+        else:
+            mnemonic, mode = INSTRUCTION_MODES[index % len(INSTRUCTION_MODES)]
+            index += 1
+            operand = operand_text(mnemonic, mode, rng, label)
+            comment = '   ; comentário' if rng.random() < 0.2 else ''
+            text = f'    {mnemonic} {operand}'.rstrip() + comment
+            size = LONG_BRANCH_SIZE if mode == AddressMode.RELATIVE else OPCODES[mnemonic][mode][1]
+        if address + size > MEMORY_SIZE:
+            out.append(f'    .ORG ${START_ADDRESS:04X}')
+            address = START_ADDRESS
+        out.append(text)
+        address += size
+    return '\n'.join(out) + '\n'
+
+
+def runnable_source() -> str:
+    """Laço infinito com acessos à memória, pilha, JSR/RTS e branches"""
+    return '\n'.join([
+        'START:  LDX #$00',
+        '        LDY #$00',
+        '        LDA #$00',
+        '        STA $20',
+        '        LDA #$03',
+        '        STA $21',
+        'LOOP:   LDA $0200,X',
+        '        CLC',
+        '        ADC #$03',
+        '        STA $0200,X',
+        '        EOR $10',
+        '        STA $10',
+        '        INC $11',
+        '        LDA ($20),Y',
+        '        ASL A',
+        '        ROR $12',
+        '        JSR SUB',
+        '        INX',
+        '        BNE LOOP',
+        '        INY',
+        '        JMP LOOP',
+        'SUB:    PHA',
+        '        TXA',
+        '        AND #$0F',
+        '        CMP #$08',
+        '        BCC SKIP',
+        '        SBC #$08',
+        'SKIP:   PLA',
+        '        RTS',
+    ]) + '\n'
+
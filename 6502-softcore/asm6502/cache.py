@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Cache em disco do Mini Assembler 6502
+
+Dois níveis, ambos indexados por hash de conteúdo:
+
+- fonte: hash do texto completo -> statements analisados, labels e bytes
+  de cada segmento. Um rebuild sem mudanças só lê esse arquivo. Fontes
+  com .INCLUDE guardam também o hash de cada arquivo incluído, conferido
+  antes de reaproveitar a entrada.
+- segmento: hash dos statements entre dois .ORG -> bytes gerados e os
+  endereços dos labels que eles referenciam. Variantes de firmware que
+  compartilham código reaproveitam os segmentos iguais, desde que nenhum
+  label referenciado tenha mudado de endereço.
+
+As entradas são gravadas em arquivo temporário + os.replace, então vários
+processos podem compartilhar o mesmo diretório de cache.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from assembler import Assembler6502, Statement, StatementKind
+from memorymap import MemoryMap
+
+# Mudar sempre que o formato das entradas ou a codificação mudar
+CACHE_VERSION = 3
+
+DEFAULT_CACHE_DIR = '.asm6502_cache'
+
+
+def statement_to_tuple(statement: Statement) -> tuple:
+    """Converte o statement em tupla (sem depender do módulo no pickle)"""
+    return tuple(getattr(statement, name) for name in Statement.__slots__)
+
+
+def statement_from_tuple(values: tuple) -> Statement:
+    statement = Statement.__new__(Statement)
+    for name, value in zip(Statement.__slots__, values):
+        setattr(statement, name, value)
+    return statement
+
+
+def split_segments(statements: List[Statement]) -> List[List[Statement]]:
+    """Divide os statements em grupos iniciados por cada .ORG"""
+    groups: List[List[Statement]] = [[]]
+    for statement in statements:
+        if statement.kind == StatementKind.ORG and groups[-1]:
+            groups.append([])
+        groups[-1].append(statement)
+    return [group for group in groups if group]
+
+
+def segment_refs(group: List[Statement]) -> List[str]:
+    """Labels cujo endereço entra nos bytes gerados pelo grupo"""
+    refs = set()
+    for statement in group:
+        if statement.ref is not None:
+            refs.add(statement.ref.lstrip('<>'))
+        elif statement.kind == StatementKind.WORD:
+            refs.update(word.lstrip('<>') for word in statement.data if isinstance(word, str))
+    return sorted(refs)
+
+
+def file_digest(path: str) -> Optional[str]:
+    """Hash do conteúdo do arquivo (None se não existir mais)"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def includes_unchanged(includes: Sequence[Tuple[str, str]]) -> bool:
+    return all(file_digest(path) == digest for path, digest in includes)
+
+
+def segment_key(group: List[Statement]) -> str:
+    """Hash do conteúdo do grupo (independe do número das linhas)"""
+    content = [(st.kind, st.instruction, st.mode, st.value, st.ref, st.opcode,
+                st.size, st.data, st.address) for st in group]
+    return hashlib.sha256(pickle.dumps((CACHE_VERSION, content))).hexdigest()
+
+
+class AssemblyCache:
+    """Cache em disco de montagens, indexado por hash de conteúdo"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0            # Fontes reaproveitadas por inteiro
+        self.segment_hits = 0    # Segmentos reaproveitados
+        self.segment_misses = 0  # Segmentos codificados novamente
+
+    def source_key(self, source: str, optimize: bool, source_name: str = '<fonte>',
+                   profile: Optional[Dict[str, int]] = None,
+                   memory_map: Optional[MemoryMap] = None) -> str:
+        # .INCLUDE é relativo ao fonte: o mesmo texto em outro diretório é outra montagem
+        directory = os.path.dirname(os.path.abspath(source_name)) if '.INCLUDE' in source.upper() else ''
+        # O layout por perfil muda a montagem: o perfil entra na chave
+        layout = json.dumps(sorted(profile.items())) if profile is not None else ''
+        # Com -O o mapa decide quais store/load viram transferência: o mapa entra na chave
+        regions = memory_map.fingerprint() if memory_map is not None else ''
+        data = f"{CACHE_VERSION}:{int(optimize)}:{directory}:{layout}:{regions}:".encode() + source.encode()
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, kind, key[:2], key)
+
+    def load(self, kind: str, key: str):
+        try:
+            with open(self.path(kind, key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            return None
+
+    def store(self, kind: str, key: str, entry) -> None:
+        path = self.path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    def restore(self, assembler: Assembler6502, entry) -> None:
+        """Reconstrói o estado do assembler a partir de uma entrada de fonte"""
+        statements, labels, segments, blocks, current_address, files, constants, _ = entry
+        assembler.statements = [statement_from_tuple(values) for values in statements]
+        assembler.labels = dict(labels)
+        assembler.files = list(files)
+        assembler.constants = dict(constants)
+        assembler.segments = list(segments)
+        # Mesmo mapa da montagem guardada (está na chave); o layout é conferido de novo
+        assembler.check_segments(assembler.statements)
+        for start, data in blocks:
+            assembler.memory[start:start + len(data)] = data
+        assembler.current_address = current_address
+
+    def encode(self, assembler: Assembler6502, statements: List[Statement]) -> None:
+        """Segunda passagem por segmento, reaproveitando os segmentos em cache"""
+        memory = assembler.memory
+        labels = assembler.labels
+
+        for group in split_segments(statements):
+            start = group[0].address
+            end = min(group[-1].address + group[-1].size, len(memory))
+            key = segment_key(group)
+            entry = self.load('segment', key)
+            if entry is not None:
+                data, refs = entry
+                if all(labels.get(label) == address for label, address in refs.items()):
+                    memory[start:start + len(data)] = data
+                    self.segment_hits += 1
+                    continue
+
+            assembler.second_pass(group)
+            refs = {label: labels.get(label) for label in segment_refs(group)}
+            self.store('segment', key, (bytes(memory[start:end]) if start < end else b'', refs))
+            self.segment_misses += 1
+
+        assembler.current_address = (statements[-1].address + statements[-1].size
+                                     if statements else assembler.current_address)
+
+    def assemble(self, assembler: Assembler6502, source: str) -> bool:
+        """
+        Assembla o fonte usando o cache
+        Retorna True se a montagem inteira veio do cache
+        """
+        key = self.source_key(source, assembler.optimize, assembler.source_name, assembler.profile,
+                              assembler.memory_map)
+        entry = self.load('source', key)
+        if entry is not None and includes_unchanged(entry[-1]):
+            self.restore(assembler, entry)
+            self.hits += 1
+            return True
+
+        statements = assembler.prepare(source)
+        self.encode(assembler, statements)
+        assembler.statements = statements
+
+        blocks = [(start, bytes(assembler.memory[start:end])) for start, end in assembler.segments]
+        includes = [(path, file_digest(path)) for path in assembler.files[1:]]
+        self.store('source', key, ([statement_to_tuple(st) for st in statements],
+                                   assembler.labels, assembler.segments, blocks,
+                                   assembler.current_address, assembler.files,
+                                   assembler.constants, includes))
+        return False
+
+    def assemble_file(self, assembler: Assembler6502, filename: str) -> bool:
+        with open(filename, 'r') as f:
+            source = f.read()
+        assembler.source_name = filename
+        return self.assemble(assembler, source)
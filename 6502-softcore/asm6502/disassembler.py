@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Disassembler do Mini Assembler 6502
+
+Decodifica imagens (.mif, .hex ou .bin) com uma tabela de 256 entradas,
+inversa de OPCODES, em uma passada linear por região. Destinos de
+branches, JMP e JSR que caem no início de uma instrução decodificada
+recebem labels (L_XXXX, ou o nome vindo de um mapa de fonte).
+
+A saída é fonte válido para o assembler: montar o resultado gera os mesmos
+bytes. Codificações que o assembler escolheria de outro jeito (modo
+absoluto com operando na página zero) e opcodes inválidos saem como
+.BYTE com a instrução em comentário.
+"""
+
+import argparse
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import memimage
+from assembler import AddressMode, BRANCH_INSTRUCTIONS, OPCODES
+
+# Opcode -> (instrução, modo, tamanho); None para opcodes inválidos
+DECODE: List[Optional[Tuple[str, str, int]]] = [None] * 256
+for _mnemonic, _modes in OPCODES.items():
+    for _mode, (_opcode, _size) in _modes.items():
+        DECODE[_opcode] = (_mnemonic, _mode, _size)
+
+# Formato do operando de cada modo ({0}: valor ou label)
+OPERAND_FORMATS: Dict[str, str] = {
+    AddressMode.IMPLIED: '',
+    AddressMode.ACCUMULATOR: 'A',
+    AddressMode.IMMEDIATE: '#${0:02X}',
+    AddressMode.ZERO_PAGE: '${0:02X}',
+    AddressMode.ZERO_PAGE_X: '${0:02X},X',
+    AddressMode.ZERO_PAGE_Y: '${0:02X},Y',
+    AddressMode.ABSOLUTE: '${0:04X}',
+    AddressMode.ABSOLUTE_X: '${0:04X},X',
+    AddressMode.ABSOLUTE_Y: '${0:04X},Y',
+    AddressMode.INDIRECT: '(${0:04X})',
+    AddressMode.INDIRECT_X: '(${0:02X},X)',
+    AddressMode.INDIRECT_Y: '(${0:02X}),Y',
+    AddressMode.RELATIVE: '${0:04X}',
+}
+
+# Modos de 16 bits que o assembler reduz para página zero (ou rejeita) com operando <= $FF
+WIDE_MODES = {AddressMode.ABSOLUTE, AddressMode.ABSOLUTE_X, AddressMode.ABSOLUTE_Y}
+
+# Instruções cujo operando é um destino de código
+FLOW_TARGETS = BRANCH_INSTRUCTIONS | {'JMP', 'JSR'}
+
+
+class Instruction:
+    """Instrução (ou byte de dados) decodificada"""
+    __slots__ = ('address', 'data', 'mnemonic', 'mode', 'operand', 'target')
+
+    def __init__(self, address: int, data: bytes, mnemonic: Optional[str] = None,
+                 mode: Optional[str] = None, operand: int = 0, target: Optional[int] = None):
+        self.address = address
+        self.data = data
+        self.mnemonic = mnemonic      # None: dados (.BYTE)
+        self.mode = mode
+        self.operand = operand
+        self.target = target          # Destino de branch/JMP/JSR
+
+    def text(self, labels: Dict[int, str]) -> str:
+        """Texto da instrução para o assembler (labels: endereço -> nome)"""
+        if self.mnemonic is None:
+            return '.BYTE ' + ', '.join(f'${byte:02X}' for byte in self.data)
+        if self.target is not None and self.target in labels:
+            operand = labels[self.target]
+        else:
+            value = self.target & 0xFFFF if self.mode == AddressMode.RELATIVE else self.operand
+            operand = OPERAND_FORMATS[self.mode].format(value)
+        return f'{self.mnemonic} {operand}'.rstrip()
+
+    def canonical(self) -> bool:
+        """Indica se o assembler gera exatamente esta codificação a partir do texto"""
+        if self.mode == AddressMode.RELATIVE:
+            # Branch que dá a volta no espaço de endereços não tem destino expressável
+            return 0 <= self.target <= 0xFFFF
+        return not (self.mode in WIDE_MODES and self.operand <= 0xFF and self.target is None)
+
+
+def decode(memory: Sequence[int], start: int, end: int) -> List[Instruction]:
+    """Decodifica [start, end) em uma passada linear"""
+    instructions = []
+    address = start
+    while address < end:
+        entry = DECODE[memory[address]]
+        if entry is None or address + entry[2] > end:
+            instructions.append(Instruction(address, bytes(memory[address:address + 1])))
+            address += 1
+            continue
+        mnemonic, mode, size = entry
+        data = bytes(memory[address:address + size])
+        operand = data[1] if size == 2 else (data[1] | (data[2] << 8)) if size == 3 else 0
+        target = None
+        if mode == AddressMode.RELATIVE:
+            target = address + 2 + (operand - 256 if operand & 0x80 else operand)
+        elif mnemonic in FLOW_TARGETS and mode == AddressMode.ABSOLUTE and operand > 0xFF:
+            target = operand
+        instructions.append(Instruction(address, data, mnemonic, mode, operand, target))
+        address += size
+    return instructions
+
+
+def disassemble(memory: Sequence[int], ranges: Optional[Sequence[Tuple[int, int]]] = None,
+                symbols: Optional[Dict[int, str]] = None, show_bytes: bool = True) -> List[str]:
+    """
+    Gera o fonte das regiões (por padrão, as regiões usadas da imagem)
+    `symbols`: endereço -> nome de label já conhecido (ex.: de um mapa de fonte)
+    """
+    if ranges is None:
+        ranges = memimage.used_ranges(memory)
+    regions = [decode(memory, start, end)
+               for start, end in memimage.normalize_ranges(ranges, len(memory))]
+
+    starts = {ins.address for region in regions for ins in region if ins.mnemonic is not None}
+    labels: Dict[int, str] = {}
+    for region in regions:
+        for ins in region:
+            if ins.target is not None and ins.target in starts:
+                labels[ins.target] = (symbols or {}).get(ins.target) or f'L_{ins.target:04X}'
+    for address, name in (symbols or {}).items():
+        if address in starts:
+            labels.setdefault(address, name)
+
+    lines = []
+    for region in regions:
+        if not region:
+            continue
+        lines.append(f'    .ORG ${region[0].address:04X}')
+        for ins in region:
+            label = labels.get(ins.address)
+            if label is not None:
+                lines.append(f'{label}:')
+            if ins.mnemonic is not None and not ins.canonical():
+                text = f'{Instruction(ins.address, ins.data).text(labels)}  ; {ins.text(labels)}'
+            else:
+                text = ins.text(labels)
+            if show_bytes:
+                text = f'{text:<24}; ${ins.address:04X}: {ins.data.hex(" ").upper()}'
+            lines.append('    ' + text)
+    return lines
+
+
+def parse_range(text: str) -> Tuple[int, int]:
+    """Lê uma região no formato 1000:10FF (hexadecimal, fim inclusivo)"""
+    first, _, last = text.partition(':')
+    return int(first, 16), int(last or first, 16) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Disassembler do Mini Assembler 6502")
+    parser.add_argument('image', help="imagem .mif, .hex ou .bin")
+    parser.add_argument('output', nargs='?', help="arquivo .asm de saída (padrão: saída padrão)")
+    parser.add_argument('-r', '--range', type=parse_range, action='append', metavar='INICIO:FIM',
+                        help="região a decodificar em hexadecimal (padrão: regiões usadas)")
+    parser.add_argument('--map', metavar='ARQUIVO', help="mapa de fonte para nomear os labels")
+    parser.add_argument('--no-bytes', action='store_true', help="omite endereço e bytes nos comentários")
+    args = parser.parse_args()
+
+    try:
+        memory = memimage.read_image(args.image)
+        symbols = None
+        if args.map:
+            from sourcemap import SourceMap
+            source_map = SourceMap.load(args.map)
+            symbols = dict(zip(source_map.symbols.addresses, source_map.symbols.names))
+        lines = disassemble(memory, args.range, symbols, not args.no_bytes)
+    except FileNotFoundError as e:
+        print(f"Erro: Arquivo '{e.filename}' não encontrado.")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+
+    text = '\n'.join(lines) + '\n'
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+        print(f"Fonte gerado: {args.output} ({len(lines)} linhas)")
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == '__main__':
+    main()
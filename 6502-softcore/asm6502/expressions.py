@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Expressões constantes do Mini Assembler 6502
+
+Avaliadas durante a análise do fonte, para .EQU, .REPT e as diretivas de
+dados (.BYTE/.WORD com FOR). A sintaxe é a de expressões Python restrita
+a números, operadores aritméticos e de bits, comparações, "a if c else b"
+e as funções de FUNCTIONS; $FF é aceito como hexadecimal. Nomes são as
+constantes definidas até ali (.EQU), a variável do FOR/.REPT, PI e E.
+
+Exemplos de tabelas:
+
+    SENO:   .BYTE round(127 * sin(2 * PI * I / 256)) & $FF FOR I = 0 TO 255
+    QUAD:   .WORD I * I FOR I = 0 TO 255
+    CRC_LO: .BYTE lo(crc16(I, $1021)) FOR I = 0 TO 255
+"""
+
+import ast
+import math
+import operator
+import re
+from typing import Callable, Dict, List, Mapping, Optional
+
+# $XXXX -> 0xXXXX (fora de strings não há outro uso de $)
+RE_HEX = re.compile(r'\$([0-9A-Fa-f]+)')
+
+# Identificador simples (label ou constante)
+RE_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def crc8(value: int, polynomial: int = 0x07) -> int:
+    """Entrada `value` da tabela de CRC-8 (MSB primeiro) do polinômio dado"""
+    crc = value & 0xFF
+    for _ in range(8):
+        crc = ((crc << 1) ^ polynomial) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def crc16(value: int, polynomial: int = 0x1021) -> int:
+    """Entrada `value` da tabela de CRC-16 (MSB primeiro, ex.: CCITT) do polinômio dado"""
+    crc = (value & 0xFF) << 8
+    for _ in range(8):
+        crc = ((crc << 1) ^ polynomial) & 0xFFFF if crc & 0x8000 else (crc << 1) & 0xFFFF
+    return crc
+
+
+FUNCTIONS: Dict[str, Callable] = {
+    'sin': math.sin, 'cos': math.cos, 'tan': math.tan, 'atan': math.atan,
+    'sqrt': math.sqrt, 'log': math.log, 'log2': math.log2, 'exp': math.exp,
+    'floor': math.floor, 'ceil': math.ceil, 'round': round, 'int': int,
+    'abs': abs, 'min': min, 'max': max,
+    'lo': lambda value: int(value) & 0xFF,
+    'hi': lambda value: (int(value) >> 8) & 0xFF,
+    'crc8': crc8, 'crc16': crc16,
+}
+
+CONSTANTS: Dict[str, float] = {'PI': math.pi, 'E': math.e}
+
+# Maior expoente aceito em a ** b (evita números gigantes por engano)
+MAX_EXPONENT = 64
+
+
+def _power(base, exponent):
+    if exponent > MAX_EXPONENT:
+        raise ValueError(f"Expoente maior que {MAX_EXPONENT}")
+    return base ** exponent
+
+
+_BINARY = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+    ast.Pow: _power, ast.LShift: operator.lshift, ast.RShift: operator.rshift,
+    ast.BitAnd: operator.and_, ast.BitOr: operator.or_, ast.BitXor: operator.xor,
+}
+_UNARY = {ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Invert: operator.invert,
+          ast.Not: operator.not_}
+_COMPARE = {ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+            ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge}
+
+# Texto -> árvore já analisada (tabelas avaliam a mesma expressão muitas vezes)
+_PARSED: Dict[str, ast.expr] = {}
+
+
+def parse(text: str) -> ast.expr:
+    tree = _PARSED.get(text)
+    if tree is None:
+        try:
+            tree = ast.parse(RE_HEX.sub(r'0x\1', text.strip()), mode='eval').body
+        except SyntaxError:
+            raise ValueError("Expressão inválida") from None
+        _PARSED[text] = tree
+    return tree
+
+
+def _evaluate(node: ast.expr, names: Mapping[str, float]):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+            and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id in names:
+            return names[node.id]
+        if node.id in CONSTANTS:
+            return CONSTANTS[node.id]
+        raise ValueError(f"Nome desconhecido na expressão: '{node.id}'")
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        return _BINARY[type(node.op)](_evaluate(node.left, names), _evaluate(node.right, names))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        return _UNARY[type(node.op)](_evaluate(node.operand, names))
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+        left = _evaluate(node.left, names)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _evaluate(comparator, names)
+            if not _COMPARE[type(op)](left, right):
+                return 0
+            left = right
+        return 1
+    if isinstance(node, ast.IfExp):
+        branch = node.body if _evaluate(node.test, names) else node.orelse
+        return _evaluate(branch, names)
+    if isinstance(node, ast.BoolOp):
+        values = [_evaluate(value, names) for value in node.values]
+        return int(all(values) if isinstance(node.op, ast.And) else any(values))
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords
+            and node.func.id.lower() in FUNCTIONS):
+        return FUNCTIONS[node.func.id.lower()](*(_evaluate(arg, names) for arg in node.args))
+    raise ValueError("Construção não suportada em expressão")
+
+
+def evaluate(text: str, names: Optional[Mapping[str, float]] = None) -> int:
+    """Avalia a expressão; o resultado precisa ser inteiro (use round/int/floor)"""
+    try:
+        value = _evaluate(parse(text), names or {})
+    except (ValueError, ZeroDivisionError, OverflowError, TypeError) as e:
+        raise ValueError(f"{e} em '{text.strip()}'") from None
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"Expressão '{text.strip()}' não é inteira ({value}); use round() ou int()")
+        value = int(value)
+    return value
+
+
+def split_arguments(text: str) -> List[str]:
+    """Divide por vírgulas fora de parênteses"""
+    items = []
+    depth = 0
+    current = []
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            items.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    items.append(''.join(current).strip())
+    return items
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Fuzzer diferencial do conjunto de instruções
+
+Gera programas aleatórios válidos (texto montado pelo próprio assembler),
+executa cada um no simulador com a semântica do softcore e no modelo de
+referência de um 6502 comum (reference.py) e compara o estado final:
+registradores, flags N V D I Z C, PC, memória e estado de parada.
+
+Semântica do softcore: a do simulador (layout de flags do README, sem
+BCD), com os opcodes que decoder.v não decodifica (timing.HW_DECODER)
+executados como no default do decoder: 1 byte, sem efeito. BRK encerra o
+caso nos dois modelos.
+
+Quando os estados finais diferem, o caso é executado de novo instrução a
+instrução para achar a primeira divergência, e o programa é minimizado
+(remoção de linhas enquanto a mesma divergência continuar aparecendo).
+Cada divergência tem uma assinatura (instrução, modo, o que diverge); o
+relatório conta os casos por assinatura e guarda o menor exemplo de cada.
+
+Os casos são distribuídos em lotes por um pool de processos; cada caso é
+reproduzível a partir de "semente:índice" (--replay).
+
+Exemplos:
+    python fuzzer.py --cases 100000 -j 8 -o relatorio.json
+    python fuzzer.py --time 28800 --hardware-only --exclude PHP,PLP
+    python fuzzer.py --replay 1:4711
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import disassembler
+import simulator
+import timing
+import reference
+from assembler import AddressMode, Assembler6502, BRANCH_INSTRUCTIONS, OPCODES, START_ADDRESS
+from reference import Reference6502, STATUS_LIMIT
+
+REPORT_FORMAT = 'asm6502-fuzz'
+REPORT_VERSION = 1
+
+DEFAULT_CASES = 10_000
+DEFAULT_LENGTH = 40         # Instruções por programa
+DEFAULT_STEPS = 1_000       # Limite de instruções executadas por caso
+DEFAULT_CHUNK = 200         # Casos por lote enviado a um worker
+SUBROUTINES = 3             # Sub-rotinas chamadas por JSR
+SUBROUTINE_LENGTH = 4
+LABEL_INTERVAL = 4          # Instruções entre labels do corpo principal
+
+# Regiões da imagem gerada
+DATA_START = 0x0200         # Dados aleatórios lidos/escritos pelos modos absolutos
+DATA_SIZE = 0x0200
+POINTERS_START = 0x0400     # Tabela de .WORD com labels (destinos de JMP indireto)
+POINTERS = 128
+
+# Instruções que o gerador não sorteia: BRK encerra o caso, RTS só fecha
+# sub-rotinas e RTI precisaria de um quadro de interrupção na pilha
+RESERVED = {'BRK', 'RTS', 'RTI'}
+# Nem dentro de sub-rotinas (mudariam o endereço de retorno ou o fluxo)
+FLOW = BRANCH_INSTRUCTIONS | {'JMP', 'JSR', 'PHA', 'PHP', 'PLA', 'PLP', 'TXS'}
+
+# Flags comparadas: (nome, bit no softcore, bit no 6502)
+FLAGS = (('N', simulator.FLAG_N, reference.N), ('V', simulator.FLAG_V, reference.V),
+         ('D', simulator.FLAG_D, reference.D), ('I', simulator.FLAG_I, reference.I),
+         ('Z', simulator.FLAG_Z, reference.Z), ('C', simulator.FLAG_C, reference.C))
+
+
+class State(NamedTuple):
+    """Estado comparável de um dos modelos"""
+    a: int
+    x: int
+    y: int
+    sp: int
+    pc: int
+    flags: str
+    status: str
+    memory: bytes
+
+
+class Divergence(NamedTuple):
+    signature: str
+    description: str
+    case: str           # "semente:índice"
+    source: List[str]   # Programa minimizado
+    original_lines: int
+
+
+def instruction_pool(hardware_only: bool = False, exclude: Sequence[str] = ()) -> List[Tuple[str, str]]:
+    """Pares (instrução, modo) sorteados pelo gerador"""
+    excluded = RESERVED | {name.upper() for name in exclude}
+    return sorted((mnemonic, mode) for mnemonic, modes in OPCODES.items() for mode, (opcode, _) in modes.items()
+                  if mnemonic not in excluded and (not hardware_only or timing.is_implemented(opcode)))
+
+
+def operand_text(mnemonic: str, mode: str, rng: random.Random, labels: List[str],
+                 subroutines: List[str]) -> str:
+    if mode == AddressMode.IMPLIED:
+        return ''
+    if mode == AddressMode.ACCUMULATOR:
+        return 'A'
+    if mode == AddressMode.IMMEDIATE:
+        return f'#${rng.randrange(0x100):02X}'
+    if mode == AddressMode.RELATIVE:
+        return rng.choice(labels)
+    if mode in (AddressMode.ZERO_PAGE, AddressMode.ZERO_PAGE_X, AddressMode.ZERO_PAGE_Y):
+        suffix = {AddressMode.ZERO_PAGE_X: ',X', AddressMode.ZERO_PAGE_Y: ',Y'}.get(mode, '')
+        return f'${rng.randrange(0x100):02X}{suffix}'
+    if mode in (AddressMode.INDIRECT_X, AddressMode.INDIRECT_Y):
+        zp = rng.randrange(0x100)
+        return f'(${zp:02X},X)' if mode == AddressMode.INDIRECT_X else f'(${zp:02X}),Y'
+    if mode == AddressMode.INDIRECT:
+        # Ponteiro da tabela de labels; às vezes o último byte da página (bug do NMOS)
+        if rng.random() < 0.05:
+            return f'(${POINTERS_START + 0xFF:04X})'
+        return f'(${POINTERS_START + 2 * rng.randrange(POINTERS):04X})'
+    if mnemonic == 'JSR':
+        return rng.choice(subroutines)
+    if mnemonic == 'JMP':
+        return rng.choice(labels)
+    suffix = {AddressMode.ABSOLUTE_X: ',X', AddressMode.ABSOLUTE_Y: ',Y'}.get(mode, '')
+    return f'${DATA_START + rng.randrange(DATA_SIZE):04X}{suffix}'
+
+
+def data_lines(rng: random.Random, start: int, size: int) -> List[str]:
+    lines = [f'        .ORG ${start:04X}']
+    for _ in range(0, size, 16):
+        lines.append('        .BYTE ' + ', '.join(f'${byte:02X}' for byte in rng.randbytes(16)))
+    return lines
+
+
+def generate_program(rng: random.Random, length: int, pool: Sequence[Tuple[str, str]]) -> List[str]:
+    """Programa aleatório: dados, corpo principal terminado em BRK e sub-rotinas"""
+    labels = [f'L{i}' for i in range(length // LABEL_INTERVAL + 1)]
+    subroutines = [f'SUB{i}' for i in range(SUBROUTINES)]
+    straight = [entry for entry in pool if entry[0] not in FLOW]
+
+    lines = data_lines(rng, 0x0000, 0x100) + data_lines(rng, DATA_START, DATA_SIZE)
+    # Só labels do corpo: JMP para uma sub-rotina chegaria ao RTS sem JSR
+    lines.append(f'        .ORG ${POINTERS_START:04X}')
+    lines.extend('        .WORD ' + ', '.join(rng.choice(labels) for _ in range(8))
+                 for _ in range(POINTERS // 8))
+    lines.append(f'        .ORG ${START_ADDRESS:04X}')
+
+    for i in range(length):
+        mnemonic, mode = rng.choice(pool)
+        label = f'{labels[i // LABEL_INTERVAL]}:' if i % LABEL_INTERVAL == 0 else ''
+        operand = operand_text(mnemonic, mode, rng, labels, subroutines)
+        lines.append(f'{label:<8}{mnemonic} {operand}'.rstrip())
+    # Labels ainda não usados ficam no fim (destino de branches que encerram o caso)
+    for label in labels[(length - 1) // LABEL_INTERVAL + 1:]:
+        lines.append(f'{label}:')
+    lines.append('        BRK')
+
+    for name in subroutines:
+        body = [rng.choice(straight) for _ in range(SUBROUTINE_LENGTH)] if straight else []
+        for j, (mnemonic, mode) in enumerate(body):
+            label = f'{name}:' if j == 0 else ''
+            operand = operand_text(mnemonic, mode, rng, labels, subroutines)
+            lines.append(f'{label:<8}{mnemonic} {operand}'.rstrip())
+        lines.append(f'{name + ":" if not body else "":<8}RTS')
+    return lines
+
+
+def case_rng(seed: int, index: int) -> random.Random:
+    return random.Random(f'{seed}:{index}')
+
+
+class Harness:
+    """Modelos reaproveitados entre os casos de um worker"""
+
+    def __init__(self, steps: int = DEFAULT_STEPS):
+        self.steps = steps
+        self.softcore = simulator.Simulator6502()
+        mask = self.softcore.address_mask
+        cpu = self.softcore
+
+        def unimplemented() -> None:
+            # Default do decoder.v: instrução de 1 byte sem efeito
+            cpu.pc = (cpu.pc + 1) & mask
+
+        brk = OPCODES['BRK'][AddressMode.IMPLIED][0]
+        for opcode in range(256):
+            if opcode != brk and not timing.is_implemented(opcode):
+                cpu.handlers[opcode] = unimplemented
+
+    def assemble(self, lines: Sequence[str]) -> Optional[bytes]:
+        """Imagem do programa (None se o assembler recusar o texto)"""
+        assembler = Assembler6502()
+        try:
+            assembler.assemble('\n'.join(lines))
+        except ValueError:
+            return None
+        return bytes(assembler.memory)
+
+    def load(self, image: bytes) -> Tuple[simulator.Simulator6502, Reference6502]:
+        softcore = self.softcore
+        softcore.memory[:] = image
+        softcore.reset()
+        return softcore, Reference6502(image, START_ADDRESS)
+
+    @staticmethod
+    def softcore_state(cpu: simulator.Simulator6502) -> State:
+        flags = ''.join(name for name, bit, _ in FLAGS if cpu.ps & bit)
+        status = cpu.status if cpu.status != simulator.STATUS_RUNNING else STATUS_LIMIT
+        return State(cpu.a, cpu.x, cpu.y, cpu.sp, cpu.pc, flags, status, bytes(cpu.memory))
+
+    @staticmethod
+    def reference_state(cpu: Reference6502) -> State:
+        flags = ''.join(name for name, _, bit in FLAGS if cpu.p & bit)
+        status = cpu.status if cpu.status != reference.STATUS_RUNNING else STATUS_LIMIT
+        return State(cpu.a, cpu.x, cpu.y, cpu.sp, cpu.pc, flags, status, bytes(cpu.memory))
+
+    def final_states(self, image: bytes) -> Tuple[State, State]:
+        softcore, model = self.load(image)
+        softcore.run(self.steps)
+        model.run(self.steps)
+        return self.softcore_state(softcore), self.reference_state(model)
+
+    def first_divergence(self, image: bytes) -> Optional[Tuple[str, str]]:
+        """(assinatura, descrição) da primeira instrução cujo efeito diverge"""
+        softcore, model = self.load(image)
+        for step in range(self.steps):
+            pc = softcore.pc
+            opcode = softcore.memory[pc]
+            softcore.run(1)
+            model.step()
+            ours, theirs = self.softcore_state(softcore), self.reference_state(model)
+            if model.status != reference.STATUS_RUNNING or softcore.status != simulator.STATUS_LIMIT:
+                # Algum dos dois parou: o estado de parada também é comparado
+                if ours.status != theirs.status or ours != theirs:
+                    return describe(step, pc, opcode, softcore.memory, ours, theirs)
+                return None
+            if ours != theirs:
+                return describe(step, pc, opcode, softcore.memory, ours, theirs)
+        return None
+
+    def check(self, lines: Sequence[str]) -> Optional[Tuple[str, str]]:
+        """Divergência do programa, ou None (também para texto que não monta)"""
+        image = self.assemble(lines)
+        if image is None:
+            return None
+        ours, theirs = self.final_states(image)
+        if ours == theirs:
+            return None
+        return self.first_divergence(image)
+
+    def minimize(self, lines: List[str], signature: str) -> List[str]:
+        """
+        Remove linhas (em blocos cada vez menores) enquanto a divergência de
+        mesma assinatura persistir; .ORG e o BRK final ficam
+        """
+        kept = [line.split()[-1] in ('BRK', '.ORG') or '.ORG' in line for line in lines]
+        current = list(range(len(lines)))
+        chunk = max(1, len(lines) // 2)
+        while chunk >= 1:
+            i = 0
+            while i < len(current):
+                removed = [index for index in current[i:i + chunk] if not kept[index]]
+                if not removed:
+                    i += chunk
+                    continue
+                candidate = [index for index in current if index not in removed]
+                found = self.check([lines[index] for index in candidate])
+                if found is not None and found[0] == signature:
+                    current = candidate
+                else:
+                    i += chunk
+            chunk //= 2
+        return [lines[index] for index in current]
+
+
+def describe(step: int, pc: int, opcode: int, memory: bytes, ours: State, theirs: State) -> Tuple[str, str]:
+    instruction = disassembler.decode(memory, pc, pc + 3)[0]
+    # Opcodes fora da tabela formam uma única assinatura
+    mnemonic = instruction.mnemonic or 'opcode inválido'
+    mode = instruction.mode or '-'
+    differences = []
+    for field in ('a', 'x', 'y', 'sp', 'pc', 'flags', 'status'):
+        mine, other = getattr(ours, field), getattr(theirs, field)
+        if mine != other:
+            if isinstance(mine, int):
+                differences.append(f"{field.upper()}: softcore ${mine:02X}, 6502 ${other:02X}")
+            else:
+                differences.append(f"{field.upper()}: softcore '{mine}', 6502 '{other}'")
+    written = [address for page in range(0, len(ours.memory), 256)
+               if ours.memory[page:page + 256] != theirs.memory[page:page + 256]
+               for address in range(page, page + 256) if ours.memory[address] != theirs.memory[address]]
+    if written:
+        address = written[0]
+        differences.append(f"memória ${address:04X}: softcore ${ours.memory[address]:02X}, "
+                           f"6502 ${theirs.memory[address]:02X} ({len(written)} byte(s))")
+    kinds = [text.split(':')[0].split(' ')[0] for text in differences]
+    implemented = '' if timing.is_implemented(opcode) else ' [não decodificado por decoder.v]'
+    signature = f"{mnemonic} {mode}: {', '.join(sorted(set(kinds)))}"
+    description = (f"instrução {step + 1}, ${pc:04X}: {instruction.text({})}{implemented}\n  "
+                   + '\n  '.join(differences))
+    return signature, description
+
+
+class ChunkResult(NamedTuple):
+    cases: int
+    invalid: int
+    counts: Dict[str, int]
+    examples: Dict[str, Divergence]
+
+
+def fuzz_chunk(task: Tuple[int, int, int, int, int, bool, Tuple[str, ...]]) -> ChunkResult:
+    """Executa os casos [first, first + count) da semente (dentro do worker)"""
+    seed, first, count, length, steps, hardware_only, exclude = task
+    harness = Harness(steps)
+    pool = instruction_pool(hardware_only, exclude)
+    counts: Dict[str, int] = {}
+    examples: Dict[str, Divergence] = {}
+    invalid = 0
+    for index in range(first, first + count):
+        lines = generate_program(case_rng(seed, index), length, pool)
+        image = harness.assemble(lines)
+        if image is None:
+            invalid += 1
+            continue
+        ours, theirs = harness.final_states(image)
+        if ours == theirs:
+            continue
+        found = harness.first_divergence(image)
+        if found is None:
+            continue
+        signature, _ = found
+        counts[signature] = counts.get(signature, 0) + 1
+        if signature in examples:
+            continue
+        minimized = harness.minimize(lines, signature)
+        _, description = harness.check(minimized) or found
+        examples[signature] = Divergence(signature, description, f'{seed}:{index}', minimized, len(lines))
+    return ChunkResult(count, invalid, counts, examples)
+
+
+class Report:
+    """Divergências acumuladas de todos os lotes"""
+
+    def __init__(self):
+        self.cases = 0
+        self.invalid = 0
+        self.counts: Dict[str, int] = {}
+        self.examples: Dict[str, Divergence] = {}
+
+    def add(self, result: ChunkResult) -> None:
+        self.cases += result.cases
+        self.invalid += result.invalid
+        for signature, count in result.counts.items():
+            self.counts[signature] = self.counts.get(signature, 0) + count
+        for signature, example in result.examples.items():
+            known = self.examples.get(signature)
+            if known is None or len(example.source) < len(known.source):
+                self.examples[signature] = example
+
+    def to_dict(self) -> dict:
+        return {
+            'format': REPORT_FORMAT,
+            'version': REPORT_VERSION,
+            'cases': self.cases,
+            'invalid': self.invalid,
+            'divergences': [dict(example._asdict(), count=self.counts[signature])
+                            for signature, example in sorted(self.examples.items())],
+        }
+
+    def save(self, filename: str) -> None:
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1, ensure_ascii=False)
+
+    def print(self) -> None:
+        diverging = sum(self.counts.values())
+        print(f"\n{self.cases} casos, {self.invalid} não montaram, {diverging} com divergência, "
+              f"{len(self.counts)} assinatura(s)")
+        for signature, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+            example = self.examples[signature]
+            print(f"\n[{count}x] {signature}  (caso {example.case}, "
+                  f"{len(example.source)} de {example.original_lines} linhas)")
+            print(f"  {example.description}")
+
+
+def run_fuzzer(cases: int, seed: int, workers: Optional[int], length: int, steps: int,
+               hardware_only: bool, exclude: Sequence[str], chunk: int = DEFAULT_CHUNK,
+               duration: Optional[float] = None) -> Report:
+    """Distribui os casos em lotes pelo pool (até `cases` casos ou `duration` segundos)"""
+    report = Report()
+    workers = workers or os.cpu_count() or 1
+    deadline = time.monotonic() + duration if duration else None
+    exclude = tuple(exclude)
+    started = time.perf_counter()
+    submitted = 0
+
+    def next_task():
+        nonlocal submitted
+        if (cases and submitted >= cases) or (deadline is not None and time.monotonic() >= deadline):
+            return None
+        count = min(chunk, cases - submitted) if cases else chunk
+        task = (seed, submitted, count, length, steps, hardware_only, exclude)
+        submitted += count
+        return task
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Poucos lotes em voo por worker: a fila não cresce com o total de casos
+        pending = set()
+        while True:
+            while len(pending) < 2 * workers:
+                task = next_task()
+                if task is None:
+                    break
+                pending.add(executor.submit(fuzz_chunk, task))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                report.add(future.result())
+            rate = report.cases / (time.perf_counter() - started)
+            print(f"\r{report.cases} casos ({rate:,.0f}/s), {sum(report.counts.values())} divergências, "
+                  f"{len(report.counts)} assinatura(s)", end='', flush=True)
+    print()
+    return report
+
+
+def parse_case(text: str) -> Tuple[int, int]:
+    seed, _, index = text.partition(':')
+    return int(seed), int(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fuzzer diferencial: softcore (simulador + decoder.v) contra um 6502 de referência",
+        epilog=__doc__.split('Exemplos:')[1], formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', type=int, default=DEFAULT_CASES,
+                        help="quantidade de casos (0: sem limite, use com --time)")
+    parser.add_argument('--time', type=float, metavar='SEGUNDOS', help="para de enviar lotes após este tempo")
+    parser.add_argument('--seed', type=int, default=1, help="semente dos casos (padrão: 1)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="número de processos (padrão: CPUs)")
+    parser.add_argument('--length', type=int, default=DEFAULT_LENGTH, help="instruções por programa")
+    parser.add_argument('--steps', type=int, default=DEFAULT_STEPS, help="limite de instruções executadas por caso")
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help="casos por lote")
+    parser.add_argument('--hardware-only', action='store_true',
+                        help="sorteia só opcodes decodificados por decoder.v")
+    parser.add_argument('--exclude', default='', metavar='INSTRUÇÕES',
+                        help="instruções que não são sorteadas, separadas por vírgula (divergências já conhecidas)")
+    parser.add_argument('--replay', metavar='SEMENTE:ÍNDICE', help="gera, compara e minimiza um único caso")
+    parser.add_argument('-o', '--output', metavar='ARQUIVO', help="grava o relatório em JSON")
+    args = parser.parse_args()
+    exclude = [name for name in args.exclude.split(',') if name]
+    if args.cases == 0 and not args.time:
+        parser.error("--cases 0 exige --time")
+
+    if args.replay:
+        seed, index = parse_case(args.replay)
+        harness = Harness(args.steps)
+        lines = generate_program(case_rng(seed, index), args.length,
+                                 instruction_pool(args.hardware_only, exclude))
+        found = harness.check(lines)
+        if found is None:
+            print(f"Caso {args.replay}: sem divergência")
+            return
+        minimized = harness.minimize(lines, found[0])
+        print(f"Caso {args.replay}: {found[0]}\n  {found[1]}\n")
+        print('\n'.join(minimized))
+        sys.exit(1)
+
+    report = run_fuzzer(args.cases, args.seed, args.jobs, args.length, args.steps,
+                        args.hardware_only, exclude, args.chunk, args.time)
+    report.print()
+    if args.output:
+        report.save(args.output)
+        print(f"\nRelatório gravado em: {args.output}")
+    if report.counts:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Layout de código guiado por perfil do Mini Assembler 6502
+
+Roda entre o parser (e o otimizador) e a relaxação, sobre a lista de
+Statements. O código é dividido em blocos que começam em cada label;
+blocos consecutivos só de instruções formam uma região relocável, limitada
+por .ORG, .BYTE, .WORD e .EQU (que ficam onde estão). Dentro de cada
+região os blocos são reordenados a partir de um perfil de execução
+(label -> número de vezes que a instrução do label executou):
+
+- as arestas mais quentes (fall-through, JMP e branch) unem os blocos em
+  cadeias, de forma que o caminho quente cai direto no bloco seguinte e o
+  JMP que levava até ele some;
+- as cadeias vão da mais quente para a mais fria, o que deixa os laços
+  quentes juntos e dentro do alcance de branch curto;
+- quando um fall-through original deixa de ser o próximo bloco, o branch
+  condicional é invertido (se o destino dele ficou logo em seguida) ou um
+  JMP é inserido; pela construção isso só acontece em arestas frias.
+
+O primeiro bloco de cada região continua no início (é onde se entra vindo
+do .ORG), e um bloco que cai para fora da região continua no fim. Saltos
+para endereços numéricos (JMP $1234, BNE $1010) impedem o layout: o
+código só pode ser movido quando todos os destinos são labels.
+
+O perfil vem do profiler (profiler.py --save-profile) ou de um JSON
+escrito à mão ({"LABEL": execuções, ...}); profile_from_run obtém o perfil
+direto de uma execução no simulador.
+"""
+
+import json
+from typing import Dict, List, Optional, Tuple
+
+import timing
+from assembler import (BRANCH_INSTRUCTIONS, INVERTED_BRANCHES, JMP_ABSOLUTE, OPCODES,
+                       AddressMode, Assembler6502, Statement, StatementKind)
+from optimizer import FLOW_BREAKS, removed
+
+PROFILE_FORMAT = 'asm6502-profile'
+PROFILE_VERSION = 1
+
+# Statements que não podem mudar de lugar (delimitam as regiões relocáveis)
+FIXED_KINDS = {StatementKind.ORG, StatementKind.BYTE, StatementKind.WORD, StatementKind.EQU}
+
+# Instruções cujo destino precisa ser um label para o código poder ser movido
+FLOW_TARGETS = BRANCH_INSTRUCTIONS | {'JMP', 'JSR'}
+
+JMP_CYCLES = timing.CYCLES[JMP_ABSOLUTE]
+
+
+def load_profile(filename: str) -> Dict[str, int]:
+    """Lê o perfil (formato do profiler ou {label: execuções})"""
+    with open(filename, 'r') as f:
+        data = json.load(f)
+    if isinstance(data, dict) and data.get('format') == PROFILE_FORMAT:
+        if data.get('version') != PROFILE_VERSION:
+            raise ValueError(f"Versão de perfil não suportada: {data.get('version')}")
+        data = data.get('labels')
+    if not isinstance(data, dict) or not all(isinstance(count, int) for count in data.values()):
+        raise ValueError(f"Perfil inválido em '{filename}': esperado {{\"LABEL\": execuções}}")
+    return data
+
+
+def save_profile(hits: Dict[str, int], filename: str) -> None:
+    data = {'format': PROFILE_FORMAT, 'version': PROFILE_VERSION, 'labels': hits}
+    with open(filename, 'w') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+
+
+def profile_from_run(assembler: Assembler6502, max_steps: int = 1_000_000) -> Dict[str, int]:
+    """Perfil por label de uma execução da última montagem no simulador (modo exato)"""
+    # Import local: simulador e profiler dependem das classes do assembler
+    from profiler import Profiler
+    from simulator import Simulator6502
+    simulator = Simulator6502.from_assembler(assembler, detect_idle=True)
+    labels = {name: address for name, address in assembler.labels.items()
+              if name not in assembler.constants}
+    profiler = Profiler(simulator, labels)
+    profiler.run(max_steps)
+    return profiler.label_hits()
+
+
+class Block:
+    """Trecho de código que começa em um label (ou no início da região)"""
+    __slots__ = ('label', 'statements', 'position', 'count', 'branch', 'jump',
+                 'falls_through', 'taken', 'onward')
+
+    def __init__(self, statements: List[Statement], position: int, profile: Dict[str, int]):
+        self.label = statements[0].label
+        self.statements = statements
+        self.position = position   # Ordem original dentro da região
+        # Sem label só o início da região, onde se entra ao menos uma vez
+        self.count = profile.get(self.label, 0) if self.label is not None else 1
+        instructions = [st for st in statements if st.kind == StatementKind.INSTRUCTION]
+        last = instructions[-1] if instructions else None
+        # Saída do bloco: branch condicional, JMP absoluto ou "Bxx T / JMP U"
+        self.jump = last if last is not None and last.instruction == 'JMP' \
+            and last.mode == AddressMode.ABSOLUTE else None
+        candidate = instructions[-2] if self.jump is not None and len(instructions) > 1 else last
+        self.branch = candidate if candidate is not None and candidate.mode == AddressMode.RELATIVE else None
+        self.falls_through = last is None or last.instruction not in FLOW_BREAKS
+
+        # Execuções que chegam à saída: branches no meio do bloco desviam parte delas
+        flow = self.count
+        for statement in instructions:
+            if statement is self.branch or statement is self.jump:
+                break
+            if statement.mode == AddressMode.RELATIVE:
+                flow -= min(flow, profile.get(statement.ref, 0))
+            elif statement.instruction in FLOW_BREAKS:
+                flow = 0
+        self.taken = min(flow, profile.get(self.branch.ref, 0)) if self.branch is not None else 0
+        self.onward = flow - self.taken   # Para o JMP ou para o bloco seguinte
+
+
+class LayoutReport:
+    """Resumo do layout: blocos movidos e saltos removidos/inseridos"""
+
+    def __init__(self):
+        self.regions = 0
+        self.blocks = 0
+        self.moved = 0
+        self.jumps_removed: List[Tuple[int, int]] = []   # (linha, execuções)
+        self.jumps_added: List[Tuple[int, int]] = []
+        self.branches_inverted = 0
+        # Branches longos (branch invertido + JMP) antes e depois: (quantidade, vezes tomados)
+        self.long_before = (0, 0)
+        self.long_after = (0, 0)
+        self.skipped: Optional[str] = None
+
+    @property
+    def cycles_saved(self) -> int:
+        """Estimativa pelo perfil (o custo da FSM não depende de o branch ser tomado)"""
+        return JMP_CYCLES * (sum(count for _, count in self.jumps_removed)
+                             - sum(count for _, count in self.jumps_added)
+                             + self.long_before[1] - self.long_after[1])
+
+    def print(self) -> None:
+        if self.skipped is not None:
+            print(f"\nLayout por perfil não aplicado: {self.skipped}")
+            return
+        print(f"\nLayout por perfil: {self.moved} de {self.blocks} blocos movidos "
+              f"em {self.regions} região(ões)")
+        print(f"  JMPs removidos: {len(self.jumps_removed)}, inseridos: {len(self.jumps_added)}, "
+              f"branches invertidos: {self.branches_inverted}")
+        print(f"  Branches longos: {self.long_before[0]} -> {self.long_after[0]}")
+        print(f"  Total: {self.cycles_saved} ciclos economizados (estimativa pelo perfil)")
+
+
+def long_branches(statements: List[Statement], profile: Dict[str, int]) -> Dict[int, int]:
+    """
+    Branches fora do alcance no layout de `statements` -> vezes em que são tomados
+
+    Os endereços são os de antes da relaxação (sem página zero e sem os
+    branches longos), o que basta para comparar dois layouts.
+    Chave: id() do statement.
+    """
+    labels: Dict[str, int] = {}
+    addresses = []
+    address = Assembler6502.origin
+    for statement in statements:
+        if statement.kind == StatementKind.ORG:
+            address = statement.value
+        if statement.label is not None and statement.kind != StatementKind.EQU:
+            labels[statement.label] = address
+        addresses.append(address)
+        address += statement.size
+
+    found: Dict[int, int] = {}
+    flow = 0
+    for statement, address in zip(statements, addresses):
+        if statement.label is not None:
+            flow = profile.get(statement.label, 0)
+        if statement.kind != StatementKind.INSTRUCTION:
+            continue
+        if statement.mode == AddressMode.RELATIVE and statement.ref in labels:
+            taken = min(flow, profile.get(statement.ref, 0))
+            flow -= taken
+            offset = labels[statement.ref] - (address + 2)
+            if offset < -128 or offset > 127:
+                found[id(statement)] = taken
+        elif statement.instruction in FLOW_BREAKS:
+            flow = 0
+    return found
+
+
+def split_regions(statements: List[Statement]) -> List[Tuple[bool, List[Statement]]]:
+    """Sequência de (relocável, statements): regiões relocáveis e statements fixos"""
+    items: List[Tuple[bool, List[Statement]]] = []
+    for statement in statements:
+        relocatable = statement.kind not in FIXED_KINDS
+        if relocatable and items and items[-1][0]:
+            items[-1][1].append(statement)
+        else:
+            items.append((relocatable, [statement]))
+    return items
+
+
+def split_blocks(region: List[Statement], profile: Dict[str, int]) -> List[Block]:
+    starts = [i for i, statement in enumerate(region) if i == 0 or statement.label is not None]
+    ends = starts[1:] + [len(region)]
+    return [Block(region[start:end], position, profile)
+            for position, (start, end) in enumerate(zip(starts, ends))]
+
+
+def edges(blocks: List[Block], long: Dict[int, int]) -> List[Tuple[int, int, int, int]]:
+    """
+    Arestas (peso, prioridade, origem, destino) da saída de cada bloco
+
+    Prioridade 0: a aresta do JMP ou do fall-through original, com o número
+    estimado de JMPs que o fall-through por ela evita. Prioridade 1: a do
+    branch como alternativa (invertendo a condição evita o mesmo JMP).
+    Prioridade 2: a do branch fora do alcance (em `long`), pelas vezes em
+    que é tomado: o custo do branch na FSM não depende de ser tomado, mas o
+    branch longo é um branch invertido + JMP, e o JMP some quando o
+    destino fica logo em seguida.
+    """
+    by_label = {block.label: block for block in blocks if block.label is not None}
+    found = []
+    for block in blocks:
+        if block.jump is not None:
+            target = by_label.get(block.jump.ref)
+        elif block.falls_through and block.position + 1 < len(blocks):
+            target = blocks[block.position + 1]
+        else:
+            target = None
+        if target is not None:
+            found.append((block.onward, 0, block.position, target.position))
+        if block.branch is not None and block.branch.ref in by_label:
+            branch_target = by_label[block.branch.ref].position
+            found.append((block.onward, 1, block.position, branch_target))
+            if id(block.branch) in long:
+                found.append((block.taken, 2, block.position, branch_target))
+    return [edge for edge in found if edge[2] != edge[3] and edge[0] > 0]
+
+
+def order_blocks(blocks: List[Block], long: Dict[int, int]) -> List[Block]:
+    """Une os blocos em cadeias pelas arestas mais quentes e ordena as cadeias"""
+    chains: Dict[int, List[Block]] = {block.position: [block] for block in blocks}
+    chain_of = {block.position: block.position for block in blocks}
+    entry = blocks[0].position
+    exit_block = blocks[-1].position if blocks[-1].falls_through else None
+
+    def merge(source: int, target: int) -> None:
+        head, tail = chain_of[source], chain_of[target]
+        if head == tail or chains[head][-1].position != source or tail != target or target == entry:
+            return
+        if head == chain_of[entry] and exit_block is not None and tail == chain_of[exit_block]:
+            # Início e fim da região na mesma cadeia deixariam as outras sem lugar
+            return
+        for block in chains[tail]:
+            chain_of[block.position] = head
+        chains[head].extend(chains.pop(tail))
+
+    # Arestas quentes primeiro, por prioridade (as alternativas só quando a
+    # preferida não foi possível); depois os fall-throughs originais, para
+    # o código frio manter a ordem do fonte
+    found = edges(blocks, long)
+    for priority in range(3):
+        for weight, _, source, target in sorted((edge for edge in found if edge[1] == priority),
+                                                key=lambda edge: (-edge[0], edge[2])):
+            merge(source, target)
+    for block in blocks[:-1]:
+        if block.falls_through:
+            merge(block.position, block.position + 1)
+
+    first = chains.pop(chain_of[entry])
+    last = chains.pop(chain_of[exit_block]) if exit_block is not None and chain_of[exit_block] in chains else []
+    middle = sorted(chains.values(),
+                    key=lambda chain: (-max(block.count for block in chain), chain[0].position))
+    return first + [block for chain in middle for block in chain] + last
+
+
+def jump(origin: Statement, label: str) -> Statement:
+    """JMP absoluto para `label` (mesma linha e arquivo de `origin`)"""
+    opcode, size = OPCODES['JMP'][AddressMode.ABSOLUTE]
+    statement = Statement(origin.line_num, None, StatementKind.INSTRUCTION, 'JMP',
+                          AddressMode.ABSOLUTE, ref=label, opcode=opcode, size=size)
+    statement.file = origin.file
+    return statement
+
+
+def invert(branch: Statement, label: str) -> Statement:
+    """Branch com a condição invertida para `label`"""
+    inverted = branch.copy()
+    inverted.instruction = INVERTED_BRANCHES[branch.instruction]
+    inverted.opcode = OPCODES[inverted.instruction][AddressMode.RELATIVE][0]
+    inverted.ref = label
+    return inverted
+
+
+def emit_region(blocks: List[Block], order: List[Block], report: LayoutReport) -> List[Statement]:
+    """Statements da região na nova ordem, com os saltos ajustados"""
+    result: List[Statement] = []
+    for i, block in enumerate(order):
+        following = order[i + 1].label if i + 1 < len(order) else None
+        statements = block.statements
+        branch, jump_statement = block.branch, block.jump
+
+        if jump_statement is not None and following is not None:
+            index = statements.index(jump_statement)
+            if jump_statement.ref == following:
+                # Aresta quente virou fall-through: o JMP some
+                statements = statements[:index] + removed(jump_statement) + statements[index + 1:]
+                report.jumps_removed.append((jump_statement.line_num, block.onward))
+            elif branch is not None and branch.ref == following:
+                # Bxx T / JMP U com T em seguida: BYY U e o JMP some
+                statements = (statements[:index - 1] + [invert(branch, jump_statement.ref)]
+                              + removed(jump_statement) + statements[index + 1:])
+                report.jumps_removed.append((jump_statement.line_num, block.onward))
+                report.branches_inverted += 1
+        elif block.falls_through and block.position + 1 < len(blocks):
+            original = blocks[block.position + 1].label
+            if following == original:
+                pass
+            elif branch is not None and branch.ref == following:
+                # O destino do branch ficou logo em seguida: inverte a condição
+                statements = statements[:-1] + [invert(branch, original)]
+                report.branches_inverted += 1
+            else:
+                origin = statements[-1]
+                statements = statements + [jump(origin, original)]
+                report.jumps_added.append((origin.line_num, block.onward))
+        result.extend(statements)
+    report.moved += sum(1 for i, block in enumerate(order) if block.position != i)
+    return result
+
+
+def layout(statements: List[Statement], profile: Dict[str, int],
+           report: Optional[LayoutReport] = None) -> List[Statement]:
+    """Reordena os blocos de cada região relocável segundo o perfil"""
+    if report is None:
+        report = LayoutReport()
+    numeric = next((st for st in statements if st.kind == StatementKind.INSTRUCTION
+                    and st.instruction in FLOW_TARGETS and st.mode != AddressMode.INDIRECT
+                    and st.ref is None), None)
+    if numeric is not None:
+        report.skipped = f"linha {numeric.line_num}: {numeric.instruction} para endereço numérico"
+        return statements
+
+    long = long_branches(statements, profile)
+    result: List[Statement] = []
+    for relocatable, item in split_regions(statements):
+        if not relocatable:
+            result.extend(item)
+            continue
+        blocks = split_blocks(item, profile)
+        report.regions += 1
+        report.blocks += len(blocks)
+        if len(blocks) < 2 or not any(block.count for block in blocks):
+            result.extend(item)
+            continue
+        result.extend(emit_region(blocks, order_blocks(blocks, long), report))
+    after = long_branches(result, profile)
+    report.long_before = (len(long), sum(long.values()))
+    report.long_after = (len(after), sum(after.values()))
+    return result
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Módulos relocáveis e linker do Mini Assembler 6502
+
+Cada módulo é montado a partir do endereço 0, sem .ORG nem .EQU, e gera um arquivo
+objeto (.obj, JSON) com:
+
+- code: bytes do módulo
+- labels: todos os labels locais (offset dentro do módulo)
+- exports: labels visíveis para outros módulos (.EXPORT NOME, ...)
+- imports: símbolos definidos em outros módulos (.IMPORT NOME, ...)
+- relocations: (offset, tipo, símbolo) com tipo LOW, HIGH, WORD ou REL
+
+O cabeçalho do objeto guarda as opções da montagem (-O e o mapa de
+memória): um .obj montado com outras opções é refeito.
+
+O linker posiciona os módulos nas regiões RAM/ROM do mapa de memória do
+projeto (memoria.cfg ao lado do fonte, ou a RAM única de 16 KB), resolve
+os símbolos, aplica as relocações e gera a mesma imagem .mif/.hex/.bin do
+assembler.
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import memimage
+from assembler import (LONG_BRANCH_SIZE, MEMORY_SIZE, START_ADDRESS, AddressMode,
+                       Assembler6502, Statement, StatementKind)
+from memorymap import MemoryMap, find_project_map
+
+OBJECT_FORMAT = 'asm6502-obj'
+OBJECT_VERSION = 2
+
+
+class Relocation:
+    LOW = 'LOW'     # Byte baixo do símbolo (#<LABEL)
+    HIGH = 'HIGH'   # Byte alto do símbolo (#>LABEL)
+    WORD = 'WORD'   # Endereço de 16 bits little-endian
+    REL = 'REL'     # Offset de branch relativo ao byte seguinte
+
+
+class ObjectModule:
+    """Módulo relocável: bytes + tabela de símbolos + relocações"""
+
+    def __init__(self, name: str, code: bytes, labels: Dict[str, int],
+                 exports: Sequence[str] = (), imports: Sequence[str] = (),
+                 relocations: Sequence[Tuple[int, str, str]] = (),
+                 options: Optional[Dict[str, object]] = None):
+        self.name = name
+        self.code = bytes(code)
+        self.labels = dict(labels)
+        self.exports = list(exports)
+        self.imports = list(imports)
+        self.relocations = [tuple(relocation) for relocation in relocations]
+        # Opções da montagem: {'optimize': bool, 'memory_map': MemoryMap.fingerprint() ou None}
+        self.options = dict(options) if options is not None else object_options(False, None)
+
+    def to_dict(self) -> dict:
+        return {
+            'format': OBJECT_FORMAT,
+            'version': OBJECT_VERSION,
+            'name': self.name,
+            'code': self.code.hex().upper(),
+            'labels': self.labels,
+            'exports': self.exports,
+            'imports': self.imports,
+            'relocations': [list(relocation) for relocation in self.relocations],
+            'options': self.options,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ObjectModule':
+        if data.get('format') != OBJECT_FORMAT or data.get('version') != OBJECT_VERSION:
+            raise ValueError(f"Arquivo objeto inválido ou de versão incompatível: {data.get('name')!r}")
+        return cls(data['name'], bytes.fromhex(data['code']), data['labels'],
+                   data['exports'], data['imports'], data['relocations'], data['options'])
+
+    def save(self, filename: str) -> None:
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, filename: str) -> 'ObjectModule':
+        with open(filename, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+    def __repr__(self) -> str:
+        return (f"ObjectModule({self.name!r}, {len(self.code)} bytes, "
+                f"{len(self.exports)} exports, {len(self.imports)} imports, "
+                f"{len(self.relocations)} relocações)")
+
+
+def object_options(optimize: bool, memory_map: Optional[MemoryMap]) -> Dict[str, object]:
+    """Opções que mudam o código do módulo (gravadas no cabeçalho do objeto)"""
+    return {'optimize': bool(optimize),
+            'memory_map': memory_map.fingerprint() if memory_map is not None else None}
+
+
+class ObjectAssembler(Assembler6502):
+    """Assembler de módulos relocáveis (origem 0, .EXPORT/.IMPORT, sem .ORG e .EQU)"""
+
+    origin = 0
+    relocatable = True
+
+    def __init__(self, optimize: bool = False, memory_map: Optional[MemoryMap] = None):
+        super().__init__(optimize, memory_map)
+        self.exports: List[str] = []
+        self.imports: List[str] = []
+
+    def parse_line(self, line: str, line_num: int) -> Optional[Statement]:
+        parts = line.split(';', 1)[0].split(None, 1)
+        directive = parts[0].upper() if parts else ''
+        if directive in ('.EXPORT', '.IMPORT'):
+            names = [name.strip() for name in parts[1].split(',')] if len(parts) > 1 else []
+            if not names or not all(names):
+                raise ValueError(f"Linha {line_num}: {directive} sem símbolos")
+            (self.exports if directive == '.EXPORT' else self.imports).extend(names)
+            return None
+
+        statement = super().parse_line(line, line_num)
+        if statement is not None and statement.kind in (StatementKind.ORG, StatementKind.EQU):
+            # Labels são relocados no link; constantes (.EQU) seriam relocadas junto
+            raise ValueError(f"Linha {line_num}: {statement.instruction} não é permitido em módulo relocável")
+        return statement
+
+    def check_segments(self, statements: List[Statement]) -> None:
+        # O módulo começa em 0: as regiões do mapa são conferidas no link
+        pass
+
+    def resolve_label(self, label: str, line_num: int) -> int:
+        # Símbolos importados só são conhecidos no link
+        if label in self.imports:
+            return 0
+        return super().resolve_label(label, line_num)
+
+    def imported_branch(self, statement: Statement) -> bool:
+        return (statement.mode == AddressMode.RELATIVE and statement.ref in self.imports
+                and statement.size != LONG_BRANCH_SIZE)
+
+    def second_pass(self, statements: List[Statement]) -> None:
+        # Branches para símbolos importados recebem o offset no link
+        super().second_pass([st for st in statements if not self.imported_branch(st)])
+        for statement in statements:
+            if self.imported_branch(statement):
+                self.memory[statement.address:statement.address + 2] = bytes((statement.opcode, 0))
+
+    def relocations(self) -> List[Tuple[int, str, str]]:
+        """Posições que dependem do endereço final de algum símbolo"""
+        relocations = []
+        for statement in self.statements:
+            address = statement.address
+            if statement.kind == StatementKind.WORD:
+                for i, word in enumerate(statement.data):
+                    if not isinstance(word, str):
+                        continue
+                    if word[0] in '<>':
+                        # .WORD <LABEL/>LABEL: só o byte baixo da palavra depende do símbolo
+                        kind = Relocation.LOW if word[0] == '<' else Relocation.HIGH
+                        relocations.append((address + 2 * i, kind, word[1:]))
+                    else:
+                        relocations.append((address + 2 * i, Relocation.WORD, word))
+                continue
+            ref = statement.ref
+            if statement.kind != StatementKind.INSTRUCTION or ref is None:
+                continue
+            if ref[0] in '<>':
+                relocations.append((address + 1, Relocation.LOW if ref[0] == '<' else Relocation.HIGH, ref[1:]))
+            elif statement.size == LONG_BRANCH_SIZE:
+                # Branch invertido + JMP: apenas o JMP é absoluto
+                relocations.append((address + 3, Relocation.WORD, ref))
+            elif statement.mode == AddressMode.RELATIVE:
+                if ref in self.imports:
+                    relocations.append((address + 1, Relocation.REL, ref))
+            else:
+                relocations.append((address + 1, Relocation.WORD, ref))
+        return relocations
+
+    def to_object(self, name: str) -> ObjectModule:
+        """Gera o módulo objeto da última montagem"""
+        for symbol in self.exports:
+            if symbol not in self.labels:
+                raise ValueError(f"Símbolo exportado não definido: '{symbol}'")
+        size = max((st.address + st.size for st in self.statements), default=0)
+        return ObjectModule(name, self.memory[:size], self.labels,
+                            self.exports, self.imports, self.relocations(),
+                            object_options(self.optimize, self.memory_map))
+
+
+def assemble_object(source: str, name: str, optimize: bool = False,
+                    memory_map: Optional[MemoryMap] = None) -> ObjectModule:
+    """Monta um fonte como módulo relocável"""
+    assembler = ObjectAssembler(optimize, memory_map)
+    assembler.assemble(source)
+    return assembler.to_object(name)
+
+
+def object_filename(source_file: str) -> str:
+    return source_file.rsplit('.', 1)[0] + '.obj'
+
+
+def compile_file(source_file: str, object_file: Optional[str] = None,
+                 optimize: bool = False, force: bool = False,
+                 memory_map: Optional[MemoryMap] = None) -> ObjectModule:
+    """
+    Monta um .asm para .obj
+    O objeto existente é reaproveitado se for mais novo que o fonte e tiver
+    sido montado com as mesmas opções (-O e mapa de memória).
+    """
+    object_file = object_file or object_filename(source_file)
+    if (not force and os.path.exists(object_file)
+            and os.path.getmtime(object_file) >= os.path.getmtime(source_file)):
+        try:
+            module = ObjectModule.load(object_file)
+        except (ValueError, KeyError):
+            module = None  # Objeto de outra versão: monta de novo
+        if module is not None and module.options == object_options(optimize, memory_map):
+            return module
+    with open(source_file, 'r') as f:
+        module = assemble_object(f.read(), os.path.basename(source_file).rsplit('.', 1)[0],
+                                 optimize, memory_map)
+    module.save(object_file)
+    return module
+
+
+class Linker:
+    """Posiciona módulos no mapa de memória e resolve as relocações"""
+
+    def __init__(self, memory_size: int = MEMORY_SIZE, start: int = START_ADDRESS,
+                 memory_map: Optional[MemoryMap] = None):
+        # Com mapa de memória vale o espaço dele, e os módulos só entram em RAM/ROM
+        self.memory_map = memory_map
+        self.memory = bytearray(memory_map.size if memory_map is not None else memory_size)
+        self.start = start
+        self.modules: List[ObjectModule] = []
+        self.bases: Dict[str, int] = {}
+        self.symbols: Dict[str, int] = {}
+        self.segments: List[Tuple[int, int]] = []
+
+    def free_address(self, size: int) -> int:
+        """Primeiro endereço a partir de `start` com `size` bytes livres (em RAM/ROM, com mapa)"""
+        address = self.start
+        moved = True
+        while moved and address + size <= len(self.memory):
+            moved = False
+            for start, end in sorted(self.segments):
+                if address < end and start < address + size:
+                    address = end
+                    moved = True
+            if self.memory_map is not None:
+                gaps = self.memory_map.uncovered(address, address + size)
+                if gaps:
+                    address = gaps[-1][1]
+                    moved = True
+        return address
+
+    def add(self, module: ObjectModule, base: Optional[int] = None) -> None:
+        """Adiciona um módulo; sem `base`, ocupa o primeiro espaço livre"""
+        if module.name in self.bases:
+            raise ValueError(f"Módulo duplicado: '{module.name}'")
+        if base is None:
+            base = self.free_address(len(module.code))
+        end = base + len(module.code)
+        if base < 0 or end > len(self.memory):
+            raise ValueError(f"Módulo '{module.name}' (${base:04X}-${end - 1:04X}) não cabe na memória")
+        for other, (start, stop) in zip(self.modules, self.segments):
+            if base < stop and start < end:
+                raise ValueError(f"Módulo '{module.name}' sobrepõe '{other.name}' em ${max(base, start):04X}")
+        if self.memory_map is not None and base < end:
+            gaps = self.memory_map.uncovered(base, end)
+            if gaps:
+                raise ValueError(f"Módulo '{module.name}' (${base:04X}-${end - 1:04X}) fora das regiões "
+                                 f"RAM/ROM: ${gaps[0][0]:04X} em {self.memory_map.describe(gaps[0][0])}")
+        self.modules.append(module)
+        self.bases[module.name] = base
+        self.segments.append((base, end))
+
+    def resolve_symbols(self) -> None:
+        self.symbols = {}
+        for module in self.modules:
+            base = self.bases[module.name]
+            for symbol in module.exports:
+                if symbol in self.symbols:
+                    raise ValueError(f"Símbolo '{symbol}' exportado por mais de um módulo")
+                self.symbols[symbol] = base + module.labels[symbol]
+
+    def symbol_address(self, module: ObjectModule, symbol: str) -> int:
+        if symbol in module.labels:
+            return self.bases[module.name] + module.labels[symbol]
+        if symbol in module.imports and symbol in self.symbols:
+            return self.symbols[symbol]
+        raise ValueError(f"Módulo '{module.name}': símbolo não resolvido '{symbol}'")
+
+    def link(self) -> bytearray:
+        """Copia os módulos para a imagem e aplica as relocações"""
+        self.resolve_symbols()
+        memory = self.memory
+        for module in self.modules:
+            base = self.bases[module.name]
+            memory[base:base + len(module.code)] = module.code
+            for offset, kind, symbol in module.relocations:
+                value = self.symbol_address(module, symbol)
+                address = base + offset
+                if kind == Relocation.LOW:
+                    memory[address] = value & 0xFF
+                elif kind == Relocation.HIGH:
+                    memory[address] = (value >> 8) & 0xFF
+                elif kind == Relocation.WORD:
+                    memory[address] = value & 0xFF
+                    memory[address + 1] = (value >> 8) & 0xFF
+                elif kind == Relocation.REL:
+                    branch = value - (address + 1)
+                    if branch < -128 or branch > 127:
+                        raise ValueError(f"Módulo '{module.name}': branch para '{symbol}' "
+                                         f"fora do alcance ({branch})")
+                    memory[address] = branch & 0xFF
+                else:
+                    raise ValueError(f"Módulo '{module.name}': relocação desconhecida '{kind}'")
+        return memory
+
+    def generate_output(self, output_filename: str) -> None:
+        """Gera .mif, .hex ou .bin de acordo com a extensão"""
+        # Com mapa de memória a imagem é esparsa, como a do assembler
+        memimage.write_image(self.memory, output_filename, self.segments, self.memory_map is not None)
+        print(f"Imagem gerada: {output_filename}")
+
+    def print_map(self) -> None:
+        print("\nMapa de memória:")
+        for module, (start, end) in zip(self.modules, self.segments):
+            print(f"  ${start:04X}-${end - 1:04X}  {end - start:>5} bytes  {module.name}")
+        print("\nSímbolos exportados:")
+        for symbol, address in sorted(self.symbols.items(), key=lambda item: item[1]):
+            print(f"  {symbol}: ${address:04X}")
+
+
+def parse_placement(text: str) -> Tuple[str, int]:
+    """Lê 'modulo=$1000' da linha de comando"""
+    name, _, address = text.partition('=')
+    return name, Assembler6502().parse_value(address)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Linker do Mini Assembler 6502",
+        epilog="Exemplo:\n  python linker.py -c main.asm lib.asm\n"
+               "  python linker.py main.asm lib.obj -o programa.mif --place lib=$2000",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help="módulos .asm (montados se o .obj estiver desatualizado) ou .obj")
+    parser.add_argument('-o', '--output', default='program.mif', help="imagem de saída .mif, .hex ou .bin")
+    parser.add_argument('-c', '--compile-only', action='store_true', help="apenas gera os .obj")
+    parser.add_argument('--place', action='append', default=[], metavar='MODULO=ENDERECO',
+                        help="endereço fixo de um módulo (os demais são colocados em sequência)")
+    parser.add_argument('-O', '--optimize', action='store_true', help="aplica o otimizador peephole")
+    parser.add_argument('--memory-map', metavar='ARQUIVO',
+                        help="mapa de memória RAM/ROM/E/S do projeto (padrão: memoria.cfg ao lado "
+                             "do primeiro módulo, se existir; sem mapa, RAM única de 16KB)")
+    args = parser.parse_args()
+
+    try:
+        map_file = args.memory_map or find_project_map(args.inputs[0])
+        memory_map = MemoryMap.load(map_file) if map_file else None
+        modules = []
+        for filename in args.inputs:
+            if filename.lower().endswith('.obj'):
+                modules.append(ObjectModule.load(filename))
+            else:
+                modules.append(compile_file(filename, optimize=args.optimize, memory_map=memory_map))
+                print(f"Objeto: {object_filename(filename)}")
+        if args.compile_only:
+            return
+
+        placements = dict(parse_placement(text) for text in args.place)
+        linker = Linker(memory_map=memory_map)
+        # Módulos com endereço fixo primeiro; os demais ocupam o espaço que sobrar
+        for module in sorted(modules, key=lambda module: module.name not in placements):
+            linker.add(module, placements.get(module.name))
+        linker.link()
+        linker.generate_output(args.output)
+        linker.print_map()
+
+    except FileNotFoundError as e:
+        print(f"Erro: Arquivo '{e.filename}' não encontrado.")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Erro de link: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Leitura e escrita da imagem de memória do Mini Assembler 6502
+
+Gera .mif (Quartus), Intel HEX e .bin a partir do mesmo bytearray (ou de
+uma memorymap.SparseMemory, lida por fatias), e lê os três formatos de
+volta (o .mif em uma passada, linha a linha).
+As sequências de bytes iguais são encontradas em bloco (regex em C) e a
+saída é montada em pedaços antes de ir para o disco, evitando milhares
+de chamadas a f.write.
+"""
+
+import operator
+import re
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Encontra sequências (runs) de bytes iguais
+RE_RUN = re.compile(rb'(.)\1*', re.DOTALL)
+RE_REPEAT = re.compile(rb'(.)\1+', re.DOTALL)
+
+# Textos pré-formatados das entradas de byte isolado do .mif
+_MIF_ADDRESSES: List[str] = []
+_MIF_VALUES = [f"{value:02X};\n" for value in range(256)]
+
+# Quantidade de linhas acumuladas antes de cada escrita no arquivo
+CHUNK_LINES = 4096
+
+# Bytes de dados por registro Intel HEX
+HEX_RECORD_SIZE = 16
+
+MIF_HEADER = (
+    "-- Memory Initialization File (.mif)\n"
+    "-- Generated by Mini Assembler 6502\n"
+    "-- Instructions start at address 0x1000\n\n"
+    "DEPTH = {depth};\n"
+    "WIDTH = 8;\n"
+    "ADDRESS_RADIX = HEX;\n"
+    "DATA_RADIX = HEX;\n\n"
+    "CONTENT BEGIN\n"
+)
+
+
+def find_runs(memory: Sequence[int], start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, int, int]]:
+    """
+    Percorre a memória agrupando bytes consecutivos iguais
+    Retorna: (início, fim exclusivo, valor) para cada sequência
+    """
+    if end is None:
+        end = len(memory)
+    for match in RE_RUN.finditer(memory, start, end):
+        yield match.start(), match.end(), memory[match.start()]
+
+
+def normalize_ranges(ranges: Optional[Sequence[Tuple[int, int]]], size: int) -> List[Tuple[int, int]]:
+    """Ordena, limita ao tamanho da memória e junta ranges (início, fim exclusivo)"""
+    if ranges is None:
+        return [(0, size)]
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        start, end = max(start, 0), min(end, size)
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def used_ranges(memory: Sequence[int], fill: int = 0x00, max_gap: int = 16) -> List[Tuple[int, int]]:
+    """
+    Estima as regiões usadas da imagem (bytes diferentes de `fill`)
+    Lacunas menores que `max_gap` são incorporadas à região vizinha.
+    """
+    ranges: List[Tuple[int, int]] = []
+    for start, end, value in find_runs(memory):
+        if value == fill:
+            continue
+        if ranges and start - ranges[-1][1] < max_gap:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def _write_chunked(f, lines: Iterator[str]) -> None:
+    """Escreve as linhas (ou blocos de linhas) em pedaços de CHUNK_LINES"""
+    chunk: List[str] = []
+    append = chunk.append
+    for line in lines:
+        append(line)
+        if len(chunk) >= CHUNK_LINES:
+            f.write(''.join(chunk))
+            chunk.clear()
+    if chunk:
+        f.write(''.join(chunk))
+
+
+def _single_entries(data: bytes, base: int, start: int, end: int) -> str:
+    """Formata em bloco as entradas de bytes isolados de [start, end) (`data` começa em `base`)"""
+    global _MIF_ADDRESSES
+    if len(_MIF_ADDRESSES) < end:
+        _MIF_ADDRESSES = [f"    {i:04X} : " for i in range(max(end, 1 << 16))]
+    return ''.join(map(operator.add, _MIF_ADDRESSES[start:end],
+                       map(_MIF_VALUES.__getitem__, data[start - base:end - base])))
+
+
+def mif_lines(memory: Sequence[int], ranges: Optional[Sequence[Tuple[int, int]]] = None) -> Iterator[str]:
+    """Gera o conteúdo do .mif (entre CONTENT BEGIN e END) em blocos de linhas"""
+    for range_start, range_end in normalize_ranges(ranges, len(memory)):
+        # Cópia da região: a regex precisa de um buffer (a memória pode ser esparsa)
+        data = bytes(memory[range_start:range_end])
+        position = range_start
+        # Apenas sequências com 2+ bytes iguais passam pela regex;
+        # os bytes isolados entre elas são formatados em bloco
+        for match in RE_REPEAT.finditer(data):
+            start, end = match.start() + range_start, match.end() + range_start
+            if start > position:
+                yield _single_entries(data, range_start, position, start)
+            # Range de valores iguais
+            yield f"    [{start:04X}..{end - 1:04X}] : {data[match.start()]:02X};\n"
+            position = end
+        if position < range_end:
+            yield _single_entries(data, range_start, position, range_end)
+
+
+def write_mif(memory: Sequence[int], filename: str,
+              ranges: Optional[Sequence[Tuple[int, int]]] = None) -> None:
+    """
+    Gera arquivo MIF com a profundidade igual ao tamanho da memória
+    Com `ranges`, apenas as regiões indicadas são escritas (saída esparsa).
+    """
+    with open(filename, 'w') as f:
+        f.write(MIF_HEADER.format(depth=len(memory)))
+        _write_chunked(f, mif_lines(memory, ranges))
+        f.write("END;\n")
+
+
+# Linha de um .mif de layout fixo: "    AAAA : VV;\n" (um byte por linha)
+MIF_FIXED_LINE_SIZE = 15
+
+
+def write_mif_fixed(memory: Sequence[int], filename: str) -> None:
+    """
+    Gera um .mif com uma linha de tamanho fixo por endereço (até 64KB)
+    O byte do endereço N fica sempre na mesma posição do arquivo, então
+    patch_mif_fixed pode reescrever só as linhas alteradas.
+    """
+    if len(memory) > 1 << 16:
+        raise ValueError("Layout fixo do .mif só suporta até 64KB")
+    data = bytes(memory[0:len(memory)])
+    with open(filename, 'w') as f:
+        f.write(MIF_HEADER.format(depth=len(memory)))
+        _write_chunked(f, (_single_entries(data, 0, start, min(start + CHUNK_LINES, len(data)))
+                           for start in range(0, len(data), CHUNK_LINES)))
+        f.write("END;\n")
+
+
+def patch_mif_fixed(memory: Sequence[int], filename: str, ranges: Sequence[Tuple[int, int]]) -> None:
+    """
+    Reescreve no lugar as linhas de `ranges` de um .mif gerado por write_mif_fixed
+    Gera ValueError se o arquivo não tem o layout esperado.
+    """
+    header = MIF_HEADER.format(depth=len(memory)).encode()
+    with open(filename, 'r+b') as f:
+        if f.read(len(header)) != header:
+            raise ValueError(f"{filename} não tem o layout fixo do modo watch")
+        f.seek(0, 2)
+        if f.tell() != len(header) + len(memory) * MIF_FIXED_LINE_SIZE + len("END;\n"):
+            raise ValueError(f"{filename} não tem o layout fixo do modo watch")
+        for start, end in normalize_ranges(ranges, len(memory)):
+            f.seek(len(header) + start * MIF_FIXED_LINE_SIZE)
+            f.write(_single_entries(bytes(memory[start:end]), start, start, end).encode())
+
+
+def hex_record(address: int, record_type: int, data: bytes) -> str:
+    """Monta um registro Intel HEX com checksum"""
+    record = bytes((len(data), (address >> 8) & 0xFF, address & 0xFF, record_type)) + data
+    checksum = (-sum(record)) & 0xFF
+    return f":{record.hex().upper()}{checksum:02X}\n"
+
+
+def hex_lines(memory: Sequence[int], ranges: Optional[Sequence[Tuple[int, int]]] = None) -> Iterator[str]:
+    """Gera os registros Intel HEX (dados + fim de arquivo)"""
+    if ranges is None:
+        ranges = used_ranges(memory)
+    upper = 0
+    for range_start, range_end in normalize_ranges(ranges, len(memory)):
+        address = range_start
+        while address < range_end:
+            # Registro de endereço linear estendido para imagens acima de 64KB
+            if address >> 16 != upper:
+                upper = address >> 16
+                yield hex_record(0, 0x04, upper.to_bytes(2, 'big'))
+            end = min(address + HEX_RECORD_SIZE, range_end, (upper + 1) << 16)
+            yield hex_record(address & 0xFFFF, 0x00, bytes(memory[address:end]))
+            address = end
+    yield ":00000001FF\n"
+
+
+def write_hex(memory: Sequence[int], filename: str,
+              ranges: Optional[Sequence[Tuple[int, int]]] = None) -> None:
+    """Gera arquivo Intel HEX (por padrão, apenas com as regiões usadas)"""
+    with open(filename, 'w') as f:
+        _write_chunked(f, hex_lines(memory, ranges))
+
+
+def write_bin(memory: Sequence[int], filename: str, start: int = 0, end: Optional[int] = None) -> None:
+    """Gera arquivo binário bruto com a região [start, end) da memória"""
+    if end is None:
+        end = len(memory)
+    with open(filename, 'wb') as f:
+        f.write(bytes(memory[start:end]))
+
+
+def image_format(filename: str) -> str:
+    """Formato da imagem pela extensão: 'HEX', 'BIN' ou 'MIF' (padrão)"""
+    extension = filename.rsplit('.', 1)[-1].lower()
+    return extension.upper() if extension in ('hex', 'bin') else 'MIF'
+
+
+def write_image(memory: Sequence[int], filename: str,
+                ranges: Optional[Sequence[Tuple[int, int]]] = None, sparse: bool = False) -> str:
+    """
+    Escolhe o formato pela extensão: .hex, .bin ou .mif
+    O .hex tem só as regiões em `ranges`. Com `sparse` (imagem de um mapa de
+    memória) o .mif também, e o .bin termina no fim da última região; sem
+    ele os dois cobrem a memória inteira. Retorna o formato gravado.
+    """
+    output_format = image_format(filename)
+    if sparse and ranges is None:
+        raise ValueError("Imagem esparsa precisa das regiões usadas")
+    if output_format == 'HEX':
+        write_hex(memory, filename, ranges)
+    elif output_format == 'BIN':
+        end = max((end for _, end in normalize_ranges(ranges, len(memory))), default=0) if sparse else None
+        write_bin(memory, filename, 0, end)
+    else:
+        write_mif(memory, filename, ranges if sparse else None)
+    return output_format
+
+
+# Base numérica de ADDRESS_RADIX/DATA_RADIX do .mif
+MIF_RADIX = {'HEX': 16, 'DEC': 10, 'UNS': 10, 'BIN': 2, 'OCT': 8}
+
+# Entrada do CONTENT: "AAAA : VV VV ...", "[AAAA..BBBB] : VV" ou "[AAAA..BBBB] : VV VV ..."
+RE_MIF_SINGLE = re.compile(r'^\s*(\w+)\s*:\s*(\w+)\s*;\s*$')
+RE_MIF_ENTRY = re.compile(r'^\[?\s*(\w+)\s*(?:\.\.\s*(\w+)\s*\])?\s*:\s*(.+)$')
+
+# Início do CONTENT: "CONTENT BEGIN", ou "CONTENT" e "BEGIN" em linhas separadas
+RE_MIF_BEGIN = re.compile(r'^(?:CONTENT\b\s*)?BEGIN\b\s*(.*)$', re.IGNORECASE)
+
+
+def mif_entries(lines: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+    """
+    Percorre um .mif linha a linha sem montar a imagem
+    Gera ('depth', profundidade) e depois (início, fim exclusivo, valores):
+    em ranges com um único valor, `valores` tem só esse valor e deve ser
+    repetido até o fim do range (a expansão fica a cargo de quem consome).
+    """
+    address_radix = data_radix = 16
+    in_content = False
+    pending = ''
+    single = RE_MIF_SINGLE.match
+    for line in lines:
+        if in_content and not pending:
+            # Caso mais comum: um byte por linha ("AAAA : VV;")
+            match = single(line)
+            if match is not None:
+                start = int(match.group(1), address_radix)
+                yield start, start + 1, bytes((int(match.group(2), data_radix),))
+                continue
+        line = line.split('--', 1)[0].strip()
+        if not line:
+            continue
+        if not in_content:
+            begin = RE_MIF_BEGIN.match(line)
+            if begin is None:
+                key, _, value = line.rstrip(';').partition('=')
+                key, value = key.strip().upper(), value.strip().upper()
+                if key == 'DEPTH':
+                    yield 'depth', int(value)
+                elif key == 'WIDTH' and value != '8':
+                    raise ValueError(f"Largura de palavra {value} não suportada (apenas 8 bits)")
+                elif key == 'ADDRESS_RADIX':
+                    address_radix = MIF_RADIX[value]
+                elif key == 'DATA_RADIX':
+                    data_radix = MIF_RADIX[value]
+                continue
+            # Entradas podem vir na mesma linha do BEGIN
+            in_content = True
+            line = begin.group(1)
+            if not line:
+                continue
+        # Uma linha pode ter várias entradas, e uma entrada pode seguir na próxima linha
+        pending += ' ' + line
+        *entries, pending = pending.split(';')
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+            if entry.upper() == 'END':
+                return
+            match = RE_MIF_ENTRY.match(entry)
+            if match is None:
+                raise ValueError(f"Entrada inválida no .mif: '{entry}'")
+            first, last, values = match.groups()
+            start = int(first, address_radix)
+            data = bytes(int(value, data_radix) for value in values.split())
+            end = int(last, address_radix) + 1 if last is not None else start + len(data)
+            yield start, end, data
+        if pending.strip().upper() == 'END':
+            return
+
+
+def read_mif(filename: str) -> bytearray:
+    """
+    Lê um arquivo .mif para um bytearray, em uma passada pelo arquivo
+    Ranges de zeros não são expandidos (a memória já começa zerada).
+    """
+    memory = bytearray()
+    with open(filename, 'r') as f:
+        for entry in mif_entries(f):
+            if entry[0] == 'depth':
+                memory = bytearray(entry[1])
+                continue
+            start, end, data = entry
+            if end > len(memory):
+                raise ValueError(f"Endereço ${end - 1:04X} fora da profundidade do .mif ({len(memory)})")
+            if len(data) == end - start:
+                memory[start:end] = data
+            elif len(data) == 1:
+                if data[0]:
+                    memory[start:end] = data * (end - start)
+            else:
+                # Range com vários valores: a sequência se repete até o fim
+                count = end - start
+                memory[start:end] = (data * (count // len(data) + 1))[:count]
+    return memory
+
+
+def read_hex(filename: str, size: int = 16 * 1024) -> bytearray:
+    """Lê um arquivo Intel HEX (registros 00, 01, 02 e 04) para uma memória de `size` bytes"""
+    memory = bytearray(size)
+    base = 0
+    with open(filename, 'r') as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                if line[0] != ':':
+                    raise ValueError
+                record = bytes.fromhex(line[1:])
+            except ValueError:
+                raise ValueError(f"Linha {line_num}: registro Intel HEX inválido") from None
+            # Contagem, endereço (2), tipo e checksum: no mínimo 5 bytes
+            if len(record) < 5 or len(record) != record[0] + 5 or sum(record) & 0xFF:
+                raise ValueError(f"Linha {line_num}: tamanho ou checksum inválido")
+            count, record_type = record[0], record[3]
+            data = record[4:4 + count]
+            if record_type == 0x00:
+                address = base + ((record[1] << 8) | record[2])
+                if address + count > size:
+                    raise ValueError(f"Linha {line_num}: endereço ${address:04X} fora da memória")
+                memory[address:address + count] = data
+            elif record_type == 0x01:
+                break
+            elif record_type == 0x02:
+                base = int.from_bytes(data, 'big') << 4
+            elif record_type == 0x04:
+                base = int.from_bytes(data, 'big') << 16
+    return memory
+
+
+def read_bin(filename: str, size: int = 16 * 1024, start: int = 0) -> bytearray:
+    """Lê um binário bruto a partir de `start` em uma memória de `size` bytes"""
+    memory = bytearray(size)
+    with open(filename, 'rb') as f:
+        data = f.read(size - start)
+    memory[start:start + len(data)] = data
+    return memory
+
+
+def read_image(filename: str, size: int = 16 * 1024) -> bytearray:
+    """
+    Escolhe o leitor pela extensão: .hex, .bin ou .mif
+    `size` vale para .hex e .bin; o .mif traz a própria profundidade.
+    """
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension == 'hex':
+        return read_hex(filename, size)
+    if extension == 'bin':
+        return read_bin(filename, size)
+    return read_mif(filename)
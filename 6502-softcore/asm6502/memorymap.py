@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Mapa de memória do projeto e memória esparsa por páginas
+
+O mapa descreve as regiões do espaço de endereços de uma placa (RAM, ROM
+e E/S) em um arquivo de texto, uma região por linha:
+
+    # nome      tipo  início  tamanho
+    ZP          RAM   $0000   $0100
+    PILHA       RAM   $0100   $0100
+    PROGRAMA    ROM   $1000   16K
+    LEDS        IO    $8000   $0010
+
+Números aceitam $/0x (hexadecimal), decimal e o sufixo K (x 1024). As
+regiões não podem se sobrepor. O espaço de endereços tem 64KB, a menos
+que uma linha "ESPACO <tamanho>" diga outro tamanho (potência de 2).
+
+O assembler só aceita código e dados em regiões RAM ou ROM; o simulador
+só escreve em RAM e E/S. Escritas fora disso são reportadas em vez de
+descartadas em silêncio.
+
+SparseMemory guarda apenas as páginas de 256 bytes que receberam algum
+byte diferente de zero, então a memória do assembler cresce com o
+programa e não com o espaço de endereços.
+"""
+
+import bisect
+import os
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from snapshot import PAGE_SHIFT, PAGE_SIZE
+
+RAM = 'RAM'
+ROM = 'ROM'
+IO = 'IO'
+KINDS = (RAM, ROM, IO)
+
+# Regiões em que o assembler pode colocar código e dados
+LOADABLE = frozenset((RAM, ROM))
+# Regiões em que o programa pode escrever durante a execução
+WRITABLE = frozenset((RAM, IO))
+
+# Espaço de endereços completo do 6502
+ADDRESS_SPACE = 1 << 16
+
+# Nome do mapa procurado no diretório do fonte quando nenhum é indicado
+PROJECT_MAP_NAME = 'memoria.cfg'
+
+PAGE_MASK = PAGE_SIZE - 1
+
+
+def parse_size(text: str) -> int:
+    """Lê um número do mapa: $FF, 0xFF, 255 ou 16K"""
+    text = text.strip().upper()
+    scale = 1
+    if text.endswith('K'):
+        text, scale = text[:-1], 1024
+    if text.startswith('$'):
+        return int(text[1:], 16) * scale
+    if text.startswith('0X'):
+        return int(text[2:], 16) * scale
+    return int(text) * scale
+
+
+class Region(NamedTuple):
+    name: str
+    kind: str
+    start: int
+    size: int
+
+    @property
+    def end(self) -> int:
+        """Fim exclusivo"""
+        return self.start + self.size
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.kind} ${self.start:04X}-${self.end - 1:04X})"
+
+
+class MemoryMap:
+    """Regiões RAM/ROM/E/S do espaço de endereços, ordenadas pelo início"""
+
+    def __init__(self, regions: Sequence[Region], size: int = ADDRESS_SPACE):
+        if size <= 0 or size & (size - 1):
+            raise ValueError(f"Espaço de endereços de {size} bytes não é potência de 2")
+        self.size = size
+        self.regions = sorted(regions, key=lambda region: region.start)
+        previous = None
+        for region in self.regions:
+            if region.kind not in KINDS:
+                raise ValueError(f"Região '{region.name}': tipo '{region.kind}' inválido "
+                                 f"(use {', '.join(KINDS)})")
+            if region.size <= 0 or region.start < 0 or region.end > size:
+                raise ValueError(f"Região '{region.name}' fora do espaço de endereços de {size} bytes")
+            if previous is not None and region.start < previous.end:
+                raise ValueError(f"Região '{region.name}' sobrepõe '{previous.name}' em ${region.start:04X}")
+            previous = region
+        self.starts = [region.start for region in self.regions]
+
+    @classmethod
+    def parse(cls, lines: Sequence[str], filename: str = '<mapa>') -> 'MemoryMap':
+        regions = []
+        size = ADDRESS_SPACE
+        for line_num, line in enumerate(lines, 1):
+            fields = line.split('#', 1)[0].split(';', 1)[0].split()
+            if not fields:
+                continue
+            try:
+                if fields[0].upper() == 'ESPACO' and len(fields) == 2:
+                    size = parse_size(fields[1])
+                    continue
+                if len(fields) != 4:
+                    raise ValueError
+                name, kind, start, length = fields
+                regions.append(Region(name, kind.upper(), parse_size(start), parse_size(length)))
+            except ValueError:
+                raise ValueError(f"{filename}, linha {line_num}: esperado 'nome tipo início tamanho'") from None
+        return cls(regions, size)
+
+    @classmethod
+    def load(cls, filename: str) -> 'MemoryMap':
+        with open(filename, 'r') as f:
+            return cls.parse(f.read().split('\n'), filename)
+
+    def __iter__(self) -> Iterator[Region]:
+        return iter(self.regions)
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    def region_at(self, address: int) -> Optional[Region]:
+        """Região que contém o endereço (None se nenhuma)"""
+        i = bisect.bisect_right(self.starts, address) - 1
+        if i >= 0 and address < self.regions[i].end:
+            return self.regions[i]
+        return None
+
+    def uncovered(self, start: int, end: int, kinds: frozenset = LOADABLE) -> List[Tuple[int, int]]:
+        """Partes de [start, end) que não caem em regiões dos tipos `kinds`"""
+        gaps = []
+        position = start
+        i = max(bisect.bisect_right(self.starts, start) - 1, 0)
+        for region in self.regions[i:]:
+            if region.start >= end:
+                break
+            if region.end <= position or region.kind not in kinds:
+                continue
+            if region.start > position:
+                gaps.append((position, region.start))
+            position = max(position, region.end)
+        if position < end:
+            gaps.append((position, end))
+        return gaps
+
+    def describe(self, address: int) -> str:
+        """Região do endereço para mensagens de erro"""
+        region = self.region_at(address)
+        return f"região {region}" if region is not None else "nenhuma região do mapa de memória"
+
+    def fingerprint(self) -> str:
+        """Texto que identifica o espaço e as regiões (chaves de cache e objetos)"""
+        return ';'.join([f"{self.size:X}"] + [f"{region.name}:{region.kind}:{region.start:X}:{region.size:X}"
+                                                for region in self.regions])
+
+    def writable(self) -> bytearray:
+        """Tabela com 1 nos endereços em que o programa pode escrever (RAM e E/S)"""
+        table = bytearray(self.size)
+        for region in self.regions:
+            if region.kind in WRITABLE:
+                table[region.start:region.end] = b'\x01' * region.size
+        return table
+
+    def __repr__(self) -> str:
+        return f"MemoryMap({', '.join(map(str, self.regions))})"
+
+
+def find_project_map(source_file: str) -> Optional[str]:
+    """Mapa do projeto (PROJECT_MAP_NAME) no diretório do fonte, se existir"""
+    path = os.path.join(os.path.dirname(os.path.abspath(source_file)), PROJECT_MAP_NAME)
+    return path if os.path.isfile(path) else None
+
+
+class SparseMemory:
+    """
+    Memória de `size` bytes com páginas alocadas na primeira escrita não nula
+    Aceita índices e fatias (passo 1) como um bytearray; fatias lidas
+    retornam bytes e fatias escritas precisam manter o tamanho.
+    """
+    __slots__ = ('size', 'pages')
+
+    def __init__(self, size: int = ADDRESS_SPACE):
+        self.size = size
+        self.pages: Dict[int, bytearray] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _range(self, key: slice) -> Tuple[int, int]:
+        start, stop, step = key.indices(self.size)
+        if step != 1:
+            raise ValueError("SparseMemory só aceita fatias de passo 1")
+        return start, max(start, stop)
+
+    def _index(self, key: int) -> int:
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError(f"Endereço fora da memória: {key}")
+        return key
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[int, bytes]:
+        if isinstance(key, slice):
+            return self.read(*self._range(key))
+        key = self._index(key)
+        page = self.pages.get(key >> PAGE_SHIFT)
+        return page[key & PAGE_MASK] if page is not None else 0
+
+    def __setitem__(self, key: Union[int, slice], value) -> None:
+        if isinstance(key, slice):
+            start, end = self._range(key)
+            data = bytes(value)
+            if len(data) != end - start:
+                raise ValueError("Atribuição a fatia não pode mudar o tamanho da memória")
+            self.write(start, data)
+            return
+        key = self._index(key)
+        page = self.pages.get(key >> PAGE_SHIFT)
+        if page is None:
+            if not value:
+                return
+            page = self.pages[key >> PAGE_SHIFT] = bytearray(PAGE_SIZE)
+        page[key & PAGE_MASK] = value
+
+    def read(self, start: int, end: int) -> bytes:
+        """Bytes de [start, end); páginas não alocadas são zeros"""
+        out = bytearray(end - start)
+        if end <= start:
+            return bytes(out)
+        pages = self.pages
+        for number in range(start >> PAGE_SHIFT, ((end - 1) >> PAGE_SHIFT) + 1):
+            page = pages.get(number)
+            if page is None:
+                continue
+            base = number << PAGE_SHIFT
+            low, high = max(start, base), min(end, base + PAGE_SIZE)
+            out[low - start:high - start] = page[low - base:high - base]
+        return bytes(out)
+
+    def write(self, start: int, data: bytes) -> None:
+        """Copia `data` a partir de `start`, sem alocar páginas para trechos zerados"""
+        pages = self.pages
+        position = start
+        end = start + len(data)
+        while position < end:
+            number = position >> PAGE_SHIFT
+            offset = position & PAGE_MASK
+            chunk = data[position - start:min(end, (number + 1) << PAGE_SHIFT) - start]
+            page = pages.get(number)
+            if page is None:
+                if not any(chunk):
+                    position += len(chunk)
+                    continue
+                page = pages[number] = bytearray(PAGE_SIZE)
+            page[offset:offset + len(chunk)] = chunk
+            position += len(chunk)
+
+    def used_pages(self) -> List[int]:
+        return sorted(self.pages)
+
+    def allocated(self) -> int:
+        """Bytes efetivamente alocados"""
+        return len(self.pages) * PAGE_SIZE
+
+    def __bytes__(self) -> bytes:
+        return self.read(0, self.size)
+
+    def __repr__(self) -> str:
+        return f"SparseMemory({self.size} bytes, {len(self.pages)} páginas alocadas)"
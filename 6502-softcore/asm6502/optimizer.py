@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Otimizador peephole do Mini Assembler 6502
+
+Roda entre o parser e a montagem, sobre a lista de Statements. Cada regra
+da tabela RULES olha uma janela de statements consecutivos e devolve a
+sequência equivalente mais barata. Statements com label são barreiras:
+podem ser destino de salto, então nada é propagado através deles.
+
+O efeito nos flags segue o hardware (control_unit.v), não o 6502
+documentado: toda instrução que passa pela ALU grava C, Z, V e N no
+WRITEBACK, inclusive INX/DEX, AND/ORA/EOR e as transferências TAX/TXA
+(que zeram C e V), enquanto o LDA não altera o PS.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+import timing
+from assembler import (DEFAULT_MEMORY_MAP, OPCODES, AddressMode, Statement, StatementKind,
+                       statement_cycles)
+from memorymap import RAM, MemoryMap
+
+# Store seguido de load do mesmo endereço vira transferência entre registradores
+TRANSFER_RULES = {
+    ('STX', 'LDA'): 'TXA',
+    ('STY', 'LDA'): 'TYA',
+    ('STA', 'LDX'): 'TAX',
+    ('STA', 'LDY'): 'TAY',
+}
+
+# Instruções que alteram o carry (ou cujo efeito no carry é desconhecido):
+# as do 6502 documentado e todas que o hardware grava com os flags da ALU
+CARRY_WRITERS = ({'ADC', 'SBC', 'CMP', 'CPX', 'CPY', 'ASL', 'LSR', 'ROL', 'ROR',
+                  'PLP', 'RTI', 'BRK', 'JSR'}
+                 | {instruction for instruction, modes in OPCODES.items()
+                    for opcode, _ in modes.values() if opcode in timing.HW_ALU_FLAG_WRITERS})
+
+# Instruções que alteram o overflow (ou cujo efeito é desconhecido), como em CARRY_WRITERS
+OVERFLOW_WRITERS = ({'ADC', 'SBC', 'BIT', 'PLP', 'RTI', 'BRK', 'JSR'}
+                    | {instruction for instruction, modes in OPCODES.items()
+                       for opcode, _ in modes.values() if opcode in timing.HW_ALU_FLAG_WRITERS})
+
+# Instruções que leem o carry (ADC/SBC/ROL/ROR usam PS[0] como carry de entrada)
+CARRY_READERS = {'ADC', 'SBC', 'ROL', 'ROR', 'BCC', 'BCS', 'PHP'}
+
+# Leitores de cada flag do PS em que TXA/TYA/TAX/TAY e o LDA/LDX/LDY diferem
+FLAG_READERS = {
+    'C': CARRY_READERS,
+    'V': {'BVC', 'BVS', 'PHP'},
+    'Z': {'BEQ', 'BNE', 'PHP'},
+    'N': {'BMI', 'BPL', 'PHP'},
+}
+
+# Instruções que sobrescrevem o flag no 6502 documentado; o flag só está
+# sobrescrito nos dois modelos se o opcode também grava os flags da ALU
+# no hardware (HW_ALU_FLAG_WRITERS) ou se é um CLC/SEC/CLV
+DOCUMENTED_FLAG_WRITERS = {
+    'C': {'ADC', 'SBC', 'CMP', 'CPX', 'CPY', 'ASL', 'LSR', 'ROL', 'ROR'},
+    'V': {'ADC', 'SBC'},
+    'Z': {'ADC', 'SBC', 'AND', 'ORA', 'EOR', 'CMP', 'CPX', 'CPY', 'ASL', 'LSR', 'ROL', 'ROR',
+          'INX', 'INY', 'DEX', 'DEY', 'TAX', 'TAY', 'TXA', 'TYA', 'TSX'},
+}
+DOCUMENTED_FLAG_WRITERS['N'] = DOCUMENTED_FLAG_WRITERS['Z']
+FLAG_SETTERS = {'C': {'CLC', 'SEC'}, 'V': {'CLV'}, 'Z': set(), 'N': set()}
+
+# Flags após a transferência no hardware (Z e N dependem do valor e nunca são conhecidos)
+TRANSFER_FLAGS = {'C': False, 'V': False}
+
+# Estado conhecido de C e V (None = desconhecido); Z e N não são acompanhados
+Flags = Dict[str, Optional[bool]]
+UNKNOWN_FLAGS: Flags = {'C': None, 'V': None}
+
+# Instruções após as quais o fluxo só continua via label
+FLOW_BREAKS = {'JMP', 'RTS', 'RTI', 'BRK'}
+
+# Estado do flag conhecido ao cair de um branch não tomado
+CARRY_FALLTHROUGH = {'BCC': True, 'BCS': False}
+OVERFLOW_FALLTHROUGH = {'BVC': True, 'BVS': False}
+
+
+def implied(origin: Statement, label: Optional[str], instruction: str) -> Statement:
+    """Cria uma instrução de modo implícito no lugar de `origin` (mesma linha e arquivo)"""
+    opcode, size = OPCODES[instruction][AddressMode.IMPLIED]
+    statement = Statement(origin.line_num, label, StatementKind.INSTRUCTION, instruction,
+                          AddressMode.IMPLIED, opcode=opcode, size=size)
+    statement.file = origin.file
+    return statement
+
+
+def removed(statement: Statement) -> List[Statement]:
+    """Remove o statement preservando o label que ele define"""
+    if statement.label is None:
+        return []
+    return [Statement(statement.line_num, statement.label, StatementKind.LABEL)]
+
+
+def same_operand(first: Statement, second: Statement) -> bool:
+    """Verifica se duas instruções acessam o mesmo endereço de memória"""
+    return (first.mode == second.mode
+            and first.mode in (AddressMode.ZERO_PAGE, AddressMode.ABSOLUTE)
+            and first.ref == second.ref and first.value == second.value)
+
+
+def overwrites(statement: Statement, flag: str) -> bool:
+    """Indica se a instrução sobrescreve o flag tanto no hardware quanto no 6502 documentado"""
+    instruction = statement.instruction
+    return (instruction in FLAG_SETTERS[flag]
+            or (instruction in DOCUMENTED_FLAG_WRITERS[flag]
+                and statement.opcode in timing.HW_ALU_FLAG_WRITERS))
+
+
+def flags_dead(statements: List[Statement], start: int, flags: str) -> bool:
+    """
+    Indica se cada um dos `flags` ('C', 'V', 'Z', 'N') é sobrescrito antes de
+    ser lido a partir de statements[start]
+    Labels, saltos e o fim da lista contam como leitura (o flag pode ser usado adiante).
+    """
+    live = set(flags)
+    for statement in statements[start:]:
+        if not live:
+            return True
+        if statement.label is not None or statement.kind != StatementKind.INSTRUCTION:
+            return False
+        instruction = statement.instruction
+        if (instruction in FLOW_BREAKS or instruction == 'JSR'
+                or statement.mode == AddressMode.RELATIVE
+                or any(instruction in FLAG_READERS[flag] for flag in live)):
+            return False
+        live = {flag for flag in live if not overwrites(statement, flag)}
+    return not live
+
+
+def store_then_load(statements: List[Statement], i: int, flags: Flags,
+                    in_ram: Callable[[Statement], bool]) -> Optional[Tuple[int, List[Statement]]]:
+    """STX $10 / LDA $10 -> STX $10 / TXA (e variantes com Y e A)"""
+    if i + 1 >= len(statements):
+        return None
+    store, load = statements[i], statements[i + 1]
+    transfer = TRANSFER_RULES.get((store.instruction, load.instruction))
+    if transfer is None or load.kind != StatementKind.INSTRUCTION or load.label is not None:
+        return None
+    # E/S e ROM podem devolver outro valor na leitura
+    if not same_operand(store, load) or not in_ram(store):
+        return None
+    # No hardware a transferência passa pela ALU (C=0, V=0, Z/N do valor) e o
+    # LDA não altera o PS: só troca se cada flag que muda já tem esse valor
+    # ou é sobrescrito antes de ser lido
+    live = ''.join(flag for flag in 'CVZN' if flag not in TRANSFER_FLAGS
+                   or flags[flag] is not TRANSFER_FLAGS[flag])
+    if not flags_dead(statements, i + 2, live):
+        return None
+    return 2, [store, implied(load, None, transfer)]
+
+
+def redundant_carry(statements: List[Statement], i: int, flags: Flags,
+                    in_ram: Callable[[Statement], bool]) -> Optional[Tuple[int, List[Statement]]]:
+    """CLC com carry já limpo (ou SEC com carry já setado) é removido"""
+    statement = statements[i]
+    carry = flags['C']
+    if (statement.instruction == 'CLC' and carry is False) or (statement.instruction == 'SEC' and carry is True):
+        return 1, removed(statement)
+    return None
+
+
+def jump_to_next(statements: List[Statement], i: int, flags: Flags,
+                 in_ram: Callable[[Statement], bool]) -> Optional[Tuple[int, List[Statement]]]:
+    """JMP para a instrução seguinte é removido"""
+    jump = statements[i]
+    if jump.instruction != 'JMP' or jump.mode != AddressMode.ABSOLUTE or jump.ref is None:
+        return None
+    # Labels entre o JMP e o próximo byte gerado apontam todos para o mesmo endereço
+    for statement in statements[i + 1:]:
+        if statement.label == jump.ref:
+            return 1, removed(jump)
+        if statement.kind != StatementKind.LABEL:
+            break
+    return None
+
+
+# Tabela de regras: (nome, função)
+# Cada função recebe (statements, índice, estado de C e V, operando em RAM?)
+# e retorna (statements consumidos, substitutos) ou None se não se aplica
+RULES: List[Tuple[str, Callable]] = [
+    ('store/load -> transferência', store_then_load),
+    ('CLC/SEC redundante', redundant_carry),
+    ('JMP para a próxima instrução', jump_to_next),
+]
+
+
+def next_carry(statement: Statement, carry: Optional[bool]) -> Optional[bool]:
+    """Estado conhecido do carry após executar o statement (None = desconhecido)"""
+    if statement.kind != StatementKind.INSTRUCTION:
+        return None
+    instruction = statement.instruction
+    if instruction == 'CLC':
+        return False
+    if instruction == 'SEC':
+        return True
+    if instruction in CARRY_WRITERS or instruction in FLOW_BREAKS:
+        return None
+    return CARRY_FALLTHROUGH.get(instruction, carry)
+
+
+def next_overflow(statement: Statement, overflow: Optional[bool]) -> Optional[bool]:
+    """Estado conhecido do overflow após executar o statement (None = desconhecido)"""
+    if statement.kind != StatementKind.INSTRUCTION:
+        return None
+    instruction = statement.instruction
+    if instruction == 'CLV':
+        return False
+    if instruction in OVERFLOW_WRITERS or instruction in FLOW_BREAKS:
+        return None
+    return OVERFLOW_FALLTHROUGH.get(instruction, overflow)
+
+
+def next_flags(statement: Statement, flags: Flags) -> Flags:
+    """Estado conhecido de C e V após executar o statement"""
+    return {'C': next_carry(statement, flags['C']), 'V': next_overflow(statement, flags['V'])}
+
+
+class OptimizationReport:
+    """Resumo das reescritas aplicadas pelo otimizador"""
+
+    def __init__(self):
+        self.rewrites: List[Tuple[str, int, int, int]] = []  # (regra, linha, bytes, ciclos)
+
+    @property
+    def bytes_saved(self) -> int:
+        return sum(rewrite[2] for rewrite in self.rewrites)
+
+    @property
+    def cycles_saved(self) -> int:
+        return sum(rewrite[3] for rewrite in self.rewrites)
+
+    def print(self) -> None:
+        print(f"\nOtimizações aplicadas: {len(self.rewrites)}")
+        for rule, line_num, size, cycles in self.rewrites:
+            print(f"  Linha {line_num:>5}: {rule:<30} -{size} bytes  -{cycles} ciclos")
+        print(f"  Total: {self.bytes_saved} bytes e {self.cycles_saved} ciclos economizados "
+              f"(uma passagem por instrução)")
+
+
+def ram_checker(memory_map: Optional[MemoryMap],
+                constants: Dict[str, int]) -> Callable[[Statement], bool]:
+    """
+    Predicado "o operando da instrução está em RAM" para o mapa de memória
+    Sem mapa vale a RAM única de 16KB, onde também ficam todos os labels.
+    Com mapa, labels que não são constantes só têm endereço depois do layout
+    e contam como fora da RAM.
+    """
+    def in_ram(statement: Statement) -> bool:
+        address = statement.value
+        if statement.ref is not None:
+            address = constants.get(statement.ref)
+            if address is None:
+                return memory_map is None
+        region = (memory_map or DEFAULT_MEMORY_MAP).region_at(address)
+        return region is not None and region.kind == RAM
+    return in_ram
+
+
+def optimize_pass(statements: List[Statement], report: OptimizationReport,
+                  in_ram: Callable[[Statement], bool]) -> Tuple[List[Statement], bool]:
+    """Aplica a tabela de regras uma vez sobre toda a lista"""
+    result: List[Statement] = []
+    changed = False
+    flags = UNKNOWN_FLAGS
+    i = 0
+
+    while i < len(statements):
+        statement = statements[i]
+        if statement.label is not None:
+            flags = UNKNOWN_FLAGS
+        if statement.kind == StatementKind.INSTRUCTION:
+            for name, rule in RULES:
+                match = rule(statements, i, flags, in_ram)
+                if match is None:
+                    continue
+                consumed, replacement = match
+                original = statements[i:i + consumed]
+                size = sum(st.size for st in original) - sum(st.size for st in replacement)
+                cycles = (sum(statement_cycles(st) for st in original)
+                          - sum(statement_cycles(st) for st in replacement))
+                report.rewrites.append((name, statement.line_num, size, cycles))
+                for st in replacement:
+                    if st.label is not None:
+                        flags = UNKNOWN_FLAGS
+                    flags = next_flags(st, flags)
+                result.extend(replacement)
+                i += consumed
+                changed = True
+                break
+            else:
+                flags = next_flags(statement, flags)
+                result.append(statement)
+                i += 1
+        else:
+            flags = UNKNOWN_FLAGS
+            result.append(statement)
+            i += 1
+
+    return result, changed
+
+
+def optimize(statements: List[Statement], report: Optional[OptimizationReport] = None,
+             memory_map: Optional[MemoryMap] = None,
+             constants: Optional[Dict[str, int]] = None) -> List[Statement]:
+    """
+    Aplica as regras até nenhuma reescrita ser possível
+    `memory_map` e `constants` (.EQU) dizem quais operandos estão em RAM.
+    """
+    if report is None:
+        report = OptimizationReport()
+    in_ram = ram_checker(memory_map, constants or {})
+    changed = True
+    while changed:
+        statements, changed = optimize_pass(statements, report, in_ram)
+    return statements
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Pré-processador do Mini Assembler 6502: .INCLUDE, macros e .REPT
+
+Roda dentro de Assembler6502.parse quando o fonte usa alguma dessas
+diretivas (sem elas o parser segue linha a linha como antes):
+
+    .INCLUDE "comum.inc"        ; caminho relativo ao arquivo que inclui
+
+    .MACRO ESPERA N             ; parâmetros usados no corpo como \\N
+            LDX #\\N
+    L\\@:    DEX                 ; \\@: sufixo único de cada expansão
+            BNE L\\@
+    .ENDM
+            ESPERA $10
+
+    .REPT 8, I                  ; corpo repetido; \\I vale 0, 1, ..., 7
+            .BYTE 1 << \\I
+    .ENDR
+
+As linhas geradas por uma macro ficam com o número da linha da chamada.
+Os arquivos incluídos ficam em um cache do processo (INCLUDE_CACHE),
+indexado por caminho, mtime e tamanho: cada arquivo é lido uma vez, e as
+linhas de instrução, label e .ORG são analisadas uma única vez e copiadas
+nas inclusões seguintes (inclusive em outras montagens do mesmo processo,
+como no modo watch).
+"""
+
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from assembler import Assembler6502, OPCODES, Statement
+from expressions import RE_NAME, evaluate, split_arguments
+
+# Limite de expansões aninhadas (macro chamando macro, .REPT dentro de macro...)
+MAX_EXPANSION_DEPTH = 64
+
+# Diretivas tratadas aqui (e não pelo parse_line)
+DIRECTIVES = {'.INCLUDE', '.MACRO', '.ENDM', '.REPT', '.ENDR'}
+
+# (texto, número da linha, índice do arquivo em Assembler6502.files)
+SourceLine = Tuple[str, int, int]
+
+RE_PARAMETER = re.compile(r'\\(@|[A-Za-z_][A-Za-z0-9_]*)')
+
+
+class Macro(NamedTuple):
+    name: str
+    params: List[str]
+    body: List[SourceLine]
+
+
+class IncludedFile:
+    """Linhas de um arquivo incluído e os statements já analisados (por linha)"""
+    __slots__ = ('stamp', 'lines', 'templates')
+
+    def __init__(self, stamp: Tuple[int, int], lines: List[str]):
+        self.stamp = stamp
+        self.lines = lines
+        # Linha -> statement (None: linha vazia); só linhas sem dependência de contexto
+        self.templates: Dict[int, Optional[Statement]] = {}
+
+
+class IncludeCache:
+    """Arquivos incluídos já lidos, indexados pelo caminho absoluto"""
+
+    def __init__(self):
+        self.files: Dict[str, IncludedFile] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str) -> IncludedFile:
+        info = os.stat(path)
+        stamp = (info.st_mtime_ns, info.st_size)
+        entry = self.files.get(path)
+        if entry is not None and entry.stamp == stamp:
+            self.hits += 1
+            return entry
+        with open(path, 'r') as f:
+            entry = self.files[path] = IncludedFile(stamp, f.read().split('\n'))
+        self.misses += 1
+        return entry
+
+    def clear(self) -> None:
+        self.files.clear()
+
+
+INCLUDE_CACHE = IncludeCache()
+
+
+def substitute(text: str, values: Dict[str, str]) -> str:
+    """Troca \\NOME pelo valor (parâmetros de macro, \\@ e variável do .REPT)"""
+    return RE_PARAMETER.sub(lambda match: values.get(match.group(1), match.group(0)), text)
+
+
+def split_code(text: str) -> Tuple[Optional[str], str, str]:
+    """(label, primeira palavra, resto) de uma linha sem o comentário"""
+    code = text.split(';', 1)[0]
+    label = None
+    if ':' in code:
+        label, _, code = code.partition(':')
+        label = label.strip()
+    parts = code.split(None, 1)
+    if not parts:
+        return label, '', ''
+    return label, parts[0], parts[1].strip() if len(parts) > 1 else ''
+
+
+class Preprocessor:
+    """Expande .INCLUDE, macros e .REPT e analisa as linhas resultantes"""
+
+    def __init__(self, assembler: Assembler6502, cache: Optional[IncludeCache] = None):
+        self.assembler = assembler
+        self.cache = cache if cache is not None else INCLUDE_CACHE
+        self.macros: Dict[str, Macro] = {}
+        self.expansions = 0
+        self.include_stack: List[str] = []
+        self.statements: List[Statement] = []
+
+    def expand(self, lines: List[str]) -> List[Statement]:
+        """Statements do fonte principal (arquivo 0 de assembler.files)"""
+        self.process([(line, line_num, 0) for line_num, line in enumerate(lines, 1)], 0)
+        return self.statements
+
+    def emit(self, text: str, line_num: int, file_id: int) -> Optional[Statement]:
+        statement = self.assembler.parse_line(text, line_num)
+        if statement is not None:
+            statement.file = file_id
+            self.statements.append(statement)
+        return statement
+
+    def collect(self, lines: List[SourceLine], i: int, opening: str, closing: str) -> Tuple[List[SourceLine], int]:
+        """Corpo até o `closing` correspondente a partir de lines[i]; retorna (corpo, próximo índice)"""
+        depth = 1
+        for j in range(i, len(lines)):
+            word = split_code(lines[j][0])[1].upper()
+            if word == opening:
+                depth += 1
+            elif word == closing:
+                depth -= 1
+                if depth == 0:
+                    return lines[i:j], j + 1
+        _, line_num, file_id = lines[i - 1]
+        raise ValueError(self.where(file_id, f"Linha {line_num}: {opening} sem {closing}"))
+
+    def where(self, file_id: int, message: str) -> str:
+        """Prefixa a mensagem com o arquivo quando não é o fonte principal"""
+        return f"{self.assembler.files[file_id]}: {message}" if file_id else message
+
+    def process(self, lines: List[SourceLine], depth: int,
+                included: Optional[IncludedFile] = None) -> None:
+        if depth > MAX_EXPANSION_DEPTH:
+            raise ValueError(f"Mais de {MAX_EXPANSION_DEPTH} expansões aninhadas (recursão de macro?)")
+        templates = included.templates if included is not None else None
+        i = 0
+        while i < len(lines):
+            text, line_num, file_id = lines[i]
+            i += 1
+            if templates is not None and line_num in templates:
+                template = templates[line_num]
+                if template is not None:
+                    statement = template.copy()
+                    statement.file = file_id
+                    self.statements.append(statement)
+                continue
+
+            label, word, operand = split_code(text)
+            directive = word.upper()
+            try:
+                if directive in DIRECTIVES or directive in self.macros:
+                    if label:
+                        self.emit(label + ':', line_num, file_id)
+                    if directive == '.INCLUDE':
+                        self.include(operand, line_num, file_id, depth)
+                    elif directive == '.MACRO':
+                        body, i = self.collect(lines, i, '.MACRO', '.ENDM')
+                        self.define(operand, body, line_num)
+                    elif directive == '.REPT':
+                        body, i = self.collect(lines, i, '.REPT', '.ENDR')
+                        self.repeat(operand, body, line_num, depth)
+                    elif directive in ('.ENDM', '.ENDR'):
+                        raise ValueError(f"Linha {line_num}: {directive} sem abertura")
+                    else:
+                        self.call(self.macros[directive], operand, line_num, file_id, depth)
+                    continue
+                statement = self.emit(text, line_num, file_id)
+            except ValueError as e:
+                if file_id and not str(e).startswith(tuple(self.assembler.files[1:])):
+                    # Erro ainda sem arquivo: prefixa com o incluído em que ocorreu
+                    raise ValueError(self.where(file_id, str(e))) from None
+                raise
+            if templates is not None and self.context_free(directive, operand):
+                templates[line_num] = statement.copy() if statement is not None else None
+
+    def context_free(self, directive: str, operand: str) -> bool:
+        """Linha cujo statement não depende de constantes nem de macros (pode ir para o cache)"""
+        if directive in OPCODES:
+            # Imediato com constante (#NOME) depende do .EQU
+            return not (operand.startswith('#') and RE_NAME.match(operand[1:].strip()))
+        return directive == '.ORG' or not directive
+
+    def include(self, operand: str, line_num: int, file_id: int, depth: int) -> None:
+        name = operand.strip().strip('"\'')
+        if not name:
+            raise ValueError(f"Linha {line_num}: .INCLUDE sem arquivo")
+        files = self.assembler.files
+        base = os.path.dirname(files[file_id]) if os.path.isfile(files[file_id]) else ''
+        path = os.path.abspath(os.path.join(base, name))
+        if path in self.include_stack:
+            raise ValueError(f"Linha {line_num}: inclusão circular de '{name}'")
+        try:
+            included = self.cache.get(path)
+        except FileNotFoundError:
+            raise ValueError(f"Linha {line_num}: arquivo incluído '{name}' não encontrado") from None
+        if path not in files:
+            files.append(path)
+        included_id = files.index(path)
+        self.include_stack.append(path)
+        try:
+            self.process([(line, number, included_id) for number, line in enumerate(included.lines, 1)],
+                         depth + 1, included)
+        finally:
+            self.include_stack.pop()
+
+    def define(self, operand: str, body: List[SourceLine], line_num: int) -> None:
+        parts = operand.split(None, 1)
+        if not parts:
+            raise ValueError(f"Linha {line_num}: .MACRO sem nome")
+        name = parts[0].upper()
+        if name in OPCODES or name.startswith('.'):
+            raise ValueError(f"Linha {line_num}: macro '{parts[0]}' tem nome de instrução ou diretiva")
+        params = split_arguments(parts[1]) if len(parts) > 1 else []
+        if not all(RE_NAME.match(param) for param in params):
+            raise ValueError(f"Linha {line_num}: parâmetros inválidos em .MACRO {parts[0]}")
+        self.macros[name] = Macro(name, params, body)
+
+    def call(self, macro: Macro, operand: str, line_num: int, file_id: int, depth: int) -> None:
+        args = split_arguments(operand) if operand else []
+        if len(args) != len(macro.params):
+            raise ValueError(f"Linha {line_num}: macro {macro.name} espera {len(macro.params)} "
+                             f"argumento(s), recebeu {len(args)}")
+        self.expansions += 1
+        values = dict(zip(macro.params, args))
+        values['@'] = f'_{self.expansions}'
+        body = [(substitute(text, values), line_num, file_id) for text, _, _ in macro.body]
+        try:
+            self.process(body, depth + 1)
+        except ValueError as e:
+            if '(expansão de ' in str(e):
+                raise
+            raise ValueError(f"{e} (expansão de {macro.name})") from None
+
+    def repeat(self, operand: str, body: List[SourceLine], line_num: int, depth: int) -> None:
+        args = split_arguments(operand) if operand else []
+        if not 1 <= len(args) <= 2:
+            raise ValueError(f"Linha {line_num}: uso: .REPT quantidade[, variável]")
+        variable = args[1] if len(args) == 2 else None
+        if variable is not None and not RE_NAME.match(variable):
+            raise ValueError(f"Linha {line_num}: variável inválida em .REPT: '{variable}'")
+        try:
+            count = evaluate(args[0], self.assembler.constants)
+        except ValueError as e:
+            raise ValueError(f"Linha {line_num}: {e}") from None
+        for index in range(count):
+            if variable is None:
+                lines = body
+            else:
+                values = {variable: str(index)}
+                lines = [(substitute(text, values), number, file_id) for text, number, file_id in body]
+            self.process(lines, depth + 1)
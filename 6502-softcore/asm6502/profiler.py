@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Profiler do simulador 6502
+
+Conta instruções e ciclos da FSM (timing.CYCLES) por PC e por label,
+usando o dicionário `labels` do assembler como tabela de símbolos: cada PC
+pertence ao último label definido antes dele. A pilha de chamadas é
+reconstruída a partir de JSR/RTS e exportada no formato "folded stacks"
+(uma linha 'RAIZ;FUNC;SUBFUNC ciclos'), aceito por flamegraph.pl e
+speedscope.
+
+Dois modos:
+
+- exato: laço próprio que conta cada instrução executada;
+- amostragem: o simulador roda em trechos de `interval` instruções no
+  laço normal e só o PC ao fim de cada trecho é registrado, com peso igual
+  ao trecho. O tamanho dos trechos varia em torno de `interval` para não
+  entrar em fase com laços de período fixo. Apenas JSR/RTS ganham handlers instrumentados para manter a
+  pilha de chamadas, então o custo fica baixo em execuções longas.
+
+Durante o profiling a tradução de blocos não é usada (JSR/RTS precisam
+passar pelos handlers).
+"""
+
+import argparse
+import random
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import timing
+from assembler import Assembler6502
+from layout import save_profile
+from simulator import (Halt, Simulator6502, STATUS_FAST_FORWARD, STATUS_LIMIT,
+                       STATUS_RUNNING, _OPCODE_TABLE)
+from sourcemap import SymbolIndex
+
+JSR_OPCODE = 0x20
+RTS_OPCODE = 0x60
+
+# Limite de profundidade da pilha reconstruída (recursão sem RTS)
+MAX_STACK_DEPTH = 256
+
+
+class Profiler:
+    """Coleta o perfil de execução de um Simulator6502"""
+
+    def __init__(self, simulator: Simulator6502, labels: Optional[Dict[str, int]] = None,
+                 interval: Optional[int] = None):
+        self.simulator = simulator
+        self.labels = labels or {}
+        self.symbols = SymbolIndex(labels)
+        self.interval = interval   # None: modo exato
+        size = len(simulator.memory)
+        self.counts = [0] * size   # Instruções por PC
+        self.cycles = [0] * size   # Ciclos da FSM por PC
+        self.folded: Dict[Tuple[int, ...], int] = {}
+        self.stack: List[int] = [simulator.pc]
+        self.total_instructions = 0
+        self.total_cycles = 0
+        self.samples = 0
+        # Sorteio do tamanho dos trechos da amostragem (reprodutível)
+        self.random = random.Random(0)
+
+    @property
+    def exact(self) -> bool:
+        return self.interval is None
+
+    def call(self, target: int) -> None:
+        if len(self.stack) < MAX_STACK_DEPTH:
+            self.stack.append(target)
+
+    def ret(self) -> None:
+        if len(self.stack) > 1:
+            self.stack.pop()
+
+    def run(self, max_steps: Optional[int] = None) -> str:
+        """Executa o simulador coletando o perfil; retorna o estado de parada"""
+        simulator = self.simulator
+        limit = max_steps if max_steps is not None else sys.maxsize
+        translate = simulator.translate
+        simulator.translate = False
+        try:
+            if self.exact:
+                return self.run_exact(limit)
+            return self.run_sampled(limit)
+        finally:
+            simulator.translate = translate
+
+    def run_exact(self, limit: int) -> str:
+        """Conta cada instrução; a pilha muda nos próprios JSR/RTS do laço"""
+        simulator = self.simulator
+        memory = simulator.memory
+        handlers = simulator.handlers
+        counts = self.counts
+        cycles = self.cycles
+        folded = self.folded
+        cycle_table = timing.CYCLES
+        key = tuple(self.stack)
+        spent = 0       # Ciclos na pilha atual ainda não somados em `folded`
+        total = 0
+        forwarded = 0   # Ciclos que fast_forward já somou no simulador
+        executed = 0
+        status = STATUS_LIMIT
+        simulator.status = STATUS_RUNNING
+        while True:
+            try:
+                for executed in range(executed, limit):
+                    pc = simulator.pc
+                    opcode = memory[pc]
+                    handlers[opcode]()
+                    c = cycle_table[opcode]
+                    counts[pc] += 1
+                    cycles[pc] += c
+                    spent += c
+                    if opcode == JSR_OPCODE or opcode == RTS_OPCODE:
+                        folded[key] = folded.get(key, 0) + spent
+                        total += spent
+                        spent = 0
+                        if opcode == JSR_OPCODE:
+                            self.call(simulator.pc)
+                        else:
+                            self.ret()
+                        key = tuple(self.stack)
+                executed = limit
+                status = STATUS_LIMIT
+                break
+            except Halt as halt:
+                status = halt.status
+                if status != STATUS_FAST_FORWARD:
+                    break
+                # Laço contador avançado de uma vez: metade no contador, metade no BNE
+                pc = simulator.pc
+                opcode = memory[pc]
+                count = simulator.fast_forward(limit - executed)
+                branch = (pc + _OPCODE_TABLE[opcode][2]) & simulator.address_mask
+                counter_count, branch_count = (count + 1) // 2, count // 2
+                counts[pc] += counter_count
+                counts[branch] += branch_count
+                counter_cycles = counter_count * cycle_table[opcode]
+                branch_cycles = branch_count * cycle_table[memory[branch]]
+                cycles[pc] += counter_cycles
+                cycles[branch] += branch_cycles
+                spent += counter_cycles + branch_cycles
+                forwarded += counter_cycles + branch_cycles
+                executed += count
+        folded[key] = folded.get(key, 0) + spent
+        total += spent
+
+        self.total_instructions += executed
+        self.total_cycles += total
+        simulator.steps += executed
+        if simulator.timing_mode:
+            simulator.cycles += total - forwarded
+        simulator.status = status
+        return status
+
+    def run_sampled(self, limit: int) -> str:
+        """Roda em trechos de `interval` instruções e registra o PC ao fim de cada um"""
+        simulator = self.simulator
+        memory = simulator.memory
+        cycle_table = timing.CYCLES
+        self.instrument()
+        try:
+            status = STATUS_LIMIT
+            executed = 0
+            while executed < limit:
+                before_steps = simulator.steps
+                before_cycles = simulator.cycles
+                interval = self.random.randint((self.interval + 1) // 2, self.interval * 3 // 2)
+                status = simulator.run(min(interval, limit - executed))
+                count = simulator.steps - before_steps
+                executed += count
+                if not count:
+                    break
+                pc = simulator.pc
+                if simulator.timing_mode:
+                    spent = simulator.cycles - before_cycles
+                else:
+                    spent = count * cycle_table[memory[pc]]
+                self.counts[pc] += count
+                self.cycles[pc] += spent
+                key = tuple(self.stack)
+                self.folded[key] = self.folded.get(key, 0) + spent
+                self.total_instructions += count
+                self.total_cycles += spent
+                self.samples += 1
+                if status != STATUS_LIMIT:
+                    break
+        finally:
+            simulator.build_handlers()
+        return status
+
+    def instrument(self) -> None:
+        """Troca os handlers de JSR e RTS por versões que mantêm a pilha"""
+        simulator = self.simulator
+        handlers = simulator.handlers
+        jsr, rts = handlers[JSR_OPCODE], handlers[RTS_OPCODE]
+
+        def profiled_jsr() -> None:
+            jsr()
+            self.call(simulator.pc)
+
+        def profiled_rts() -> None:
+            rts()
+            self.ret()
+
+        handlers[JSR_OPCODE] = profiled_jsr
+        handlers[RTS_OPCODE] = profiled_rts
+
+    def by_label(self) -> List[Tuple[str, int, int]]:
+        """(label, instruções, ciclos) somados por label, do mais caro ao mais barato"""
+        totals: Dict[str, List[int]] = {}
+        for pc, count in enumerate(self.counts):
+            if count:
+                entry = totals.setdefault(self.symbols.owner(pc), [0, 0])
+                entry[0] += count
+                entry[1] += self.cycles[pc]
+        return sorted(((label, count, cycles) for label, (count, cycles) in totals.items()),
+                      key=lambda item: -item[2])
+
+    def label_hits(self) -> Dict[str, int]:
+        """Execuções da instrução de cada label (perfil do layout, layout.py)"""
+        counts = self.counts
+        return {label: counts[address] for label, address in self.labels.items()
+                if 0 <= address < len(counts) and counts[address]}
+
+    def hot_spots(self, top: int = 20) -> List[Tuple[int, int, int]]:
+        """Os `top` PCs com mais ciclos: (PC, instruções, ciclos)"""
+        used = [(pc, count, self.cycles[pc]) for pc, count in enumerate(self.counts) if count]
+        used.sort(key=lambda item: -item[2])
+        return used[:top]
+
+    def folded_lines(self) -> List[str]:
+        """Pilhas no formato folded, com os frames nomeados pelos labels"""
+        lines = []
+        for key, cycles in sorted(self.folded.items()):
+            if cycles:
+                frames = ';'.join(self.symbols.owner(address) for address in key)
+                lines.append(f"{frames} {cycles}")
+        return lines
+
+    def write_folded(self, filename: str) -> None:
+        with open(filename, 'w') as f:
+            for line in self.folded_lines():
+                f.write(line + '\n')
+
+    def print_report(self, top: int = 20) -> None:
+        """Imprime as tabelas de hot spots por PC e por label"""
+        memory = self.simulator.memory
+        total = self.total_cycles or 1
+        mode = 'exato' if self.exact else f'amostragem a cada {self.interval} instruções ({self.samples} amostras)'
+        print(f"Perfil ({mode}): {self.total_instructions} instruções, {self.total_cycles} ciclos")
+
+        print(f"\n{'PC':<6} {'Local':<24} {'Instrução':<10} {'Execuções':>10} {'Ciclos':>12} {'%':>6}")
+        print("-" * 72)
+        for pc, count, cycles in self.hot_spots(top):
+            entry = _OPCODE_TABLE.get(memory[pc])
+            mnemonic = entry[0] if entry else '???'
+            print(f"${pc:04X}  {self.symbols.describe(pc):<24} {mnemonic:<10} {count:>10} "
+                  f"{cycles:>12} {cycles * 100 / total:>5.1f}%")
+
+        print(f"\n{'Label':<30} {'Instruções':>12} {'Ciclos':>12} {'%':>6}")
+        print("-" * 64)
+        for label, count, cycles in self.by_label()[:top]:
+            print(f"{label:<30} {count:>12} {cycles:>12} {cycles * 100 / total:>5.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profiler do simulador 6502")
+    parser.add_argument('program', help="arquivo .asm (os labels viram a tabela de símbolos)")
+    parser.add_argument('-n', '--max-steps', type=int, default=1_000_000,
+                        help="limite de instruções executadas (padrão: 1000000)")
+    parser.add_argument('-s', '--sample', type=int, metavar='N', default=None,
+                        help="modo de amostragem: uma amostra a cada N instruções (padrão: exato)")
+    parser.add_argument('--top', type=int, default=20, help="linhas das tabelas de hot spots")
+    parser.add_argument('--folded', metavar='ARQUIVO', help="grava as pilhas no formato folded (flame graph)")
+    parser.add_argument('--save-profile', metavar='ARQUIVO',
+                        help="grava as execuções por label em JSON (entrada do assembler.py --profile)")
+    parser.add_argument('-t', '--timing', action='store_true',
+                        help="mantém a contagem de ciclos do simulador")
+    parser.add_argument('--idle', action='store_true',
+                        help="para em laços ociosos e avança laços contador/BNE")
+    args = parser.parse_args()
+
+    try:
+        assembler = Assembler6502()
+        assembler.assemble_file(args.program)
+        simulator = Simulator6502.from_assembler(assembler, timing_mode=args.timing,
+                                                 detect_idle=args.idle)
+        profiler = Profiler(simulator, assembler.labels, args.sample)
+        status = profiler.run(args.max_steps)
+
+        print(f"Estado: {status} após {simulator.steps} instruções")
+        profiler.print_report(args.top)
+        if args.folded:
+            profiler.write_folded(args.folded)
+            print(f"\nPilhas gravadas em: {args.folded}")
+        if args.save_profile:
+            save_profile(profiler.label_hits(), args.save_profile)
+            print(f"Perfil por label gravado em: {args.save_profile}")
+
+    except FileNotFoundError:
+        print(f"Erro: Arquivo '{args.program}' não encontrado.")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
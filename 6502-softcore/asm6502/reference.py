@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Modelo de referência de um 6502 NMOS comum
+
+Usado pelo fuzzer diferencial (fuzzer.py) como oráculo: é escrito a partir
+da documentação do 6502 e não compartilha tabelas nem templates com o
+assembler ou com o simulador, então um erro em OPCODES ou em simulator.py
+aparece como divergência em vez de ser copiado para os dois lados.
+
+Diferenças de propósito em relação ao softcore:
+
+- PS no layout do 6502 (N V - B D I Z C); PHP empilha B e o bit 5 em 1;
+- ADC/SBC em modo decimal (D) fazem aritmética BCD, com N/V/Z do
+  resultado binário, como no NMOS;
+- JMP ($xxFF) lê o byte alto de $xx00 (bug de página do NMOS).
+
+Para servir de referência no mesmo ambiente do softcore, a memória tem o
+tamanho da imagem (espelhada pelos bits baixos do endereço), o estado
+inicial é o do reset do softcore (A=X=Y=0, SP=$FF, PS=0) e BRK encerra a
+execução. Opcodes fora dos 151 oficiais também encerram (estado
+STATUS_ILLEGAL).
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Flags no layout do 6502
+C = 0x01
+Z = 0x02
+I = 0x04
+D = 0x08
+B = 0x10
+U = 0x20   # Bit 5: sempre 1 quando empilhado
+V = 0x40
+N = 0x80
+
+STATUS_RUNNING = 'running'
+STATUS_BRK = 'brk'
+STATUS_ILLEGAL = 'illegal'
+STATUS_LIMIT = 'limit'
+
+# Opcodes oficiais por instrução, na ordem dos modos de cada grupo
+ALU_MODES = ('imm', 'zp', 'zpx', 'abs', 'abx', 'aby', 'izx', 'izy')
+SHIFT_MODES = ('acc', 'zp', 'zpx', 'abs', 'abx')
+
+_GROUPS: List[Tuple[str, Tuple[str, ...], Tuple[int, ...]]] = [
+    ('ORA', ALU_MODES, (0x09, 0x05, 0x15, 0x0D, 0x1D, 0x19, 0x01, 0x11)),
+    ('AND', ALU_MODES, (0x29, 0x25, 0x35, 0x2D, 0x3D, 0x39, 0x21, 0x31)),
+    ('EOR', ALU_MODES, (0x49, 0x45, 0x55, 0x4D, 0x5D, 0x59, 0x41, 0x51)),
+    ('ADC', ALU_MODES, (0x69, 0x65, 0x75, 0x6D, 0x7D, 0x79, 0x61, 0x71)),
+    ('LDA', ALU_MODES, (0xA9, 0xA5, 0xB5, 0xAD, 0xBD, 0xB9, 0xA1, 0xB1)),
+    ('CMP', ALU_MODES, (0xC9, 0xC5, 0xD5, 0xCD, 0xDD, 0xD9, 0xC1, 0xD1)),
+    ('SBC', ALU_MODES, (0xE9, 0xE5, 0xF5, 0xED, 0xFD, 0xF9, 0xE1, 0xF1)),
+    ('STA', ALU_MODES[1:], (0x85, 0x95, 0x8D, 0x9D, 0x99, 0x81, 0x91)),
+    ('ASL', SHIFT_MODES, (0x0A, 0x06, 0x16, 0x0E, 0x1E)),
+    ('ROL', SHIFT_MODES, (0x2A, 0x26, 0x36, 0x2E, 0x3E)),
+    ('LSR', SHIFT_MODES, (0x4A, 0x46, 0x56, 0x4E, 0x5E)),
+    ('ROR', SHIFT_MODES, (0x6A, 0x66, 0x76, 0x6E, 0x7E)),
+    ('INC', SHIFT_MODES[1:], (0xE6, 0xF6, 0xEE, 0xFE)),
+    ('DEC', SHIFT_MODES[1:], (0xC6, 0xD6, 0xCE, 0xDE)),
+    ('LDX', ('imm', 'zp', 'zpy', 'abs', 'aby'), (0xA2, 0xA6, 0xB6, 0xAE, 0xBE)),
+    ('LDY', ('imm', 'zp', 'zpx', 'abs', 'abx'), (0xA0, 0xA4, 0xB4, 0xAC, 0xBC)),
+    ('STX', ('zp', 'zpy', 'abs'), (0x86, 0x96, 0x8E)),
+    ('STY', ('zp', 'zpx', 'abs'), (0x84, 0x94, 0x8C)),
+    ('CPX', ('imm', 'zp', 'abs'), (0xE0, 0xE4, 0xEC)),
+    ('CPY', ('imm', 'zp', 'abs'), (0xC0, 0xC4, 0xCC)),
+    ('BIT', ('zp', 'abs'), (0x24, 0x2C)),
+    ('JMP', ('abs', 'ind'), (0x4C, 0x6C)),
+    ('JSR', ('abs',), (0x20,)),
+]
+
+_SINGLE: Dict[str, int] = {
+    'BPL': 0x10, 'BMI': 0x30, 'BVC': 0x50, 'BVS': 0x70,
+    'BCC': 0x90, 'BCS': 0xB0, 'BNE': 0xD0, 'BEQ': 0xF0,
+    'BRK': 0x00, 'RTI': 0x40, 'RTS': 0x60, 'PHP': 0x08, 'PLP': 0x28,
+    'PHA': 0x48, 'PLA': 0x68, 'CLC': 0x18, 'SEC': 0x38, 'CLI': 0x58,
+    'SEI': 0x78, 'CLV': 0xB8, 'CLD': 0xD8, 'SED': 0xF8, 'DEY': 0x88,
+    'TXA': 0x8A, 'TYA': 0x98, 'TXS': 0x9A, 'TAY': 0xA8, 'TAX': 0xAA,
+    'TSX': 0xBA, 'INY': 0xC8, 'DEX': 0xCA, 'INX': 0xE8, 'NOP': 0xEA,
+}
+
+BRANCHES = {'BPL': (N, False), 'BMI': (N, True), 'BVC': (V, False), 'BVS': (V, True),
+            'BCC': (C, False), 'BCS': (C, True), 'BNE': (Z, False), 'BEQ': (Z, True)}
+
+# Tamanho em bytes de cada modo
+MODE_SIZES = {'imp': 1, 'acc': 1, 'imm': 2, 'zp': 2, 'zpx': 2, 'zpy': 2, 'rel': 2,
+              'izx': 2, 'izy': 2, 'abs': 3, 'abx': 3, 'aby': 3, 'ind': 3}
+
+
+def decode_table() -> Dict[int, Tuple[str, str]]:
+    """Opcode -> (instrução, modo) dos 151 opcodes oficiais"""
+    table: Dict[int, Tuple[str, str]] = {}
+    for mnemonic, modes, opcodes in _GROUPS:
+        for mode, opcode in zip(modes, opcodes):
+            table[opcode] = (mnemonic, mode)
+    for mnemonic, opcode in _SINGLE.items():
+        table[opcode] = (mnemonic, 'rel' if mnemonic in BRANCHES else 'imp')
+    return table
+
+
+DECODE = decode_table()
+
+
+class Reference6502:
+    """6502 NMOS executado instrução a instrução"""
+
+    def __init__(self, memory: bytes, start: int):
+        self.memory = bytearray(memory)
+        size = len(self.memory)
+        if size & (size - 1):
+            raise ValueError(f"Tamanho de memória {size} não é potência de 2")
+        self.mask = size - 1
+        self.a = self.x = self.y = 0
+        self.sp = 0xFF
+        self.p = 0
+        self.pc = start & self.mask
+        self.steps = 0
+        self.status = STATUS_RUNNING
+        # Opcode -> (operação, modo, tamanho); None para BRK e opcodes não oficiais
+        self.table: List[Optional[Tuple[Callable[[str, Optional[int]], None], str, int]]] = [None] * 256
+        for opcode, (mnemonic, mode) in DECODE.items():
+            if mnemonic != 'BRK':
+                self.table[opcode] = (getattr(self, 'op_' + mnemonic), mode, MODE_SIZES[mode])
+
+    # Memória e pilha
+
+    def read(self, address: int) -> int:
+        return self.memory[address & self.mask]
+
+    def write(self, address: int, value: int) -> None:
+        self.memory[address & self.mask] = value & 0xFF
+
+    def word(self, address: int) -> int:
+        return self.read(address) | (self.read(address + 1) << 8)
+
+    def push(self, value: int) -> None:
+        self.write(0x100 | self.sp, value)
+        self.sp = (self.sp - 1) & 0xFF
+
+    def pull(self) -> int:
+        self.sp = (self.sp + 1) & 0xFF
+        return self.read(0x100 | self.sp)
+
+    def set_nz(self, value: int) -> int:
+        self.p = (self.p & ~(N | Z)) | (value & N) | (0 if value else Z)
+        return value
+
+    def flag(self, mask: int, condition) -> None:
+        self.p = (self.p | mask) if condition else (self.p & ~mask)
+
+    # Endereçamento
+
+    def effective_address(self, mode: str) -> Optional[int]:
+        pc = self.pc
+        if mode in ('imp', 'acc'):
+            return None
+        if mode == 'imm':
+            return (pc + 1) & self.mask
+        operand = self.read(pc + 1)
+        if mode == 'zp':
+            return operand
+        if mode == 'zpx':
+            return (operand + self.x) & 0xFF
+        if mode == 'zpy':
+            return (operand + self.y) & 0xFF
+        if mode == 'izx':
+            pointer = (operand + self.x) & 0xFF
+            return self.read(pointer) | (self.read((pointer + 1) & 0xFF) << 8)
+        if mode == 'izy':
+            base = self.read(operand) | (self.read((operand + 1) & 0xFF) << 8)
+            return (base + self.y) & 0xFFFF
+        if mode == 'rel':
+            offset = operand - 0x100 if operand & 0x80 else operand
+            return (pc + 2 + offset) & 0xFFFF
+        absolute = operand | (self.read(pc + 2) << 8)
+        if mode == 'abs':
+            return absolute
+        if mode == 'abx':
+            return (absolute + self.x) & 0xFFFF
+        if mode == 'aby':
+            return (absolute + self.y) & 0xFFFF
+        # 'ind': o byte alto não cruza a página (bug do NMOS)
+        high = (absolute & 0xFF00) | ((absolute + 1) & 0xFF)
+        return self.read(absolute) | (self.read(high) << 8)
+
+    # Execução
+
+    def step(self) -> str:
+        """Executa uma instrução; retorna o estado (STATUS_RUNNING enquanto continua)"""
+        entry = self.table[self.memory[self.pc]]
+        if entry is None:
+            self.status = STATUS_BRK if self.memory[self.pc] == _SINGLE['BRK'] else STATUS_ILLEGAL
+            return self.status
+        operation, mode, size = entry
+        address = self.effective_address(mode)
+        self.pc = (self.pc + size) & self.mask
+        operation(mode, address)
+        self.pc &= self.mask
+        self.steps += 1
+        return self.status
+
+    def run(self, max_steps: int) -> str:
+        for _ in range(max_steps):
+            if self.step() != STATUS_RUNNING:
+                return self.status
+        self.status = STATUS_LIMIT
+        return self.status
+
+    # Operações: (modo, endereço efetivo); o PC já aponta para a próxima instrução
+
+    def op_LDA(self, mode, address):
+        self.a = self.set_nz(self.read(address))
+
+    def op_LDX(self, mode, address):
+        self.x = self.set_nz(self.read(address))
+
+    def op_LDY(self, mode, address):
+        self.y = self.set_nz(self.read(address))
+
+    def op_STA(self, mode, address):
+        self.write(address, self.a)
+
+    def op_STX(self, mode, address):
+        self.write(address, self.x)
+
+    def op_STY(self, mode, address):
+        self.write(address, self.y)
+
+    def op_ORA(self, mode, address):
+        self.a = self.set_nz(self.a | self.read(address))
+
+    def op_AND(self, mode, address):
+        self.a = self.set_nz(self.a & self.read(address))
+
+    def op_EOR(self, mode, address):
+        self.a = self.set_nz(self.a ^ self.read(address))
+
+    def op_ADC(self, mode, address):
+        value = self.read(address)
+        carry = self.p & C
+        total = self.a + value + carry
+        result = total & 0xFF
+        overflow = ~(self.a ^ value) & (self.a ^ result) & 0x80
+        if self.p & D:
+            # BCD do NMOS: Z do resultado binário; N e V do nibble alto antes do ajuste
+            low = (self.a & 0x0F) + (value & 0x0F) + carry
+            if low > 9:
+                low += 6
+            high = (self.a >> 4) + (value >> 4) + (1 if low > 0x0F else 0)
+            self.flag(Z, result == 0)
+            self.flag(N, high & 0x08)
+            self.flag(V, ~(self.a ^ value) & (self.a ^ (high << 4)) & 0x80)
+            if high > 9:
+                high += 6
+            self.flag(C, high > 0x0F)
+            self.a = ((high << 4) | (low & 0x0F)) & 0xFF
+            return
+        self.flag(C, total > 0xFF)
+        self.flag(V, overflow)
+        self.a = self.set_nz(result)
+
+    def op_SBC(self, mode, address):
+        value = self.read(address)
+        borrow = 0 if self.p & C else 1
+        total = self.a - value - borrow
+        result = total & 0xFF
+        self.flag(V, (self.a ^ value) & (self.a ^ result) & 0x80)
+        self.flag(C, total >= 0)
+        self.set_nz(result)
+        if self.p & D:
+            # BCD do NMOS: flags do resultado binário
+            low = (self.a & 0x0F) - (value & 0x0F) - borrow
+            high = (self.a >> 4) - (value >> 4)
+            if low & 0x10:
+                low -= 6
+                high -= 1
+            if high & 0x10:
+                high -= 6
+            result = ((high << 4) | (low & 0x0F)) & 0xFF
+        self.a = result
+
+    def compare(self, register: int, address: int) -> None:
+        total = register - self.read(address)
+        self.flag(C, total >= 0)
+        self.set_nz(total & 0xFF)
+
+    def op_CMP(self, mode, address):
+        self.compare(self.a, address)
+
+    def op_CPX(self, mode, address):
+        self.compare(self.x, address)
+
+    def op_CPY(self, mode, address):
+        self.compare(self.y, address)
+
+    def op_BIT(self, mode, address):
+        value = self.read(address)
+        self.flag(Z, not self.a & value)
+        self.flag(N, value & N)
+        self.flag(V, value & V)
+
+    def modify(self, mode: str, address: Optional[int], function: Callable[[int], int]) -> None:
+        """Leitura-modificação-escrita no acumulador ou na memória"""
+        if mode == 'acc':
+            self.a = self.set_nz(function(self.a))
+        else:
+            self.write(address, self.set_nz(function(self.read(address))))
+
+    def op_ASL(self, mode, address):
+        def shift(value):
+            self.flag(C, value & 0x80)
+            return (value << 1) & 0xFF
+        self.modify(mode, address, shift)
+
+    def op_LSR(self, mode, address):
+        def shift(value):
+            self.flag(C, value & 0x01)
+            return value >> 1
+        self.modify(mode, address, shift)
+
+    def op_ROL(self, mode, address):
+        def rotate(value):
+            carry = self.p & C
+            self.flag(C, value & 0x80)
+            return ((value << 1) | carry) & 0xFF
+        self.modify(mode, address, rotate)
+
+    def op_ROR(self, mode, address):
+        def rotate(value):
+            carry = self.p & C
+            self.flag(C, value & 0x01)
+            return (value >> 1) | (0x80 if carry else 0)
+        self.modify(mode, address, rotate)
+
+    def op_INC(self, mode, address):
+        self.modify(mode, address, lambda value: (value + 1) & 0xFF)
+
+    def op_DEC(self, mode, address):
+        self.modify(mode, address, lambda value: (value - 1) & 0xFF)
+
+    def op_INX(self, mode, address):
+        self.x = self.set_nz((self.x + 1) & 0xFF)
+
+    def op_DEX(self, mode, address):
+        self.x = self.set_nz((self.x - 1) & 0xFF)
+
+    def op_INY(self, mode, address):
+        self.y = self.set_nz((self.y + 1) & 0xFF)
+
+    def op_DEY(self, mode, address):
+        self.y = self.set_nz((self.y - 1) & 0xFF)
+
+    def op_TAX(self, mode, address):
+        self.x = self.set_nz(self.a)
+
+    def op_TAY(self, mode, address):
+        self.y = self.set_nz(self.a)
+
+    def op_TXA(self, mode, address):
+        self.a = self.set_nz(self.x)
+
+    def op_TYA(self, mode, address):
+        self.a = self.set_nz(self.y)
+
+    def op_TSX(self, mode, address):
+        self.x = self.set_nz(self.sp)
+
+    def op_TXS(self, mode, address):
+        self.sp = self.x
+
+    def op_CLC(self, mode, address):
+        self.p &= ~C
+
+    def op_SEC(self, mode, address):
+        self.p |= C
+
+    def op_CLI(self, mode, address):
+        self.p &= ~I
+
+    def op_SEI(self, mode, address):
+        self.p |= I
+
+    def op_CLD(self, mode, address):
+        self.p &= ~D
+
+    def op_SED(self, mode, address):
+        self.p |= D
+
+    def op_CLV(self, mode, address):
+        self.p &= ~V
+
+    def op_NOP(self, mode, address):
+        pass
+
+    def op_PHA(self, mode, address):
+        self.push(self.a)
+
+    def op_PLA(self, mode, address):
+        self.a = self.set_nz(self.pull())
+
+    def op_PHP(self, mode, address):
+        self.push(self.p | B | U)
+
+    def op_PLP(self, mode, address):
+        self.p = self.pull() & ~(B | U)
+
+    def op_JMP(self, mode, address):
+        self.pc = address
+
+    def op_JSR(self, mode, address):
+        # Empilha o endereço do último byte da instrução
+        back = (self.pc - 1) & 0xFFFF
+        self.push(back >> 8)
+        self.push(back & 0xFF)
+        self.pc = address
+
+    def op_RTS(self, mode, address):
+        low = self.pull()
+        self.pc = ((self.pull() << 8) | low) + 1
+
+    def op_RTI(self, mode, address):
+        self.p = self.pull() & ~(B | U)
+        low = self.pull()
+        self.pc = (self.pull() << 8) | low
+
+    def branch(self, mnemonic: str, address: int) -> None:
+        mask, taken = BRANCHES[mnemonic]
+        if bool(self.p & mask) == taken:
+            self.pc = address
+
+    def op_BPL(self, mode, address):
+        self.branch('BPL', address)
+
+    def op_BMI(self, mode, address):
+        self.branch('BMI', address)
+
+    def op_BVC(self, mode, address):
+        self.branch('BVC', address)
+
+    def op_BVS(self, mode, address):
+        self.branch('BVS', address)
+
+    def op_BCC(self, mode, address):
+        self.branch('BCC', address)
+
+    def op_BCS(self, mode, address):
+        self.branch('BCS', address)
+
+    def op_BNE(self, mode, address):
+        self.branch('BNE', address)
+
+    def op_BEQ(self, mode, address):
+        self.branch('BEQ', address)
@@ -0,0 +1,1020 @@
+#!/usr/bin/env python3
+"""
+Simulador de conjunto de instruções (ISS) para o softcore 6502
+
+Executa a imagem de memória gerada pelo assembler (ou lida de um .mif)
+a partir de START_ADDRESS, com os registradores A, X, Y, PC, SP e PS e o
+layout de flags do README (Z=0, C=1, N=2, V=3).
+
+O despacho usa uma tabela de 256 handlers derivada de OPCODES. Cada
+handler é gerado a partir de templates de modo de endereçamento e de
+operação, e o código resultante é compilado uma única vez.
+
+No modo de tradução, trechos lineares de código (até um branch, JMP, JSR,
+RTS, RTI ou BRK) são traduzidos com os mesmos templates para uma única
+função Python, com operandos como constantes e registradores em
+variáveis locais. Os blocos ficam em cache pelo PC inicial e são
+descartados quando uma escrita atinge um byte traduzido.
+
+Com um trace anexado (attach_trace) a execução é interpretada e cada
+instrução é registrada com os registradores e as escritas na memória
+(formato em tracefile.py).
+
+snapshot() e restore() usam páginas de 256 bytes em copy-on-write
+(snapshot.py): depois do primeiro snapshot as escritas marcam a página
+como suja, e só as páginas sujas são copiadas.
+
+Com um mapa de memória (memorymap.py) a memória tem o tamanho do mapa e
+escritas em ROM ou fora das regiões não alteram a memória: ficam
+registradas em `bus_errors`.
+"""
+
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import memimage
+import timing
+from memorymap import MemoryMap, find_project_map
+from snapshot import PAGE_SHIFT, PAGE_SIZE, Snapshot, split_pages
+from assembler import (AddressMode, Assembler6502, BRANCH_INSTRUCTIONS,
+                       MEMORY_SIZE, OPCODES, START_ADDRESS)
+
+# Flags do registrador PS (layout do README)
+FLAG_Z = 0x01  # Zero
+FLAG_C = 0x02  # Carry
+FLAG_N = 0x04  # Negative
+FLAG_V = 0x08  # Overflow
+FLAG_I = 0x10  # Interrupt disable (sem efeito no softcore)
+FLAG_D = 0x20  # Decimal (sem efeito: o softcore não tem modo BCD)
+
+# Máscara que preserva todos os flags exceto Z e N
+FLAG_KEEP_NZ = 0xFF & ~(FLAG_Z | FLAG_N)
+
+# Flags Z e N para cada resultado de 8 bits
+NZ = [(FLAG_Z if value == 0 else 0) | (FLAG_N if value & 0x80 else 0) for value in range(256)]
+
+# Máximo de instruções por bloco traduzido
+MAX_BLOCK_INSTRUCTIONS = 64
+
+# Estados de parada do simulador
+STATUS_RUNNING = 'running'
+STATUS_BRK = 'brk'        # Instrução BRK executada
+STATUS_LIMIT = 'limit'    # Limite de instruções atingido
+STATUS_IDLE = 'idle'      # Laço ocioso atingido (JMP/branch para si mesmo)
+# Uso interno: laço contador detectado, será avançado de uma vez
+STATUS_FAST_FORWARD = 'fast-forward'
+
+# Contadores reconhecidos em laços "contador / BNE de volta":
+# (instrução, modo) -> (incremento, registrador ou None para memória)
+COUNTER_INSTRUCTIONS: Dict[Tuple[str, str], Tuple[int, Optional[str]]] = {
+    ('DEX', AddressMode.IMPLIED): (-1, 'x'), ('DEY', AddressMode.IMPLIED): (-1, 'y'),
+    ('INX', AddressMode.IMPLIED): (1, 'x'), ('INY', AddressMode.IMPLIED): (1, 'y'),
+    ('DEC', AddressMode.ZERO_PAGE): (-1, None), ('DEC', AddressMode.ABSOLUTE): (-1, None),
+    ('INC', AddressMode.ZERO_PAGE): (1, None), ('INC', AddressMode.ABSOLUTE): (1, None),
+}
+BNE_OPCODE = OPCODES['BNE'][AddressMode.RELATIVE][0]
+
+# Instruções que alteram o PC (encerram um trecho linear de código)
+FLOW_INSTRUCTIONS = BRANCH_INSTRUCTIONS | {'JMP', 'JSR', 'RTS', 'RTI', 'BRK'}
+
+# Endereço efetivo de cada modo de endereçamento
+MODE_ADDRESS: Dict[str, str] = {
+    AddressMode.ZERO_PAGE: '{op8}',
+    AddressMode.ZERO_PAGE_X: '(({op8} + {x}) & 0xFF)',
+    AddressMode.ZERO_PAGE_Y: '(({op8} + {y}) & 0xFF)',
+    AddressMode.ABSOLUTE: '({op16} & {mask})',
+    AddressMode.ABSOLUTE_X: '(({op16} + {x}) & {mask})',
+    AddressMode.ABSOLUTE_Y: '(({op16} + {y}) & {mask})',
+    AddressMode.INDIRECT_X: '((m[({op8} + {x}) & 0xFF] | (m[({op8} + {x} + 1) & 0xFF] << 8)) & {mask})',
+    AddressMode.INDIRECT_Y: '(((m[{op8}] | (m[({op8} + 1) & 0xFF] << 8)) + {y}) & {mask})',
+    AddressMode.INDIRECT: '((m[{op16} & {mask}] | (m[({op16} + 1) & {mask}] << 8)) & {mask})',
+}
+
+# Templates das operações (semântica do 6502 com o layout de flags do README)
+# {val}: valor do operando, {ea}: endereço efetivo, {rmw_load}/{rmw_store}:
+# leitura/escrita do alvo de ASL/LSR/ROL/ROR/INC/DEC (acumulador ou memória)
+OPERATIONS: Dict[str, str] = {
+    'LDA': 'v = {val}\n{a} = v\n{ps} = ({ps} & {nZN}) | NZ[v]',
+    'LDX': 'v = {val}\n{x} = v\n{ps} = ({ps} & {nZN}) | NZ[v]',
+    'LDY': 'v = {val}\n{y} = v\n{ps} = ({ps} & {nZN}) | NZ[v]',
+    'STA': '{write}({ea}, {a})',
+    'STX': '{write}({ea}, {x})',
+    'STY': '{write}({ea}, {y})',
+    'ADC': ('v = {val}\n'
+            't = {a} + v + (1 if {ps} & {C} else 0)\n'
+            'r = t & 0xFF\n'
+            '{ps} = ({ps} & {nZCNV}) | NZ[r] | ({C} if t > 0xFF else 0)'
+            ' | ({V} if ~({a} ^ v) & ({a} ^ r) & 0x80 else 0)\n'
+            '{a} = r'),
+    'SBC': ('v = {val}\n'
+            't = {a} - v - (0 if {ps} & {C} else 1)\n'
+            'r = t & 0xFF\n'
+            '{ps} = ({ps} & {nZCNV}) | NZ[r] | ({C} if t >= 0 else 0)'
+            ' | ({V} if ({a} ^ v) & ({a} ^ r) & 0x80 else 0)\n'
+            '{a} = r'),
+    'AND': 'r = {a} & {val}\n{a} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'ORA': 'r = {a} | {val}\n{a} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'EOR': 'r = {a} ^ {val}\n{a} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'CMP': 't = {a} - {val}\n{ps} = ({ps} & {nZCN}) | NZ[t & 0xFF] | ({C} if t >= 0 else 0)',
+    'CPX': 't = {x} - {val}\n{ps} = ({ps} & {nZCN}) | NZ[t & 0xFF] | ({C} if t >= 0 else 0)',
+    'CPY': 't = {y} - {val}\n{ps} = ({ps} & {nZCN}) | NZ[t & 0xFF] | ({C} if t >= 0 else 0)',
+    'BIT': ('v = {val}\n'
+            '{ps} = ({ps} & {nZNV}) | (0 if {a} & v else {Z})'
+            ' | ({N} if v & 0x80 else 0) | ({V} if v & 0x40 else 0)'),
+    'INC': '{rmw_load}\nr = (v + 1) & 0xFF\n{rmw_store}\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'DEC': '{rmw_load}\nr = (v - 1) & 0xFF\n{rmw_store}\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'INX': 'r = ({x} + 1) & 0xFF\n{x} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'DEX': 'r = ({x} - 1) & 0xFF\n{x} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'INY': 'r = ({y} + 1) & 0xFF\n{y} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'DEY': 'r = ({y} - 1) & 0xFF\n{y} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'ASL': ('{rmw_load}\nr = (v << 1) & 0xFF\n{rmw_store}\n'
+            '{ps} = ({ps} & {nZCN}) | NZ[r] | ({C} if v & 0x80 else 0)'),
+    'LSR': ('{rmw_load}\nr = v >> 1\n{rmw_store}\n'
+            '{ps} = ({ps} & {nZCN}) | NZ[r] | ({C} if v & 0x01 else 0)'),
+    'ROL': ('{rmw_load}\nr = ((v << 1) | (1 if {ps} & {C} else 0)) & 0xFF\n{rmw_store}\n'
+            '{ps} = ({ps} & {nZCN}) | NZ[r] | ({C} if v & 0x80 else 0)'),
+    'ROR': ('{rmw_load}\nr = (v >> 1) | (0x80 if {ps} & {C} else 0)\n{rmw_store}\n'
+            '{ps} = ({ps} & {nZCN}) | NZ[r] | ({C} if v & 0x01 else 0)'),
+    'TAX': 'r = {a}\n{x} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'TAY': 'r = {a}\n{y} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'TXA': 'r = {x}\n{a} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'TYA': 'r = {y}\n{a} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'TSX': 'r = {sp}\n{x} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'TXS': '{sp} = {x}',
+    'CLC': '{ps} = {ps} & {nC}',
+    'SEC': '{ps} = {ps} | {C}',
+    'CLI': '{ps} = {ps} & {nI}',
+    'SEI': '{ps} = {ps} | {I}',
+    'CLD': '{ps} = {ps} & {nD}',
+    'SED': '{ps} = {ps} | {D}',
+    'CLV': '{ps} = {ps} & {nV}',
+    'NOP': 'pass',
+    'PHA': '{write}(0x100 | {sp}, {a})\n{sp} = ({sp} - 1) & 0xFF',
+    'PHP': '{write}(0x100 | {sp}, {ps})\n{sp} = ({sp} - 1) & 0xFF',
+    'PLA': '{sp} = ({sp} + 1) & 0xFF\nr = m[0x100 | {sp}]\n{a} = r\n{ps} = ({ps} & {nZN}) | NZ[r]',
+    'PLP': '{sp} = ({sp} + 1) & 0xFF\n{ps} = m[0x100 | {sp}]',
+    # Controle de fluxo: definem o novo PC ({newpc}) diretamente
+    'JMP': '{newpc} = {ea}',
+    'JSR': ('ret = ({pc} + 2) & 0xFFFF\n'
+            '{write}(0x100 | {sp}, ret >> 8)\n'
+            '{write}(0x100 | (({sp} - 1) & 0xFF), ret & 0xFF)\n'
+            '{sp} = ({sp} - 2) & 0xFF\n'
+            '{newpc} = {ea}'),
+    'RTS': ('lo = m[0x100 | (({sp} + 1) & 0xFF)]\n'
+            'hi = m[0x100 | (({sp} + 2) & 0xFF)]\n'
+            '{sp} = ({sp} + 2) & 0xFF\n'
+            '{newpc} = (((hi << 8) | lo) + 1) & {mask}'),
+    'RTI': ('{ps} = m[0x100 | (({sp} + 1) & 0xFF)]\n'
+            'lo = m[0x100 | (({sp} + 2) & 0xFF)]\n'
+            'hi = m[0x100 | (({sp} + 3) & 0xFF)]\n'
+            '{sp} = ({sp} + 3) & 0xFF\n'
+            '{newpc} = ((hi << 8) | lo) & {mask}'),
+    # BRK para a simulação (o softcore não tem vetor de interrupção)
+    'BRK': 'raise Halt(STATUS_BRK)',
+}
+
+# Condição de desvio de cada branch
+BRANCH_CONDITIONS: Dict[str, str] = {
+    'BCC': 'not {ps} & {C}',
+    'BCS': '{ps} & {C}',
+    'BEQ': '{ps} & {Z}',
+    'BNE': 'not {ps} & {Z}',
+    'BMI': '{ps} & {N}',
+    'BPL': 'not {ps} & {N}',
+    'BVC': 'not {ps} & {V}',
+    'BVS': '{ps} & {V}',
+}
+
+# Constantes de flags usadas nos templates
+FLAG_CONSTANTS: Dict[str, str] = {
+    'Z': str(FLAG_Z), 'C': str(FLAG_C), 'N': str(FLAG_N), 'V': str(FLAG_V),
+    'I': str(FLAG_I), 'D': str(FLAG_D),
+    'nZN': str(0xFF & ~(FLAG_Z | FLAG_N)),
+    'nZCN': str(0xFF & ~(FLAG_Z | FLAG_C | FLAG_N)),
+    'nZCNV': str(0xFF & ~(FLAG_Z | FLAG_C | FLAG_N | FLAG_V)),
+    'nZNV': str(0xFF & ~(FLAG_Z | FLAG_N | FLAG_V)),
+    'nC': str(0xFF & ~FLAG_C), 'nI': str(0xFF & ~FLAG_I),
+    'nD': str(0xFF & ~FLAG_D), 'nV': str(0xFF & ~FLAG_V),
+}
+
+
+class Halt(Exception):
+    """Interrompe a execução (BRK, laço ocioso etc.)"""
+
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+
+class _Keep(dict):
+    """Mantém os placeholders ainda não conhecidos durante a expansão"""
+
+    def __missing__(self, key: str) -> str:
+        return '{' + key + '}'
+
+
+def operation_template(mnemonic: str, mode: str, advance: bool = True) -> str:
+    """
+    Expande o template da operação para o modo de endereçamento dado
+    Com `advance`, instruções que não desviam também avançam o PC ({newpc}).
+    """
+    if mnemonic in BRANCH_CONDITIONS:
+        return '{newpc} = {target} if ' + BRANCH_CONDITIONS[mnemonic] + ' else {next}'
+
+    ea = MODE_ADDRESS.get(mode, '')
+    if mode == AddressMode.IMMEDIATE:
+        val = '{op8}'
+    else:
+        val = 'm[' + ea + ']'
+    if mode == AddressMode.ACCUMULATOR:
+        rmw_load, rmw_store = 'v = {a}', '{a} = r'
+    else:
+        rmw_load, rmw_store = 'ea = ' + ea + '\nv = m[ea]', '{write}(ea, r)'
+
+    template = OPERATIONS[mnemonic].format_map(
+        _Keep(val=val, ea=ea, rmw_load=rmw_load, rmw_store=rmw_store))
+    if advance and mnemonic not in FLOW_INSTRUCTIONS:
+        template += '\n{newpc} = {next}'
+    return template
+
+
+def handler_source(opcode: int, mnemonic: str, mode: str, size: int, mask: int) -> str:
+    """Gera o código Python do handler de um opcode"""
+    fields = dict(FLAG_CONSTANTS)
+    fields.update(a='cpu.a', x='cpu.x', y='cpu.y', sp='cpu.sp', ps='cpu.ps',
+                  pc='pc', op8='o', op16='o', write='write', mask=str(mask), newpc='cpu.pc',
+                  next=f'((pc + {size}) & {mask})',
+                  target=f'((pc + 2 + (o - 256 if o & 0x80 else o)) & {mask})')
+    lines = [f'def op_{opcode:02X}():', '    pc = cpu.pc']
+    if size == 2:
+        lines.append(f'    o = m[(pc + 1) & {mask}]')
+    elif size == 3:
+        lines.append(f'    o = m[(pc + 1) & {mask}] | (m[(pc + 2) & {mask}] << 8)')
+    body = operation_template(mnemonic, mode).format_map(fields)
+    lines.extend('    ' + line for line in body.split('\n'))
+    return '\n'.join(lines)
+
+
+def opcode_table() -> Dict[int, Tuple[str, str, int]]:
+    """Inverso de OPCODES: opcode -> (instrução, modo, tamanho)"""
+    table: Dict[int, Tuple[str, str, int]] = {}
+    for mnemonic, modes in OPCODES.items():
+        for mode, (opcode, size) in modes.items():
+            table[opcode] = (mnemonic, mode, size)
+    return table
+
+
+# Opcode -> (instrução, modo, tamanho), usado pelo tradutor de blocos
+_OPCODE_TABLE = opcode_table()
+
+# Código das fábricas de handlers já compilado, por máscara de endereço
+_FACTORY_CACHE: Dict[int, object] = {}
+
+
+def handler_factory(mask: int):
+    """Compila (uma vez por máscara) a fábrica da tabela de 256 handlers"""
+    code = _FACTORY_CACHE.get(mask)
+    if code is None:
+        lines = ['def make_handlers(cpu, m, write):']
+        names = []
+        for opcode, (mnemonic, mode, size) in sorted(opcode_table().items()):
+            source = handler_source(opcode, mnemonic, mode, size, mask)
+            lines.extend('    ' + line for line in source.split('\n'))
+            names.append(f'{opcode}: op_{opcode:02X}')
+        lines.append('    return {' + ', '.join(names) + '}')
+        code = compile('\n'.join(lines), '<handlers 6502>', 'exec')
+        _FACTORY_CACHE[mask] = code
+    namespace = {'NZ': NZ, 'Halt': Halt, 'STATUS_BRK': STATUS_BRK}
+    exec(code, namespace)
+    return namespace['make_handlers']
+
+
+def block_source(memory: Sequence[int], start: int, mask: int,
+                 table: Dict[int, Tuple[str, str, int]],
+                 stop: Optional[Callable[[int], object]] = None,
+                 store_pc: bool = False) -> Tuple[str, List[int]]:
+    """
+    Gera o código de um bloco traduzido a partir de `start`
+    Retorna (código da fábrica, endereço de cada instrução do bloco)
+
+    O bloco recebe o máximo de instruções que pode executar e retorna
+    quantas executou. Ele termina em instruções de controle de fluxo,
+    antes de opcodes inválidos, após MAX_BLOCK_INSTRUCTIONS ou, mais cedo,
+    quando uma escrita atinge código traduzido (cpu.code_modified), pois os
+    operandos já estão embutidos. Se o desvio final pode voltar para o
+    início do bloco (laço), o bloco repete dentro da própria função.
+    Com `stop`, o bloco também termina antes de qualquer instrução (exceto
+    a primeira) para a qual stop(endereço) é verdadeiro. Com `store_pc`,
+    cpu.pc recebe o endereço de cada instrução que escreve na memória antes
+    da escrita (erros de barramento registram o PC da instrução).
+    """
+    writeback = 'cpu.a, cpu.x, cpu.y, cpu.sp, cpu.ps = a, x, y, sp, ps'
+    body: List[str] = []
+    addresses: List[int] = []
+    pc = start
+    loops = False
+    flow = False
+
+    while len(addresses) < MAX_BLOCK_INSTRUCTIONS:
+        entry = table.get(memory[pc])
+        if entry is None or (stop is not None and addresses and stop(pc)):
+            break
+        mnemonic, mode, size = entry
+        addresses.append(pc)
+        count = len(addresses)
+        operand = 0
+        if size == 2:
+            operand = memory[(pc + 1) & mask]
+        elif size == 3:
+            operand = memory[(pc + 1) & mask] | (memory[(pc + 2) & mask] << 8)
+        next_pc = (pc + size) & mask
+        target = (pc + 2 + (operand - 256 if operand & 0x80 else operand)) & mask
+
+        fields = dict(FLAG_CONSTANTS)
+        fields.update(a='a', x='x', y='y', sp='sp', ps='ps', pc=str(pc),
+                      op8=str(operand), op16=str(operand), write='write', mask=str(mask),
+                      next=str(next_pc), target=str(target), newpc='npc')
+
+        if mnemonic == 'BRK':
+            # BRK não conta como executada, igual ao laço interpretado
+            body += [writeback, f'cpu.pc = {pc}', 'raise Halt(STATUS_BRK)']
+            flow = True
+            break
+
+        template = operation_template(mnemonic, mode, advance=False)
+        if store_pc and '{write}' in template:
+            body.append(f'cpu.pc = {pc}')
+        body.extend(template.format_map(fields).split('\n'))
+        if mnemonic in FLOW_INSTRUCTIONS:
+            loops = ((mnemonic in BRANCH_CONDITIONS and target == start)
+                     or (mnemonic == 'JMP' and mode == AddressMode.ABSOLUTE and (operand & mask) == start))
+            flow = True
+            break
+
+        pc = next_pc
+        if '{write}' in template:
+            body += ['if cpu.code_modified:',
+                     '    cpu.code_modified = False',
+                     '    ' + writeback,
+                     f'    cpu.pc = {pc}',
+                     f'    return n + {count}']
+
+    if not flow:
+        body.append(f'npc = {pc}')
+    count = len(addresses)
+
+    lines = ['def make_block(cpu, m, write):',
+             '    def block(budget):',
+             '        a, x, y, sp, ps = cpu.a, cpu.x, cpu.y, cpu.sp, cpu.ps',
+             '        n = 0']
+    if loops:
+        lines.append('        while True:')
+        lines.extend('            ' + line for line in body)
+        lines += [f'            n += {count}',
+                  f'            if npc != {start} or n + {count} > budget:',
+                  '                break']
+    else:
+        lines.extend('        ' + line for line in body)
+        lines.append(f'        n = {count}')
+    lines += ['        cpu.pc = npc', '        ' + writeback, '        return n', '    return block']
+    return '\n'.join(lines), addresses
+
+
+class Simulator6502:
+    """Simulador do softcore: registradores, memória e laço de execução"""
+
+    def __init__(self, memory: Optional[bytearray] = None, start: int = START_ADDRESS,
+                 timing_mode: bool = False, translate: bool = False, detect_idle: bool = False,
+                 memory_map: Optional[MemoryMap] = None):
+        if memory_map is not None:
+            # A imagem (bytearray ou SparseMemory) é copiada para o espaço do mapa
+            data = bytes(memory) if memory is not None else b''
+            if len(data) > memory_map.size:
+                raise ValueError(f"Imagem de {len(data)} bytes maior que o mapa de memória ({memory_map.size})")
+            self.memory = bytearray(memory_map.size)
+            self.memory[:len(data)] = data
+        else:
+            self.memory = bytearray(memory) if memory is not None else bytearray(MEMORY_SIZE)
+        size = len(self.memory)
+        if size & (size - 1):
+            raise ValueError(f"Tamanho de memória {size} não é potência de 2")
+        # A RAM só decodifica os bits baixos do endereço (espelhamento)
+        self.address_mask = size - 1
+        self.start = start
+        self.a = self.x = self.y = 0
+        self.sp = 0xFF
+        self.ps = 0
+        self.pc = start & self.address_mask
+        self.steps = 0
+        # Modo de temporização: conta ciclos de clock da FSM (timing.CYCLES)
+        self.timing_mode = timing_mode
+        self.cycles = 0
+        self.status = STATUS_RUNNING
+        self.write: Callable[[int, int], None] = self.memory.__setitem__
+        # Cache de blocos traduzidos: PC inicial -> (bloco, ciclos acumulados por instrução)
+        self.translate = translate
+        self.blocks: Dict[int, Tuple[Callable[[int], int], List[int]]] = {}
+        self.block_bytes: Dict[int, List[int]] = {}
+        # Página de 256 bytes -> PCs iniciais dos blocos com bytes nela (a escrita
+        # em código só confere os blocos da página, como os snapshots)
+        self.block_pages: Dict[int, set] = {}
+        # Quantidade de blocos que contêm cada byte da memória
+        self.code_map = bytearray(size)
+        self.code_modified = False
+        if translate:
+            self.write = self.translated_write
+        # Escritas em ROM ou fora do mapa: (PC, endereço, valor). No modo de
+        # tradução o PC é o do início do bloco
+        self.memory_map = memory_map
+        self.bus_errors: List[Tuple[int, int, int]] = []
+        if memory_map is not None:
+            self.map_writes()
+        # Detecção de laços ociosos: para em JMP para si mesmo e avança
+        # laços contador/BNE direto para o fim
+        self.detect_idle = detect_idle
+        # Trace binário (trace.TraceWriter) e escritas da instrução atual
+        self.trace = None
+        self.trace_writes: List[Tuple[int, int]] = []
+        self.untraced_write = self.write
+        # Páginas do último snapshot/restore e páginas escritas desde então
+        # (None enquanto nenhum snapshot foi tirado)
+        self.pages: Optional[List[bytes]] = None
+        self.dirty_pages: Optional[set] = None
+        self.handlers: List[Callable[[], None]] = []
+        self.build_handlers()
+
+    @classmethod
+    def from_assembler(cls, assembler: Assembler6502, start: int = START_ADDRESS,
+                       timing_mode: bool = False, translate: bool = False,
+                       detect_idle: bool = False) -> 'Simulator6502':
+        """Cria o simulador a partir da memória (e do mapa de memória) do assembler"""
+        return cls(assembler.memory, start, timing_mode, translate, detect_idle, assembler.memory_map)
+
+    @classmethod
+    def from_mif(cls, filename: str, start: int = START_ADDRESS,
+                 timing_mode: bool = False, translate: bool = False,
+                 detect_idle: bool = False) -> 'Simulator6502':
+        """Cria o simulador a partir de um arquivo .mif"""
+        return cls(memimage.read_mif(filename), start, timing_mode, translate, detect_idle)
+
+    @classmethod
+    def from_image(cls, filename: str, start: int = START_ADDRESS,
+                   timing_mode: bool = False, translate: bool = False,
+                   detect_idle: bool = False, memory_map: Optional[MemoryMap] = None) -> 'Simulator6502':
+        """Cria o simulador a partir de uma imagem .mif, .hex ou .bin"""
+        if memory_map is not None:
+            memory = memimage.read_image(filename, memory_map.size)
+        else:
+            memory = memimage.read_image(filename)
+        return cls(memory, start, timing_mode, translate, detect_idle, memory_map)
+
+    @classmethod
+    def from_state(cls, filename: str, timing_mode: bool = False, translate: bool = False,
+                   detect_idle: bool = False, memory_map: Optional[MemoryMap] = None) -> 'Simulator6502':
+        """Cria o simulador a partir de um estado gravado com save_state"""
+        saved = Snapshot.load(filename)
+        simulator = cls(saved.memory(), saved.pc, timing_mode, translate, detect_idle, memory_map)
+        simulator.restore(saved)
+        return simulator
+
+    def build_handlers(self) -> None:
+        """Monta a tabela de 256 handlers (opcodes fora de OPCODES são inválidos)"""
+        defined = handler_factory(self.address_mask)(self, self.memory, self.write)
+        self.handlers = [defined.get(opcode) or self.illegal_handler(opcode) for opcode in range(256)]
+        if self.detect_idle:
+            for opcode, (mnemonic, mode, size) in _OPCODE_TABLE.items():
+                if (mnemonic in BRANCH_CONDITIONS or mnemonic == 'JMP'
+                        or (mnemonic, mode) in COUNTER_INSTRUCTIONS):
+                    self.handlers[opcode] = self.idle_handler(opcode, self.handlers[opcode])
+
+    def map_writes(self) -> None:
+        """Filtra as escritas pelo mapa de memória (só RAM e E/S são escritas)"""
+        writable = self.memory_map.writable()
+        errors = self.bus_errors
+        base = self.write
+
+        def mapped_write(address: int, value: int) -> None:
+            if writable[address]:
+                base(address, value)
+            else:
+                errors.append((self.pc, address, value))
+
+        self.write = mapped_write
+
+    def attach_trace(self, writer) -> None:
+        """Passa a registrar cada instrução executada em `writer` (tracefile.TraceWriter)"""
+        self.detach_trace()
+        self.trace = writer
+        self.untraced_write = self.write
+        writes = self.trace_writes
+        base = self.untraced_write
+
+        def traced_write(address: int, value: int) -> None:
+            base(address, value)
+            writes.append((address, value))
+
+        self.write = traced_write
+        self.build_handlers()
+
+    def detach_trace(self) -> None:
+        """Para de registrar o trace (o writer não é fechado)"""
+        if self.trace is None:
+            return
+        self.trace = None
+        self.write = self.untraced_write
+        self.build_handlers()
+
+    def track_pages(self) -> None:
+        """
+        Passa a marcar as páginas escritas (necessário para os snapshots)
+        Só as escritas feitas por `write` são vistas; alterações diretas em
+        `memory` não entram nos snapshots seguintes.
+        """
+        if self.dirty_pages is not None:
+            return
+        if len(self.memory) < PAGE_SIZE:
+            raise ValueError(f"Snapshots exigem memória de pelo menos {PAGE_SIZE} bytes")
+        self.pages = split_pages(self.memory)
+        dirty = self.dirty_pages = set()
+        trace = self.trace
+        self.detach_trace()
+        base = self.write
+
+        def paged_write(address: int, value: int) -> None:
+            base(address, value)
+            dirty.add(address >> PAGE_SHIFT)
+
+        self.write = paged_write
+        # Blocos traduzidos guardam a função de escrita antiga
+        self.flush_blocks()
+        if trace is not None:
+            self.attach_trace(trace)
+        else:
+            self.build_handlers()
+
+    def snapshot(self) -> Snapshot:
+        """Estado atual; copia apenas as páginas escritas desde o último snapshot"""
+        if self.dirty_pages is None:
+            self.track_pages()
+        pages = self.pages
+        memory = self.memory
+        for page in self.dirty_pages:
+            start = page << PAGE_SHIFT
+            pages[page] = bytes(memory[start:start + PAGE_SIZE])
+        self.dirty_pages.clear()
+        return Snapshot((self.a, self.x, self.y, self.sp, self.ps, self.pc),
+                        self.steps, self.cycles, tuple(pages))
+
+    def restore(self, saved: Snapshot) -> None:
+        """
+        Volta ao estado de um snapshot
+        Só reescreve as páginas sujas e as que diferem do snapshot.
+        """
+        if saved.memory_size != len(self.memory):
+            raise ValueError(f"Snapshot de {saved.memory_size} bytes, memória de {len(self.memory)}")
+        if self.dirty_pages is None:
+            self.track_pages()
+        pages = self.pages
+        memory = self.memory
+        code_map = self.code_map
+        changed = set(self.dirty_pages)
+        changed.update(page for page, data in enumerate(saved.pages) if pages[page] is not data)
+        for page in changed:
+            start = page << PAGE_SHIFT
+            end = start + PAGE_SIZE
+            memory[start:end] = saved.pages[page]
+            pages[page] = saved.pages[page]
+            if any(code_map[start:end]):
+                for address in range(start, end):
+                    if code_map[address]:
+                        self.invalidate(address)
+        self.dirty_pages.clear()
+        self.code_modified = False
+        self.a, self.x, self.y, self.sp, self.ps, self.pc = saved.registers
+        self.steps = saved.steps
+        self.cycles = saved.cycles
+        self.status = STATUS_RUNNING
+
+    def save_state(self, filename: str) -> None:
+        """Grava registradores e memória em disco (ver snapshot.Snapshot.save)"""
+        self.snapshot().save(filename)
+
+    def load_state(self, filename: str) -> None:
+        self.restore(Snapshot.load(filename))
+
+    def flush_blocks(self) -> None:
+        """Descarta todos os blocos traduzidos"""
+        self.blocks.clear()
+        self.block_bytes.clear()
+        self.block_pages.clear()
+        self.code_map[:] = bytes(len(self.code_map))
+
+    def illegal_handler(self, opcode: int) -> Callable[[], None]:
+        """Handler para opcodes que não existem na tabela OPCODES"""
+        def illegal() -> None:
+            raise ValueError(f"Opcode inválido ${opcode:02X} em ${self.pc:04X}")
+        return illegal
+
+    def translated_write(self, address: int, value: int) -> None:
+        """Escrita na memória que descarta os blocos traduzidos atingidos"""
+        self.memory[address] = value
+        if self.code_map[address]:
+            self.invalidate(address)
+
+    def translate_block(self, pc: int) -> Optional[Tuple[Callable[[int], int], List[int]]]:
+        """Traduz e guarda no cache o bloco que começa em `pc` (None se inválido)"""
+        memory = self.memory
+        mask = self.address_mask
+        if self.detect_idle and self.idle_pattern(pc):
+            # Laços ociosos ficam com os handlers, que sabem pará-los ou avançá-los
+            return None
+        source, addresses = block_source(memory, pc, mask, _OPCODE_TABLE,
+                                         self.idle_pattern if self.detect_idle else None,
+                                         self.memory_map is not None)
+        if not addresses:
+            return None
+        namespace = {'NZ': NZ, 'Halt': Halt, 'STATUS_BRK': STATUS_BRK}
+        exec(compile(source, f'<bloco ${pc:04X}>', 'exec'), namespace)
+        function = namespace['make_block'](self, memory, self.write)
+
+        cycles = [0]
+        covered = []
+        for address in addresses:
+            opcode = memory[address]
+            cycles.append(cycles[-1] + timing.CYCLES[opcode])
+            covered.extend((address + i) & mask for i in range(_OPCODE_TABLE[opcode][2]))
+        for address in covered:
+            self.code_map[address] += 1
+        for page in {address >> PAGE_SHIFT for address in covered}:
+            self.block_pages.setdefault(page, set()).add(pc)
+        block = self.blocks[pc] = (function, cycles)
+        self.block_bytes[pc] = covered
+        return block
+
+    def invalidate(self, address: int) -> None:
+        """Descarta os blocos traduzidos que contêm o byte em `address`"""
+        starts = self.block_pages.get(address >> PAGE_SHIFT)
+        if starts:
+            code_map = self.code_map
+            for start in list(starts):
+                covered = self.block_bytes[start]
+                if address not in covered:
+                    continue
+                for byte in covered:
+                    code_map[byte] -= 1
+                for page in {byte >> PAGE_SHIFT for byte in covered}:
+                    pages = self.block_pages[page]
+                    pages.discard(start)
+                    if not pages:
+                        del self.block_pages[page]
+                del self.blocks[start]
+                del self.block_bytes[start]
+        self.code_modified = True
+
+    def reset(self) -> None:
+        """Reinicia os registradores como no reset do softcore"""
+        self.a = self.x = self.y = 0
+        self.sp = 0xFF
+        self.ps = 0
+        self.pc = self.start & self.address_mask
+        self.steps = 0
+        self.cycles = 0
+        self.status = STATUS_RUNNING
+
+    def step(self) -> str:
+        """Executa uma única instrução"""
+        return self.run(1)
+
+    def run(self, max_steps: Optional[int] = None) -> str:
+        """
+        Executa até BRK ou até `max_steps` instruções
+        Retorna o estado de parada (STATUS_BRK, STATUS_IDLE ou STATUS_LIMIT)
+        """
+        limit = max_steps if max_steps is not None else sys.maxsize
+        if self.trace is not None:
+            loop = self.run_traced
+        elif self.translate:
+            loop = self.run_translated
+        elif self.timing_mode:
+            loop = self.run_timed
+        else:
+            loop = self.run_interpreted
+        self.status = STATUS_RUNNING
+        executed = 0
+        while True:
+            count, status = loop(limit - executed)
+            executed += count
+            if status != STATUS_FAST_FORWARD:
+                break
+            # Laço de contagem detectado: avança direto para o fim
+            executed += self.fast_forward(limit - executed)
+        self.steps += executed
+        self.status = status
+        return status
+
+    def run_interpreted(self, limit: int) -> Tuple[int, str]:
+        """Laço de execução interpretado; retorna (instruções executadas, estado)"""
+        memory = self.memory
+        handlers = self.handlers
+        executed = 0
+        try:
+            for executed in range(limit):
+                handlers[memory[self.pc]]()
+        except Halt as halt:
+            return executed, halt.status
+        return limit, STATUS_LIMIT
+
+    def run_timed(self, limit: int) -> Tuple[int, str]:
+        """Laço de execução que também acumula os ciclos da FSM"""
+        memory = self.memory
+        handlers = self.handlers
+        cycle_table = timing.CYCLES
+        cycles = self.cycles
+        executed = 0
+        status = STATUS_LIMIT
+        try:
+            for executed in range(limit):
+                opcode = memory[self.pc]
+                handlers[opcode]()
+                cycles += cycle_table[opcode]
+            executed = limit
+        except Halt as halt:
+            status = halt.status
+        self.cycles = cycles
+        return executed, status
+
+    def run_traced(self, limit: int) -> Tuple[int, str]:
+        """Laço interpretado que registra cada instrução no trace"""
+        memory = self.memory
+        handlers = self.handlers
+        trace = self.trace
+        # Empacota direto no buffer do writer, que grava a cada bloco completo
+        pack_into = trace.entry.pack_into
+        buffer = trace.buffer
+        size = trace.entry.size
+        end = trace.interval * size
+        offset = trace.position * size
+        writes = self.trace_writes
+        cycle_table = timing.CYCLES
+        timed = self.timing_mode
+        executed = 0
+        status = STATUS_LIMIT
+        writes.clear()
+        try:
+            for executed in range(limit):
+                pc = self.pc
+                opcode = memory[pc]
+                handlers[opcode]()
+                if writes:
+                    first = writes[0]
+                    second = writes[1] if len(writes) > 1 else (0, 0)
+                    pack_into(buffer, offset, pc, opcode, self.a, self.x, self.y, self.sp, self.ps,
+                              len(writes), first[0], first[1], second[0], second[1])
+                    writes.clear()
+                else:
+                    pack_into(buffer, offset, pc, opcode, self.a, self.x, self.y, self.sp, self.ps,
+                              0, 0, 0, 0, 0)
+                offset += size
+                if offset == end:
+                    trace.position = trace.interval
+                    trace.flush()
+                    offset = 0
+                if timed:
+                    self.cycles += cycle_table[opcode]
+            executed = limit
+        except Halt as halt:
+            writes.clear()
+            status = halt.status
+        trace.position = offset // size
+        return executed, status
+
+    def run_translated(self, limit: int) -> Tuple[int, str]:
+        """Laço de execução por blocos traduzidos (conta ciclos no modo de temporização)"""
+        memory = self.memory
+        handlers = self.handlers
+        blocks = self.blocks
+        translate_block = self.translate_block
+        cycle_table = timing.CYCLES
+        timed = self.timing_mode
+        cycles = self.cycles
+        executed = 0
+        pending = 0  # Instruções antes do BRK, caso o bloco pare a execução
+        status = STATUS_LIMIT
+        try:
+            while executed < limit:
+                pc = self.pc
+                block = blocks.get(pc) or translate_block(pc)
+                if block is None or len(block[1]) - 1 > limit - executed:
+                    # Opcode inválido, laço ocioso ou limite no meio do bloco: uma instrução por vez
+                    pending = 0
+                    opcode = memory[pc]
+                    handlers[opcode]()
+                    executed += 1
+                    if timed:
+                        cycles += cycle_table[opcode]
+                    continue
+                function, block_cycles = block
+                pending = len(block_cycles) - 2
+                count = function(limit - executed)
+                executed += count
+                if timed:
+                    # Blocos em laço executam várias passagens completas
+                    passes, rest = divmod(count, len(block_cycles) - 1)
+                    cycles += passes * block_cycles[-1] + block_cycles[rest]
+        except Halt as halt:
+            executed += pending
+            if timed and pending:
+                cycles += block_cycles[pending]
+            status = halt.status
+        self.cycles = cycles
+        return executed, status
+
+    def idle_pattern(self, pc: int) -> Optional[str]:
+        """
+        Reconhece laços que só mudam de estado por um contador
+        Retorna 'jump' (JMP/branch para si mesmo), 'counter' (contador + BNE
+        de volta) ou None.
+        """
+        memory = self.memory
+        mask = self.address_mask
+        entry = _OPCODE_TABLE.get(memory[pc])
+        if entry is None:
+            return None
+        mnemonic, mode, size = entry
+        if mnemonic in BRANCH_CONDITIONS:
+            return 'jump' if memory[(pc + 1) & mask] == 0xFE else None
+        if mnemonic == 'JMP' and mode == AddressMode.ABSOLUTE:
+            target = (memory[(pc + 1) & mask] | (memory[(pc + 2) & mask] << 8)) & mask
+            return 'jump' if target == pc else None
+        if (mnemonic, mode) in COUNTER_INSTRUCTIONS:
+            if (memory[(pc + size) & mask] == BNE_OPCODE
+                    and memory[(pc + size + 1) & mask] == 0x100 - (size + 2)):
+                return 'counter'
+        return None
+
+    def idle_handler(self, opcode: int, base: Callable[[], None]) -> Callable[[], None]:
+        """Envolve o handler de um opcode com a detecção de laço ocioso"""
+        mnemonic, mode, size = _OPCODE_TABLE[opcode]
+        if mnemonic in BRANCH_CONDITIONS or mnemonic == 'JMP':
+            def jump() -> None:
+                pc = self.pc
+                base()
+                # Desvio para si mesmo: nenhum estado muda daqui em diante
+                if self.pc == pc:
+                    raise Halt(STATUS_IDLE)
+            return jump
+
+        def counter() -> None:
+            # Com trace, cada iteração precisa ser registrada: não avança
+            if self.trace is None and self.idle_pattern(self.pc) == 'counter':
+                raise Halt(STATUS_FAST_FORWARD)
+            base()
+        return counter
+
+    def fast_forward(self, budget: int) -> int:
+        """
+        Executa de uma vez as iterações de um laço contador/BNE a partir do PC
+        Retorna as instruções executadas (no máximo `budget`)
+        """
+        if budget <= 0:
+            return 0
+        memory = self.memory
+        mask = self.address_mask
+        pc = self.pc
+        opcode = memory[pc]
+        mnemonic, mode, size = _OPCODE_TABLE[opcode]
+        delta, register = COUNTER_INSTRUCTIONS[(mnemonic, mode)]
+        address = None
+        if register is not None:
+            value = getattr(self, register)
+        else:
+            address = memory[(pc + 1) & mask]
+            if size == 3:
+                address = (address | (memory[(pc + 2) & mask] << 8)) & mask
+            value = memory[address]
+
+        # Iterações até o contador chegar a zero (256 se já começa em zero)
+        remaining = (value if delta < 0 else 0x100 - value) or 0x100
+        iterations = min(remaining, budget // 2)
+        if iterations:
+            value = (value + delta * iterations) & 0xFF
+            executed = 2 * iterations
+            cycles = iterations * (timing.CYCLES[opcode] + timing.CYCLES[BNE_OPCODE])
+            if iterations == remaining:
+                pc = (pc + size + 2) & mask
+        else:
+            # Sobra apenas uma instrução: executa só o contador
+            value = (value + delta) & 0xFF
+            executed = 1
+            cycles = timing.CYCLES[opcode]
+            pc = (pc + size) & mask
+
+        if register is not None:
+            setattr(self, register, value)
+        else:
+            self.write(address, value)
+        self.ps = (self.ps & FLAG_KEEP_NZ) | NZ[value]
+        self.pc = pc
+        if self.timing_mode:
+            self.cycles += cycles
+        return executed
+
+    def elapsed_seconds(self, clock_hz: float = timing.DEFAULT_CLOCK_HZ) -> float:
+        """Tempo real equivalente aos ciclos executados na frequência dada"""
+        return timing.cycles_to_seconds(self.cycles, clock_hz)
+
+    def flags_string(self) -> str:
+        """Flags no formato NVCZ (maiúscula = ativo)"""
+        return ''.join(name if self.ps & flag else name.lower()
+                       for name, flag in (('N', FLAG_N), ('V', FLAG_V), ('C', FLAG_C), ('Z', FLAG_Z)))
+
+    def __repr__(self) -> str:
+        return (f"A=${self.a:02X} X=${self.x:02X} Y=${self.y:02X} SP=${self.sp:02X} "
+                f"PC=${self.pc:04X} PS=${self.ps:02X} [{self.flags_string()}]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador do softcore 6502")
+    parser.add_argument('program', help="arquivo .asm, imagem (.mif, .hex, .bin) ou estado gravado (.state)")
+    parser.add_argument('-n', '--max-steps', type=int, default=1_000_000,
+                        help="limite de instruções executadas (padrão: 1000000)")
+    parser.add_argument('-t', '--timing', action='store_true',
+                        help="conta os ciclos de clock da FSM do control_unit")
+    parser.add_argument('--translate', action='store_true',
+                        help="executa por blocos traduzidos para Python (mais rápido)")
+    parser.add_argument('--idle', action='store_true',
+                        help="para em laços ociosos (JMP para si mesmo) e avança laços contador/BNE")
+    parser.add_argument('--clock', type=float, default=timing.DEFAULT_CLOCK_HZ / 1e6,
+                        help="frequência de clock em MHz para o modo de temporização (padrão: 50)")
+    parser.add_argument('--trace', metavar='ARQUIVO',
+                        help="grava o trace binário da execução (leitura com tracefile.py)")
+    parser.add_argument('--save-state', metavar='ARQUIVO',
+                        help="grava o estado final (retomável passando o arquivo como programa)")
+    parser.add_argument('--start', type=lambda text: int(text.lstrip('$'), 16), default=START_ADDRESS,
+                        metavar='ENDEREÇO', help="endereço inicial em hexadecimal (padrão: 1000)")
+    parser.add_argument('--memory-map', metavar='ARQUIVO',
+                        help="mapa de memória RAM/ROM/E/S (padrão: memoria.cfg ao lado do programa, "
+                             "se existir)")
+    args = parser.parse_args()
+
+    try:
+        map_file = args.memory_map or find_project_map(args.program)
+        memory_map = MemoryMap.load(map_file) if map_file else None
+        if args.program.lower().endswith('.state'):
+            simulator = Simulator6502.from_state(args.program, timing_mode=args.timing,
+                                                 translate=args.translate, detect_idle=args.idle,
+                                                 memory_map=memory_map)
+        elif args.program.lower().endswith(('.mif', '.hex', '.bin')):
+            simulator = Simulator6502.from_image(args.program, args.start, timing_mode=args.timing,
+                                               translate=args.translate, detect_idle=args.idle,
+                                               memory_map=memory_map)
+        else:
+            assembler = Assembler6502(memory_map=memory_map)
+            assembler.assemble_file(args.program)
+            simulator = Simulator6502.from_assembler(assembler, args.start, timing_mode=args.timing,
+                                                     translate=args.translate, detect_idle=args.idle)
+
+        writer = None
+        if args.trace:
+            from tracefile import TraceWriter
+            writer = TraceWriter(args.trace)
+            simulator.attach_trace(writer)
+
+        started = time.perf_counter()
+        try:
+            status = simulator.run(args.max_steps)
+        finally:
+            if writer is not None:
+                writer.close()
+        elapsed = time.perf_counter() - started
+
+        if args.save_state:
+            simulator.save_state(args.save_state)
+
+        print(f"Estado: {status} após {simulator.steps} instruções")
+        print(simulator)
+        if args.timing:
+            clock_hz = args.clock * 1e6
+            cpi = simulator.cycles / simulator.steps if simulator.steps else 0.0
+            print(f"Ciclos: {simulator.cycles} ({cpi:.2f} ciclos/instrução)")
+            print(f"Tempo a {args.clock:g} MHz: {simulator.elapsed_seconds(clock_hz) * 1e6:.3f} us")
+        if elapsed > 0:
+            print(f"Velocidade: {simulator.steps / elapsed / 1e6:.2f} M instruções/s")
+        if simulator.bus_errors:
+            print(f"Escritas fora de RAM/E/S: {len(simulator.bus_errors)}")
+            for pc, address, value in simulator.bus_errors[:10]:
+                print(f"  PC ${pc:04X}: ${value:02X} -> ${address:04X} "
+                      f"({simulator.memory_map.describe(address)})")
+
+    except FileNotFoundError as e:
+        print(f"Erro: Arquivo '{e.filename or args.program}' não encontrado.")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Erro de simulação: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
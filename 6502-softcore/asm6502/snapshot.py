@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Snapshots do estado do simulador 6502
+
+A memória é dividida em páginas de 256 bytes, a mesma divisão do 6502
+entre página zero (modos ZERO_PAGE) e o resto (modos ABSOLUTE). Um
+snapshot guarda os registradores e uma tupla com um objeto bytes imutável
+por página. Páginas não escritas desde o snapshot anterior são o mesmo
+objeto nos dois snapshots (copy-on-write), então tirar e restaurar um
+snapshot só copia bytes das páginas tocadas.
+
+O estado também pode ser gravado em disco (apenas páginas não vazias)
+para retomar uma execução longa sem repeti-la.
+"""
+
+import struct
+from typing import List, Sequence, Tuple
+
+PAGE_SHIFT = 8
+PAGE_SIZE = 1 << PAGE_SHIFT
+
+STATE_MAGIC = b'S6502STA'
+STATE_VERSION = 1
+
+# magic, versão, tamanho da memória, A, X, Y, SP, PS, PC, passos, ciclos, páginas gravadas
+STATE_HEADER = struct.Struct('<8sHI5BHQQI')
+PAGE_HEADER = struct.Struct('<H')
+
+_EMPTY_PAGE = bytes(PAGE_SIZE)
+
+
+def split_pages(memory: Sequence[int]) -> List[bytes]:
+    """Cópia da memória como lista de páginas imutáveis"""
+    return [bytes(memory[start:start + PAGE_SIZE]) for start in range(0, len(memory), PAGE_SIZE)]
+
+
+class Snapshot:
+    """Registradores e páginas de memória em um ponto da execução"""
+    __slots__ = ('a', 'x', 'y', 'sp', 'ps', 'pc', 'steps', 'cycles', 'pages')
+
+    def __init__(self, registers: Tuple[int, int, int, int, int, int], steps: int, cycles: int,
+                 pages: Tuple[bytes, ...]):
+        self.a, self.x, self.y, self.sp, self.ps, self.pc = registers
+        self.steps = steps
+        self.cycles = cycles
+        self.pages = pages
+
+    @property
+    def registers(self) -> Tuple[int, int, int, int, int, int]:
+        return self.a, self.x, self.y, self.sp, self.ps, self.pc
+
+    @property
+    def memory_size(self) -> int:
+        return len(self.pages) * PAGE_SIZE
+
+    def memory(self) -> bytearray:
+        """Imagem completa da memória do snapshot"""
+        return bytearray(b''.join(self.pages))
+
+    def changed_pages(self, other: 'Snapshot') -> List[int]:
+        """Páginas diferentes entre dois snapshots (as compartilhadas nem são comparadas)"""
+        return [page for page, (mine, theirs) in enumerate(zip(self.pages, other.pages))
+                if mine is not theirs and mine != theirs]
+
+    def save(self, filename: str) -> None:
+        """Grava o estado em disco, omitindo as páginas zeradas"""
+        used = [(page, data) for page, data in enumerate(self.pages) if data != _EMPTY_PAGE]
+        with open(filename, 'wb') as f:
+            f.write(STATE_HEADER.pack(STATE_MAGIC, STATE_VERSION, self.memory_size,
+                                      self.a, self.x, self.y, self.sp, self.ps, self.pc,
+                                      self.steps, self.cycles, len(used)))
+            for page, data in used:
+                f.write(PAGE_HEADER.pack(page))
+                f.write(data)
+
+    @classmethod
+    def load(cls, filename: str) -> 'Snapshot':
+        with open(filename, 'rb') as f:
+            data = f.read()
+        if len(data) < STATE_HEADER.size:
+            raise ValueError(f"Arquivo de estado inválido: {filename}")
+        (magic, version, size, a, x, y, sp, ps, pc,
+         steps, cycles, count) = STATE_HEADER.unpack_from(data, 0)
+        if magic != STATE_MAGIC or version != STATE_VERSION:
+            raise ValueError(f"Arquivo de estado inválido: {filename}")
+        pages = [_EMPTY_PAGE] * (size // PAGE_SIZE)
+        offset = STATE_HEADER.size
+        for _ in range(count):
+            (page,) = PAGE_HEADER.unpack_from(data, offset)
+            offset += PAGE_HEADER.size
+            pages[page] = data[offset:offset + PAGE_SIZE]
+            offset += PAGE_SIZE
+        return cls((a, x, y, sp, ps, pc), steps, cycles, tuple(pages))
+
+    def __repr__(self) -> str:
+        return (f"Snapshot(PC=${self.pc:04X}, passos={self.steps}, "
+                f"{len(self.pages)} páginas)")
+
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Mapa de fonte e índice de símbolos do Mini Assembler 6502
+
+Guarda, para cada statement que gera bytes, o intervalo de endereços e a
+linha do fonte, em vetores ordenados pelo endereço; os labels ficam em
+outro par de vetores ordenados. Endereço -> (arquivo, linha, label +
+deslocamento) é uma busca binária em cada um, e o resultado por endereço
+fica em cache, então simbolizar milhões de entradas de trace custa um
+acesso a dicionário por entrada.
+
+O mapa pode ser gravado ao lado da imagem (assembler.py --map) em JSON
+com os vetores em colunas.
+"""
+
+import bisect
+import json
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from assembler import Assembler6502, Statement
+
+MAP_FORMAT = 'asm6502-map'
+MAP_VERSION = 1
+
+
+class Location(NamedTuple):
+    address: int
+    file: Optional[str]
+    line: Optional[int]
+    label: Optional[str]
+    offset: int
+
+    def __str__(self) -> str:
+        if self.label is None:
+            symbol = f"${self.address:04X}"
+        else:
+            symbol = f"{self.label}+{self.offset}" if self.offset else self.label
+        if self.line is None:
+            return symbol
+        return f"{self.file}:{self.line} {symbol}"
+
+
+class SymbolIndex:
+    """Labels ordenados por endereço para busca do label que contém um endereço"""
+
+    def __init__(self, labels: Optional[Dict[str, int]] = None):
+        names: Dict[int, str] = {}
+        for label, address in (labels or {}).items():
+            # Vários labels no mesmo endereço: vale o primeiro definido
+            names.setdefault(address, label)
+        self.addresses = array('l', sorted(names))
+        self.names = [names[address] for address in self.addresses]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def lookup(self, address: int) -> Tuple[Optional[str], int]:
+        """(label que contém o endereço, deslocamento); (None, endereço) se nenhum"""
+        i = bisect.bisect_right(self.addresses, address) - 1
+        if i < 0:
+            return None, address
+        return self.names[i], address - self.addresses[i]
+
+    def owner(self, address: int) -> str:
+        """Nome do label que contém o endereço (ou o endereço em hexadecimal)"""
+        label, _ = self.lookup(address)
+        return label if label is not None else f"${address:04X}"
+
+    def describe(self, address: int) -> str:
+        """Endereço no formato LABEL+deslocamento"""
+        label, offset = self.lookup(address)
+        if label is None:
+            return f"${address:04X}"
+        return f"{label}+{offset}" if offset else label
+
+
+class SourceMap:
+    """Endereço -> arquivo, linha e símbolo da última montagem"""
+
+    def __init__(self, files: List[str], starts: Iterable[int], sizes: Iterable[int],
+                 file_ids: Iterable[int], lines: Iterable[int], labels: Dict[str, int]):
+        self.files = list(files)
+        self.starts = array('l', starts)
+        self.sizes = array('l', sizes)
+        self.file_ids = array('l', file_ids)
+        self.lines = array('l', lines)
+        self.labels = dict(labels)
+        self.symbols = SymbolIndex(labels)
+        self._cache: Dict[int, Location] = {}
+
+    @classmethod
+    def from_statements(cls, statements: List[Statement], labels: Dict[str, int],
+                        files: Sequence[str] = ('<fonte>',)) -> 'SourceMap':
+        """Monta o mapa a partir dos statements com endereços já calculados"""
+        entries = sorted((st.address, st.size, st.file, st.line_num) for st in statements if st.size)
+        return cls(files, (entry[0] for entry in entries), (entry[1] for entry in entries),
+                   (entry[2] for entry in entries), (entry[3] for entry in entries), labels)
+
+    @classmethod
+    def from_assembler(cls, assembler: Assembler6502) -> 'SourceMap':
+        # Constantes (.EQU) não são endereços: ficam fora do índice de símbolos
+        labels = {name: address for name, address in assembler.labels.items()
+                  if name not in assembler.constants}
+        files = [assembler.source_name] + assembler.files[1:]
+        return cls.from_statements(assembler.statements, labels, files)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def line_at(self, address: int) -> Optional[Tuple[str, int]]:
+        """(arquivo, linha) do statement que gerou o byte em `address`"""
+        i = bisect.bisect_right(self.starts, address) - 1
+        if i < 0 or address >= self.starts[i] + self.sizes[i]:
+            return None
+        return self.files[self.file_ids[i]], self.lines[i]
+
+    def address_of(self, line: int, filename: Optional[str] = None) -> Optional[int]:
+        """Primeiro endereço gerado pela linha (busca linear; uso interativo)"""
+        file_id = self.files.index(filename) if filename is not None else 0
+        for i, number in enumerate(self.lines):
+            if number == line and self.file_ids[i] == file_id:
+                return self.starts[i]
+        return None
+
+    def lookup(self, address: int) -> Location:
+        """Arquivo, linha e label+deslocamento do endereço (com cache por endereço)"""
+        location = self._cache.get(address)
+        if location is None:
+            found = self.line_at(address)
+            filename, line = found if found is not None else (None, None)
+            label, offset = self.symbols.lookup(address)
+            location = self._cache[address] = Location(address, filename, line, label, offset)
+        return location
+
+    def symbolize(self, address: int) -> str:
+        return str(self.lookup(address))
+
+    def to_dict(self) -> dict:
+        return {
+            'format': MAP_FORMAT,
+            'version': MAP_VERSION,
+            'files': self.files,
+            'starts': self.starts.tolist(),
+            'sizes': self.sizes.tolist(),
+            'file_ids': self.file_ids.tolist(),
+            'lines': self.lines.tolist(),
+            # Ordem estável: labels no mesmo endereço mantêm a ordem de definição
+            'symbols': [[address, name] for name, address in
+                        sorted(self.labels.items(), key=lambda item: item[1])],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SourceMap':
+        if data.get('format') != MAP_FORMAT or data.get('version') != MAP_VERSION:
+            raise ValueError("Mapa de fonte inválido ou de versão incompatível")
+        labels = {name: address for address, name in data['symbols']}
+        return cls(data['files'], data['starts'], data['sizes'], data['file_ids'],
+                   data['lines'], labels)
+
+    def save(self, filename: str) -> None:
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, filename: str) -> 'SourceMap':
+        with open(filename, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+    def __repr__(self) -> str:
+        return f"SourceMap({len(self)} intervalos, {len(self.symbols)} símbolos)"
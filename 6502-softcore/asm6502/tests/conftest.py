@@ -0,0 +1,11 @@
+"""
+Configuração do pytest
+
+Os módulos do assembler são importados pelo nome, como nos scripts
+(python assembler.py ...), então o diretório pai entra no sys.path.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,92 @@
+"""Assembler: análise única do fonte, relaxação do layout e mensagens de erro"""
+
+import os
+
+import pytest
+
+import memimage
+from assembler import LONG_BRANCH_SIZE, AddressMode, Assembler6502, StatementKind
+from simulator import STATUS_BRK, Simulator6502
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read(name: str) -> str:
+    with open(os.path.join(HERE, name), 'r') as f:
+        return f.read()
+
+
+def test_exemplo_matches_committed_mif():
+    assembler = Assembler6502()
+    assembler.assemble(read('exemplo.asm'))
+    assert assembler.memory == memimage.read_mif(os.path.join(HERE, 'exemplo.mif'))
+
+
+def test_each_line_is_parsed_once(monkeypatch):
+    source = read('exemplo.asm')
+    calls = []
+    original = Assembler6502.parse_line
+
+    def counting(self, line, line_num):
+        calls.append(line_num)
+        return original(self, line, line_num)
+
+    monkeypatch.setattr(Assembler6502, 'parse_line', counting)
+    Assembler6502().assemble(source)
+    # As duas passagens usam os statements: nenhuma linha volta ao parser
+    assert sorted(calls) == list(range(1, len(source.split('\n')) + 1))
+
+
+def test_errors_keep_line_numbers():
+    with pytest.raises(ValueError, match="Linha 3: Label desconhecido 'NADA'"):
+        Assembler6502().assemble("        .ORG $1000\n        NOP\n        JMP NADA\n")
+    with pytest.raises(ValueError, match='Linha 2: '):
+        Assembler6502().assemble("        .ORG $1000\n        LDA ($10\n")
+
+
+# DADO só é conhecido depois do uso e fica na página zero; o BNE pula
+# mais de 127 bytes e precisa virar branch invertido + JMP
+RELAX = """
+        .ORG $1000
+INICIO: LDA DADO
+        LDX #$01
+        DEX
+        BNE LONGE
+        LDA #$11
+        STA $20
+        .REPT 200
+        NOP
+        .ENDR
+LONGE:  LDA DADO,X
+        STA $21
+        BRK
+        .ORG $0040
+DADO:   .BYTE $5A, $A5
+"""
+
+
+def test_relaxation_uses_zero_page_and_long_branches():
+    assembler = Assembler6502()
+    assembler.assemble(RELAX)
+    code = {st.address: st for st in assembler.statements if st.kind == StatementKind.INSTRUCTION}
+    assert code[0x1000].mode == AddressMode.ZERO_PAGE and code[0x1000].size == 2
+    branch = next(st for st in code.values() if st.instruction == 'BNE')
+    assert branch.size == LONG_BRANCH_SIZE
+    # BEQ +3 pula o JMP LONGE
+    longe = assembler.labels['LONGE']
+    assert assembler.memory[branch.address:branch.address + 5] == bytes(
+        [0xF0, 0x03, 0x4C, longe & 0xFF, longe >> 8])
+    assert code[longe].mode == AddressMode.ZERO_PAGE_X
+
+    simulator = Simulator6502.from_assembler(assembler)
+    assert simulator.run(1_000) == STATUS_BRK
+    # X = 0 no fim: o branch não é tomado e o caminho curto é executado
+    assert simulator.memory[0x20] == 0x11 and simulator.memory[0x21] == 0x5A
+
+    # Com X = 1 no fim o branch longo é tomado e pula o STA $20
+    taken = Assembler6502()
+    taken.assemble(RELAX.replace('LDX #$01', 'LDX #$02'))
+    simulator = Simulator6502.from_assembler(taken)
+    assert simulator.run(1_000) == STATUS_BRK
+    assert simulator.memory[0x20] == 0x00 and simulator.memory[0x21] == 0xA5
+    assert simulator.steps < 20
@@ -0,0 +1,61 @@
+"""Montagem em lote: falhas isoladas por fonte e mapa de memória do projeto"""
+
+import batch
+from batch import assemble_batch
+from memorymap import ADDRESS_SPACE, PROJECT_MAP_NAME
+
+PROGRAM = '        .ORG $1000\nINICIO: LDA #$01\n        BRK\n'
+
+
+def test_bad_sources_do_not_abort_the_batch(tmp_path):
+    good = tmp_path / 'bom.asm'
+    good.write_text(PROGRAM)
+    empty_item = tmp_path / 'vazio.asm'
+    empty_item.write_text('        .ORG $1000\n        .WORD $1234,\n')
+    missing = tmp_path / 'inexistente.asm'
+
+    results = assemble_batch([str(good), str(empty_item), str(missing)], workers=1, in_memory=True)
+    assert [result.ok for result in results] == [True, False, False]
+    assert results[0].image[0x1000:0x1003] == bytes((0xA9, 0x01, 0x00))
+    assert results[1].error == 'Linha 2: Operando vazio'
+    assert 'não encontrado' in results[2].error
+
+
+def test_project_memory_map_is_used(tmp_path):
+    source = tmp_path / 'prog.asm'
+    source.write_text(PROGRAM)
+    [result] = assemble_batch([str(source)], workers=1, in_memory=True)
+    assert result.ok and len(result.image) < ADDRESS_SPACE
+
+    # Com memoria.cfg ao lado do fonte, vale o espaço do mapa e as suas regiões
+    (tmp_path / PROJECT_MAP_NAME).write_text('PROGRAMA  ROM  $1000  4K\n')
+    [result] = assemble_batch([str(source)], workers=1, in_memory=True)
+    assert result.ok and len(result.image) == ADDRESS_SPACE
+    assert result.image[0x1000:0x1003] == bytes((0xA9, 0x01, 0x00))
+
+    (tmp_path / PROJECT_MAP_NAME).write_text('LEDS  IO  $1000  $10\n')
+    [result] = assemble_batch([str(source)], workers=1, in_memory=True)
+    assert not result.ok
+
+
+def test_parallel_results_keep_job_order(tmp_path):
+    sources = []
+    for i in range(4):
+        source = tmp_path / f'prog{i}.asm'
+        source.write_text(PROGRAM.replace('#$01', f'#${i:02X}'))
+        sources.append(str(source))
+    results = assemble_batch(sources, workers=2, in_memory=True)
+    assert [result.image[0x1001] for result in results] == [0, 1, 2, 3]
+
+
+def test_shared_decode_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, 'STREAM_DECODE_CACHE', 4)
+    sources = []
+    for i in range(3):
+        source = tmp_path / f'prog{i}.asm'
+        source.write_text('        .ORG $1000\n' + ''.join(f'        LDA ${i:02X}{j:02X}\n' for j in range(8)))
+        sources.append(str(source))
+    results = assemble_batch(sources, workers=1, in_memory=True)
+    assert all(result.ok for result in results)
+    # Cada job começa com o cache acima do limite esvaziado: sobra só o último fonte
+    assert len(batch._decode_cache) == 8
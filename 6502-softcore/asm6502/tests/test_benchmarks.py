@@ -0,0 +1,72 @@
+"""Benchmarks: fontes sintéticos, resultados em JSON e detecção de regressões"""
+
+import pytest
+
+from assembler import Assembler6502
+from benchmarks.__main__ import HIGHER, LOWER, Results, best_time, compare
+from benchmarks.sources import generate_source, runnable_source
+from simulator import STATUS_LIMIT, Simulator6502
+
+
+@pytest.mark.parametrize('lines', [200, 5_000])
+def test_generated_source_assembles(lines):
+    source = generate_source(lines)
+    assert source == generate_source(lines)
+    assert abs(len(source.split('\n')) - lines) <= 2
+    assembler = Assembler6502()
+    assembler.assemble(source)
+    assert assembler.segments
+
+
+def test_runnable_source_never_halts():
+    assembler = Assembler6502()
+    assembler.assemble(runnable_source())
+    simulator = Simulator6502.from_assembler(assembler, translate=True)
+    assert simulator.run(20_000) == STATUS_LIMIT
+
+
+def test_results_round_trip(tmp_path):
+    results = Results()
+    results.add('assembler.parse.1000', 1234.5, 'linhas/s', HIGHER)
+    results.add('memoria.pico', 10.0, 'KiB', LOWER)
+    filename = str(tmp_path / 'bench.json')
+    results.save(filename)
+    assert Results.load(filename).metrics == results.metrics
+
+    (tmp_path / 'outro.json').write_text('{"format": "outro", "version": 1}')
+    with pytest.raises(ValueError, match='Arquivo de resultados inválido'):
+        Results.load(str(tmp_path / 'outro.json'))
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = Results({
+        'rapido': {'value': 100.0, 'unit': 'linhas/s', 'better': HIGHER},
+        'lento': {'value': 100.0, 'unit': 'linhas/s', 'better': HIGHER},
+        'memoria': {'value': 100.0, 'unit': 'KiB', 'better': LOWER},
+        'estavel': {'value': 100.0, 'unit': 'KiB', 'better': LOWER},
+    })
+    current = Results({
+        'rapido': {'value': 150.0, 'unit': 'linhas/s', 'better': HIGHER},
+        'lento': {'value': 85.0, 'unit': 'linhas/s', 'better': HIGHER},
+        'memoria': {'value': 115.0, 'unit': 'KiB', 'better': LOWER},
+        'estavel': {'value': 105.0, 'unit': 'KiB', 'better': LOWER},
+        'nova': {'value': 1.0, 'unit': 'KiB', 'better': LOWER},
+    })
+    assert compare(current, baseline, 0.10) == ['lento', 'memoria']
+    assert compare(current, baseline, 0.20) == []
+
+
+def test_best_time_prepares_fresh_arguments():
+    prepared = []
+
+    def setup() -> tuple:
+        prepared.append([])
+        return (prepared[-1],)
+
+    def function(values: list) -> None:
+        # Cada execução precisa receber um objeto ainda não usado
+        assert not values
+        values.append(1)
+
+    assert best_time(function, 4, setup) >= 0
+    assert len(prepared) == 4
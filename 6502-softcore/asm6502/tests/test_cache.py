@@ -0,0 +1,115 @@
+"""Cache em disco: acerto, falha e invalidação por conteúdo"""
+
+from assembler import Assembler6502
+from cache import AssemblyCache, segment_refs
+from memorymap import MemoryMap
+
+SOURCE = """
+        .ORG $1000
+START:  LDA #<TABELA
+        LDX #>TABELA
+        JSR ROTINA
+        JMP START
+ROTINA: RTS
+        .ORG $1100
+TABELA: .WORD <ROTINA, >ROTINA, START
+"""
+
+
+def build(cache: AssemblyCache, path) -> tuple:
+    assembler = Assembler6502()
+    hit = cache.assemble_file(assembler, str(path))
+    return hit, assembler
+
+
+def image(assembler: Assembler6502) -> bytes:
+    return bytes(assembler.memory)
+
+
+def test_second_build_is_a_hit_with_same_output(tmp_path):
+    source = tmp_path / 'prog.asm'
+    source.write_text(SOURCE)
+    cache = AssemblyCache(str(tmp_path / 'cache'))
+
+    hit, first = build(cache, source)
+    assert not hit and cache.hits == 0
+    hit, second = build(cache, source)
+    assert hit and cache.hits == 1
+
+    plain = Assembler6502()
+    plain.assemble(SOURCE)
+    assert image(first) == image(second) == image(plain)
+    assert second.labels == plain.labels
+
+
+def test_edit_misses_and_reuses_unchanged_segments(tmp_path):
+    source = tmp_path / 'prog.asm'
+    source.write_text(SOURCE)
+    cache = AssemblyCache(str(tmp_path / 'cache'))
+    build(cache, source)
+    assert cache.segment_misses == 2
+
+    # Só a tabela em $1100 muda; o segmento de $1000 vem do cache
+    edited = SOURCE.replace('>ROTINA, START', '>ROTINA, START, $BEEF')
+    source.write_text(edited)
+    hit, assembler = build(cache, source)
+    assert not hit
+    assert cache.segment_hits == 1 and cache.segment_misses == 3
+    plain = Assembler6502()
+    plain.assemble(edited)
+    assert image(assembler) == image(plain)
+
+
+def test_moved_label_invalidates_dependent_segment(tmp_path):
+    source = tmp_path / 'prog.asm'
+    source.write_text(SOURCE)
+    cache = AssemblyCache(str(tmp_path / 'cache'))
+    build(cache, source)
+
+    # Um NOP antes de ROTINA muda o endereço usado pela tabela em $1100
+    edited = SOURCE.replace('ROTINA: RTS', '        NOP\nROTINA: RTS')
+    source.write_text(edited)
+    hit, assembler = build(cache, source)
+    assert not hit
+    plain = Assembler6502()
+    plain.assemble(edited)
+    assert image(assembler) == image(plain)
+    assert assembler.memory[0x1100] == plain.labels['ROTINA'] & 0xFF
+
+
+def test_include_change_invalidates_source_entry(tmp_path):
+    (tmp_path / 'lib.inc').write_text('VALOR:  LDA #$01\n        RTS\n')
+    source = tmp_path / 'main.asm'
+    source.write_text('        .ORG $1000\n        JSR VALOR\n        BRK\n        .INCLUDE "lib.inc"\n')
+    cache = AssemblyCache(str(tmp_path / 'cache'))
+    build(cache, source)
+    hit, _ = build(cache, source)
+    assert hit
+
+    (tmp_path / 'lib.inc').write_text('VALOR:  LDA #$02\n        RTS\n')
+    hit, assembler = build(cache, source)
+    assert not hit
+    assert assembler.memory[assembler.labels['VALOR'] + 1] == 0x02
+
+
+def test_segment_refs_strip_byte_selectors():
+    assembler = Assembler6502()
+    statements = assembler.parse(SOURCE.split('\n'))
+    assert segment_refs(statements) == ['ROTINA', 'START', 'TABELA']
+
+
+def test_memory_map_is_part_of_the_key(tmp_path):
+    source = tmp_path / 'io.asm'
+    source.write_text('        .ORG $1000\n        STX $8001\n        LDA $8001\n        CLC\n        ADC #$01\n        BRK\n')
+    cache = AssemblyCache(str(tmp_path / 'cache'))
+    all_ram = MemoryMap.parse(['ESPACO 64K', 'RAM  RAM  $0000  64K'])
+    with_io = MemoryMap.parse(['ESPACO 64K', 'RAM  RAM  $0000  32K', 'LEDS  IO  $8000  $10'])
+
+    assembler = Assembler6502(optimize=True, memory_map=all_ram)
+    cache.assemble_file(assembler, str(source))
+    assert assembler.memory[0x1003] == 0x8A  # TXA
+
+    assembler = Assembler6502(optimize=True, memory_map=with_io)
+    hit = cache.assemble_file(assembler, str(source))
+    assert not hit
+    assert assembler.memory[0x1003] == 0xAD  # LDA $8001 (E/S não vira transferência)
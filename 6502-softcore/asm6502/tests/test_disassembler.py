@@ -0,0 +1,60 @@
+"""Disassembler: o fonte gerado monta de volta os mesmos bytes"""
+
+import os
+
+import memimage
+from assembler import MEMORY_SIZE, Assembler6502
+from disassembler import decode, disassemble
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def reassemble(lines: list) -> bytearray:
+    assembler = Assembler6502()
+    assembler.assemble('\n'.join(lines) + '\n')
+    return assembler.memory
+
+
+def test_exemplo_mif_round_trip():
+    memory = memimage.read_mif(os.path.join(HERE, 'exemplo.mif'))
+    lines = disassemble(memory)
+    assert reassemble(lines) == memory
+    # Destinos de desvio viram labels
+    assert any(line.startswith('L_') for line in lines)
+
+
+def test_non_canonical_and_invalid_bytes_become_data(tmp_path):
+    image = bytearray(MEMORY_SIZE)
+    code = bytes([
+        0xAD, 0x10, 0x00,   # LDA $0010 em modo absoluto: o assembler usaria página zero
+        0x02,               # opcode inválido
+        0xD0, 0xFA,         # BNE para o início
+        0x20, 0x0A, 0x10,   # JSR $100A
+        0x00,               # BRK
+        0x60,               # RTS
+    ])
+    image[0x1000:0x1000 + len(code)] = code
+    filename = str(tmp_path / 'imagem.hex')
+    memimage.write_hex(image, filename)
+    memory = memimage.read_image(filename)
+
+    lines = disassemble(memory, [(0x1000, 0x1000 + len(code))], symbols={0x100A: 'SAIDA'},
+                        show_bytes=False)
+    assert lines == ['    .ORG $1000',
+                     'L_1000:',
+                     '    .BYTE $AD, $10, $00  ; LDA $0010',
+                     '    .BYTE $02',
+                     '    BNE L_1000',
+                     '    JSR SAIDA',
+                     '    BRK',
+                     'SAIDA:',
+                     '    RTS']
+    assert reassemble(lines) == memory
+
+
+def test_decode_stops_at_region_end():
+    # STA absoluto sem espaço para o operando: bytes de dados
+    memory = bytearray([0xA9, 0x01, 0x8D, 0x02])
+    instructions = decode(memory, 0, len(memory))
+    assert [ins.mnemonic for ins in instructions] == ['LDA', None, None]
+    assert [ins.address for ins in instructions] == [0, 2, 3]
@@ -0,0 +1,62 @@
+"""Fuzzer diferencial: acordo entre os modelos, divergências conhecidas e relatório"""
+
+import json
+
+from fuzzer import (Harness, case_rng, fuzz_chunk, generate_program, instruction_pool,
+                    run_fuzzer)
+
+# Diferenças conhecidas do softcore em relação ao 6502 NMOS: sem BCD e sem
+# o bug de página do JMP ($xxFF)
+KNOWN = {'JMP IND: PC'}
+
+DECIMAL = ['        .ORG $1000',
+           '        SED',
+           '        LDX #$05',
+           '        LDA #$09',
+           '        CLC',
+           '        ADC #$01',
+           '        STX $20',
+           '        BRK']
+
+
+def test_generated_programs_are_reproducible():
+    pool = instruction_pool(hardware_only=True)
+    first = generate_program(case_rng(7, 3), 30, pool)
+    assert first == generate_program(case_rng(7, 3), 30, pool)
+    assert first != generate_program(case_rng(7, 4), 30, pool)
+    assert Harness().assemble(first) is not None
+    assert all(mnemonic not in ('BRK', 'RTS', 'RTI') for mnemonic, _ in pool)
+
+
+def test_models_agree_on_hardware_instructions():
+    result = fuzz_chunk((1, 0, 60, 40, 1_000, True, ('SED',)))
+    assert result.cases == 60 and result.invalid == 0
+    assert set(result.counts) <= KNOWN
+
+
+def test_decimal_mode_divergence_is_minimized():
+    harness = Harness()
+    assert harness.check([line for line in DECIMAL if 'SED' not in line]) is None
+    signature, description = harness.check(DECIMAL)
+    assert signature == 'ADC IMM: A'
+    assert 'softcore $0A, 6502 $10' in description
+    minimized = harness.minimize(DECIMAL, signature)
+    assert [line.split()[0] for line in minimized] == ['.ORG', 'SED', 'LDA', 'ADC', 'BRK']
+
+
+def test_parallel_run_matches_sequential_chunks(tmp_path):
+    report = run_fuzzer(40, seed=2, workers=2, length=30, steps=500, hardware_only=False,
+                        exclude=(), chunk=15)
+    counts = {}
+    for first, count in ((0, 15), (15, 15), (30, 10)):
+        for signature, found in fuzz_chunk((2, first, count, 30, 500, False, ())).counts.items():
+            counts[signature] = counts.get(signature, 0) + found
+    assert report.cases == 40
+    assert report.counts == counts
+    assert set(report.examples) == set(counts)
+
+    filename = tmp_path / 'relatorio.json'
+    report.save(str(filename))
+    data = json.loads(filename.read_text())
+    assert data['cases'] == 40
+    assert {entry['signature']: entry['count'] for entry in data['divergences']} == counts
@@ -0,0 +1,76 @@
+"""Detecção de laço ocioso e avanço rápido de laços contadores"""
+
+import pytest
+
+from assembler import Assembler6502
+from simulator import STATUS_IDLE, STATUS_LIMIT, Simulator6502
+
+# Atrasos aninhados com contadores em registrador e na memória; termina em
+# JMP para si mesmo (o "halt" dos programas do softcore)
+DELAY = """
+        .ORG $1000
+INICIO: LDY #$03
+FORA:   LDX #$00
+ATRASO: DEX
+        BNE ATRASO
+MEM1:   DEC $20
+        BNE MEM1
+MEM2:   INC $21
+        BNE MEM2
+        DEY
+        BNE FORA
+        LDA #$AA
+        STA $22
+FIM:    JMP FIM
+"""
+
+
+def assembled() -> Assembler6502:
+    assembler = Assembler6502()
+    assembler.assemble(DELAY)
+    return assembler
+
+
+def state(simulator: Simulator6502) -> tuple:
+    return (simulator.a, simulator.x, simulator.y, simulator.sp, simulator.ps, simulator.pc,
+            simulator.steps, simulator.cycles, bytes(simulator.memory))
+
+
+def reference(assembler: Assembler6502) -> Simulator6502:
+    """Execução instrução a instrução até o JMP FIM"""
+    simulator = Simulator6502.from_assembler(assembler, timing_mode=True)
+    end = assembler.labels['FIM']
+    while simulator.pc != end:
+        simulator.step()
+    return simulator
+
+
+@pytest.mark.parametrize('translate', [False, True])
+def test_fast_forward_matches_step_by_step(translate):
+    assembler = assembled()
+    expected = reference(assembler)
+    simulator = Simulator6502.from_assembler(assembler, timing_mode=True, translate=translate,
+                                             detect_idle=True)
+    assert simulator.run(10_000_000) == STATUS_IDLE
+    # Como o BRK, o desvio para si mesmo que para a execução não é contado
+    assert state(simulator) == state(expected)
+    assert simulator.memory[0x22] == 0xAA
+
+
+def test_fast_forward_respects_step_limit():
+    assembler = assembled()
+    expected = Simulator6502.from_assembler(assembler, timing_mode=True)
+    simulator = Simulator6502.from_assembler(assembler, timing_mode=True, detect_idle=True)
+    # Limites que caem no meio dos laços contadores
+    for limit in (5, 100, 1, 333, 2_000):
+        assert simulator.run(limit) == STATUS_LIMIT
+        for _ in range(limit):
+            expected.step()
+        assert state(simulator) == state(expected)
+
+
+def test_without_detection_idle_loop_runs_to_limit():
+    assembler = assembled()
+    simulator = Simulator6502.from_assembler(assembler)
+    assert simulator.run(50_000) == STATUS_LIMIT
+    assert simulator.pc == assembler.labels['FIM']
@@ -0,0 +1,80 @@
+"""Layout guiado por perfil: mesmo comportamento, menos saltos no caminho quente"""
+
+import pytest
+
+from assembler import Assembler6502
+from layout import load_profile, profile_from_run, save_profile
+from simulator import STATUS_BRK, Simulator6502
+
+# O caminho quente (LACO -> CONTINUA) passa por cima de um bloco frio grande:
+# o JMP é tomado a cada iteração e o BNE LACO vira branch longo
+PROGRAM = """
+        .ORG $1000
+INICIO: LDX #$00
+        LDY #$00
+LACO:   LDA $0300,X
+        BNE RARO
+        JMP CONTINUA
+RARO:   INY
+        .REPT 150
+        NOP
+        .ENDR
+        JMP CONTINUA
+CONTINUA: INX
+        BNE LACO
+        STY $20
+        BRK
+        .ORG $0300
+        .BYTE 0, 0, 7, 0, 0, 0, 0, 9
+"""
+
+
+def assembled(profile=None) -> Assembler6502:
+    assembler = Assembler6502(profile=profile)
+    assembler.assemble(PROGRAM)
+    return assembler
+
+
+def execute(assembler: Assembler6502) -> Simulator6502:
+    simulator = Simulator6502.from_assembler(assembler, timing_mode=True)
+    assert simulator.run(100_000) == STATUS_BRK
+    return simulator
+
+
+def test_layout_keeps_behaviour_and_saves_cycles():
+    plain = assembled()
+    profile = profile_from_run(plain)
+    assert profile['LACO'] == 256 and profile['RARO'] == 2
+
+    laid_out = assembled(profile)
+    report = laid_out.layout_report
+    assert report.skipped is None and report.moved
+    assert sum(count for _, count in report.jumps_removed) >= 254
+    assert report.long_before[1] > 0 and report.long_after == (0, 0)
+    assert report.cycles_saved > 0
+
+    before, after = execute(plain), execute(laid_out)
+    assert (after.a, after.x, after.y, after.sp, after.ps) == (before.a, before.x, before.y, before.sp, before.ps)
+    assert after.memory[0x20] == before.memory[0x20] == 2
+    assert after.cycles < before.cycles
+    assert after.steps < before.steps
+
+
+def test_numeric_targets_skip_layout():
+    assembler = Assembler6502(profile={'INICIO': 1})
+    assembler.assemble("        .ORG $1000\nINICIO: JMP $1003\nFIM:    BRK\n")
+    assert assembler.layout_report.skipped == 'linha 2: JMP para endereço numérico'
+    assert assembler.memory[0x1000:0x1004] == bytes([0x4C, 0x03, 0x10, 0x00])
+
+
+def test_profile_file_round_trip(tmp_path):
+    filename = str(tmp_path / 'perfil.json')
+    save_profile({'LACO': 256, 'RARO': 2}, filename)
+    assert load_profile(filename) == {'LACO': 256, 'RARO': 2}
+
+    # JSON escrito à mão também vale
+    (tmp_path / 'manual.json').write_text('{"LACO": 10}')
+    assert load_profile(str(tmp_path / 'manual.json')) == {'LACO': 10}
+    (tmp_path / 'ruim.json').write_text('{"LACO": "muito"}')
+    with pytest.raises(ValueError, match='Perfil inválido'):
+        load_profile(str(tmp_path / 'ruim.json'))
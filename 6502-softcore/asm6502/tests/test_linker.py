@@ -0,0 +1,133 @@
+"""Linker: cada tipo de relocação aplicado com a base final dos módulos"""
+
+import pytest
+
+from assembler import Assembler6502
+from linker import Linker, ObjectModule, Relocation, assemble_object, compile_file
+from memorymap import MemoryMap
+
+MAIN = """
+        .IMPORT ROTINA, VOLTA
+        .EXPORT INICIO
+INICIO: LDA #<TABELA
+        LDX #>TABELA
+        JSR ROTINA
+        BNE VOLTA
+        BRK
+TABELA: .WORD ROTINA, <INICIO, >INICIO
+"""
+
+LIB = """
+        .IMPORT INICIO
+        .EXPORT ROTINA, VOLTA
+ROTINA: RTS
+VOLTA:  JMP INICIO
+"""
+
+
+def relocation_kinds(module):
+    return {(offset, kind, symbol) for offset, kind, symbol in module.relocations}
+
+
+def test_object_lists_every_relocation_kind():
+    module = assemble_object(MAIN, 'main')
+    assert relocation_kinds(module) == {
+        (1, Relocation.LOW, 'TABELA'),
+        (3, Relocation.HIGH, 'TABELA'),
+        (5, Relocation.WORD, 'ROTINA'),
+        (8, Relocation.REL, 'VOLTA'),
+        (10, Relocation.WORD, 'ROTINA'),
+        # .WORD <LABEL/>LABEL: só o byte baixo depende do símbolo, sem o seletor
+        (12, Relocation.LOW, 'INICIO'),
+        (14, Relocation.HIGH, 'INICIO'),
+    }
+
+
+def test_link_matches_absolute_assembly():
+    main = assemble_object(MAIN, 'main')
+    lib = assemble_object(LIB, 'lib')
+    linker = Linker()
+    linker.add(main, 0x1000)
+    linker.add(lib, 0x1010)
+    memory = linker.link()
+
+    # Mesmo programa montado direto nos endereços finais
+    absolute = Assembler6502()
+    absolute.assemble("""
+        .ORG $1000
+INICIO: LDA #<TABELA
+        LDX #>TABELA
+        JSR ROTINA
+        BNE VOLTA
+        BRK
+TABELA: .WORD ROTINA, <INICIO, >INICIO
+        .ORG $1010
+ROTINA: RTS
+VOLTA:  JMP INICIO
+""")
+    end = 0x1010 + len(lib.code)
+    assert memory[0x1000:end] == absolute.memory[0x1000:end]
+    assert linker.symbols == {'INICIO': 0x1000, 'ROTINA': 0x1010, 'VOLTA': 0x1011}
+
+
+def test_free_placement_skips_occupied_range():
+    lib = assemble_object(LIB, 'lib')
+    main = assemble_object(MAIN, 'main')
+    linker = Linker()
+    linker.add(lib, linker.start)
+    linker.add(main)
+    assert linker.bases['main'] == linker.start + len(lib.code)
+    linker.link()
+
+
+def test_branch_to_import_out_of_range():
+    far = assemble_object('        .EXPORT VOLTA\n        .BYTE ' + ', '.join(['0'] * 200)
+                          + '\nVOLTA:  RTS\n', 'far')
+    main = assemble_object(MAIN, 'main')
+    lib = assemble_object(LIB.replace('VOLTA', 'OUTRA'), 'lib')
+    linker = Linker()
+    linker.add(main, 0x1000)
+    linker.add(lib, 0x1010)
+    linker.add(far, 0x1020)
+    with pytest.raises(ValueError, match='fora do alcance'):
+        linker.link()
+
+
+def test_unresolved_import():
+    linker = Linker()
+    linker.add(assemble_object(MAIN, 'main'))
+    with pytest.raises(ValueError, match="símbolo não resolvido 'ROTINA'"):
+        linker.link()
+
+
+def test_stale_object_rebuilt_when_options_change(tmp_path):
+    source = tmp_path / 'mod.asm'
+    source.write_text('        .EXPORT F\nF:      STX $10\n        LDA $10\n        CLC\n        ADC #1\n        RTS\n')
+    plain = compile_file(str(source))
+    assert plain.options == {'optimize': False, 'memory_map': None}
+    assert compile_file(str(source)).code == plain.code
+
+    # Objeto mais novo que o fonte, mas montado sem -O: é refeito
+    optimized = compile_file(str(source), optimize=True)
+    assert optimized.options['optimize'] and len(optimized.code) < len(plain.code)
+    assert ObjectModule.load(str(tmp_path / 'mod.obj')).options == optimized.options
+
+    memory_map = MemoryMap.parse(['RAM  RAM  $0000  $4000'])
+    mapped = compile_file(str(source), optimize=True, memory_map=memory_map)
+    assert mapped.options['memory_map'] == memory_map.fingerprint()
+
+
+def test_linker_places_modules_in_map_regions():
+    memory_map = MemoryMap.parse(['ZP  RAM  $0000  $0100', 'LEDS  IO  $1000  $10',
+                                  'PROGRAMA  ROM  $2000  $1000'])
+    main = assemble_object(MAIN, 'main', memory_map=memory_map)
+    lib = assemble_object(LIB, 'lib', memory_map=memory_map)
+    linker = Linker(memory_map=memory_map)
+    linker.add(main)
+    linker.add(lib)
+    assert len(linker.memory) == memory_map.size
+    assert linker.bases == {'main': 0x2000, 'lib': 0x2000 + len(main.code)}
+    linker.link()
+
+    with pytest.raises(ValueError, match='fora das regiões RAM/ROM'):
+        Linker(memory_map=memory_map).add(lib, 0x1000)
@@ -0,0 +1,107 @@
+"""Listagem: expansões de macro/.REPT, código incluído sob a linha de origem e laços"""
+
+import re
+
+from assembler import Assembler6502, StatementKind, statement_cycles
+
+MAIN = """        .MACRO DOIS
+        NOP
+        NOP
+        .ENDM
+        .ORG $1000
+INICIO: DOIS
+        .INCLUDE "lib.inc"
+        .REPT 2
+        INY
+        .ENDR
+        BRK
+"""
+
+
+def listing(tmp_path):
+    (tmp_path / 'lib.inc').write_text('X:      INX\n        RTS\n')
+    source = tmp_path / 'main.asm'
+    source.write_text(MAIN)
+    assembler = Assembler6502()
+    assembler.source_name = str(source)
+    assembler.assemble(MAIN)
+    output = tmp_path / 'main.lst'
+    assembler.generate_listing(MAIN.split('\n'), str(output))
+    return assembler, output.read_text().split('\n')
+
+
+def rows(lines):
+    """Linhas da tabela com endereço e bytes: (endereço, bytes, linha, texto)"""
+    result = []
+    for line in lines[1:]:
+        if not line or line.startswith('Total'):
+            break
+        match = re.match(r'([0-9A-F]{4})  ((?:[0-9A-F]{2} ?)+)\s+\d+\s+(\d*)\s+(.*)$', line)
+        if match:
+            result.append((match.group(1), match.group(2).strip(), match.group(3), match.group(4)))
+    return result
+
+
+def test_every_statement_has_a_row_in_order(tmp_path):
+    assembler, lines = listing(tmp_path)
+    code = [(f"{st.address:04X}", st) for st in assembler.statements if st.size]
+    listed = rows(lines)
+    assert [address for address, _, _, _ in listed] == [address for address, _ in code]
+    assert [encoded for _, encoded, _, _ in listed] == ['EA', 'EA', 'E8', '60', 'C8', 'C8', '00']
+
+
+def test_expansions_follow_their_source_line(tmp_path):
+    _, lines = listing(tmp_path)
+    listed = rows(lines)
+    # Macro: os NOPs logo abaixo da linha da chamada (que tem o label), sem número
+    call_row = next(i for i, line in enumerate(lines) if 'INICIO: DOIS' in line)
+    assert lines[call_row].startswith('1000')
+    assert lines[call_row + 1].startswith('1000  EA') and lines[call_row + 2].startswith('1001  EA')
+    assert listed[0][2] == listed[1][2] == ''
+    # Incluído: sob a linha do .INCLUDE, com arquivo:linha
+    assert listed[2][3] == 'lib.inc:1  X: INX'
+    assert listed[3][3] == 'lib.inc:2  RTS'
+    include_row = next(i for i, line in enumerate(lines) if '.INCLUDE' in line)
+    assert lines[include_row + 1].startswith('1002')
+    # .REPT: corpo repetido sob a linha do INY
+    assert listed[4][2] == '9' and listed[5][2] == ''
+
+
+def test_total_cycles_cover_all_statements(tmp_path):
+    assembler, lines = listing(tmp_path)
+    expected = sum(statement_cycles(st) for st in assembler.statements
+                   if st.kind == StatementKind.INSTRUCTION)
+    total = next(line for line in lines if line.startswith('Total'))
+    assert total == f"Total: 7 bytes, {expected} ciclos (uma passagem por instrução)"
+
+
+LOOPS = """        .ORG $1000
+INICIO: LDX #$03
+FORA:   LDY #$02
+DENTRO: DEY
+        BNE DENTRO
+        DEX
+        BNE FORA
+        JMP FIM
+FIM:    BRK
+"""
+
+
+def test_loop_report_orders_by_cycles(tmp_path):
+    assembler = Assembler6502()
+    assembler.assemble(LOOPS)
+    loops = assembler.find_loops()
+    # Só os saltos para trás viram laços; o JMP para frente fica de fora
+    assert [(label, start, count) for label, start, _, _, count, _ in loops] == [
+        ('FORA', 0x1002, 5), ('DENTRO', 0x1004, 2)]
+    by_address = {st.address: st for st in assembler.statements if st.size}
+    assert loops[1][5] == statement_cycles(by_address[0x1004]) + statement_cycles(by_address[0x1005])
+    assert loops[0][3] == 7
+
+    output = tmp_path / 'loops.lst'
+    assembler.generate_listing(LOOPS.split('\n'), str(output), clock_hz=1_000_000)
+    report = output.read_text().split('Laços encontrados')[1].split('\n')
+    assert report[0] == ' (custo por iteração a 1 MHz):'
+    assert report[1].split()[:2] == ['FORA', '$1002-$1008']
+    assert report[2].split()[:2] == ['DENTRO', '$1004-$1005']
+    assert f"{loops[1][5]} ciclos" in ' '.join(report[2].split())
@@ -0,0 +1,108 @@
+"""Leitura e escrita de .mif, Intel HEX e .bin"""
+
+import os
+
+import pytest
+
+import memimage
+from assembler import Assembler6502
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_mif_round_trip_keeps_every_byte(tmp_path):
+    memory = bytearray(256) * 64
+    memory[0x1000:0x1010] = bytes(range(16))
+    memory[0x2000:0x2100] = b'\xEA' * 256
+    output = tmp_path / 'imagem.mif'
+    memimage.write_mif(memory, str(output))
+    assert memimage.read_mif(str(output)) == memory
+
+
+def test_mif_content_and_begin_on_separate_lines(tmp_path):
+    output = tmp_path / 'quartus.mif'
+    output.write_text("DEPTH = 16;\nWIDTH = 8;\nADDRESS_RADIX = HEX;\nDATA_RADIX = HEX;\n"
+                      "CONTENT\nBEGIN\n    0 : 12;\n    [1..3] : AB;\nEND;\n")
+    assert memimage.read_mif(str(output)) == bytes.fromhex('12ababab') + bytes(12)
+
+    output.write_text("DEPTH = 8;\nWIDTH = 8;\nCONTENT BEGIN 2 : 7F; END;\n")
+    assert memimage.read_mif(str(output)) == bytes((0, 0, 0x7F)) + bytes(5)
+
+
+def test_hex_round_trip(tmp_path):
+    assembler = Assembler6502()
+    with open(os.path.join(HERE, 'exemplo.asm'), 'r') as f:
+        assembler.assemble(f.read())
+    output = tmp_path / 'exemplo.hex'
+    memimage.write_hex(assembler.memory, str(output), assembler.segments)
+    assert memimage.read_hex(str(output)) == assembler.memory
+
+
+@pytest.mark.parametrize('record', [':', ':00', ':0400000001', ':0100000000'])
+def test_short_or_corrupt_hex_record(tmp_path, record):
+    output = tmp_path / 'ruim.hex'
+    output.write_text(record + '\n')
+    with pytest.raises(ValueError, match='Linha 1: '):
+        memimage.read_hex(str(output))
+
+
+def test_sparse_image_honours_ranges_in_every_format(tmp_path):
+    memory = bytearray(1 << 16)
+    memory[0x1000:0x1003] = b'\xA9\x01\x00'
+    memory[0xFFFC:0xFFFE] = b'\x00\x10'
+    ranges = [(0x1000, 0x1003), (0xFFFC, 0xFFFE)]
+
+    mif = tmp_path / 'esparso.mif'
+    assert memimage.write_image(memory, str(mif), ranges, sparse=True) == 'MIF'
+    content = mif.read_text()
+    assert 'DEPTH = 65536;' in content and '[' not in content  # nenhum range de zeros
+    assert memimage.read_mif(str(mif)) == memory
+
+    binary = tmp_path / 'esparso.bin'
+    assert memimage.write_image(memory, str(binary), [(0x1000, 0x1003)], sparse=True) == 'BIN'
+    assert binary.read_bytes() == bytes(memory[:0x1003])
+
+    # Sem `sparse`, .mif e .bin cobrem a memória inteira
+    memimage.write_image(memory, str(binary), ranges)
+    assert len(binary.read_bytes()) == len(memory)
+    with pytest.raises(ValueError):
+        memimage.write_image(memory, str(binary), None, sparse=True)
+
+
+def test_mif_writer_groups_runs_and_honours_ranges(tmp_path):
+    memory = bytearray(0x100)
+    memory[0x10:0x20] = b'\xFF' * 16
+    memory[0x20] = 0x01
+    output = tmp_path / 'runs.mif'
+    memimage.write_mif(memory, str(output))
+    content = output.read_text().split('CONTENT BEGIN\n', 1)[1]
+    assert content == ("    [0000..000F] : 00;\n    [0010..001F] : FF;\n    0020 : 01;\n"
+                       "    [0021..00FF] : 00;\nEND;\n")
+
+    memimage.write_mif(memory, str(output), [(0x1E, 0x22)])
+    content = output.read_text().split('CONTENT BEGIN\n', 1)[1]
+    assert content == "    [001E..001F] : FF;\n    0020 : 01;\n    0021 : 00;\nEND;\n"
+
+
+def test_hex_writer_splits_records_above_64k(tmp_path):
+    memory = bytearray(0x20000)
+    memory[0xFFF8:0x10008] = bytes(range(1, 17))
+    output = tmp_path / 'grande.hex'
+    memimage.write_hex(memory, str(output), [(0xFFF8, 0x10008)])
+    records = output.read_text().split()
+    # Dados até $FFFF, registro de endereço estendido e o resto na página 1
+    assert records == [memimage.hex_record(0xFFF8, 0x00, bytes(range(1, 9))).strip(),
+                       ':020000040001F9',
+                       memimage.hex_record(0x0000, 0x00, bytes(range(9, 17))).strip(),
+                       ':00000001FF']
+    assert memimage.read_hex(str(output), len(memory)) == memory
+
+
+def test_chunked_writer_matches_unchunked(tmp_path, monkeypatch):
+    memory = bytes(i * 7 & 0xFF for i in range(0x4000))
+    whole = tmp_path / 'inteiro.mif'
+    memimage.write_mif(memory, str(whole))
+    monkeypatch.setattr(memimage, 'CHUNK_LINES', 3)
+    chunked = tmp_path / 'pedacos.mif'
+    memimage.write_mif(memory, str(chunked))
+    assert chunked.read_text() == whole.read_text()
@@ -0,0 +1,86 @@
+"""Mapa de memória: regiões, memória esparsa, montagem e erros de barramento"""
+
+import pytest
+
+from assembler import Assembler6502
+from memorymap import IO, RAM, ROM, MemoryMap, SparseMemory
+from simulator import STATUS_BRK, Simulator6502
+
+MAP = """
+# nome      tipo  início  tamanho
+ZP          RAM   $0000   $0100
+PILHA       RAM   $0100   $0100
+DADOS       RAM   0x0200  512
+PROGRAMA    ROM   $F000   4K
+LEDS        IO    $8000   $0010
+"""
+
+
+def memory_map() -> MemoryMap:
+    return MemoryMap.parse(MAP.split('\n'))
+
+
+def test_parse_and_lookup():
+    regions = memory_map()
+    assert [(region.name, region.kind, region.start, region.size) for region in regions] == [
+        ('ZP', RAM, 0x0000, 0x100), ('PILHA', RAM, 0x100, 0x100), ('DADOS', RAM, 0x200, 0x200),
+        ('LEDS', IO, 0x8000, 0x10), ('PROGRAMA', ROM, 0xF000, 0x1000)]
+    assert regions.size == 0x10000
+    assert regions.region_at(0x8005).name == 'LEDS'
+    assert regions.region_at(0x0400) is None
+    # IO não recebe código: conta como buraco
+    assert regions.uncovered(0x0300, 0x0500) == [(0x0400, 0x0500)]
+    assert regions.uncovered(0x7FF0, 0x8010) == [(0x7FF0, 0x8010)]
+    assert regions.uncovered(0xF000, 0x10000) == []
+
+    assert MemoryMap.parse(['ESPACO 32K', 'RAM RAM 0 32K']).size == 0x8000
+    with pytest.raises(ValueError, match="'B' sobrepõe 'A'"):
+        MemoryMap.parse(['A RAM $0000 $200', 'B RAM $0100 $100'])
+    with pytest.raises(ValueError, match="linha 2: esperado 'nome tipo início tamanho'"):
+        MemoryMap.parse(['A RAM $0000 $200', 'B RAM $0200'])
+
+
+def test_sparse_memory_allocates_only_written_pages():
+    memory = SparseMemory()
+    assert len(memory) == 0x10000 and memory[0xF123] == 0
+    memory[0xF0FE:0xF102] = b'\x01\x02\x03\x04'
+    memory[0x0010] = 0
+    assert memory[0xF0FF:0xF101] == b'\x02\x03'
+    assert memory.used_pages() == [0xF0, 0xF1]
+    with pytest.raises(ValueError):
+        memory[0:2] = b'\x01'
+
+
+def test_assembler_places_code_only_in_ram_or_rom():
+    assembler = Assembler6502(memory_map=memory_map())
+    assembler.assemble("        .ORG $F000\nINICIO: LDA #$01\n        STA $8000\n        BRK\n")
+    assert assembler.sparse
+    assert assembler.memory[0xF000:0xF002] == b'\xA9\x01'
+    assert assembler.memory.used_pages() == [0xF0]
+
+    with pytest.raises(ValueError, match=r'Linha 4: \$8000-\$8001 em região'):
+        Assembler6502(memory_map=memory_map()).assemble(
+            "        .ORG $F000\n        NOP\n        .ORG $8000\n        .BYTE 1, 2\n")
+    with pytest.raises(ValueError, match='nenhuma região do mapa de memória'):
+        Assembler6502(memory_map=memory_map()).assemble("        .ORG $0400\n        NOP\n")
+
+
+def test_simulator_reports_writes_outside_ram_and_io():
+    source = """
+        .ORG $F000
+INICIO: LDA #$55
+        STA $0300
+        STA $8001
+        STA $F100
+        STA $4000
+        BRK
+"""
+    assembler = Assembler6502(memory_map=memory_map())
+    assembler.assemble(source)
+    for translate in (False, True):
+        simulator = Simulator6502.from_assembler(assembler, start=0xF000, translate=translate)
+        assert simulator.run(100) == STATUS_BRK
+        assert simulator.memory[0x0300] == simulator.memory[0x8001] == 0x55
+        # ROM e endereço fora do mapa: a escrita não acontece e fica registrada
+        assert simulator.memory[0xF100] == simulator.memory[0x4000] == 0
+        assert simulator.bus_errors == [(0xF008, 0xF100, 0x55), (0xF00B, 0x4000, 0x55)]
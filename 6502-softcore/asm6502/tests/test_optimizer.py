@@ -0,0 +1,107 @@
+"""Otimizador peephole: equivalência no simulador e modelo de flags do hardware"""
+
+import random
+
+import pytest
+
+from assembler import Assembler6502
+from memorymap import MemoryMap
+from simulator import STATUS_BRK, Simulator6502
+
+# Trechos que disparam as regras, misturados com instruções que usam o carry
+SNIPPETS = [
+    ['STX $10', 'LDA $10', 'CLC', 'ADC #$05'],
+    ['STY $11', 'LDA $11', 'SEC', 'SBC #$01'],
+    ['STA $12', 'LDX $12', 'CLC', 'ADC $12'],
+    ['STA $13', 'LDY $13', 'SEC', 'ROL A'],
+    ['CLC', 'CLC', 'ADC #$7F'],
+    ['SEC', 'SEC', 'ROR A'],
+    ['SEC', 'INX', 'SEC', 'ADC #$01'],
+    ['CLC', 'TAX', 'CLC', 'ADC $10'],
+    ['STX $14', 'LDA $14', 'ADC #$03'],
+    ['INX', 'INY', 'EOR #$5A', 'STA $15'],
+]
+
+
+def random_program(rng: random.Random, length: int = 12) -> str:
+    lines = ['        LDA #$21', '        LDX #$42', '        LDY #$07']
+    for i in range(length):
+        snippet = rng.choice(SNIPPETS)
+        if rng.random() < 0.3:
+            # JMP para a instrução seguinte (regra jump_to_next)
+            lines.append(f'        JMP N{i}')
+            lines.append(f'N{i}:')
+        lines.extend(f'        {line}' for line in snippet)
+    lines.append('        BRK')
+    return '\n'.join(lines) + '\n'
+
+
+def final_state(assembler: Assembler6502) -> tuple:
+    simulator = Simulator6502.from_assembler(assembler)
+    assert simulator.run(10_000) == STATUS_BRK
+    return (simulator.a, simulator.x, simulator.y, simulator.sp, simulator.ps,
+            bytes(simulator.memory[:0x100]))
+
+
+def rewrites(source: str, memory_map=None) -> list:
+    assembler = Assembler6502(optimize=True, memory_map=memory_map)
+    assembler.assemble(source)
+    return [rule for rule, *_ in assembler.optimization_report.rewrites]
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_optimized_program_matches_simulator(seed):
+    source = random_program(random.Random(seed))
+    plain = Assembler6502()
+    plain.assemble(source)
+    optimized = Assembler6502(optimize=True)
+    optimized.assemble(source)
+    assert final_state(optimized) == final_state(plain)
+
+
+def test_random_programs_exercise_every_rule():
+    applied = set()
+    for seed in range(40):
+        applied.update(rewrites(random_program(random.Random(seed))))
+    assert applied == {'store/load -> transferência', 'CLC/SEC redundante',
+                       'JMP para a próxima instrução'}
+
+
+def test_alu_instructions_clobber_carry():
+    # No hardware INX grava o carry da ALU: o segundo SEC é necessário
+    assert rewrites("  SEC\n  INX\n  SEC\n  ADC #1\n  BRK\n") == []
+    assert rewrites("  SEC\n  LDA #1\n  SEC\n  ADC #1\n  BRK\n") == ['CLC/SEC redundante']
+
+
+def test_transfer_only_when_carry_is_dead():
+    # TXA zera o carry no hardware e o LDA não
+    assert rewrites("  STX $10\n  LDA $10\n  ADC #1\n  BRK\n") == []
+    assert rewrites("  STX $10\n  LDA $10\n  CLC\n  ADC #1\n  BRK\n") == ['store/load -> transferência']
+
+
+def test_store_load_on_io_is_kept():
+    memory_map = MemoryMap.parse(['RAM RAM $0000 $4000', 'LEDS IO $8000 $10'])
+    source = "LEDS: .EQU $8000\n  .ORG $1000\n  STX LEDS\n  LDA LEDS\n  CLC\n  STX $8001\n  LDA $8001\n  SEC\n  BRK\n"
+    assert rewrites(source, memory_map) == []
+    assert rewrites("  STX $20\n  LDA $20\n  CLC\n  ADC #1\n  BRK\n", memory_map) == ['store/load -> transferência']
+
+
+def test_transfer_only_when_overflow_is_dead_or_clear():
+    # TXA zera o V no hardware e o LDA não
+    assert rewrites("  STX $10\n  LDA $10\n  BVS FIM\nFIM: BRK\n") == []
+    assert rewrites("  STX $10\n  LDA $10\n  CLC\n  ADC #1\n  BVS FIM\nFIM: BRK\n") == [
+        'store/load -> transferência']
+    # Com V já zerado (CLV) só falta C, Z e N estarem mortos
+    assert rewrites("  CLV\n  CLC\n  STX $10\n  LDA $10\n  CMP #1\n  BRK\n") == [
+        'store/load -> transferência']
+    assert rewrites("  CLC\n  STX $10\n  LDA $10\n  CMP #1\n  BRK\n") == []
+
+
+def test_transfer_only_when_zero_and_negative_are_dead():
+    # TXA grava Z/N do valor no hardware e o LDA não altera o PS
+    assert rewrites("  STX $10\n  LDA $10\n  BEQ FIM\nFIM: BRK\n") == []
+    assert rewrites("  STX $10\n  LDA $10\n  BMI FIM\nFIM: BRK\n") == []
+    assert rewrites("  STX $10\n  LDA $10\n  CLC\n  PHP\n  BRK\n") == []
+    # ASL A sobrescreve C, Z e N nos dois modelos, mas V só no hardware
+    assert rewrites("  CLV\n  STX $10\n  LDA $10\n  ASL A\n  BRK\n") == ['store/load -> transferência']
+    assert rewrites("  STX $10\n  LDA $10\n  ASL A\n  BRK\n") == []
@@ -0,0 +1,83 @@
+"""Profiler: contagens por PC e label, pilhas folded e modo de amostragem"""
+
+import pytest
+
+import timing
+from assembler import Assembler6502
+from profiler import Profiler
+from simulator import STATUS_BRK, Simulator6502
+
+# INICIO chama EXTERNA 3 vezes; EXTERNA chama INTERNA, que tem um laço de atraso
+PROGRAM = """
+        .ORG $1000
+INICIO: LDY #$03
+VOLTA:  JSR EXTERNA
+        DEY
+        BNE VOLTA
+        BRK
+EXTERNA: INC $20
+        JSR INTERNA
+        RTS
+INTERNA: LDX #$04
+ATRASO: DEX
+        BNE ATRASO
+        RTS
+"""
+
+
+def assembled() -> Assembler6502:
+    assembler = Assembler6502()
+    assembler.assemble(PROGRAM)
+    return assembler
+
+
+def profiled(interval=None, **options) -> Profiler:
+    assembler = assembled()
+    simulator = Simulator6502.from_assembler(assembler, timing_mode=True, **options)
+    profiler = Profiler(simulator, assembler.labels, interval)
+    assert profiler.run(100_000) == STATUS_BRK
+    return profiler
+
+
+@pytest.mark.parametrize('detect_idle', [False, True])
+def test_exact_counts_match_plain_run(detect_idle):
+    plain = Simulator6502.from_assembler(assembled(), timing_mode=True)
+    plain.run(100_000)
+    profiler = profiled(detect_idle=detect_idle)
+    assert profiler.total_instructions == plain.steps == profiler.simulator.steps
+    assert profiler.total_cycles == plain.cycles == profiler.simulator.cycles
+    assert sum(profiler.counts) == plain.steps
+    assert sum(profiler.cycles) == plain.cycles
+
+    labels = profiler.labels
+    assert profiler.counts[labels['ATRASO']] == 12
+    assert profiler.label_hits() == {'INICIO': 1, 'VOLTA': 3, 'EXTERNA': 3, 'INTERNA': 3, 'ATRASO': 12}
+    by_label = {label: count for label, count, _ in profiler.by_label()}
+    # ATRASO: DEX + BNE por iteração, mais o RTS final de cada chamada
+    assert by_label['ATRASO'] == 3 * (2 * 4 + 1)
+
+
+def test_folded_stacks_follow_jsr_and_rts(tmp_path):
+    profiler = profiled()
+    stacks = dict(line.rsplit(' ', 1) for line in profiler.folded_lines())
+    assert set(stacks) == {'INICIO', 'INICIO;EXTERNA', 'INICIO;EXTERNA;INTERNA'}
+    assert sum(int(cycles) for cycles in stacks.values()) == profiler.total_cycles
+    # Cada chamada de INTERNA: LDX, 4x (DEX + BNE) e o RTS
+    inner = timing.CYCLES[0xA2] + 4 * (timing.CYCLES[0xCA] + timing.CYCLES[0xD0]) + timing.CYCLES[0x60]
+    assert int(stacks['INICIO;EXTERNA;INTERNA']) == 3 * inner
+
+    output = tmp_path / 'perfil.folded'
+    profiler.write_folded(str(output))
+    assert output.read_text().split('\n')[:-1] == profiler.folded_lines()
+
+
+def test_sampled_mode_keeps_totals():
+    exact = profiled()
+    sampled = profiled(interval=4)
+    assert sampled.samples > 1
+    assert sampled.total_instructions == exact.total_instructions
+    assert sampled.total_cycles == exact.total_cycles
+    assert sum(sampled.counts) == exact.total_instructions
+    # A pilha é mantida pelos handlers instrumentados de JSR/RTS
+    assert {line.rsplit(' ', 1)[0] for line in sampled.folded_lines()} <= {
+        'INICIO', 'INICIO;EXTERNA', 'INICIO;EXTERNA;INTERNA'}
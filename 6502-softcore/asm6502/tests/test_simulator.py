@@ -0,0 +1,139 @@
+"""Simulador: semântica das instruções, blocos traduzidos e escritas no próprio código"""
+
+import pytest
+
+from assembler import Assembler6502
+from simulator import FLAG_C, FLAG_N, FLAG_V, FLAG_Z, STATUS_BRK, STATUS_LIMIT, Simulator6502
+
+# A rotina em $1100 é executada, tem o operando do LDA trocado e é executada de novo
+PATCH_ROUTINE = """
+        .ORG $1000
+INICIO: JSR ROT
+        STA $10
+        LDA #$42
+        STA $1101
+        JSR ROT
+        STA $11
+        BRK
+        .ORG $1100
+ROT:    LDA #$07
+        RTS
+"""
+
+# O STA escreve no operando do LDA seguinte, dentro do mesmo bloco
+PATCH_SAME_BLOCK = """
+        .ORG $1000
+INICIO: LDA #$05
+        STA $1006
+        LDA #$00
+        STA $10
+        BRK
+"""
+
+
+def execute(body: str, **options) -> Simulator6502:
+    """Monta o trecho em $1000 seguido de BRK e executa até o BRK"""
+    assembler = Assembler6502()
+    assembler.assemble("        .ORG $1000\n" + body + "        BRK\n")
+    simulator = Simulator6502.from_assembler(assembler, **options)
+    assert simulator.run(10000) == STATUS_BRK
+    return simulator
+
+
+def test_adc_sets_overflow_and_negative():
+    simulator = execute("        LDA #$7F\n        CLC\n        ADC #$01\n")
+    assert simulator.a == 0x80
+    assert simulator.ps & (FLAG_V | FLAG_N | FLAG_C | FLAG_Z) == FLAG_V | FLAG_N
+
+
+def test_sbc_borrow_clears_carry():
+    simulator = execute("        LDA #$00\n        SEC\n        SBC #$01\n")
+    assert simulator.a == 0xFF
+    assert simulator.ps & (FLAG_C | FLAG_N) == FLAG_N
+
+
+def test_jsr_rts_restores_stack():
+    simulator = execute("        LDX #$05\n        JSR ROT\n        STX $10\n        BRK\n"
+                        "ROT:    INX\n        RTS\n")
+    assert simulator.memory[0x10] == 0x06
+    assert simulator.sp == 0xFF
+    # Endereço de retorno empilhado: último byte do JSR ($1004)
+    assert simulator.memory[0x1FE:0x200] == bytes((0x04, 0x10))
+
+
+def test_indirect_indexed_store():
+    simulator = execute("        LDA #$00\n        STA $20\n        LDA #$30\n        STA $21\n"
+                        "        LDY #$04\n        LDA #$99\n        STA ($20),Y\n")
+    assert simulator.memory[0x3004] == 0x99
+
+
+def test_step_limit_and_resume():
+    assembler = Assembler6502()
+    assembler.assemble("        .ORG $1000\n        LDX #$00\nLACO:   INX\n        BNE LACO\n        BRK\n")
+    simulator = Simulator6502.from_assembler(assembler)
+    assert simulator.run(10) == STATUS_LIMIT and simulator.steps == 10
+    assert simulator.run() == STATUS_BRK
+    assert simulator.x == 0 and simulator.steps == 1 + 256 * 2
+
+
+def run(source: str, translate: bool) -> Simulator6502:
+    assembler = Assembler6502()
+    assembler.assemble(source)
+    simulator = Simulator6502.from_assembler(assembler, translate=translate)
+    assert simulator.run(10000) == STATUS_BRK
+    return simulator
+
+
+def state(simulator: Simulator6502) -> tuple:
+    return (simulator.a, simulator.x, simulator.y, simulator.sp, simulator.ps,
+            simulator.pc, simulator.steps, bytes(simulator.memory))
+
+
+@pytest.mark.parametrize('source', [PATCH_ROUTINE, PATCH_SAME_BLOCK], ids=['rotina', 'mesmo-bloco'])
+def test_translated_matches_interpreted(source):
+    assert state(run(source, translate=True)) == state(run(source, translate=False))
+
+
+def test_patched_routine_uses_new_operand():
+    simulator = run(PATCH_ROUTINE, translate=True)
+    assert simulator.memory[0x10] == 0x07
+    assert simulator.memory[0x11] == 0x42
+
+
+def test_write_in_same_block_ends_block():
+    simulator = run(PATCH_SAME_BLOCK, translate=True)
+    assert simulator.memory[0x10] == 0x05
+
+
+def test_write_invalidates_covering_blocks():
+    assembler = Assembler6502()
+    assembler.assemble(PATCH_ROUTINE)
+    simulator = Simulator6502.from_assembler(assembler, translate=True)
+    simulator.translate_block(0x1100)
+    assert 0x1100 in simulator.blocks
+    assert simulator.code_map[0x1101] == 1
+
+    # Escrita fora do código traduzido não descarta nada
+    simulator.write(0x1200, 0xFF)
+    assert 0x1100 in simulator.blocks and not simulator.code_modified
+
+    simulator.write(0x1101, 0x42)
+    assert 0x1100 not in simulator.blocks and 0x1100 not in simulator.block_bytes
+    assert not any(simulator.code_map)
+    assert simulator.code_modified
+    assert simulator.block_pages == {}
+
+
+def test_block_index_by_page():
+    # Bloco que atravessa a fronteira de página entra no índice das duas
+    assembler = Assembler6502()
+    assembler.assemble("        .ORG $10FE\nINICIO: NOP\n        NOP\n        NOP\n        BRK\n")
+    simulator = Simulator6502.from_assembler(assembler, translate=True)
+    simulator.translate_block(0x10FE)
+    assert simulator.block_pages == {0x10: {0x10FE}, 0x11: {0x10FE}}
+
+    # Escrita em outra página não toca no bloco; na segunda página, descarta
+    simulator.write(0x1200, 0xEA)
+    assert 0x10FE in simulator.blocks
+    simulator.write(0x1100, 0xEA)
+    assert simulator.blocks == {} and simulator.block_pages == {}
@@ -0,0 +1,99 @@
+"""Snapshots copy-on-write e estado gravado em disco"""
+
+import pytest
+
+from assembler import Assembler6502
+from simulator import STATUS_BRK, STATUS_LIMIT, Simulator6502
+from snapshot import Snapshot
+
+# Soma 1..10 em $20, guarda cada parcial em $0300,X e reescreve o operando
+# do LDA em ROT (código automodificável, para os blocos traduzidos)
+PROGRAM = """
+        .ORG $1000
+INICIO: LDX #$0A
+        LDA #$00
+LACO:   CLC
+        STX $21
+        ADC $21
+        STA $0300,X
+        STA $1101
+        JSR ROT
+        DEX
+        BNE LACO
+        STA $20
+        BRK
+        .ORG $1100
+ROT:    LDA #$00
+        RTS
+"""
+
+
+def state(simulator: Simulator6502) -> tuple:
+    return (simulator.a, simulator.x, simulator.y, simulator.sp, simulator.ps, simulator.pc,
+            simulator.steps, simulator.cycles, bytes(simulator.memory))
+
+
+def simulator(**options) -> Simulator6502:
+    assembler = Assembler6502()
+    assembler.assemble(PROGRAM)
+    return Simulator6502.from_assembler(assembler, timing_mode=True, **options)
+
+
+@pytest.mark.parametrize('translate', [False, True])
+def test_restore_replays_the_same_execution(translate):
+    sim = simulator(translate=translate)
+    assert sim.run(17) == STATUS_LIMIT
+    middle = sim.snapshot()
+    middle_state = state(sim)
+    assert sim.run(10_000) == STATUS_BRK
+    final = state(sim)
+    assert sim.memory[0x20] == 55
+
+    sim.restore(middle)
+    assert state(sim) == middle_state
+    assert sim.run(10_000) == STATUS_BRK
+    assert state(sim) == final
+
+
+def test_snapshots_share_unwritten_pages():
+    sim = simulator()
+    first = sim.snapshot()
+    sim.run(9)
+    second = sim.snapshot()
+    # Só a página zero ($21), a $0300, a pilha e a página de ROT ($1101)
+    assert first.changed_pages(second) == [0x00, 0x01, 0x03, 0x11]
+    assert sum(mine is theirs for mine, theirs in zip(first.pages, second.pages)) == len(first.pages) - 4
+    assert second.memory() == sim.memory
+
+
+def test_state_file_round_trip(tmp_path):
+    sim = simulator()
+    sim.run(25)
+    filename = str(tmp_path / 'estado.bin')
+    sim.save_state(filename)
+    saved = state(sim)
+
+    loaded = Snapshot.load(filename)
+    assert loaded.registers == (sim.a, sim.x, sim.y, sim.sp, sim.ps, sim.pc)
+    assert (loaded.steps, loaded.cycles) == (sim.steps, sim.cycles)
+
+    resumed = Simulator6502.from_state(filename, timing_mode=True)
+    assert state(resumed) == saved
+    sim.run(10_000)
+    resumed.run(10_000)
+    assert state(resumed) == state(sim)
+
+    # load_state volta o simulador original ao ponto gravado
+    sim.load_state(filename)
+    assert state(sim) == saved
+
+
+def test_invalid_state_files(tmp_path):
+    bad = tmp_path / 'ruim.bin'
+    bad.write_bytes(b'nada')
+    with pytest.raises(ValueError, match='Arquivo de estado inválido'):
+        Snapshot.load(str(bad))
+    sim = simulator()
+    small = Simulator6502(bytearray(0x1000), 0)
+    with pytest.raises(ValueError, match='Snapshot de'):
+        small.restore(sim.snapshot())
@@ -0,0 +1,78 @@
+"""Mapa de fonte: endereço -> arquivo/linha/label, arquivos incluídos e JSON"""
+
+import os
+
+import pytest
+
+from assembler import Assembler6502
+from sourcemap import SourceMap, SymbolIndex
+
+MAIN = """PORTA:  .EQU $8000
+        .ORG $1000
+INICIO: LDA #$01
+        STA PORTA
+        .INCLUDE "lib.inc"
+FIM:    BRK
+"""
+
+
+def source_map(tmp_path) -> SourceMap:
+    (tmp_path / 'lib.inc').write_text('X:      INX\n        RTS\n')
+    source = tmp_path / 'main.asm'
+    source.write_text(MAIN)
+    assembler = Assembler6502()
+    assembler.assemble_file(str(source))
+    return assembler.source_map()
+
+
+def test_addresses_map_to_source_lines(tmp_path):
+    mapping = source_map(tmp_path)
+    main, lib = str(tmp_path / 'main.asm'), str(tmp_path / 'lib.inc')
+    assert [os.path.basename(name) for name in mapping.files] == ['main.asm', 'lib.inc']
+    # Todos os bytes de uma instrução apontam para a mesma linha
+    assert mapping.line_at(0x1000) == mapping.line_at(0x1001) == (mapping.files[0], 3)
+    assert mapping.line_at(0x1004)[1] == 4
+    assert os.path.samefile(mapping.line_at(0x1005)[0], lib)
+    assert mapping.line_at(0x1006)[1] == 2
+    assert mapping.line_at(0x0FFF) is None and mapping.line_at(0x1008) is None
+
+    assert mapping.address_of(4) == 0x1002
+    assert mapping.address_of(2, mapping.files[1]) == 0x1006
+    assert mapping.address_of(1) is None
+    assert os.path.samefile(mapping.files[0], main)
+
+
+def test_symbolize_uses_labels_but_not_constants(tmp_path):
+    mapping = source_map(tmp_path)
+    assert 'PORTA' not in mapping.labels
+    assert mapping.symbolize(0x1003).endswith(':4 INICIO+3')
+    assert mapping.symbolize(0x1006).endswith('lib.inc:2 X+1')
+    # Fora do código: só o símbolo
+    assert mapping.symbolize(0x1008) == 'FIM+1'
+    assert mapping.symbolize(0x0800) == '$0800'
+    location = mapping.lookup(0x1005)
+    assert (location.label, location.offset, location.line) == ('X', 0, 1)
+    assert mapping.lookup(0x1005) is location
+
+
+def test_json_round_trip(tmp_path):
+    mapping = source_map(tmp_path)
+    filename = str(tmp_path / 'main.map')
+    mapping.save(filename)
+    loaded = SourceMap.load(filename)
+    assert len(loaded) == len(mapping) == 5
+    for address in range(0x0FFE, 0x100A):
+        assert loaded.lookup(address) == mapping.lookup(address)
+
+    (tmp_path / 'ruim.map').write_text('{"format": "outro"}')
+    with pytest.raises(ValueError, match='Mapa de fonte inválido'):
+        SourceMap.load(str(tmp_path / 'ruim.map'))
+
+
+def test_symbol_index_prefers_first_label_at_an_address():
+    index = SymbolIndex({'A': 0x10, 'B': 0x10, 'C': 0x20})
+    assert len(index) == 2
+    assert index.lookup(0x15) == ('A', 5)
+    assert index.lookup(0x0F) == (None, 0x0F)
+    assert index.owner(0x0F) == '$000F'
+    assert index.describe(0x20) == 'C' and index.describe(0x22) == 'C+2'
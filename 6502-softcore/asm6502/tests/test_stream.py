@@ -0,0 +1,66 @@
+"""Montagem em streaming: mesma imagem que assemble() e limites documentados"""
+
+import io
+import os
+
+import pytest
+
+from assembler import Assembler6502
+from benchmarks.sources import generate_source, runnable_source
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read(name: str) -> str:
+    with open(os.path.join(HERE, name), 'r') as f:
+        return f.read()
+
+
+def both(source: str):
+    whole = Assembler6502()
+    whole.assemble(source)
+    stream = Assembler6502()
+    stream.assemble_stream(io.StringIO(source))
+    return whole, stream
+
+
+@pytest.mark.parametrize('source', [
+    pytest.param(read('exemplo.asm'), id='exemplo.asm'),
+    pytest.param(read('loop.asm'), id='loop.asm'),
+    pytest.param(generate_source(20000), id='generate_source'),
+    pytest.param(runnable_source(), id='runnable_source'),
+])
+def test_stream_matches_assemble(source):
+    whole, stream = both(source)
+    assert bytes(stream.memory) == bytes(whole.memory)
+    assert stream.labels == whole.labels
+    assert stream.segments == whole.segments
+
+
+def test_forward_references_resolved_at_end():
+    source = """
+        .ORG $1000
+        JSR ROTINA
+        LDA #<TABELA
+        BNE FIM
+FIM:    BRK
+ROTINA: RTS
+TABELA: .WORD ROTINA, >FIM
+"""
+    whole, stream = both(source)
+    assert bytes(stream.memory) == bytes(whole.memory)
+
+
+def test_long_forward_branch_is_rejected():
+    source = '        .ORG $1000\n        BNE LONGE\n' + '        NOP\n' * 200 + 'LONGE:  BRK\n'
+    with pytest.raises(ValueError, match='Branch para frente fora do alcance'):
+        Assembler6502().assemble_stream(io.StringIO(source))
+    # assemble() troca por branch invertido + JMP
+    Assembler6502().assemble(source)
+
+
+def test_preprocessor_needs_whole_source():
+    with pytest.raises(ValueError, match='precisam do fonte inteiro'):
+        Assembler6502().assemble_stream(io.StringIO('        .INCLUDE "lib.inc"\n'))
+    with pytest.raises(ValueError, match='precisam do fonte inteiro'):
+        Assembler6502(optimize=True).assemble_stream(io.StringIO('        NOP\n'))
@@ -0,0 +1,73 @@
+"""Modelo de ciclos da FSM: tabela por opcode e contagem no simulador"""
+
+import pytest
+
+import timing
+from assembler import Assembler6502
+from simulator import STATUS_BRK, Simulator6502
+
+LOOP = """
+        .ORG $1000
+INICIO: LDX #$05
+        LDA #$00
+LACO:   CLC
+        ADC #$03
+        STA $20,X
+        DEX
+        BNE LACO
+        JSR ROT
+        LDY #$01
+        LDA ($30),Y
+        BRK
+ROT:    INC $21
+        RTS
+"""
+
+
+def assembled(source: str) -> Assembler6502:
+    assembler = Assembler6502()
+    assembler.assemble(source)
+    return assembler
+
+
+def test_stage_breakdown():
+    # NOP: sem READ; LDA #: 1 byte de operando; LDA abs: operando + dado lido duas vezes
+    assert timing.cycle_breakdown(0xEA)['READ'] == 0
+    assert timing.cycle_breakdown(0xA9)['READ'] == timing.MEMORY_ACCESS_CYCLES + timing.READ_EXIT_CYCLES
+    assert timing.cycle_breakdown(0xAD)['READ'] == 4 * timing.MEMORY_ACCESS_CYCLES
+    # JSR e STA (zp),Y gastam três ciclos no WRITEBACK
+    assert timing.cycle_breakdown(0x20)['WRITEBACK'] == 3
+    assert timing.cycle_breakdown(0x91)['WRITEBACK'] == 3
+    assert timing.CYCLES == [timing.fsm_cycles(opcode) for opcode in range(256)]
+    assert timing.fsm_cycles(0xEA) < timing.fsm_cycles(0xA9) < timing.fsm_cycles(0xAD)
+
+
+def test_unimplemented_opcode_uses_decoder_default():
+    assert not timing.is_implemented(0x02)
+    assert timing.cycle_breakdown(0x02) == timing.cycle_breakdown(0xEA)
+    assert timing.is_implemented(0xA9)
+
+
+@pytest.mark.parametrize('translate', [False, True])
+def test_simulator_cycles_match_table(translate):
+    assembler = assembled(LOOP)
+    # Referência: soma da tabela sobre cada opcode executado passo a passo (o BRK
+    # para a simulação e não conta como instrução executada)
+    reference = Simulator6502.from_assembler(assembler)
+    expected = 0
+    while True:
+        opcode = reference.memory[reference.pc]
+        if reference.step() == STATUS_BRK:
+            break
+        expected += timing.CYCLES[opcode]
+
+    simulator = Simulator6502.from_assembler(assembler, timing_mode=True, translate=translate)
+    assert simulator.run(1_000) == STATUS_BRK
+    assert simulator.steps == reference.steps
+    assert simulator.cycles == expected
+    assert simulator.elapsed_seconds() == pytest.approx(expected / timing.DEFAULT_CLOCK_HZ)
+
+
+def test_cycles_to_seconds():
+    assert timing.cycles_to_seconds(50_000_000) == 1.0
+    assert timing.cycles_to_seconds(25, 25) == 1.0
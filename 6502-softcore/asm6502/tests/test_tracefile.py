@@ -0,0 +1,110 @@
+"""Trace binário: gravação pelo simulador e leitura por passo, faixa de PC e ciclos"""
+
+import csv
+
+import pytest
+
+import timing
+from assembler import Assembler6502
+from simulator import STATUS_BRK, STATUS_LIMIT, Simulator6502
+from tracefile import TraceReader, TraceWriter
+
+# Laço com sub-rotina (JSR grava dois bytes na pilha) e escritas indexadas
+PROGRAM = """
+        .ORG $1000
+INICIO: LDX #$0A
+LACO:   TXA
+        STA $20,X
+        JSR ROT
+        DEX
+        BNE LACO
+        BRK
+        .ORG $1100
+ROT:    INC $40
+        RTS
+"""
+
+INTERVAL = 8
+
+
+def assembled() -> Assembler6502:
+    assembler = Assembler6502()
+    assembler.assemble(PROGRAM)
+    return assembler
+
+
+def expected_steps(assembler: Assembler6502) -> list:
+    """(pc, opcode, a, x, y, sp, ps, bytes alterados) de cada passo, instrução a instrução"""
+    simulator = Simulator6502.from_assembler(assembler)
+    steps = []
+    while True:
+        pc = simulator.pc
+        opcode = simulator.memory[pc]
+        before = bytes(simulator.memory)
+        if simulator.step() == STATUS_BRK:
+            return steps
+        changed = {(address, value) for address, (old, value)
+                   in enumerate(zip(before, simulator.memory)) if old != value}
+        steps.append((pc, opcode, simulator.a, simulator.x, simulator.y, simulator.sp,
+                      simulator.ps, changed))
+
+
+def record(assembler: Assembler6502, filename: str, *limits) -> Simulator6502:
+    simulator = Simulator6502.from_assembler(assembler, timing_mode=True)
+    with TraceWriter(filename, interval=INTERVAL) as writer:
+        simulator.attach_trace(writer)
+        for limit in limits:
+            simulator.run(limit)
+        simulator.detach_trace()
+    return simulator
+
+
+def test_round_trip_matches_step_by_step(tmp_path):
+    assembler = assembled()
+    expected = expected_steps(assembler)
+    filename = str(tmp_path / 'exec.trc')
+    # Execução interrompida no meio de um bloco do índice e retomada
+    simulator = record(assembler, filename, 13, None)
+    assert simulator.status == STATUS_BRK
+
+    with TraceReader(filename) as reader:
+        assert len(reader) == len(expected) == simulator.steps
+        for entry, (pc, opcode, a, x, y, sp, ps, changed) in zip(reader.entries(), expected):
+            assert (entry.pc, entry.opcode, entry.a, entry.x, entry.y, entry.sp, entry.ps) == (
+                pc, opcode, a, x, y, sp, ps)
+            assert changed <= set(entry.writes)
+        jsr = next(entry for entry in reader.entries() if entry.opcode == 0x20)
+        assert jsr.writes == ((0x1FF, 0x10), (0x1FE, 0x07))
+        assert reader[len(expected) - 1] == reader.entry(len(expected) - 1)
+        with pytest.raises(IndexError):
+            reader.entry(len(expected))
+
+
+def test_filter_and_cycles_use_the_index(tmp_path):
+    assembler = assembled()
+    filename = str(tmp_path / 'exec.trc')
+    simulator = record(assembler, filename, None)
+
+    with TraceReader(filename) as reader:
+        entries = list(reader.entries())
+        routine = list(reader.filter_pc(0x1100, 0x11FF))
+        assert routine == [entry for entry in entries if entry.pc >= 0x1100]
+        assert len(routine) == 20
+        for step in (0, 1, INTERVAL, INTERVAL + 3, len(reader)):
+            assert reader.cycles_at(step) == sum(timing.CYCLES[entry.opcode] for entry in entries[:step])
+        assert reader.cycles_at(len(reader)) == simulator.cycles
+
+        rows = reader.export_csv(str(tmp_path / 'janela.csv'), 5, 15, pc_range=(0x1000, 0x10FF))
+        with open(tmp_path / 'janela.csv', newline='') as f:
+            table = list(csv.reader(f))
+        assert rows == len(table) - 1 == sum(1 for entry in entries[5:15] if entry.pc < 0x1100)
+        assert table[1][3] in ('TXA', 'STA', 'JSR', 'DEX', 'BNE')
+
+
+def test_stop_at_limit_keeps_partial_block(tmp_path):
+    filename = str(tmp_path / 'exec.trc')
+    simulator = record(assembled(), filename, INTERVAL * 2 + 3)
+    assert simulator.status == STATUS_LIMIT
+    with TraceReader(filename) as reader:
+        assert len(reader) == INTERVAL * 2 + 3
+        assert len(reader.index) == 3
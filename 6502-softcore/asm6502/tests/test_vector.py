@@ -0,0 +1,81 @@
+"""Simulador vetorizado: cada lane igual ao Simulator6502 escalar"""
+
+import numpy as np
+import pytest
+
+from assembler import Assembler6502
+from simulator import STATUS_BRK, Simulator6502
+from vector import VectorSimulator6502
+
+LANES = 512
+
+# O caminho depende de A, X, Y e do carry iniciais de cada lane
+PROGRAM = """
+        .ORG $1000
+INICIO: STA $30
+        STX $31
+        ADC #$45
+        BVC SEMV
+        INY
+SEMV:   SBC $31
+        BCS COMC
+        JSR DOBRA
+COMC:   CMP #$80
+        BMI NEG
+        EOR #$FF
+NEG:    PHA
+        TXA
+        AND #$07
+        TAX
+        BEQ FIM
+LACO:   ROL $30
+        ASL A
+        ORA $30
+        DEX
+        BNE LACO
+FIM:    STA ($40),Y
+        BIT $30
+        PLA
+        ROR A
+        STA $32
+        BRK
+DOBRA:  LSR A
+        INC $31
+        RTS
+        .ORG $0040
+        .WORD $0200
+"""
+
+
+def test_lanes_match_scalar_simulator():
+    assembler = Assembler6502()
+    assembler.assemble(PROGRAM)
+    rng = np.random.default_rng(12)
+    registers = {name: rng.integers(0, 256, LANES) for name in ('a', 'x', 'y')}
+    # Só os flags da ALU variam: C, Z, N e V
+    registers['ps'] = rng.integers(0, 16, LANES)
+
+    vector = VectorSimulator6502.from_assembler(assembler, LANES, timing_mode=True)
+    vector.set_registers(**registers)
+    assert vector.run(1_000) == STATUS_BRK
+
+    for lane in range(LANES):
+        scalar = Simulator6502.from_assembler(assembler, timing_mode=True)
+        scalar.a, scalar.x, scalar.y = (int(registers[name][lane]) for name in ('a', 'x', 'y'))
+        scalar.ps = int(registers['ps'][lane])
+        assert scalar.run(1_000) == STATUS_BRK
+        result = vector.lane(lane)
+        assert (result.a, result.x, result.y, result.sp, result.ps, result.pc) == (
+            scalar.a, scalar.x, scalar.y, scalar.sp, scalar.ps, scalar.pc), f"lane {lane}"
+        assert (result.steps, result.cycles) == (scalar.steps, scalar.cycles)
+        assert result.memory == scalar.memory, f"lane {lane}"
+    # As lanes divergiram de fato (laço com 0 a 7 iterações)
+    assert len(set(vector.steps.tolist())) > 4
+
+
+def test_set_registers_rejects_unknown_names():
+    vector = VectorSimulator6502(bytearray(0x200), 2, start=0)
+    with pytest.raises(ValueError, match="Registrador desconhecido 'q'"):
+        vector.set_registers(q=1)
+    with pytest.raises(ValueError, match='3 lanes'):
+        VectorSimulator6502(np.zeros((3, 0x200), dtype=np.uint8), 2)
@@ -0,0 +1,90 @@
+"""Modo watch: cada montagem incremental igual à montagem completa do mesmo texto"""
+
+import pytest
+
+import memimage
+from assembler import Assembler6502
+from watch import WatchSession
+
+SOURCE = """LIMITE: .EQU $05
+        .ORG $1000
+INICIO: LDX #LIMITE
+LACO:   LDA TABELA,X
+        STA $20,X
+        DEX
+        BNE LACO
+        JSR ROT
+        BRK
+ROT:    INC CONTA
+        RTS
+TABELA: .BYTE 1, 2, 3, 4, 5, 6
+        .ORG $0040
+CONTA:  .BYTE 0
+"""
+
+# (texto antigo, texto novo) aplicados em sequência
+EDITS = [
+    ('LDX #LIMITE', 'LDX #$03'),                                   # só o operando
+    ('        DEX\n', '        DEX\n        NOP\n        NOP\n'),   # desloca o resto do código
+    ('.BYTE 1, 2, 3, 4, 5, 6', '.BYTE 9, 8'),                      # encolhe o fim
+    ('        .ORG $0040\n', '        .ORG $0140\n'),               # CONTA sai da página zero
+    ('        NOP\n        NOP\n', ''),                             # remove linhas
+    ('LIMITE: .EQU $05', 'LIMITE: .EQU $02'),                       # .EQU: montagem completa
+]
+
+
+def full_memory(source: str) -> bytearray:
+    assembler = Assembler6502()
+    assembler.assemble(source)
+    return assembler.memory
+
+
+def session(tmp_path, output: str):
+    source_file = tmp_path / 'main.asm'
+    source_file.write_text(SOURCE)
+    watch = WatchSession(str(source_file), str(tmp_path / output))
+    watch.poll()
+    assert watch.rebuild().startswith('[1] montagem completa')
+    return watch, source_file
+
+
+@pytest.mark.parametrize('output', ['main.mif', 'main.hex'])
+def test_incremental_builds_match_full_assembly(tmp_path, output):
+    watch, source_file = session(tmp_path, output)
+    source = SOURCE
+    for old, new in EDITS:
+        assert old in source
+        source = source.replace(old, new)
+        source_file.write_text(source)
+        result = watch.update()
+        assert (result is None) == ('.EQU' in old)
+        expected = full_memory(source)
+        assert watch.assembler.memory == expected, (old, new)
+        assert memimage.read_image(str(tmp_path / output)) == expected
+
+
+def test_changed_ranges_and_lines(tmp_path):
+    watch, source_file = session(tmp_path, 'main.mif')
+    source_file.write_text(SOURCE.replace('BYTE 1, 2, 3', 'BYTE 1, 7, 3'))
+    changed, lines = watch.update()
+    table = watch.assembler.labels['TABELA']
+    assert changed == [(table + 1, table + 2)]
+    assert lines == (12, 13)
+    # Texto igual: nada a codificar
+    changed, (first, last) = watch.update()
+    assert changed == [] and first == last
+
+
+def test_error_keeps_previous_image(tmp_path):
+    watch, source_file = session(tmp_path, 'main.mif')
+    before = bytes(watch.assembler.memory)
+    source_file.write_text(SOURCE.replace('JSR ROT', 'JSR NADA'))
+    watch.poll()
+    assert watch.rebuild() == "Erro de montagem: Linha 8: Label desconhecido 'NADA'"
+    assert bytes(watch.assembler.memory) == before
+    assert memimage.read_mif(str(tmp_path / 'main.mif')) == before
+
+    source_file.write_text(SOURCE.replace('INC CONTA', 'DEC CONTA'))
+    watch.poll()
+    assert watch.rebuild().startswith('[2] linha 10:')
+    assert watch.assembler.memory == full_memory(SOURCE.replace('INC CONTA', 'DEC CONTA'))
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Modelo de temporização da FSM do softcore (control_unit.v)
+
+Cada instrução passa por FETCH/DECODE/READ/EXECUTE/WRITEBACK, e cada
+acesso à RAM usa os sub-estágios SUB_SET_ADDR/SUB_WAIT/SUB_CAPTURE. Os
+endereçamentos indiretos e a pilha têm sub-máquinas próprias. A contagem
+abaixo reproduz, ciclo a ciclo, as transições da FSM para cada opcode
+decodificado por decoder.v.
+"""
+
+from typing import Dict, FrozenSet, List, Tuple
+
+# Frequências típicas de operação na Cyclone IV (README)
+DEFAULT_CLOCK_HZ = 50_000_000
+MIN_CLOCK_HZ = 25_000_000
+
+# Opcodes decodificados por decoder.v
+# Formato: {opcode: (instr_type, addr_mode, instr_size, acesso à memória)}
+# Acesso: 'R' = mem_read, 'W' = mem_write
+HW_DECODER: Dict[int, Tuple[str, str, int, str]] = {
+    0x01: ('ORA', 'INDX', 2, 'R'),
+    0x05: ('ORA', 'ZP', 2, 'R'),
+    0x06: ('ASL', 'ZP', 2, 'RW'),
+    0x09: ('ORA', 'IMM', 2, ''),
+    0x0A: ('ASL', 'IMPL', 1, ''),
+    0x0D: ('ORA', 'ABS', 3, 'R'),
+    0x0E: ('ASL', 'ABS', 3, 'RW'),
+    0x10: ('BPL', 'IMM', 2, ''),
+    0x11: ('ORA', 'INDY', 2, 'R'),
+    0x15: ('ORA', 'ZPX', 2, 'R'),
+    0x16: ('ASL', 'ZPX', 2, 'RW'),
+    0x18: ('CLR_CARRY', 'IMPL', 1, ''),
+    0x19: ('ORA', 'ABY', 3, 'R'),
+    0x1D: ('ORA', 'ABX', 3, 'R'),
+    0x1E: ('ASL', 'ABX', 3, 'RW'),
+    0x20: ('JSR', 'ABS', 3, ''),
+    0x21: ('AND', 'INDX', 2, 'R'),
+    0x24: ('BIT', 'ZP', 2, 'R'),
+    0x25: ('AND', 'ZP', 2, 'R'),
+    0x26: ('ROL', 'ZP', 2, 'RW'),
+    0x29: ('AND', 'IMM', 2, ''),
+    0x2A: ('ROL', 'IMPL', 1, ''),
+    0x2C: ('BIT', 'ABS', 3, 'R'),
+    0x2D: ('AND', 'ABS', 3, 'R'),
+    0x2E: ('ROL', 'ABS', 3, 'RW'),
+    0x30: ('BMI', 'IMM', 2, ''),
+    0x31: ('AND', 'INDY', 2, 'R'),
+    0x35: ('AND', 'ZPX', 2, 'R'),
+    0x36: ('ROL', 'ZPX', 2, 'RW'),
+    0x38: ('SET_CARRY', 'IMPL', 1, ''),
+    0x39: ('AND', 'ABY', 3, 'R'),
+    0x3D: ('AND', 'ABX', 3, 'R'),
+    0x3E: ('ROL', 'ABX', 3, 'RW'),
+    0x41: ('XOR', 'INDX', 2, 'R'),
+    0x45: ('XOR', 'ZP', 2, 'R'),
+    0x46: ('LSR', 'ZP', 2, 'RW'),
+    0x49: ('XOR', 'IMM', 2, ''),
+    0x4A: ('LSR', 'IMPL', 1, ''),
+    0x4C: ('JMP', 'ABS', 3, ''),
+    0x4D: ('XOR', 'ABS', 3, 'R'),
+    0x4E: ('LSR', 'ABS', 3, 'RW'),
+    0x50: ('BVC', 'IMM', 2, ''),
+    0x51: ('XOR', 'INDY', 2, 'R'),
+    0x55: ('XOR', 'ZPX', 2, 'R'),
+    0x56: ('LSR', 'ZPX', 2, 'RW'),
+    0x58: ('CLR_IRQ', 'IMPL', 1, ''),
+    0x59: ('XOR', 'ABY', 3, 'R'),
+    0x5D: ('XOR', 'ABX', 3, 'R'),
+    0x5E: ('LSR', 'ABX', 3, 'RW'),
+    0x60: ('RTS', 'IMPL', 1, 'R'),
+    0x61: ('ADC', 'INDX', 2, 'R'),
+    0x65: ('ADC', 'ZP', 2, 'R'),
+    0x66: ('ROR', 'ZP', 2, 'RW'),
+    0x69: ('ADC', 'IMM', 2, ''),
+    0x6A: ('ROR', 'IMPL', 1, ''),
+    0x6C: ('JMP', 'IND', 3, 'R'),
+    0x6D: ('ADC', 'ABS', 3, 'R'),
+    0x6E: ('ROR', 'ABS', 3, 'RW'),
+    0x70: ('BVS', 'IMM', 2, ''),
+    0x71: ('ADC', 'INDY', 2, 'R'),
+    0x75: ('ADC', 'ZPX', 2, 'R'),
+    0x76: ('ROR', 'ZPX', 2, 'RW'),
+    0x78: ('SET_IRQ', 'IMPL', 1, ''),
+    0x79: ('ADC', 'ABY', 3, 'R'),
+    0x7D: ('ADC', 'ABX', 3, 'R'),
+    0x7E: ('ROR', 'ABX', 3, 'RW'),
+    0x81: ('STA', 'INDX', 2, 'W'),
+    0x84: ('STA', 'ZP', 2, 'W'),
+    0x85: ('STA', 'ZP', 2, 'W'),
+    0x86: ('STA', 'ZP', 2, 'W'),
+    0x88: ('INX', 'IMPL', 1, ''),
+    0x8A: ('TX', 'IMPL', 1, ''),
+    0x8C: ('STA', 'ABS', 3, 'W'),
+    0x8D: ('STA', 'ABS', 3, 'W'),
+    0x8E: ('STA', 'ABS', 3, 'W'),
+    0x90: ('BCC', 'IMM', 2, ''),
+    0x91: ('STA', 'INDY', 2, 'W'),
+    0x94: ('STA', 'ZPX', 2, 'W'),
+    0x95: ('STA', 'ZPX', 2, 'W'),
+    0x96: ('STA', 'ZPY', 2, 'W'),
+    0x98: ('TY', 'IMPL', 1, ''),
+    0x99: ('STA', 'ABY', 3, 'W'),
+    0x9A: ('TX', 'IMPL', 1, ''),
+    0x9D: ('STA', 'ABX', 3, 'W'),
+    0xA0: ('LDA', 'IMM', 2, ''),
+    0xA1: ('LDA', 'INDX', 2, 'R'),
+    0xA2: ('LDA', 'IMM', 2, ''),
+    0xA4: ('LDA', 'ZP', 2, 'R'),
+    0xA5: ('LDA', 'ZP', 2, 'R'),
+    0xA6: ('LDA', 'ZP', 2, 'R'),
+    0xA8: ('TA', 'IMPL', 1, ''),
+    0xA9: ('LDA', 'IMM', 2, ''),
+    0xAA: ('TA', 'IMPL', 1, ''),
+    0xAC: ('LDA', 'ABS', 3, 'R'),
+    0xAD: ('LDA', 'ABS', 3, 'R'),
+    0xAE: ('LDA', 'ABS', 3, 'R'),
+    0xB0: ('BCS', 'IMM', 2, ''),
+    0xB1: ('LDA', 'INDY', 2, 'R'),
+    0xB4: ('LDA', 'ZPX', 2, 'R'),
+    0xB5: ('LDA', 'ZPX', 2, 'R'),
+    0xB6: ('LDA', 'ZPY', 2, 'R'),
+    0xB8: ('CLR_CLV', 'IMPL', 1, ''),
+    0xB9: ('LDA', 'ABY', 3, 'R'),
+    0xBA: ('TS', 'IMPL', 1, ''),
+    0xBC: ('LDA', 'ABX', 3, 'R'),
+    0xBD: ('LDA', 'ABX', 3, 'R'),
+    0xBE: ('LDA', 'ABY', 3, 'R'),
+    0xC0: ('CPY', 'IMM', 2, ''),
+    0xC1: ('CMP', 'INDX', 2, 'R'),
+    0xC4: ('CPY', 'ZP', 2, 'R'),
+    0xC5: ('CMP', 'ZP', 2, 'R'),
+    0xC6: ('INC', 'ZP', 2, 'RW'),
+    0xC8: ('INX', 'IMPL', 1, ''),
+    0xC9: ('CMP', 'IMM', 2, ''),
+    0xCA: ('INX', 'IMPL', 1, ''),
+    0xCC: ('CPY', 'ABS', 3, 'R'),
+    0xCD: ('CMP', 'ABS', 3, 'R'),
+    0xCE: ('INC', 'ABS', 3, 'RW'),
+    0xD0: ('BNE', 'IMM', 2, ''),
+    0xD1: ('CMP', 'INDY', 2, 'R'),
+    0xD5: ('CMP', 'ZPX', 2, 'R'),
+    0xD6: ('INC', 'ZPX', 2, 'RW'),
+    0xD8: ('CLR_CLD', 'IMPL', 1, ''),
+    0xD9: ('CMP', 'ABY', 3, 'R'),
+    0xDD: ('CMP', 'ABX', 3, 'R'),
+    0xDE: ('INC', 'ABX', 3, 'RW'),
+    0xE0: ('CPX', 'IMM', 2, ''),
+    0xE1: ('SBC', 'INDX', 2, 'R'),
+    0xE4: ('CPX', 'ZP', 2, 'R'),
+    0xE5: ('SBC', 'ZP', 2, 'R'),
+    0xE6: ('INC', 'ZP', 2, 'RW'),
+    0xE8: ('INX', 'IMPL', 1, ''),
+    0xE9: ('SBC', 'IMM', 2, ''),
+    0xEA: ('LDA', 'IMPL', 1, ''),
+    0xEC: ('CPX', 'ABS', 3, 'R'),
+    0xED: ('SBC', 'ABS', 3, 'R'),
+    0xEE: ('INC', 'ABS', 3, 'RW'),
+    0xF0: ('BEQ', 'IMM', 2, ''),
+    0xF1: ('SBC', 'INDY', 2, 'R'),
+    0xF5: ('SBC', 'ZPX', 2, 'R'),
+    0xF6: ('INC', 'ZPX', 2, 'RW'),
+    0xF8: ('SET_CLD', 'IMPL', 1, ''),
+    0xF9: ('SBC', 'ABY', 3, 'R'),
+    0xFD: ('SBC', 'ABX', 3, 'R'),
+    0xFE: ('INC', 'ABX', 3, 'RW'),
+}
+
+# Opcodes cujo WRITEBACK grava C, Z, V e N com os flags da ALU (control_unit.v:
+# use_alu com reg_dest != DEST_NONE e sem mem_write; BIT tem tratamento próprio).
+# Além do 6502 documentado, inclui INX/INY/DEX/DEY, AND/ORA/EOR e as
+# transferências entre registradores, que neste core zeram ou alteram o carry.
+HW_ALU_FLAG_WRITERS: FrozenSet[int] = frozenset({
+    0x01, 0x05, 0x09, 0x0A, 0x0D, 0x11, 0x15, 0x19, 0x1D,   # ORA, ASL A
+    0x21, 0x25, 0x29, 0x2A, 0x2D, 0x31, 0x35, 0x39, 0x3D,   # AND, ROL A
+    0x41, 0x45, 0x49, 0x4A, 0x4D, 0x51, 0x55, 0x59, 0x5D,   # EOR, LSR A
+    0x61, 0x65, 0x69, 0x6A, 0x6D, 0x71, 0x75, 0x79, 0x7D,   # ADC, ROR A
+    0x88, 0x8A, 0x98, 0x9A, 0xA8, 0xAA, 0xBA,               # DEY, TXA, TYA, TXS, TAY, TAX, TSX
+    0xC0, 0xC1, 0xC4, 0xC5, 0xC8, 0xC9, 0xCA, 0xCC, 0xCD,   # CPY, CMP, INY, DEX
+    0xD1, 0xD5, 0xD9, 0xDD,                                 # CMP
+    0xE0, 0xE1, 0xE4, 0xE5, 0xE8, 0xE9, 0xEC, 0xED,         # CPX, SBC, INX
+    0xF1, 0xF5, 0xF9, 0xFD,                                 # SBC
+})
+
+# Modos que leem o dado diretamente do endereço do operando
+DIRECT_MODES = {'ZP', 'ABS', 'ZPX', 'ZPY', 'ABX', 'ABY'}
+
+# Modos com a sub-máquina de endereçamento indireto
+INDIRECT_MODES = {'INDX', 'INDY', 'IND'}
+
+# Ciclos de cada etapa da FSM
+FETCH_CYCLES = 3           # SUB_SET_ADDR -> SUB_WAIT -> SUB_CAPTURE
+DECODE_CYCLES = 1
+MEMORY_ACCESS_CYCLES = 3   # Cada leitura de byte em READ
+READ_EXIT_CYCLES = 1       # SUB_SET_ADDR que apenas segue para EXECUTE
+EXECUTE_CYCLES = 1
+WRITEBACK_CYCLES = 1
+
+
+def cycle_breakdown(opcode: int) -> Dict[str, int]:
+    """
+    Ciclos de clock de cada estágio da FSM para um opcode
+    Opcodes ausentes em decoder.v caem no default (1 byte, sem acesso à memória).
+    """
+    instr_type, mode, size, access = HW_DECODER.get(opcode, ('NOP', 'IMPL', 1, ''))
+    mem_read = 'R' in access or instr_type == 'RTS'  # mem_read_eff
+    stages = {'FETCH': FETCH_CYCLES, 'DECODE': DECODE_CYCLES, 'READ': 0,
+              'EXECUTE': EXECUTE_CYCLES, 'WRITEBACK': WRITEBACK_CYCLES}
+
+    # DECODE só pula READ para instruções de 1 byte sem leitura
+    if size > 1 or mem_read:
+        read = MEMORY_ACCESS_CYCLES * (size - 1)
+        if instr_type == 'RTS':
+            # SUB_STACK_1 e SUB_STACK_2 (PC baixo e alto)
+            read += 2 * MEMORY_ACCESS_CYCLES
+        elif mem_read and mode in INDIRECT_MODES:
+            # SUB_IND_READ_LO/HI/DATA + SUB_IND_COMPLETE
+            read += 3 * MEMORY_ACCESS_CYCLES + READ_EXIT_CYCLES
+        elif mem_read and mode in DIRECT_MODES:
+            # A captura do dado volta para SUB_SET_ADDR e o dado é lido duas vezes
+            read += 2 * MEMORY_ACCESS_CYCLES
+        else:
+            read += READ_EXIT_CYCLES
+        stages['READ'] = read
+
+    if instr_type == 'JSR':
+        # SUB_STACK_1..3: empilha PC alto, PC baixo e atualiza PC/SP
+        stages['WRITEBACK'] = 3
+    elif 'W' in access and mode in INDIRECT_MODES:
+        # Escrita indireta: lê ponteiro baixo, alto e então escreve
+        stages['WRITEBACK'] = 3
+
+    return stages
+
+
+def fsm_cycles(opcode: int) -> int:
+    """Total de ciclos de clock de um opcode"""
+    return sum(cycle_breakdown(opcode).values())
+
+
+# Ciclos por opcode (tabela de 256 posições)
+CYCLES: List[int] = [fsm_cycles(opcode) for opcode in range(256)]
+
+
+def is_implemented(opcode: int) -> bool:
+    """Indica se o opcode é decodificado pelo hardware"""
+    return opcode in HW_DECODER
+
+
+def cycles_to_seconds(cycles: int, clock_hz: float = DEFAULT_CLOCK_HZ) -> float:
+    """Converte ciclos em tempo real para uma frequência de clock"""
+    return cycles / clock_hz
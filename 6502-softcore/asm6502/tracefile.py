@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Trace binário de execução do simulador 6502
+
+Cada instrução executada vira uma entrada de tamanho fixo (16 bytes):
+
+    PC (16) | opcode | A | X | Y | SP | PS | nº de escritas |
+    endereço/valor da 1ª escrita | endereço/valor da 2ª escrita | pad
+
+Os registradores são os valores após a instrução; as escritas são as que
+ela fez na memória (JSR faz duas). A entrada N corresponde ao passo N,
+então buscar um passo é só calcular o offset.
+
+A cada INDEX_INTERVAL entradas o arquivo ganha um registro de índice com o
+menor e o maior PC do trecho e os ciclos da FSM acumulados no início dele.
+O índice fica no fim do arquivo; o leitor usa mmap e só lê o cabeçalho e o
+índice ao abrir, então traces de gigabytes abrem instantaneamente. O filtro
+por faixa de PC pula trechos inteiros que não podem conter a faixa.
+"""
+
+import argparse
+import csv
+import mmap
+import struct
+import sys
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+import timing
+from simulator import opcode_table
+
+MAGIC = b'T6502TRC'
+VERSION = 1
+
+# magic, versão, tamanho da entrada, intervalo do índice, entradas, offset do índice
+HEADER = struct.Struct('<8sHHIQQ')
+ENTRY = struct.Struct('<HB5BBHBHBx')
+# menor PC, maior PC, ciclos acumulados no início do trecho
+INDEX = struct.Struct('<HHQ')
+
+INDEX_INTERVAL = 4096
+
+
+class TraceEntry(NamedTuple):
+    step: int
+    pc: int
+    opcode: int
+    a: int
+    x: int
+    y: int
+    sp: int
+    ps: int
+    writes: Tuple[Tuple[int, int], ...]
+
+
+class TraceWriter:
+    """Grava o trace em blocos de INDEX_INTERVAL entradas"""
+
+    def __init__(self, filename: str, interval: int = INDEX_INTERVAL):
+        self.filename = filename
+        self.interval = interval
+        self.file = open(filename, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, ENTRY.size, interval, 0, 0))
+        self.buffer = bytearray(ENTRY.size * interval)
+        self.position = 0     # Entradas no bloco atual
+        self.count = 0        # Entradas já gravadas no arquivo
+        self.cycles = 0       # Ciclos acumulados até o bloco atual
+        self.index: List[bytes] = []
+        self.entry = ENTRY
+
+    def record(self, pc: int, opcode: int, a: int, x: int, y: int, sp: int, ps: int,
+               writes: List[Tuple[int, int]]) -> None:
+        """Acrescenta uma entrada (chamado pelo simulador a cada instrução)"""
+        count = len(writes)
+        first = writes[0] if count else (0, 0)
+        second = writes[1] if count > 1 else (0, 0)
+        ENTRY.pack_into(self.buffer, self.position * ENTRY.size, pc, opcode, a, x, y, sp, ps,
+                        count, first[0], first[1], second[0], second[1])
+        self.position += 1
+        if self.position == self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Grava o bloco atual e o registro de índice correspondente"""
+        if not self.position:
+            return
+        size = self.position * ENTRY.size
+        data = memoryview(self.buffer)[:size]
+        pcs = data.cast('H')[::ENTRY.size // 2]
+        self.index.append(INDEX.pack(min(pcs), max(pcs), self.cycles))
+        self.cycles += sum(map(timing.CYCLES.__getitem__, data[2::ENTRY.size]))
+        self.file.write(data)
+        self.count += self.position
+        self.position = 0
+
+    def close(self) -> None:
+        """Grava o índice no fim do arquivo e atualiza o cabeçalho"""
+        if self.file.closed:
+            return
+        self.flush()
+        index_offset = self.file.tell()
+        self.file.write(b''.join(self.index))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, ENTRY.size, self.interval, self.count, index_offset))
+        self.file.close()
+
+    def __enter__(self) -> 'TraceWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class TraceReader:
+    """Leitura do trace via mmap: busca por passo, filtro por PC e exportação"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, entry_size, interval, count, index_offset = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION or entry_size != ENTRY.size:
+            raise ValueError(f"Arquivo de trace inválido: {filename}")
+        self.interval = interval
+        self.count = count
+        self.index = [INDEX.unpack_from(self.data, index_offset + i * INDEX.size)
+                      for i in range((count + interval - 1) // interval)]
+
+    def close(self) -> None:
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self) -> 'TraceReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def entry(self, step: int) -> TraceEntry:
+        """Entrada do passo `step`"""
+        if not 0 <= step < self.count:
+            raise IndexError(f"Passo {step} fora do trace (0..{self.count - 1})")
+        return self._entry(step, ENTRY.unpack_from(self.data, HEADER.size + step * ENTRY.size))
+
+    __getitem__ = entry
+
+    @staticmethod
+    def _entry(step: int, fields: tuple) -> TraceEntry:
+        pc, opcode, a, x, y, sp, ps, count, address1, value1, address2, value2 = fields
+        writes = ((address1, value1), (address2, value2))[:count]
+        return TraceEntry(step, pc, opcode, a, x, y, sp, ps, writes)
+
+    def entries(self, start: int = 0, stop: Optional[int] = None) -> Iterator[TraceEntry]:
+        """Entradas dos passos [start, stop)"""
+        stop = self.count if stop is None else min(stop, self.count)
+        start = max(start, 0)
+        if start >= stop:
+            return
+        view = memoryview(self.data)[HEADER.size + start * ENTRY.size:HEADER.size + stop * ENTRY.size]
+        try:
+            for step, fields in enumerate(ENTRY.iter_unpack(view), start):
+                yield self._entry(step, fields)
+        finally:
+            view.release()
+
+    def filter_pc(self, low: int, high: int, start: int = 0,
+                  stop: Optional[int] = None) -> Iterator[TraceEntry]:
+        """Entradas com PC em [low, high], pulando trechos do índice fora da faixa"""
+        stop = self.count if stop is None else min(stop, self.count)
+        for chunk, (min_pc, max_pc, _) in enumerate(self.index):
+            chunk_start = max(chunk * self.interval, start)
+            chunk_stop = min((chunk + 1) * self.interval, stop)
+            if chunk_start >= chunk_stop or max_pc < low or min_pc > high:
+                continue
+            for entry in self.entries(chunk_start, chunk_stop):
+                if low <= entry.pc <= high:
+                    yield entry
+
+    def cycles_at(self, step: int) -> int:
+        """Ciclos da FSM acumulados antes do passo `step`"""
+        chunk = step // self.interval
+        if chunk >= len(self.index):
+            chunk = len(self.index) - 1
+        cycles = self.index[chunk][2] if self.index else 0
+        for entry in self.entries(chunk * self.interval, step):
+            cycles += timing.CYCLES[entry.opcode]
+        return cycles
+
+    def export_csv(self, filename: str, start: int = 0, stop: Optional[int] = None,
+                   pc_range: Optional[Tuple[int, int]] = None, source_map=None) -> int:
+        """
+        Exporta a janela como CSV; retorna a quantidade de linhas
+        Com `source_map` (sourcemap.SourceMap), cada linha ganha a posição no fonte.
+        """
+        table = opcode_table()
+        entries = self.filter_pc(*pc_range, start, stop) if pc_range else self.entries(start, stop)
+        rows = 0
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            header = ['passo', 'pc', 'opcode', 'instrucao', 'a', 'x', 'y', 'sp', 'ps', 'escritas']
+            if source_map is not None:
+                header.append('fonte')
+            writer.writerow(header)
+            for entry in entries:
+                mnemonic = table[entry.opcode][0] if entry.opcode in table else '???'
+                writes = ' '.join(f"{address:04X}={value:02X}" for address, value in entry.writes)
+                row = [entry.step, f"{entry.pc:04X}", f"{entry.opcode:02X}", mnemonic,
+                       f"{entry.a:02X}", f"{entry.x:02X}", f"{entry.y:02X}",
+                       f"{entry.sp:02X}", f"{entry.ps:02X}", writes]
+                if source_map is not None:
+                    row.append(source_map.symbolize(entry.pc))
+                writer.writerow(row)
+                rows += 1
+        return rows
+
+    def export_vcd(self, filename: str, start: int = 0, stop: Optional[int] = None) -> int:
+        """
+        Exporta a janela em formato VCD (tempo em ciclos da FSM)
+        Retorna a quantidade de passos exportados
+        """
+        signals = (('pc', 16, '!'), ('opcode', 8, '"'), ('a', 8, '#'), ('x', 8, '$'),
+                   ('y', 8, '%'), ('sp', 8, '&'), ('ps', 8, "'"))
+        cycles = self.cycles_at(max(start, 0))
+        last: dict = {}
+        steps = 0
+        with open(filename, 'w') as f:
+            f.write("$timescale 1 ns $end\n$scope module cpu6502 $end\n")
+            for name, width, code in signals:
+                f.write(f"$var wire {width} {code} {name} $end\n")
+            f.write("$upscope $end\n$enddefinitions $end\n")
+            for entry in self.entries(start, stop):
+                cycles += timing.CYCLES[entry.opcode]
+                changes = []
+                for name, width, code in signals:
+                    value = getattr(entry, name)
+                    if last.get(code) != value:
+                        last[code] = value
+                        changes.append(f"b{value:0{width}b} {code}\n")
+                if changes:
+                    f.write(f"#{cycles}\n")
+                    f.write(''.join(changes))
+                steps += 1
+        return steps
+
+
+def parse_range(text: str) -> Tuple[int, int]:
+    """Lê uma faixa de PC no formato 1000:10FF (hexadecimal)"""
+    low, _, high = text.partition(':')
+    return int(low, 16), int(high or low, 16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leitura de traces binários do simulador 6502")
+    parser.add_argument('trace', help="arquivo de trace gerado com simulator.py --trace")
+    parser.add_argument('--start', type=int, default=0, help="primeiro passo da janela")
+    parser.add_argument('--count', type=int, default=None, help="quantidade de passos da janela")
+    parser.add_argument('--pc', type=parse_range, metavar='INICIO:FIM', help="filtra por faixa de PC (hex)")
+    parser.add_argument('--csv', metavar='ARQUIVO', help="exporta a janela em CSV")
+    parser.add_argument('--vcd', metavar='ARQUIVO', help="exporta a janela em VCD")
+    parser.add_argument('--map', metavar='ARQUIVO', help="mapa de fonte (assembler.py --map) para simbolizar os PCs")
+    args = parser.parse_args()
+
+    try:
+        source_map = None
+        if args.map:
+            from sourcemap import SourceMap
+            source_map = SourceMap.load(args.map)
+        with TraceReader(args.trace) as reader:
+            stop = None if args.count is None else args.start + args.count
+            print(f"{args.trace}: {len(reader)} passos, índice a cada {reader.interval}")
+            if args.csv:
+                rows = reader.export_csv(args.csv, args.start, stop, args.pc, source_map)
+                print(f"CSV gerado: {args.csv} ({rows} linhas)")
+            if args.vcd:
+                steps = reader.export_vcd(args.vcd, args.start, stop)
+                print(f"VCD gerado: {args.vcd} ({steps} passos)")
+            if not args.csv and not args.vcd:
+                entries = reader.filter_pc(*args.pc, args.start, stop) if args.pc else reader.entries(args.start, stop)
+                for entry in entries:
+                    writes = ' '.join(f"[{address:04X}]={value:02X}" for address, value in entry.writes)
+                    location = f"  {source_map.symbolize(entry.pc)}" if source_map is not None else ''
+                    print(f"{entry.step:>10}  {entry.pc:04X}  {entry.opcode:02X}  A={entry.a:02X} X={entry.x:02X} "
+                          f"Y={entry.y:02X} SP={entry.sp:02X} PS={entry.ps:02X}  {writes}{location}")
+    except FileNotFoundError as e:
+        print(f"Erro: Arquivo '{e.filename}' não encontrado.")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Execução vetorizada (lockstep) de milhares de instâncias do softcore 6502
+
+Cada instância ("lane") tem seus próprios registradores e memória: A, X, Y,
+SP, PS e PC são arrays NumPy com uma posição por lane e a memória é um
+array 2-D (lanes x bytes). A cada passo, todas as lanes ativas executam
+uma instrução. Lanes no mesmo PC e com o mesmo opcode formam um grupo e
+são executadas juntas com operações vetorizadas da ALU e dos flags; após
+um branch divergente cada caminho vira um grupo (máscara por lane).
+
+A semântica é a mesma do Simulator6502 (layout de flags do README), o que
+permite conferir qualquer lane com o simulador escalar via lane().
+
+Requer NumPy.
+"""
+
+import argparse
+import sys
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+import timing
+from assembler import START_ADDRESS, AddressMode, Assembler6502
+from simulator import (FLAG_C, FLAG_D, FLAG_I, FLAG_N, FLAG_V, FLAG_Z, NZ,
+                       STATUS_BRK, STATUS_LIMIT, STATUS_RUNNING, Simulator6502, opcode_table)
+
+# Flags Z e N de cada resultado de 8 bits, indexável por arrays
+NZ_TABLE = np.array(NZ, dtype=np.int32)
+CYCLE_TABLE = np.array(timing.CYCLES, dtype=np.int64)
+
+nZN = 0xFF & ~(FLAG_Z | FLAG_N)
+nZCN = 0xFF & ~(FLAG_Z | FLAG_C | FLAG_N)
+nZCNV = 0xFF & ~(FLAG_Z | FLAG_C | FLAG_N | FLAG_V)
+nZNV = 0xFF & ~(FLAG_Z | FLAG_N | FLAG_V)
+
+# Registrador de destino/origem das instruções de carga, armazenamento e transferência
+LOAD_REGISTERS = {'LDA': 'a', 'LDX': 'x', 'LDY': 'y'}
+STORE_REGISTERS = {'STA': 'a', 'STX': 'x', 'STY': 'y'}
+TRANSFERS = {'TAX': ('a', 'x'), 'TAY': ('a', 'y'), 'TXA': ('x', 'a'),
+             'TYA': ('y', 'a'), 'TSX': ('sp', 'x')}
+INCREMENTS = {'INX': ('x', 1), 'DEX': ('x', -1), 'INY': ('y', 1), 'DEY': ('y', -1)}
+COMPARES = {'CMP': 'a', 'CPX': 'x', 'CPY': 'y'}
+FLAG_CLEAR = {'CLC': FLAG_C, 'CLI': FLAG_I, 'CLD': FLAG_D, 'CLV': FLAG_V}
+FLAG_SET = {'SEC': FLAG_C, 'SEI': FLAG_I, 'SED': FLAG_D}
+
+# Branch: (flag testado, desvia quando o flag está ativo)
+BRANCHES = {
+    'BCC': (FLAG_C, False), 'BCS': (FLAG_C, True),
+    'BEQ': (FLAG_Z, True), 'BNE': (FLAG_Z, False),
+    'BMI': (FLAG_N, True), 'BPL': (FLAG_N, False),
+    'BVC': (FLAG_V, False), 'BVS': (FLAG_V, True),
+}
+
+
+class VectorSimulator6502:
+    """Simulador de muitas instâncias em lockstep sobre arrays NumPy"""
+
+    def __init__(self, memory: Sequence[int], lanes: int, start: int = START_ADDRESS,
+                 timing_mode: bool = False):
+        """
+        `memory`: imagem única (1-D, copiada para todas as lanes) ou uma
+        imagem por lane (2-D, lanes x bytes)
+        """
+        image = np.asarray(memory, dtype=np.uint8)
+        if image.ndim == 1:
+            image = np.broadcast_to(image, (lanes, image.shape[0]))
+        if image.shape[0] != lanes:
+            raise ValueError(f"Memória com {image.shape[0]} lanes, esperado {lanes}")
+        size = image.shape[1]
+        if size & (size - 1) or size < 0x200:
+            raise ValueError(f"Tamanho de memória {size} não é potência de 2 (mínimo $200)")
+        self.memory = np.array(image, dtype=np.uint8)
+        self.lanes = lanes
+        self.address_mask = size - 1
+        self.start = start
+        self.a = np.zeros(lanes, dtype=np.int32)
+        self.x = np.zeros(lanes, dtype=np.int32)
+        self.y = np.zeros(lanes, dtype=np.int32)
+        self.sp = np.full(lanes, 0xFF, dtype=np.int32)
+        self.ps = np.zeros(lanes, dtype=np.int32)
+        self.pc = np.full(lanes, start & self.address_mask, dtype=np.int32)
+        self.steps = np.zeros(lanes, dtype=np.int64)
+        self.halted = np.zeros(lanes, dtype=bool)
+        self.timing_mode = timing_mode
+        self.cycles = np.zeros(lanes, dtype=np.int64)
+        self.status = STATUS_RUNNING
+        self.table = opcode_table()
+        self.operations: Dict[str, Callable] = self.build_operations()
+
+    @classmethod
+    def from_assembler(cls, assembler: Assembler6502, lanes: int, start: int = START_ADDRESS,
+                       timing_mode: bool = False) -> 'VectorSimulator6502':
+        """Cria `lanes` instâncias com a memória montada pelo assembler"""
+        return cls(assembler.memory, lanes, start, timing_mode)
+
+    def set_registers(self, **registers) -> None:
+        """Define registradores por lane (escalar ou array): a=..., x=..., ps=..."""
+        for name, values in registers.items():
+            if name not in ('a', 'x', 'y', 'sp', 'ps', 'pc'):
+                raise ValueError(f"Registrador desconhecido '{name}'")
+            mask = self.address_mask if name == 'pc' else 0xFF
+            getattr(self, name)[:] = np.asarray(values, dtype=np.int32) & mask
+
+    def lane(self, index: int) -> Simulator6502:
+        """Estado de uma lane como Simulator6502 (para conferência ou depuração)"""
+        simulator = Simulator6502(bytearray(self.memory[index].tobytes()), self.start, self.timing_mode)
+        simulator.a, simulator.x, simulator.y = int(self.a[index]), int(self.x[index]), int(self.y[index])
+        simulator.sp, simulator.ps, simulator.pc = int(self.sp[index]), int(self.ps[index]), int(self.pc[index])
+        simulator.steps, simulator.cycles = int(self.steps[index]), int(self.cycles[index])
+        return simulator
+
+    # Acesso à memória -----------------------------------------------------
+
+    def read(self, idx: np.ndarray, address: np.ndarray) -> np.ndarray:
+        return self.memory[idx, address].astype(np.int32)
+
+    def effective_address(self, idx: np.ndarray, mode: str, pc: int) -> np.ndarray:
+        """Endereço efetivo de cada lane do grupo"""
+        mask = self.address_mask
+        op8 = self.read(idx, (pc + 1) & mask)
+        if mode == AddressMode.ZERO_PAGE:
+            return op8
+        if mode == AddressMode.ZERO_PAGE_X:
+            return (op8 + self.x[idx]) & 0xFF
+        if mode == AddressMode.ZERO_PAGE_Y:
+            return (op8 + self.y[idx]) & 0xFF
+        if mode == AddressMode.INDIRECT_X:
+            pointer = op8 + self.x[idx]
+            return (self.read(idx, pointer & 0xFF) | (self.read(idx, (pointer + 1) & 0xFF) << 8)) & mask
+        if mode == AddressMode.INDIRECT_Y:
+            base = self.read(idx, op8) | (self.read(idx, (op8 + 1) & 0xFF) << 8)
+            return (base + self.y[idx]) & mask
+        op16 = op8 | (self.read(idx, (pc + 2) & mask) << 8)
+        if mode == AddressMode.ABSOLUTE:
+            return op16 & mask
+        if mode == AddressMode.ABSOLUTE_X:
+            return (op16 + self.x[idx]) & mask
+        if mode == AddressMode.ABSOLUTE_Y:
+            return (op16 + self.y[idx]) & mask
+        if mode == AddressMode.INDIRECT:
+            return (self.read(idx, op16 & mask) | (self.read(idx, (op16 + 1) & mask) << 8)) & mask
+        raise ValueError(f"Modo sem endereço efetivo: {mode}")
+
+    def operand(self, idx: np.ndarray, mode: str, pc: int) -> np.ndarray:
+        if mode == AddressMode.IMMEDIATE:
+            return self.read(idx, (pc + 1) & self.address_mask)
+        return self.read(idx, self.effective_address(idx, mode, pc))
+
+    def set_nz(self, idx: np.ndarray, result: np.ndarray, keep: int = nZN) -> None:
+        self.ps[idx] = (self.ps[idx] & keep) | NZ_TABLE[result]
+
+    def push(self, idx: np.ndarray, value: np.ndarray) -> None:
+        self.memory[idx, 0x100 | self.sp[idx]] = value
+        self.sp[idx] = (self.sp[idx] - 1) & 0xFF
+
+    def pull(self, idx: np.ndarray) -> np.ndarray:
+        self.sp[idx] = (self.sp[idx] + 1) & 0xFF
+        return self.read(idx, 0x100 | self.sp[idx])
+
+    # Operações ------------------------------------------------------------
+    # Cada operação recebe (lanes do grupo, instrução, modo, PC, tamanho) e
+    # retorna o novo PC de cada lane (ou None para avançar `tamanho` bytes)
+
+    def build_operations(self) -> Dict[str, Callable]:
+        operations: Dict[str, Callable] = {}
+        for mnemonic in LOAD_REGISTERS:
+            operations[mnemonic] = self.op_load
+        for mnemonic in STORE_REGISTERS:
+            operations[mnemonic] = self.op_store
+        for mnemonic in TRANSFERS:
+            operations[mnemonic] = self.op_transfer
+        for mnemonic in INCREMENTS:
+            operations[mnemonic] = self.op_increment
+        for mnemonic in COMPARES:
+            operations[mnemonic] = self.op_compare
+        for mnemonic in list(FLAG_CLEAR) + list(FLAG_SET):
+            operations[mnemonic] = self.op_flag
+        for mnemonic in BRANCHES:
+            operations[mnemonic] = self.op_branch
+        for mnemonic in ('AND', 'ORA', 'EOR'):
+            operations[mnemonic] = self.op_logic
+        for mnemonic in ('ASL', 'LSR', 'ROL', 'ROR', 'INC', 'DEC'):
+            operations[mnemonic] = self.op_read_modify_write
+        operations.update(ADC=self.op_adc, SBC=self.op_sbc, BIT=self.op_bit,
+                          TXS=self.op_txs, NOP=self.op_nop,
+                          PHA=self.op_push, PHP=self.op_push, PLA=self.op_pla, PLP=self.op_plp,
+                          JMP=self.op_jmp, JSR=self.op_jsr, RTS=self.op_rts, RTI=self.op_rti)
+        return operations
+
+    def op_load(self, idx, mnemonic, mode, pc, size):
+        value = self.operand(idx, mode, pc)
+        getattr(self, LOAD_REGISTERS[mnemonic])[idx] = value
+        self.set_nz(idx, value)
+
+    def op_store(self, idx, mnemonic, mode, pc, size):
+        self.memory[idx, self.effective_address(idx, mode, pc)] = getattr(self, STORE_REGISTERS[mnemonic])[idx]
+
+    def op_transfer(self, idx, mnemonic, mode, pc, size):
+        source, target = TRANSFERS[mnemonic]
+        value = getattr(self, source)[idx]
+        getattr(self, target)[idx] = value
+        self.set_nz(idx, value)
+
+    def op_txs(self, idx, mnemonic, mode, pc, size):
+        self.sp[idx] = self.x[idx]
+
+    def op_increment(self, idx, mnemonic, mode, pc, size):
+        register, delta = INCREMENTS[mnemonic]
+        result = (getattr(self, register)[idx] + delta) & 0xFF
+        getattr(self, register)[idx] = result
+        self.set_nz(idx, result)
+
+    def op_flag(self, idx, mnemonic, mode, pc, size):
+        if mnemonic in FLAG_SET:
+            self.ps[idx] |= FLAG_SET[mnemonic]
+        else:
+            self.ps[idx] &= 0xFF & ~FLAG_CLEAR[mnemonic]
+
+    def op_nop(self, idx, mnemonic, mode, pc, size):
+        pass
+
+    def op_logic(self, idx, mnemonic, mode, pc, size):
+        value = self.operand(idx, mode, pc)
+        a = self.a[idx]
+        if mnemonic == 'AND':
+            result = a & value
+        elif mnemonic == 'ORA':
+            result = a | value
+        else:
+            result = a ^ value
+        self.a[idx] = result
+        self.set_nz(idx, result)
+
+    def op_adc(self, idx, mnemonic, mode, pc, size):
+        value = self.operand(idx, mode, pc)
+        a, ps = self.a[idx], self.ps[idx]
+        total = a + value + ((ps & FLAG_C) != 0)
+        result = total & 0xFF
+        overflow = (~(a ^ value) & (a ^ result) & 0x80) != 0
+        self.ps[idx] = ((ps & nZCNV) | NZ_TABLE[result]
+                        | np.where(total > 0xFF, FLAG_C, 0) | np.where(overflow, FLAG_V, 0))
+        self.a[idx] = result
+
+    def op_sbc(self, idx, mnemonic, mode, pc, size):
+        value = self.operand(idx, mode, pc)
+        a, ps = self.a[idx], self.ps[idx]
+        total = a - value - ((ps & FLAG_C) == 0)
+        result = total & 0xFF
+        overflow = ((a ^ value) & (a ^ result) & 0x80) != 0
+        self.ps[idx] = ((ps & nZCNV) | NZ_TABLE[result]
+                        | np.where(total >= 0, FLAG_C, 0) | np.where(overflow, FLAG_V, 0))
+        self.a[idx] = result
+
+    def op_compare(self, idx, mnemonic, mode, pc, size):
+        total = getattr(self, COMPARES[mnemonic])[idx] - self.operand(idx, mode, pc)
+        self.ps[idx] = (self.ps[idx] & nZCN) | NZ_TABLE[total & 0xFF] | np.where(total >= 0, FLAG_C, 0)
+
+    def op_bit(self, idx, mnemonic, mode, pc, size):
+        value = self.operand(idx, mode, pc)
+        self.ps[idx] = ((self.ps[idx] & nZNV) | np.where(self.a[idx] & value, 0, FLAG_Z)
+                        | np.where(value & 0x80, FLAG_N, 0) | np.where(value & 0x40, FLAG_V, 0))
+
+    def op_read_modify_write(self, idx, mnemonic, mode, pc, size):
+        if mode == AddressMode.ACCUMULATOR:
+            address = None
+            value = self.a[idx]
+        else:
+            address = self.effective_address(idx, mode, pc)
+            value = self.read(idx, address)
+        ps = self.ps[idx]
+        carry_in = (ps & FLAG_C) != 0
+        if mnemonic == 'INC':
+            result, carry = (value + 1) & 0xFF, None
+        elif mnemonic == 'DEC':
+            result, carry = (value - 1) & 0xFF, None
+        elif mnemonic == 'ASL':
+            result, carry = (value << 1) & 0xFF, value & 0x80
+        elif mnemonic == 'LSR':
+            result, carry = value >> 1, value & 0x01
+        elif mnemonic == 'ROL':
+            result, carry = ((value << 1) | carry_in) & 0xFF, value & 0x80
+        else:
+            result, carry = (value >> 1) | np.where(carry_in, 0x80, 0), value & 0x01
+
+        if address is None:
+            self.a[idx] = result
+        else:
+            self.memory[idx, address] = result
+        if carry is None:
+            self.ps[idx] = (ps & nZN) | NZ_TABLE[result]
+        else:
+            self.ps[idx] = (ps & nZCN) | NZ_TABLE[result] | np.where(carry, FLAG_C, 0)
+
+    def op_push(self, idx, mnemonic, mode, pc, size):
+        self.push(idx, self.a[idx] if mnemonic == 'PHA' else self.ps[idx])
+
+    def op_pla(self, idx, mnemonic, mode, pc, size):
+        value = self.pull(idx)
+        self.a[idx] = value
+        self.set_nz(idx, value)
+
+    def op_plp(self, idx, mnemonic, mode, pc, size):
+        self.ps[idx] = self.pull(idx)
+
+    def op_branch(self, idx, mnemonic, mode, pc, size):
+        flag, when_set = BRANCHES[mnemonic]
+        offset = self.read(idx, (pc + 1) & self.address_mask)
+        target = (pc + 2 + np.where(offset & 0x80, offset - 256, offset)) & self.address_mask
+        taken = ((self.ps[idx] & flag) != 0) == when_set
+        return np.where(taken, target, (pc + 2) & self.address_mask)
+
+    def op_jmp(self, idx, mnemonic, mode, pc, size):
+        return self.effective_address(idx, mode, pc)
+
+    def op_jsr(self, idx, mnemonic, mode, pc, size):
+        target = self.effective_address(idx, mode, pc)
+        ret = (pc + 2) & 0xFFFF
+        self.push(idx, np.full(len(idx), ret >> 8, dtype=np.int32))
+        self.push(idx, np.full(len(idx), ret & 0xFF, dtype=np.int32))
+        return target
+
+    def op_rts(self, idx, mnemonic, mode, pc, size):
+        lo = self.pull(idx)
+        hi = self.pull(idx)
+        return (((hi << 8) | lo) + 1) & self.address_mask
+
+    def op_rti(self, idx, mnemonic, mode, pc, size):
+        self.ps[idx] = self.pull(idx)
+        lo = self.pull(idx)
+        hi = self.pull(idx)
+        return ((hi << 8) | lo) & self.address_mask
+
+    # Execução -------------------------------------------------------------
+
+    def execute_group(self, idx: np.ndarray, pc: int, opcode: int) -> None:
+        """Executa uma instrução em todas as lanes do grupo (mesmo PC e opcode)"""
+        entry = self.table.get(opcode)
+        if entry is None:
+            raise ValueError(f"Opcode inválido ${opcode:02X} em ${pc:04X} (lanes {idx[:8].tolist()})")
+        mnemonic, mode, size = entry
+        if mnemonic == 'BRK':
+            # BRK para a lane (não conta como instrução executada)
+            self.halted[idx] = True
+            return
+        new_pc = self.operations[mnemonic](idx, mnemonic, mode, pc, size)
+        self.pc[idx] = (pc + size) & self.address_mask if new_pc is None else new_pc
+        self.steps[idx] += 1
+        if self.timing_mode:
+            self.cycles[idx] += CYCLE_TABLE[opcode]
+
+    def step(self) -> int:
+        """Executa uma instrução em cada lane ativa; retorna quantas lanes rodaram"""
+        active = np.flatnonzero(~self.halted)
+        if active.size == 0:
+            return 0
+        pcs = self.pc[active]
+        keys = (pcs << 8) | self.memory[active, pcs]
+        first = keys[0]
+        if (keys == first).all():
+            # Caso comum: todas as lanes no mesmo ponto do programa
+            self.execute_group(active, int(first >> 8), int(first & 0xFF))
+            return active.size
+        # Lanes divergentes: um grupo por (PC, opcode)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for group in np.split(order, bounds):
+            key = int(keys[group[0]])
+            self.execute_group(active[group], key >> 8, key & 0xFF)
+        return active.size
+
+    def run(self, max_steps: Optional[int] = None) -> str:
+        """
+        Executa até todas as lanes pararem em BRK ou até `max_steps` passos
+        Retorna STATUS_BRK (todas paradas) ou STATUS_LIMIT
+        """
+        limit = max_steps if max_steps is not None else sys.maxsize
+        self.status = STATUS_RUNNING
+        for _ in range(limit):
+            if not self.step():
+                self.status = STATUS_BRK
+                return self.status
+        self.status = STATUS_BRK if self.halted.all() else STATUS_LIMIT
+        return self.status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Execução vetorizada de várias instâncias do softcore 6502")
+    parser.add_argument('program', help="arquivo .asm")
+    parser.add_argument('-l', '--lanes', type=int, default=1024, help="quantidade de instâncias (padrão: 1024)")
+    parser.add_argument('-n', '--max-steps', type=int, default=100_000,
+                        help="limite de passos (padrão: 100000)")
+    parser.add_argument('--random', action='store_true',
+                        help="inicia A, X, Y e PS com valores aleatórios em cada lane")
+    parser.add_argument('--seed', type=int, default=0, help="semente dos valores aleatórios")
+    parser.add_argument('-t', '--timing', action='store_true', help="conta os ciclos de clock da FSM")
+    args = parser.parse_args()
+
+    try:
+        assembler = Assembler6502()
+        assembler.assemble_file(args.program)
+        simulator = VectorSimulator6502.from_assembler(assembler, args.lanes, timing_mode=args.timing)
+        if args.random:
+            rng = np.random.default_rng(args.seed)
+            simulator.set_registers(**{name: rng.integers(0, 256, args.lanes) for name in ('a', 'x', 'y', 'ps')})
+
+        started = time.perf_counter()
+        status = simulator.run(args.max_steps)
+        elapsed = time.perf_counter() - started
+
+        total = int(simulator.steps.sum())
+        print(f"Estado: {status}, {int(simulator.halted.sum())} de {args.lanes} lanes paradas em BRK")
+        print(f"Instruções executadas: {total} ({total / elapsed / 1e6:.2f} M instruções/s)" if elapsed > 0 else "")
+        print(f"Lane 0: {simulator.lane(0)}")
+        if args.timing:
+            print(f"Ciclos: mín {int(simulator.cycles.min())}, máx {int(simulator.cycles.max())}")
+
+    except FileNotFoundError:
+        print(f"Erro: Arquivo '{args.program}' não encontrado.")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Erro de simulação: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
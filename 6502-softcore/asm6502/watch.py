@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Modo watch do Mini Assembler 6502
+
+Um processo de longa duração que observa o fonte (e o mapa de memória) e
+remonta a cada gravação, mantendo em memória os statements de cada
+linha, a tabela de símbolos e a imagem:
+
+- só as linhas alteradas (entre o prefixo e o sufixo iguais ao texto
+  anterior) são analisadas de novo;
+- o layout é recalculado por inteiro (primeira passagem é barata), mas
+  só são codificados os statements novos, os que mudaram de endereço,
+  tamanho ou opcode e os que referenciam labels que mudaram de endereço;
+- bytes que deixaram de ser usados voltam a zero.
+
+O .mif de saída tem layout fixo (memimage.write_mif_fixed: uma linha de
+tamanho fixo por endereço), então cada montagem só reescreve no lugar as
+linhas dos bytes que mudaram. Saídas .hex e .bin são regravadas inteiras.
+
+Com -O o otimizador reescreve a lista de statements inteira, então toda
+montagem é completa e regrava a saída inteira. O mesmo vale para fontes
+com .INCLUDE, macros ou .REPT (as linhas não correspondem mais aos
+statements; os incluídos também são observados e vêm do cache de
+preprocessor.py) e para edições de linhas com .EQU.
+
+A observação é por polling de mtime/tamanho (sem dependências externas).
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import memimage
+from assembler import RE_PREPROCESSOR, AddressMode, Assembler6502, Statement, StatementKind
+from memorymap import MemoryMap, find_project_map
+from snapshot import PAGE_SIZE
+
+# Intervalo de polling dos arquivos observados, em segundos
+DEFAULT_INTERVAL = 0.1
+
+
+def common_affixes(old: Sequence[str], new: Sequence[str]) -> Tuple[int, int]:
+    """Tamanho do prefixo e do sufixo comuns (sem se sobreporem)"""
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix
+
+
+def statement_refs(statement: Statement) -> List[str]:
+    """Labels cujo endereço entra nos bytes do statement"""
+    if statement.ref is not None:
+        return [statement.ref.lstrip('<>')]
+    if statement.kind == StatementKind.WORD:
+        return [word for word in statement.data if isinstance(word, str)]
+    return []
+
+
+def changed_ranges(before: Sequence[int], after: Sequence[int],
+                   ranges: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Intervalos (início, fim exclusivo) em que as duas imagens diferem dentro de `ranges`"""
+    changed: List[Tuple[int, int]] = []
+    for start, end in memimage.normalize_ranges(ranges, len(after)):
+        # Compara por página e só desce ao byte nas páginas diferentes
+        for page in range(start, end, PAGE_SIZE):
+            stop = min(page + PAGE_SIZE, end)
+            old, new = before[page:stop], after[page:stop]
+            if old == new:
+                continue
+            for offset, (a, b) in enumerate(zip(old, new)):
+                if a == b:
+                    continue
+                address = page + offset
+                if changed and changed[-1][1] == address:
+                    changed[-1] = (changed[-1][0], address + 1)
+                else:
+                    changed.append((address, address + 1))
+    return changed
+
+
+def uncovered(start: int, end: int, segments: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Partes de [start, end) fora de `segments`"""
+    result = []
+    position = start
+    for seg_start, seg_end in sorted(segments):
+        if seg_end <= position or seg_start >= end:
+            continue
+        if seg_start > position:
+            result.append((position, seg_start))
+        position = max(position, seg_end)
+    if position < end:
+        result.append((position, end))
+    return result
+
+
+def segments_overlap(segments: Sequence[Tuple[int, int]]) -> bool:
+    ordered = sorted(segments)
+    return any(ordered[i][1] > ordered[i + 1][0] for i in range(len(ordered) - 1))
+
+
+class WatchSession:
+    """Estado mantido entre montagens de um fonte"""
+
+    def __init__(self, source_file: str, output_file: str, memory_map_file: Optional[str] = None,
+                 optimize: bool = False):
+        self.source_file = source_file
+        self.output_file = output_file
+        self.memory_map_file = memory_map_file
+        self.optimize = optimize
+        self.assembler: Optional[Assembler6502] = None
+        self.lines: List[str] = []
+        # Statement de cada linha do fonte (None: linha vazia ou comentário)
+        self.line_statements: List[Optional[Statement]] = []
+        # Modo, opcode e tamanho vindos do parser (antes do relax) de cada statement
+        self.parsed: Dict[Statement, Tuple[str, int, int]] = {}
+        # (endereço, tamanho, opcode) de cada statement na última montagem
+        self.layout: Dict[Statement, Tuple[int, int, int]] = {}
+        self.mtimes: Dict[str, Tuple[int, int]] = {}
+        # Estado do mapa de memória na última montagem completa
+        self.map_stamp: Optional[Tuple[int, int]] = None
+        # Falso com -O ou pré-processador: toda montagem é completa
+        self.incremental = False
+        self.builds = 0
+
+    def watched_files(self) -> List[str]:
+        files = [self.source_file]
+        if self.memory_map_file:
+            files.append(self.memory_map_file)
+        if self.assembler is not None:
+            files.extend(self.assembler.files[1:])
+        return files
+
+    def poll(self) -> bool:
+        """Indica se algum arquivo observado mudou desde a última verificação"""
+        changed = False
+        for filename in self.watched_files():
+            try:
+                info = os.stat(filename)
+                stamp = (info.st_mtime_ns, info.st_size)
+            except FileNotFoundError:
+                stamp = (0, -1)
+            if self.mtimes.get(filename) != stamp:
+                self.mtimes[filename] = stamp
+                changed = True
+        return changed
+
+    def full_build(self) -> None:
+        """Montagem completa: recria o assembler e o .mif de layout fixo"""
+        memory_map = MemoryMap.load(self.memory_map_file) if self.memory_map_file else None
+        assembler = Assembler6502(self.optimize, memory_map)
+        assembler.source_name = self.source_file
+        with open(self.source_file, 'r') as f:
+            source = f.read()
+        lines = source.split('\n')
+        self.incremental = not (self.optimize or RE_PREPROCESSOR.search(source))
+        if not self.incremental:
+            # Otimizador e pré-processador reescrevem a lista inteira: sempre montagem completa
+            line_statements = []
+            statements = assembler.prepare(source)
+        else:
+            line_statements = [assembler.parse_line(line, line_num) for line_num, line in enumerate(lines, 1)]
+            statements = self.relax(assembler, line_statements)
+        assembler.second_pass(statements)
+        assembler.statements = statements
+
+        self.assembler = assembler
+        self.lines = lines
+        self.line_statements = line_statements
+        self.remember_layout(statements)
+        self.write_output(None)
+        self.builds += 1
+
+    def relax(self, assembler: Assembler6502, line_statements: List[Optional[Statement]]) -> List[Statement]:
+        """Volta os statements ao estado do parser e recalcula o layout"""
+        statements = [statement for statement in line_statements if statement is not None]
+        parsed = self.parsed
+        for statement in statements:
+            if statement.kind != StatementKind.INSTRUCTION:
+                continue
+            original = parsed.get(statement)
+            if original is None:
+                if statement.ref is not None or statement.mode == AddressMode.RELATIVE:
+                    parsed[statement] = (statement.mode, statement.opcode, statement.size)
+            else:
+                statement.mode, statement.opcode, statement.size = original
+        assembler.relax(statements)
+        return statements
+
+    def remember_layout(self, statements: List[Statement]) -> None:
+        self.layout = {st: (st.address, st.size, st.opcode) for st in statements}
+        live = set(self.layout)
+        self.parsed = {st: original for st, original in self.parsed.items() if st in live}
+
+    def update(self) -> Optional[Tuple[List[Tuple[int, int]], Tuple[int, int]]]:
+        """
+        Remonta a partir do texto atual do fonte
+        Retorna (intervalos de endereço alterados, linhas alteradas [início, fim)),
+        ou None se a mudança exigiu uma montagem completa
+        """
+        assembler = self.assembler
+        with open(self.source_file, 'r') as f:
+            source = f.read()
+        lines = source.split('\n')
+        prefix, suffix = common_affixes(self.lines, lines)
+        old_end, new_end = len(self.lines) - suffix, len(lines) - suffix
+        edited = self.lines[prefix:old_end] + lines[prefix:new_end]
+        if RE_PREPROCESSOR.search(source) or any('.EQU' in line.upper() for line in edited):
+            # Constantes já foram usadas no parse de outras linhas
+            self.full_build()
+            return None
+
+        # Analisa só as linhas alteradas; as do sufixo só mudam de número
+        middle = [assembler.parse_line(lines[i], i + 1) for i in range(prefix, new_end)]
+        tail = [statement for statement in self.line_statements[old_end:] if statement is not None]
+        line_statements = self.line_statements[:prefix] + middle + self.line_statements[old_end:]
+
+        old_labels = dict(assembler.labels)
+        old_segments = list(assembler.segments)
+        self.shift_lines(tail, new_end - old_end)
+        try:
+            statements = self.relax(assembler, line_statements)
+            encode = self.to_encode(statements, old_labels, old_segments)
+        except ValueError:
+            # O estado anterior continua valendo até o fonte voltar a montar
+            self.shift_lines(tail, old_end - new_end)
+            assembler.labels, assembler.segments = old_labels, old_segments
+            raise
+
+        memory = assembler.memory
+        before = memory[0:len(memory)]
+        try:
+            # Bytes que saíram dos segmentos voltam a zero
+            for start, end in old_segments:
+                for gap_start, gap_end in uncovered(start, end, assembler.segments):
+                    memory[gap_start:gap_end] = bytes(gap_end - gap_start)
+            if encode:
+                assembler.second_pass(encode)
+        except ValueError:
+            # Imagem parcialmente alterada: a próxima montagem é completa
+            self.assembler = None
+            raise
+        assembler.statements = statements
+
+        self.lines = lines
+        self.line_statements = line_statements
+        self.remember_layout(statements)
+        changed = changed_ranges(before, memory, old_segments + assembler.segments)
+        self.write_output(changed)
+        self.builds += 1
+        return changed, (prefix + 1, new_end + 1)
+
+    @staticmethod
+    def shift_lines(statements: List[Statement], delta: int) -> None:
+        if delta:
+            for statement in statements:
+                statement.line_num += delta
+
+    def to_encode(self, statements: List[Statement], old_labels: Dict[str, int],
+                  old_segments: List[Tuple[int, int]]) -> List[Statement]:
+        """Statements cujos bytes podem ter mudado desde a última montagem"""
+        assembler = self.assembler
+        if segments_overlap(old_segments) or segments_overlap(assembler.segments):
+            # Segmentos sobrepostos: um byte pode ter vindo de outro statement
+            return statements
+        labels = assembler.labels
+        moved = {name for name in labels.keys() | old_labels.keys()
+                 if labels.get(name) != old_labels.get(name)}
+        layout = self.layout
+        encode = []
+        for statement in statements:
+            if not statement.size:
+                continue
+            refs = statement_refs(statement)
+            if layout.get(statement) == (statement.address, statement.size, statement.opcode) \
+                    and not (moved and any(ref in moved for ref in refs)):
+                continue
+            for ref in refs:
+                # Confere antes de mexer na imagem (second_pass pararia no meio)
+                assembler.resolve_label(ref, statement.line_num)
+            encode.append(statement)
+        return encode
+
+    def write_output(self, changed: Optional[List[Tuple[int, int]]]) -> None:
+        """Grava a imagem; no .mif, só as linhas de `changed` (None: arquivo inteiro)"""
+        assembler = self.assembler
+        extension = self.output_file.rsplit('.', 1)[-1].lower()
+        if extension not in ('hex', 'bin'):
+            if changed is None:
+                memimage.write_mif_fixed(assembler.memory, self.output_file)
+            elif changed:
+                try:
+                    memimage.patch_mif_fixed(assembler.memory, self.output_file, changed)
+                except (OSError, ValueError):
+                    # Arquivo apagado ou alterado por fora: regrava inteiro
+                    memimage.write_mif_fixed(assembler.memory, self.output_file)
+        elif changed is None or changed:
+            assembler.write_output(self.output_file)
+
+    def rebuild(self) -> str:
+        """Remonta (completa na primeira vez ou se o mapa mudou) e descreve o resultado"""
+        started = time.perf_counter()
+        map_stamp = self.mtimes.get(self.memory_map_file) if self.memory_map_file else None
+        try:
+            result = None
+            if self.assembler is None or not self.incremental or map_stamp != self.map_stamp:
+                self.map_stamp = map_stamp
+                self.assembler = None
+                self.full_build()
+            else:
+                result = self.update()
+            if result is None:
+                summary = f"montagem completa, {sum(end - start for start, end in self.assembler.segments)} bytes"
+            else:
+                changed, (first, last) = result
+                ranges = ', '.join(f"${start:04X}-${end - 1:04X}" if end - start > 1 else f"${start:04X}"
+                                   for start, end in changed) or 'nenhum byte alterado'
+                lines = f"linha {first}" if last - first <= 1 else f"linhas {first}-{last - 1}"
+                summary = f"{lines}: {ranges}"
+        except FileNotFoundError as e:
+            return f"Erro: Arquivo '{e.filename}' não encontrado."
+        except ValueError as e:
+            return f"Erro de montagem: {e}"
+        elapsed = (time.perf_counter() - started) * 1000
+        return f"[{self.builds}] {summary} ({elapsed:.1f} ms)"
+
+    def run(self, interval: float = DEFAULT_INTERVAL) -> None:
+        """Observa os arquivos até Ctrl+C, remontando a cada mudança"""
+        print(f"Observando {', '.join(self.watched_files())} -> {self.output_file} (Ctrl+C para sair)")
+        try:
+            while True:
+                if self.poll():
+                    print(self.rebuild(), flush=True)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Modo watch do Mini Assembler 6502")
+    parser.add_argument('input', help="arquivo .asm observado")
+    parser.add_argument('output', nargs='?', help="arquivo de saída .mif, .hex ou .bin (padrão: <entrada>.mif)")
+    parser.add_argument('--memory-map', metavar='ARQUIVO',
+                        help="mapa de memória (padrão: memoria.cfg ao lado do fonte, se existir)")
+    parser.add_argument('-O', '--optimize', action='store_true', help="aplica o otimizador peephole")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help="intervalo de verificação dos arquivos em segundos (padrão: 0.1)")
+    args = parser.parse_args()
+
+    output_file = args.output or args.input.rsplit('.', 1)[0] + '.mif'
+    memory_map_file = args.memory_map or find_project_map(args.input)
+    if not os.path.isfile(args.input):
+        print(f"Erro: Arquivo '{args.input}' não encontrado.")
+        sys.exit(1)
+    WatchSession(args.input, output_file, memory_map_file, args.optimize).run(args.interval)
+
+
+if __name__ == '__main__':
+    main()